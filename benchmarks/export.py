@@ -0,0 +1,118 @@
+"""
+Benchmarks for the end-to-end export of scatter and volume layers.
+
+Each benchmark runs `export_viewer` for every registered file extension and compression method,
+and records the time taken, the peak memory usage, and the total size of the output.
+Compare against a stored baseline with e.g. `asv continuous master HEAD` or `asv compare`.
+"""
+
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from glue_ar.common.export import export_viewer
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
+from glue_ar.common.volume_export_options import ARIsosurfaceExportOptions, ARVoxelExportOptions
+from glue_ar.utils import xyz_bounds
+
+from .scenes import COMPRESSIONS, EXTENSIONS, check_combination, multi_scatter_scene, output_size, \
+                    scatter_scene, state_dictionary, volume_scene
+
+
+class ExportBenchmark:
+
+    number = 1
+    repeat = (1, 5, 120.0)
+    timeout = 1800
+
+    def _setup_export(self, viewer_state, layer_states, method, options, extension, compression, with_resolution,
+                      parallel=False):
+        self.parallel = parallel
+        self.viewer_state = viewer_state
+        self.layer_states = layer_states
+        self.state_dictionary = state_dictionary(layer_states, method, options)
+        self.bounds = xyz_bounds(viewer_state, with_resolution=with_resolution)
+        self.compression = compression
+        self.directory = mkdtemp()
+        self.filepath = join(self.directory, f"export.{extension}")
+
+    def teardown(self, *args):
+        directory = getattr(self, "directory", None)
+        if directory is not None:
+            rmtree(directory, ignore_errors=True)
+
+    def export(self):
+        export_viewer(self.viewer_state,
+                      layer_states=self.layer_states,
+                      bounds=self.bounds,
+                      state_dictionary=self.state_dictionary,
+                      filepath=self.filepath,
+                      compression=self.compression,
+                      parallel=self.parallel)
+
+    def time_export(self, *args):
+        self.export()
+
+    def peakmem_export(self, *args):
+        self.export()
+
+    def track_output_size(self, *args):
+        self.export()
+        return output_size(self.directory)
+
+    track_output_size.unit = "bytes"
+
+
+class ScatterExport(ExportBenchmark):
+
+    params = ([10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6], EXTENSIONS, COMPRESSIONS)
+    param_names = ["points", "extension", "compression"]
+
+    def setup(self, points, extension, compression):
+        check_combination(extension, compression)
+        viewer_state, layer_states = scatter_scene(points)
+        self._setup_export(viewer_state, layer_states, "Scatter", ARVispyScatterExportOptions(),
+                           extension, compression, with_resolution=False)
+
+
+class ParallelScatterExport(ExportBenchmark):
+
+    # Compares exporting the layers of a scene one after another and in a pool of threads.
+    # The speedup depends on the number of cores of the machine running the benchmarks
+    params = ([1, 4, 10], [False, True])
+    param_names = ["layers", "parallel"]
+
+    def setup(self, layers, parallel):
+        viewer_state, layer_states = multi_scatter_scene(layers, 10 ** 5)
+        self._setup_export(viewer_state, layer_states, "Scatter", ARVispyScatterExportOptions(log_points_per_mesh=4),
+                           "glb", "None", with_resolution=False, parallel=parallel)
+
+
+class VoxelExport(ExportBenchmark):
+
+    # Voxel geometry scales with the cube of the viewer resolution, so we cap it.
+    # The data size still determines the cost of computing the fixed resolution buffer.
+    max_resolution = 128
+
+    params = ([64, 128, 256, 512], EXTENSIONS, COMPRESSIONS)
+    param_names = ["size", "extension", "compression"]
+
+    def setup(self, size, extension, compression):
+        check_combination(extension, compression)
+        viewer_state, layer_states = volume_scene(size, resolution=min(size, self.max_resolution))
+        self._setup_export(viewer_state, layer_states, "Voxel", ARVoxelExportOptions(),
+                           extension, compression, with_resolution=True)
+
+
+class IsosurfaceExport(ExportBenchmark):
+
+    max_resolution = 256
+
+    params = ([64, 128, 256, 512], EXTENSIONS, COMPRESSIONS)
+    param_names = ["size", "extension", "compression"]
+
+    def setup(self, size, extension, compression):
+        check_combination(extension, compression)
+        viewer_state, layer_states = volume_scene(size, resolution=min(size, self.max_resolution))
+        self._setup_export(viewer_state, layer_states, "Isosurface", ARIsosurfaceExportOptions(),
+                           extension, compression, with_resolution=True)
@@ -0,0 +1,30 @@
+"""
+Benchmarks for the time that glue-ar adds to glue's startup.
+
+glue calls `glue_ar.setup` whenever it starts, so it shouldn't import the libraries that are only needed
+for exporting (usd-core, numpy-stl, DracoPy, mcubes). Each benchmark runs in a fresh interpreter,
+with glue itself imported beforehand, so that only the cost of glue-ar is measured.
+"""
+
+GLUE_IMPORTS = "import glue.config, glue.core, glue.viewers.common3d.viewer_state"
+
+
+def timeraw_import():
+    return "import glue_ar", GLUE_IMPORTS
+
+
+def timeraw_setup_common():
+    return "import glue_ar; glue_ar.setup_common()", GLUE_IMPORTS
+
+
+def timeraw_setup():
+    return "import glue_ar; glue_ar.setup()", GLUE_IMPORTS
+
+
+def timeraw_first_export_lookup():
+    # The cost of loading the exporters, which is deferred until an export (or the export dialog) needs them
+    return """
+from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
+from glue_ar.common.export_options import ar_layer_export
+ar_layer_export.method_names(ScatterLayerState3D, "glb")
+""", GLUE_IMPORTS + "; import glue_ar; glue_ar.setup_common()"
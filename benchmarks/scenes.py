@@ -0,0 +1,85 @@
+from os import walk
+from os.path import getsize, join
+from typing import Dict, List, Tuple
+
+from glue.core import Data, DataCollection
+from glue.core.state_objects import State
+from glue.viewers.common.state import LayerState
+from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
+from glue.viewers.scatter3d.viewer_state import ScatterViewerState3D
+from glue.viewers.volume3d.layer_state import VolumeLayerState3D
+from glue.viewers.volume3d.viewer_state import VolumeViewerState3D
+import numpy as np
+
+from glue_ar import setup_common
+from glue_ar.registries import builder, compressor
+from glue_ar.utils import export_label_for_layer
+
+
+setup_common()
+
+EXTENSIONS = sorted(builder.members)
+COMPRESSIONS = ["None"] + sorted(compressor.members)
+GL_EXTENSIONS = ("gltf", "glb")
+
+
+def check_combination(extension: str, compression: str):
+    # asv skips any parameter combination for which setup raises NotImplementedError.
+    # Compression only applies to glTF, so other combinations would just repeat the uncompressed case.
+    if compression != "None" and extension not in GL_EXTENSIONS:
+        raise NotImplementedError
+
+
+def scatter_scene(n_points: int, seed: int = 0) -> Tuple[ScatterViewerState3D, List[LayerState]]:
+    rng = np.random.default_rng(seed)
+    data = Data(x=rng.normal(size=n_points),
+                y=rng.normal(size=n_points),
+                z=rng.normal(size=n_points),
+                c=rng.random(n_points),
+                label="scatter")
+    viewer_state = ScatterViewerState3D()
+    layer_state = ScatterLayerState3D(layer=data, viewer_state=viewer_state)
+    viewer_state.layers.append(layer_state)
+    return viewer_state, [layer_state]
+
+
+def multi_scatter_scene(n_layers: int, n_points: int, seed: int = 0) -> Tuple[ScatterViewerState3D, List[LayerState]]:
+    # Each layer is a subset of the same data, so that they share the viewer's attributes
+    rng = np.random.default_rng(seed)
+    n = n_layers * n_points
+    data = Data(x=rng.normal(size=n),
+                y=rng.normal(size=n),
+                z=rng.normal(size=n),
+                layer=np.repeat(np.arange(n_layers), n_points),
+                label="scatter")
+    DataCollection([data])
+    viewer_state = ScatterViewerState3D()
+    layer_states = []
+    for index in range(n_layers):
+        subset = data.new_subset(data.id["layer"] == index, label=f"layer {index}")
+        layer_state = ScatterLayerState3D(layer=subset, viewer_state=viewer_state)
+        viewer_state.layers.append(layer_state)
+        layer_states.append(layer_state)
+    return viewer_state, layer_states
+
+
+def volume_scene(size: int, resolution: int) -> Tuple[VolumeViewerState3D, List[LayerState]]:
+    # A Gaussian blob, so that both isosurfaces and voxel opacity vary smoothly through the cube
+    coordinates = np.linspace(-1, 1, size, dtype=np.float32)
+    x, y, z = np.meshgrid(coordinates, coordinates, coordinates, indexing="ij", sparse=True)
+    values = np.exp(-4 * (x ** 2 + y ** 2 + z ** 2))
+    data = Data(values=values, label="volume")
+    viewer_state = VolumeViewerState3D()
+    layer_state = VolumeLayerState3D(layer=data, viewer_state=viewer_state)
+    viewer_state.layers.append(layer_state)
+    viewer_state.resolution = resolution
+    return viewer_state, [layer_state]
+
+
+def state_dictionary(layer_states: List[LayerState], method: str, options: State) -> Dict[str, Tuple[str, State]]:
+    return {export_label_for_layer(layer_state): (method, options) for layer_state in layer_states}
+
+
+def output_size(directory: str) -> int:
+    # This includes any files written alongside the main output, such as the buffers of a .gltf file
+    return sum(getsize(join(root, name)) for root, _, names in walk(directory) for name in names)
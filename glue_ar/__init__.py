@@ -1,4 +1,3 @@
-from contextlib import suppress
 import importlib.metadata
 
 
@@ -6,12 +5,14 @@ __version__ = importlib.metadata.version('glue-ar')
 
 
 def setup_common():
-    from .common.gltf_builder import GLTFBuilder  # noqa: F401
-    from .common.usd_builder import USDBuilder  # noqa: F401
-    from .common.stl_builder import STLBuilder  # noqa: F401
-
-    with suppress(ImportError):
-        from .compression_draco import compress_draco  # noqa: F401
+    # The builders and compressors are registered lazily, since their dependencies (usd-core, numpy-stl,
+    # DracoPy) are slow to import, and would otherwise be imported every time glue starts up
+    from .registries import builder, compressor
+
+    builder.add_lazy(("gltf", "glb"), "glue_ar.common.gltf_builder:GLTFBuilder", requires=("gltflib",))
+    builder.add_lazy(("usda", "usdc", "usdz"), "glue_ar.common.usd_builder:USDBuilder", requires=("pxr",))
+    builder.add_lazy("stl", "glue_ar.common.stl_builder:STLBuilder", requires=("stl",))
+    compressor.add_lazy("draco", "glue_ar.compression_draco:compress_draco", requires=("DracoPy",))
 
 
 def setup_qt():
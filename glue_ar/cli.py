@@ -0,0 +1,466 @@
+"""
+Headless batch export of the 3D viewers in glue session files.
+
+The jobs to run are described by a JSON (or YAML) spec, e.g.
+
+    {
+        "defaults": {"compression": "draco", "parallel": true, "options": {"Scatter": {"resolution": 12}}},
+        "jobs": [
+            {"session": "sessions/*.glu", "output": "out/{session}-{viewer}.glb"},
+            {"session": "cube.glu", "viewers": [1], "output": ["cube.glb", "cube.usdz"],
+             "methods": {"cube": "Isosurface"}, "options": {"Isosurface": {"isosurface_count": 8}}},
+            {"session": "survey.glu", "output": "survey/tileset.json", "options": {"Scatter": {"lod_levels": 3}}}
+        ]
+    }
+
+where a `.json` output is exported as a 3D Tiles tileset (see `export_tileset`),
+and `"cache": true` (or the path of a directory) keeps the geometry of each layer in a `GeometryCache`,
+so that exports of unchanged layers reuse it.
+The export is run with e.g. `glue-ar-export spec.json --jobs 4 --summary timings.csv`.
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+from dataclasses import asdict, dataclass, field
+from glob import glob, has_magic
+import json
+from os import remove
+from os.path import abspath, basename, dirname, exists, extsep, getmtime, getsize, join, splitext
+import sys
+from time import perf_counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type, Union
+
+from glue.core.state import GlueUnSerializer, lookup_class_with_patches
+from glue.core.state_objects import State
+from glue.logger import logger
+from glue.viewers.common.state import LayerState
+from glue.viewers.common3d.viewer_state import ViewerState3D
+from glue.viewers.scatter3d.viewer_state import ScatterViewerState3D
+from glue.viewers.volume3d.viewer_state import VolumeViewerState3D
+
+from glue_ar import setup_common
+import glue_ar.common  # noqa: F401
+from glue_ar.common.cache import GeometryCache, default_geometry_cache
+from glue_ar.common.estimate import format_bytes
+from glue_ar.common.export import export_tileset, export_viewer, export_viewer_formats
+from glue_ar.common.export_options import ar_layer_export
+from glue_ar.profiling import ExportProfiler
+from glue_ar.registries import builder as builder_registry
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+__all__ = ["SessionViewer", "ExportTask", "TaskResult", "load_session_viewers",
+           "load_spec", "expand_tasks", "run_task", "run_tasks", "main"]
+
+
+# The viewer classes are only needed to find the class of the viewer state, and the Qt and Jupyter viewers
+# can't be imported without their UI dependencies, so we look up the states of the common viewers by name
+_VIEWER_STATE_CLASSES: Dict[str, Type[ViewerState3D]] = {
+    "VispyScatterViewer": ScatterViewerState3D,
+    "JupyterVispyScatterViewer": ScatterViewerState3D,
+    "IpyvolumeScatterView": ScatterViewerState3D,
+    "VispyVolumeViewer": VolumeViewerState3D,
+    "JupyterVispyVolumeViewer": VolumeViewerState3D,
+    "IpyvolumeVolumeView": VolumeViewerState3D,
+}
+
+_JOB_KEYS = {"session", "output", "viewers", "methods", "options", "compression", "model_viewer",
+             "layer_controls", "optimize_meshes", "deterministic_names", "progressive", "parallel",
+             "cache"}
+
+
+@dataclass
+class SessionViewer:
+    """
+    A 3D viewer restored from a session file. `index` is the position of the viewer
+    among all of the viewers in the session, in tab order.
+    """
+    index: int
+    viewer_state: ViewerState3D
+    layer_states: List[LayerState]
+
+
+@dataclass
+class ExportTask:
+    """
+    The export of one viewer of a session. Tasks only hold plain values so that they can be sent to worker processes.
+    """
+    session: str
+    viewer: int
+    outputs: List[str]
+    methods: Dict[str, str] = field(default_factory=dict)
+    options: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    compression: str = "None"
+    model_viewer: bool = False
+    layer_controls: bool = True
+    optimize_meshes: bool = False
+    deterministic_names: bool = False
+    progressive: bool = False
+    parallel: bool = False
+    cache: Union[bool, str] = False
+    dependencies: List[str] = field(default_factory=list)
+
+    @property
+    def output_files(self) -> List[str]:
+        files = list(self.outputs)
+        if self.model_viewer:
+            files += [f"{splitext(output)[0]}{extsep}html" for output in self.outputs
+                      if output.endswith((".gltf", ".glb"))]
+        return files
+
+    def up_to_date(self) -> bool:
+        """
+        Whether all of the outputs of this task are newer than the session and spec files.
+        Note that this doesn't track any data files that the session refers to.
+        """
+        outputs = self.output_files
+        if not all(exists(output) for output in outputs):
+            return False
+        inputs = [self.session] + self.dependencies
+        return min(getmtime(output) for output in outputs) >= max(getmtime(path) for path in inputs)
+
+
+@dataclass
+class TaskResult:
+    session: str
+    viewer: int
+    outputs: List[str]
+    status: str
+    seconds: float = 0.0
+    load_seconds: float = 0.0
+    export_seconds: float = 0.0
+    bytes: int = 0
+    stages: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def _viewer_state_class(type_name: str) -> Optional[Type[ViewerState3D]]:
+    state_cls = _VIEWER_STATE_CLASSES.get(type_name.rsplit(".", 1)[-1], None)
+    if state_cls is None:
+        try:
+            state_cls = getattr(lookup_class_with_patches(type_name), "_state_cls", None)
+        except (ImportError, AttributeError, ValueError):
+            return None
+    if isinstance(state_cls, type) and issubclass(state_cls, ViewerState3D):
+        return state_cls
+    return None
+
+
+def _session_viewer_records(records: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # The Qt application stores its viewers as a list of ids for each tab
+    viewers = []
+    for entry in records.get("__main__", {}).get("viewers", []):
+        viewers.extend(entry if isinstance(entry, list) else [entry])
+    return [records[viewer_id] for viewer_id in viewers]
+
+
+def session_viewer_indices(session: str) -> List[int]:
+    """
+    The indices of the viewers in a session file that can be exported, without restoring any of them.
+    """
+    with open(session) as f:
+        records = json.load(f)
+    return [index for index, record in enumerate(_session_viewer_records(records))
+            if _viewer_state_class(record["_type"]) is not None]
+
+
+def load_session_viewers(session: str, indices: Optional[Iterable[int]] = None) -> List[SessionViewer]:
+    """
+    Restore the 3D viewer states and their layer states from a session file, without creating the viewers themselves.
+    If indices are given, only those viewers are restored.
+    """
+    with open(session) as f:
+        text = f.read()
+    records = json.loads(text)
+    context = GlueUnSerializer.loads(text)
+
+    wanted = None if indices is None else set(indices)
+    viewers = []
+    for index, record in enumerate(_session_viewer_records(records)):
+        if wanted is not None and index not in wanted:
+            continue
+        state_cls = _viewer_state_class(record["_type"])
+        if state_cls is None:
+            if wanted is not None:
+                raise ValueError(f"Viewer {index} of {session} is not a 3D viewer")
+            continue
+        viewer_state = state_cls.__setgluestate__(record["state"], context)
+        layer_states = []
+        for layer in record["layers"]:
+            layer_state = context.object(layer["state"])
+            layer_state.viewer_state = viewer_state
+            if layer_state not in viewer_state.layers:
+                viewer_state.layers.append(layer_state)
+            layer_states.append(layer_state)
+        viewers.append(SessionViewer(index=index, viewer_state=viewer_state, layer_states=layer_states))
+
+    if wanted is not None:
+        missing = wanted - {viewer.index for viewer in viewers}
+        if missing:
+            raise ValueError(f"{session} has no viewers with indices {sorted(missing)}")
+
+    return viewers
+
+
+def load_spec(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to read YAML export specs")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _merge_options(defaults: Dict[str, Dict[str, Any]],
+                   options: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    merged = {method: dict(values) for method, values in defaults.items()}
+    for method, values in options.items():
+        merged.setdefault(method, {}).update(values)
+    return merged
+
+
+def expand_tasks(spec: Dict[str, Any], spec_path: Optional[str] = None) -> List[ExportTask]:
+    """
+    Expand the jobs of an export spec into one task per session viewer.
+    Relative paths are taken relative to the directory of the spec file.
+    """
+    root = dirname(abspath(spec_path)) if spec_path is not None else ""
+    dependencies = [abspath(spec_path)] if spec_path is not None else []
+    defaults = spec.get("defaults", {})
+
+    tasks = []
+    for job in spec.get("jobs", []):
+        job = {**defaults, **job, "options": _merge_options(defaults.get("options", {}), job.get("options", {}))}
+        unknown = set(job) - _JOB_KEYS
+        if unknown:
+            raise ValueError(f"Unknown export job settings: {', '.join(sorted(unknown))}")
+        if "session" not in job or "output" not in job:
+            raise ValueError("Each export job needs a session and an output")
+
+        pattern = join(root, job["session"])
+        sessions = sorted(glob(pattern)) if has_magic(pattern) else [pattern]
+        if not sessions:
+            logger.warning(f"No session files match {job['session']}")
+        outputs = job["output"] if isinstance(job["output"], list) else [job["output"]]
+        # The geometry cache can be turned on with `true`, or given a directory of its own
+        cache = job.get("cache", False)
+        if isinstance(cache, str):
+            cache = abspath(join(root, cache))
+
+        for session in sessions:
+            session = abspath(session)
+            viewers = job.get("viewers", None)
+            if viewers is None:
+                viewers = session_viewer_indices(session)
+            stem = splitext(basename(session))[0]
+            for viewer in viewers:
+                paths = [abspath(join(root, output.format(session=stem, viewer=viewer))) for output in outputs]
+                tasks.append(ExportTask(session=session,
+                                        viewer=viewer,
+                                        outputs=paths,
+                                        methods=job.get("methods", {}),
+                                        options=job["options"],
+                                        compression=job.get("compression", "None"),
+                                        model_viewer=job.get("model_viewer", False),
+                                        layer_controls=job.get("layer_controls", True),
+                                        optimize_meshes=job.get("optimize_meshes", False),
+                                        deterministic_names=job.get("deterministic_names", False),
+                                        progressive=job.get("progressive", False),
+                                        parallel=job.get("parallel", False),
+                                        cache=cache,
+                                        dependencies=dependencies))
+
+    outputs = [output for task in tasks for output in task.outputs]
+    duplicates = sorted({output for output in outputs if outputs.count(output) > 1})
+    if duplicates:
+        raise ValueError(f"Several exports would write to {', '.join(duplicates)}; "
+                         "use {session} and {viewer} in the output paths to tell them apart")
+    unsupported = [output for output in outputs
+                   if splitext(output)[1][1:] not in builder_registry.members and not output.endswith(".json")]
+    if unsupported:
+        raise ValueError(f"Unsupported file types: {', '.join(unsupported)}")
+    if any(len(task.outputs) > 1 and any(output.endswith(".json") for output in task.outputs) for task in tasks):
+        raise ValueError("Tilesets can't be exported alongside other formats")
+    # The layers aren't known until the sessions are loaded, so this only catches methods that aren't
+    # available for a format with any type of layer (like Points, whose point clouds can't be written to USD or STL)
+    for task in tasks:
+        extensions = {splitext(output)[1][1:] for output in task.outputs if not output.endswith(".json")}
+        for method in set(task.methods.values()):
+            unsupported = extensions - ar_layer_export.method_extensions(method)
+            if unsupported:
+                raise ValueError(f"The {method} export method can't be used for {', '.join(sorted(unsupported))} "
+                                 f"files, as in {task.session}")
+
+    return tasks
+
+
+def _export_state(layer_state: LayerState, method: str, options: Dict[str, Any]) -> State:
+    state = ar_layer_export.options_class(type(layer_state), method)()
+    unknown = [name for name in options if not state.is_callback_property(name)]
+    if unknown:
+        raise ValueError(f"Unknown {method} export options: {', '.join(unknown)}")
+    state.update_from_dict(options)
+    return state
+
+
+def _state_dictionary(task: ExportTask, layer_states: List[LayerState], extension: str):
+    state_dictionary = {}
+    for layer_state in layer_states:
+        label = export_label_for_layer(layer_state)
+        method = task.methods.get(label, None)
+        if method is None:
+            method = ar_layer_export.method_names(type(layer_state), extension)[0]
+        state_dictionary[label] = (method, _export_state(layer_state, method, task.options.get(method, {})))
+    return state_dictionary
+
+
+def run_task(task: ExportTask) -> TaskResult:
+    """
+    Load the session viewer for a task and export it. Errors are reported in the result rather than raised,
+    and any outputs from a failed export are removed so that they aren't mistaken for up-to-date ones later.
+    """
+    setup_common()
+    result = TaskResult(session=task.session, viewer=task.viewer, outputs=task.outputs, status="exported")
+    start = perf_counter()
+    try:
+        viewer, = load_session_viewers(task.session, indices=[task.viewer])
+        result.load_seconds = perf_counter() - start
+
+        layer_states = [layer_state for layer_state in viewer.layer_states if layer_state.visible]
+        # Multi-format exports and tilesets generate their geometry with the glTF export methods
+        extension = splitext(task.outputs[0])[1][1:] if len(task.outputs) == 1 else "glb"
+        tileset = extension == "json"
+        if tileset:
+            extension = "glb"
+        state_dictionary = _state_dictionary(task, layer_states, extension)
+        bounds = xyz_bounds(viewer.viewer_state,
+                            with_resolution=isinstance(viewer.viewer_state, VolumeViewerState3D))
+
+        profiler = ExportProfiler(trace_memory=False)
+        cache = None
+        if task.cache:
+            cache = GeometryCache(task.cache) if isinstance(task.cache, str) else default_geometry_cache()
+        kwargs = dict(compression=task.compression,
+                      model_viewer=task.model_viewer,
+                      layer_controls=task.model_viewer and task.layer_controls,
+                      optimize_meshes=task.optimize_meshes,
+                      deterministic_names=task.deterministic_names,
+                      parallel=task.parallel,
+                      cache=cache,
+                      profiler=profiler)
+        if tileset:
+            report = export_tileset(viewer.viewer_state, layer_states, bounds, state_dictionary, task.outputs[0],
+                                    compression=task.compression,
+                                    optimize_meshes=task.optimize_meshes,
+                                    deterministic_names=task.deterministic_names,
+                                    parallel=task.parallel,
+                                    cache=cache,
+                                    profiler=profiler)
+        elif len(task.outputs) == 1:
+            report = export_viewer(viewer.viewer_state, layer_states, bounds, state_dictionary,
+                                   task.outputs[0], progressive=task.progressive, **kwargs)
+        else:
+            report = export_viewer_formats(viewer.viewer_state, layer_states, bounds, state_dictionary,
+                                           task.outputs, **kwargs)
+
+        result.export_seconds = report.total_time
+        for record in report.stages:
+            if record.stage != "total":
+                result.stages[record.stage] = result.stages.get(record.stage, 0.0) + record.wall_time
+        result.bytes = sum(getsize(output) for output in task.output_files if exists(output))
+    except Exception as e:
+        logger.exception(f"Export of viewer {task.viewer} of {task.session} failed")
+        result.status = "failed"
+        result.error = f"{type(e).__name__}: {e}"
+        for output in task.output_files:
+            if exists(output):
+                remove(output)
+    result.seconds = perf_counter() - start
+    return result
+
+
+def run_tasks(tasks: Sequence[ExportTask], jobs: int = 1, force: bool = False) -> List[TaskResult]:
+    """
+    Run the given tasks, using a pool of `jobs` processes if that's more than one.
+    Unless `force` is set, tasks whose outputs are up to date are skipped.
+    Results are returned in task order.
+    """
+    results: List[Optional[TaskResult]] = [None] * len(tasks)
+    pending = []
+    for index, task in enumerate(tasks):
+        if not force and task.up_to_date():
+            results[index] = TaskResult(session=task.session, viewer=task.viewer,
+                                        outputs=task.outputs, status="skipped")
+        else:
+            pending.append(index)
+
+    if jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as executor:
+            futures = {executor.submit(run_task, tasks[index]): index for index in pending}
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                logger.info(f"Finished {index + 1}/{len(tasks)}: {results[index].status}")
+    else:
+        for index in pending:
+            results[index] = run_task(tasks[index])
+
+    return results
+
+
+def write_summary(results: Sequence[TaskResult], path: str):
+    if path.endswith(".csv"):
+        fields = ["session", "viewer", "outputs", "status", "seconds",
+                  "load_seconds", "export_seconds", "bytes", "error"]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            for result in results:
+                writer.writerow({**asdict(result), "outputs": ";".join(result.outputs)})
+    else:
+        with open(path, "w") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+
+
+def _print_summary(results: Sequence[TaskResult], total_time: float):
+    for result in results:
+        line = f"{result.status:<9}{result.seconds:>8.2f}s {format_bytes(result.bytes):>10}  " \
+               f"{basename(result.session)}[{result.viewer}] -> {', '.join(basename(o) for o in result.outputs)}"
+        if result.error is not None:
+            line += f"  ({result.error})"
+        print(line)
+    counts = {status: sum(result.status == status for result in results)
+              for status in ("exported", "skipped", "failed")}
+    print(f"{counts['exported']} exported, {counts['skipped']} skipped, {counts['failed']} failed "
+          f"in {total_time:.2f}s")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="glue-ar-export",
+                                     description="Export the 3D viewers of glue session files to AR formats")
+    parser.add_argument("spec", help="JSON or YAML file describing the exports to run")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of exports to run in parallel processes")
+    parser.add_argument("-f", "--force", action="store_true", help="Re-export outputs that are already up to date")
+    parser.add_argument("--summary", help="Write per-export timings to this file (CSV if it ends in .csv, else JSON)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Don't print the summary table")
+    args = parser.parse_args(argv)
+
+    start = perf_counter()
+    tasks = expand_tasks(load_spec(args.spec), spec_path=args.spec)
+    results = run_tasks(tasks, jobs=max(args.jobs, 1), force=args.force)
+
+    if args.summary:
+        write_summary(results, args.summary)
+    if not args.quiet:
+        _print_summary(results, perf_counter() - start)
+
+    return 1 if any(result.status == "failed" for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+from glue.core import BaseData, Subset
+from glue.viewers.common.state import LayerState
+from numpy import empty, greater_equal, isfinite, less_equal, ndarray, ones
+
+
+__all__ = ["ColumnCache", "bounds_mask", "layer_values"]
+
+
+Layer = Union[BaseData, Subset]
+
+
+_active_columns: ContextVar[Optional[ColumnCache]] = ContextVar("glue_ar_columns", default=None)
+
+
+class ColumnCache:
+    """
+    Holds the component values fetched during an export, so that each component of each layer
+    is only fetched (and each subset only evaluated) once, however many times the export needs it.
+    Masked values are cached too, keyed by the mask that was applied.
+
+    Use `activate` for the duration of an export; `layer_values` reads through the active cache.
+    Entries keep references to their layers and masks, so that object ids aren't reused while
+    the cache is alive, which means that masks mustn't be modified in place once they've been used.
+    The cache can be shared between threads.
+    """
+
+    def __init__(self):
+        self._values: Dict[Tuple[int, Any], Tuple[Layer, ndarray]] = {}
+        self._masked: Dict[Tuple[int, Any, int], Tuple[Layer, ndarray, ndarray]] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def values(self, layer: Layer, att) -> ndarray:
+        key = (id(layer), att)
+        with self._lock:
+            entry = self._values.get(key, None)
+            if entry is not None:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Fetching can be slow (e.g. for derived components or subsets), so we don't hold the lock while we do it
+        values = layer[att]
+        with self._lock:
+            return self._values.setdefault(key, (layer, values))[1]
+
+    def masked(self, layer: Layer, att, mask: ndarray) -> ndarray:
+        key = (id(layer), att, id(mask))
+        with self._lock:
+            entry = self._masked.get(key, None)
+            if entry is not None:
+                self.hits += 1
+                return entry[2]
+
+        values = self.values(layer, att)[mask]
+        with self._lock:
+            return self._masked.setdefault(key, (layer, mask, values))[2]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._masked.clear()
+
+    @contextmanager
+    def activate(self) -> Iterator[ColumnCache]:
+        token = _active_columns.set(self)
+        try:
+            yield self
+        finally:
+            _active_columns.reset(token)
+
+
+def layer_values(layer_or_state: Union[Layer, LayerState], att, mask: Optional[ndarray] = None) -> ndarray:
+    """
+    Get the values of a component for a layer (or the layer of a layer state), restricted to the given mask
+    if there is one. If a `ColumnCache` is active, values are read through it.
+    """
+    layer = layer_or_state.layer if isinstance(layer_or_state, LayerState) else layer_or_state
+    cache = _active_columns.get()
+    if cache is None:
+        values = layer[att]
+        return values if mask is None else values[mask]
+    if mask is None:
+        return cache.values(layer, att)
+    return cache.masked(layer, att, mask)
+
+
+def bounds_mask(columns: Sequence[ndarray],
+                bounds: Iterable[Tuple[float, float]],
+                finite: Iterable[ndarray] = ()) -> ndarray:
+    """
+    Compute the mask of the points whose coordinates (given as one array per axis) are within
+    the given bounds, and whose values in each of the `finite` arrays are finite.
+    The comparisons are all done in place into a single scratch buffer, so no matter how many
+    conditions there are, only two boolean arrays are allocated.
+    """
+    finite = list(finite)
+    shape = (columns[0] if len(columns) > 0 else finite[0]).shape
+    mask = ones(shape, dtype=bool)
+    scratch = empty(shape, dtype=bool)
+    for values, (lower, upper) in zip(columns, bounds):
+        # Comparisons with NaN are always false, so these also filter out non-finite coordinates
+        greater_equal(values, lower, out=scratch)
+        mask &= scratch
+        less_equal(values, upper, out=scratch)
+        mask &= scratch
+    for values in finite:
+        isfinite(values, out=scratch)
+        mask &= scratch
+    return mask
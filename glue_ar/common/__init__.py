@@ -1,10 +1,46 @@
-from .gltf_builder import GLTFBuilder  # noqa: F401
-from .usd_builder import USDBuilder  # noqa: F401
-from .stl_builder import STLBuilder  # noqa: F401
-from .marching_cubes import add_isosurface_layer_gltf, add_isosurface_layer_usd  # noqa: F401
-from .scatter_gltf import add_scatter_layer_gltf  # noqa: F401
-from .scatter_stl import add_scatter_layer_stl  # noqa: F401
-from .scatter_usd import add_scatter_layer_usd  # noqa: F401
-from .voxels import add_voxel_layers_gltf, add_voxel_layers_usd  # noqa: F401
-from .scatter_export_options import ARVispyScatterExportOptions  # noqa: F401
-from .volume_export_options import ARIsosurfaceExportOptions, ARVoxelExportOptions  # noqa: F401
+from importlib import import_module
+
+from .export_options import ar_layer_export
+
+
+# The exporters register themselves with `ar_layer_export` when they're imported.
+# They import usd-core, numpy-stl and mcubes, so they're only imported once the registry is used
+EXPORTER_MODULES = (
+    "glue_ar.common.marching_cubes",
+    "glue_ar.common.scatter_gltf",
+    "glue_ar.common.scatter_stl",
+    "glue_ar.common.scatter_usd",
+    "glue_ar.common.voxels",
+)
+
+for _module in EXPORTER_MODULES:
+    ar_layer_export.lazy_add(_module)
+
+
+_EXPORTS = {
+    "GLTFBuilder": ".gltf_builder",
+    "USDBuilder": ".usd_builder",
+    "STLBuilder": ".stl_builder",
+    "add_isosurface_layer_gltf": ".marching_cubes",
+    "add_isosurface_layer_usd": ".marching_cubes",
+    "add_scatter_layer_gltf": ".scatter_gltf",
+    "add_scatter_points_layer_gltf": ".scatter_gltf",
+    "add_scatter_layer_stl": ".scatter_stl",
+    "add_scatter_layer_usd": ".scatter_usd",
+    "add_voxel_layers_gltf": ".voxels",
+    "add_voxel_layers_usd": ".voxels",
+    "ARPointCloudExportOptions": ".scatter_export_options",
+    "ARVispyScatterExportOptions": ".scatter_export_options",
+    "ARIsosurfaceExportOptions": ".volume_export_options",
+    "ARVoxelExportOptions": ".volume_export_options",
+}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
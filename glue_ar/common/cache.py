@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+from contextlib import suppress
+from hashlib import blake2b
+from os import listdir, makedirs, remove, replace, stat, utime
+from os.path import exists, join
+import pickle
+from tempfile import NamedTemporaryFile
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from glue.config import CFG_DIR
+from glue.core import BaseData, Subset
+from glue.core.component_id import ComponentID
+from glue.core.exceptions import IncompatibleAttribute
+from glue.core.state_objects import State
+from glue.viewers.common.state import LayerState
+from glue.viewers.common3d.viewer_state import ViewerState3D
+import numpy as np
+
+from glue_ar import __version__
+from glue_ar.columns import layer_values
+from glue_ar.registries import Builder
+from glue_ar.utils import Bounds, BoundsWithResolution, export_label_for_layer
+
+
+__all__ = ["GeometryCache", "default_geometry_cache", "export_cache_key", "layer_cache_key"]
+
+
+DEFAULT_CACHE_DIRECTORY = join(CFG_DIR, "glue_ar", "geometry_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Bump this whenever the layout of the cached fragments (or the way that keys are computed) changes
+CACHE_FORMAT_VERSION = 2
+
+CACHE_EXTENSION = ".fragment"
+
+
+def _stable_repr(value: Any) -> str:
+    """
+    A representation of a state value that doesn't depend on object identity,
+    so that it stays the same between sessions.
+    """
+    if isinstance(value, (BaseData, Subset)):
+        return value.label
+    if isinstance(value, (list, tuple)):
+        return f"[{','.join(_stable_repr(v) for v in value)}]"
+    # This covers component IDs and colormaps
+    name = getattr(value, "label", None) or getattr(value, "name", None)
+    if isinstance(name, str):
+        return f"{type(value).__name__}:{name}"
+    return repr(value)
+
+
+def _state_repr(state: State, exclude: Iterable[str] = ()) -> str:
+    values = state.as_dict()
+    return ";".join(f"{name}={_stable_repr(values[name])}" for name in sorted(values) if name not in exclude)
+
+
+def _component_ids(states: Iterable[State]) -> List[ComponentID]:
+    """
+    The components that a set of states refer to, in a stable order. `None` states are skipped.
+    Component IDs overload `==`, so they're told apart by identity.
+    """
+    cids: Dict[int, ComponentID] = {}
+    for state in states:
+        if state is None:
+            continue
+        values = state.as_dict()
+        for name in sorted(values):
+            if isinstance(values[name], ComponentID):
+                cids.setdefault(id(values[name]), values[name])
+    return list(cids.values())
+
+
+def _component_digest(data: BaseData, cid: ComponentID, digests: Dict[Any, str]) -> str:
+    key = (id(data), id(cid))
+    if key not in digests:
+        hasher = blake2b(digest_size=16)
+        try:
+            # This reads through the active column cache (if any), so the export doesn't fetch the values again
+            values = np.ascontiguousarray(layer_values(data, cid))
+        except IncompatibleAttribute:
+            hasher.update(f"{cid.label}:missing".encode())
+        else:
+            hasher.update(f"{cid.label}:{values.dtype}:{values.shape}".encode())
+            hasher.update(values.tobytes())
+        digests[key] = hasher.hexdigest()
+    return digests[key]
+
+
+def _data_digest(data: Union[BaseData, Subset], cids: Iterable[ComponentID], digests: Dict[Any, str]) -> str:
+    """
+    A digest of the values of the given components of a layer (and of its mask, for subsets).
+    Only the components that the export uses are hashed, since hashing (and, for derived components,
+    computing) every component of a large dataset can cost as much as the geometry that the cache saves.
+    """
+    base = data.data if isinstance(data, Subset) else data
+    hasher = blake2b(digest_size=16)
+    for cid in cids:
+        hasher.update(_component_digest(base, cid, digests).encode())
+    if isinstance(data, Subset):
+        key = id(data)
+        if key not in digests:
+            mask = data.to_mask()
+            digests[key] = blake2b(f"{mask.shape}".encode() + np.packbits(mask).tobytes(), digest_size=16).hexdigest()
+        hasher.update(digests[key].encode())
+    return hasher.hexdigest()
+
+
+def layer_cache_key(builder_cls: Type[Builder],
+                    export_method: Callable,
+                    viewer_state: ViewerState3D,
+                    layer_states: Union[LayerState, Iterable[LayerState]],
+                    export_states: Union[State, Iterable[State]],
+                    bounds: Union[Bounds, BoundsWithResolution],
+                    digests: Optional[Dict[Any, str]] = None) -> str:
+    """
+    Compute a key that identifies the geometry generated by an export method.
+    This takes into account the viewer, layer, and export options states, as well as the values
+    of the components that those states use, so any change that could affect the output gives a new key.
+
+    The optional `digests` dictionary is used to store data digests, so that
+    data shared between layers only needs to be hashed once per export.
+    """
+    if digests is None:
+        digests = {}
+    if isinstance(layer_states, LayerState):
+        layer_states = [layer_states]
+    if isinstance(export_states, State):
+        export_states = [export_states]
+
+    export_states = list(export_states)
+
+    parts = [
+        f"format={CACHE_FORMAT_VERSION}",
+        f"version={__version__}",
+        f"builder={builder_cls.__module__}.{builder_cls.__qualname__}",
+        f"method={export_method.__module__}.{export_method.__qualname__}",
+        f"bounds={_stable_repr(bounds)}",
+        f"viewer={_state_repr(viewer_state, exclude=('layers',))}",
+    ]
+    for layer_state in layer_states:
+        cids = _component_ids([viewer_state, layer_state, *export_states])
+        parts.append(f"data={_data_digest(layer_state.layer, cids, digests)}")
+        parts.append(f"layer={_state_repr(layer_state)}")
+    for export_state in export_states:
+        parts.append(f"options={_state_repr(export_state)}")
+
+    return blake2b("\n".join(parts).encode(), digest_size=20).hexdigest()
+
+
+def export_cache_key(viewer_state: ViewerState3D,
+                     layer_states: Iterable[LayerState],
+                     state_dictionary: Dict[str, Tuple[str, State]],
+                     bounds: Union[Bounds, BoundsWithResolution],
+                     **export_kwargs) -> str:
+    """
+    Compute a key that identifies a whole export of a viewer, as would be produced by
+    `export_viewer` with the given state dictionary. Any extra keyword arguments (such
+    as the compression method) are included in the key as well.
+    """
+    digests: Dict[Any, str] = {}
+    parts = [
+        f"format={CACHE_FORMAT_VERSION}",
+        f"version={__version__}",
+        f"bounds={_stable_repr(bounds)}",
+        f"viewer={_state_repr(viewer_state, exclude=('layers',))}",
+    ]
+    for layer_state in layer_states:
+        _, export_state = state_dictionary.get(export_label_for_layer(layer_state), (None, None))
+        cids = _component_ids([viewer_state, layer_state, export_state])
+        parts.append(f"data={_data_digest(layer_state.layer, cids, digests)}")
+        parts.append(f"layer={_state_repr(layer_state)}")
+    for label in sorted(state_dictionary):
+        method, export_state = state_dictionary[label]
+        parts.append(f"options={label}:{method}:{_state_repr(export_state)}")
+    for name in sorted(export_kwargs):
+        parts.append(f"{name}={_stable_repr(export_kwargs[name])}")
+
+    return blake2b("\n".join(parts).encode(), digest_size=20).hexdigest()
+
+
+class GeometryCache:
+    """
+    An on-disk cache of builder fragments, keyed by the output of `layer_cache_key`.
+    Once the total size of the cache exceeds `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self,
+                 directory: str = DEFAULT_CACHE_DIRECTORY,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return join(self.directory, f"{key}{CACHE_EXTENSION}")
+
+    def _entries(self):
+        return [join(self.directory, name) for name in listdir(self.directory) if name.endswith(CACHE_EXTENSION)]
+
+    def __contains__(self, key: str) -> bool:
+        return exists(self._path(key))
+
+    def get(self, key: str) -> Optional[Builder]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                fragment = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+        # Update the modification time so that recently used entries are evicted last
+        with suppress(FileNotFoundError):
+            utime(path)
+        return fragment
+
+    def put(self, key: str, fragment: Builder):
+        # Write to a temporary file first so that readers never see a partial entry
+        with NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as f:
+            pickle.dump(fragment, f, protocol=pickle.HIGHEST_PROTOCOL)
+        replace(f.name, self._path(key))
+        self.evict()
+
+    @property
+    def size(self) -> int:
+        return sum(stat(path).st_size for path in self._entries())
+
+    def evict(self):
+        entries = []
+        for path in self._entries():
+            with suppress(FileNotFoundError):
+                entries.append((path, stat(path)))
+        entries.sort(key=lambda entry: entry[1].st_mtime)
+
+        total = sum(path_stat.st_size for _, path_stat in entries)
+        for path, path_stat in entries:
+            if total <= self.max_bytes:
+                break
+            with suppress(FileNotFoundError):
+                remove(path)
+            total -= path_stat.st_size
+
+    def clear(self):
+        for path in self._entries():
+            remove(path)
+
+
+_default_cache: Optional[GeometryCache] = None
+
+
+def default_geometry_cache() -> GeometryCache:
+    """
+    The cache shared by the export tools, in the glue configuration directory.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = GeometryCache()
+    return _default_cache
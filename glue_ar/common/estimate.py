@@ -0,0 +1,603 @@
+from dataclasses import dataclass, field
+from math import ceil
+from typing import Callable, List, Optional, Tuple, Type, Union
+
+from glue.config import DictRegistry
+from glue.core.state_objects import State
+from glue.utils import ensure_numerical
+from glue.viewers.common.state import LayerState
+from glue.viewers.common3d.viewer_state import ViewerState3D
+from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
+from glue.viewers.volume3d.layer_state import VolumeLayerState3D
+from numpy import around, array, bincount, clip, count_nonzero, cumsum, isfinite, linspace, maximum, minimum, \
+                  nan_to_num, ndarray, searchsorted, unique
+
+from glue_ar.columns import layer_values
+from glue_ar.common.scatter import IPYVOLUME_POINTS_GETTERS, IPYVOLUME_TRIANGLE_GETTERS, box_points_getter, \
+                                   glyph_geometry, glyph_lod_resolutions, scatter_layer_mask, \
+                                   scatter_point_budget
+from glue_ar.common.scatter_export_options import ARIpyvolumeScatterExportOptions, ARPointCloudExportOptions, \
+                                                  ARVispyScatterExportOptions
+from glue_ar.common.shapes import cone_points_count, cone_triangles_count, cylinder_points_count, \
+                                  cylinder_triangles, rectangular_prism_points, rectangular_prism_triangulation, \
+                                  sphere_points_count, sphere_triangles_count
+from glue_ar.common.volume_export_options import ARIsosurfaceExportOptions, ARVoxelExportOptions
+from glue_ar.gltf_utils import index_export_option
+from glue_ar.utils import Bounds, BoundsWithResolution, NoneType, export_label_for_layer, frb_for_layer, \
+                          isomax_for_layer, isomin_for_layer, xyz_bounds
+
+try:
+    from glue_jupyter.ipyvolume.scatter.layer_state import Scatter3DLayerState as IpyvolumeScatterLayerState
+except ImportError:
+    IpyvolumeScatterLayerState = NoneType
+
+
+__all__ = ["ExportEstimate", "LayerEstimate", "ar_layer_estimate", "estimate_layer"]
+
+
+GL_EXTENSIONS = ("gltf", "glb")
+
+# Volume layers are estimated from a fixed resolution buffer of at most this size along each axis,
+# and the counts are then scaled up to the viewer resolution
+ESTIMATE_RESOLUTION = 64
+
+# Approximate sizes (in bytes) of the per-file, per-mesh and per-material metadata for each format.
+# These were measured from exports of typical scenes, and only need to be good enough
+# to distinguish a 5 MB file from a 500 MB one.
+FILE_OVERHEAD = {"gl": 600, "usda": 400, "usdc": 1200, "stl": 84}
+MESH_OVERHEAD = {"gl": 420, "usda": 420, "usdc": 200, "stl": 0}
+MATERIAL_OVERHEAD = {"gl": 190, "usda": 900, "usdc": 300, "stl": 0}
+
+# The extra accessor and buffer view for the vertex colors of each point cloud mesh
+POINT_COLORS_OVERHEAD = 160
+
+# The image, sampler, and texture for a colormap texture, along with the PNG itself
+COLORMAP_TEXTURE_OVERHEAD = {"gl": 700, "usda": 1400, "usdc": 1100, "stl": 0}
+
+# Texture coordinates take two floats per vertex, plus an accessor and buffer view for each glTF mesh
+TEXCOORD_VERTEX_BYTES = {"gl": 8, "usda": 20, "usdc": 8, "stl": 0}
+TEXCOORD_MESH_OVERHEAD = 130
+
+# The MSFT_lod extension and screen coverage hints on the node of each glTF mesh with levels of detail
+LOD_OVERHEAD = 100
+
+# Bytes per vertex, and per triangle, in the text-based USDA format
+USDA_VERTEX_BYTES = 32
+USDA_TRIANGLE_BYTES = 22
+
+USDC_TRIANGLE_BYTES = 1.5
+
+STL_TRIANGLE_BYTES = 50
+
+
+def _format_key(extension: str) -> str:
+    extension = extension.lower()
+    if extension in GL_EXTENSIONS:
+        return "gl"
+    elif extension == "usdz":
+        return "usdc"
+    return extension
+
+
+def geometry_bytes(extension: str,
+                   vertices: int,
+                   triangles: int,
+                   meshes: int = 1,
+                   materials: int = 0,
+                   indices: Optional[int] = None,
+                   max_index: Optional[int] = None) -> int:
+    """
+    The approximate number of bytes needed to store the given geometry in a file of the given type.
+    `indices` is the number of triangle indices that are actually stored, which for glTF can be fewer
+    than `3 * triangles` as meshes can share index buffers. `max_index` determines the index type for glTF.
+    """
+    key = _format_key(extension)
+    overhead = meshes * MESH_OVERHEAD[key] + materials * MATERIAL_OVERHEAD[key]
+    if key == "gl":
+        indices = 3 * triangles if indices is None else indices
+        max_index = vertices - 1 if max_index is None else max_index
+        index_size = index_export_option(max(max_index, 0)).byte_size
+        return overhead + 12 * vertices + index_size * indices
+    elif key == "usdc":
+        # The crate format compresses the face vertex indices and counts very effectively
+        return overhead + 12 * vertices + int(USDC_TRIANGLE_BYTES * triangles)
+    elif key == "usda":
+        return overhead + USDA_VERTEX_BYTES * vertices + USDA_TRIANGLE_BYTES * triangles
+    else:
+        return overhead + STL_TRIANGLE_BYTES * triangles
+
+
+@dataclass
+class LayerEstimate:
+    """
+    The predicted size of the export of a single layer.
+    Counts are predicted without building any geometry, so they are approximate for volume layers.
+    """
+    layer: str
+    method: str
+    vertices: int = 0
+    triangles: int = 0
+    meshes: int = 0
+    materials: int = 0
+    bytes: int = 0
+
+
+@dataclass
+class ExportEstimate:
+    extension: str
+    layers: List[LayerEstimate] = field(default_factory=list)
+    # Labels of the layers whose export methods don't have an estimator
+    unestimated: List[str] = field(default_factory=list)
+
+    @property
+    def vertices(self) -> int:
+        return sum(layer.vertices for layer in self.layers)
+
+    @property
+    def triangles(self) -> int:
+        return sum(layer.triangles for layer in self.layers)
+
+    @property
+    def meshes(self) -> int:
+        return sum(layer.meshes for layer in self.layers)
+
+    @property
+    def materials(self) -> int:
+        return sum(layer.materials for layer in self.layers)
+
+    @property
+    def bytes(self) -> int:
+        return FILE_OVERHEAD[_format_key(self.extension)] + sum(layer.bytes for layer in self.layers)
+
+    def summary(self) -> str:
+        text = f"~{self.vertices:,} vertices, {self.triangles:,} triangles in {self.meshes:,} meshes"
+        if _format_key(self.extension) != "stl":
+            text += f" ({self.materials:,} materials)"
+        text = f"{text}, about {format_bytes(self.bytes)}"
+        if self.unestimated:
+            text += f" (not including {', '.join(self.unestimated)})"
+        return text
+
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1000:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} GB"
+
+
+Estimator = Callable[[ViewerState3D, LayerState, State, Union[Bounds, BoundsWithResolution], str], LayerEstimate]
+
+
+class ARExportEstimatorRegistry(DictRegistry):
+    """
+    Estimators predict the output of the export method with the same layer type and name.
+    They should be cheap enough to run each time an export option changes.
+    """
+
+    def add(self, layer_state_cls: Type[LayerState], name: str, estimator: Estimator):
+        self._members[(layer_state_cls, name)] = estimator
+
+    def estimator(self, layer_state_cls: Type[LayerState], name: str) -> Optional[Estimator]:
+        return self._members.get((layer_state_cls, name), None)
+
+    def __call__(self, layer_state_cls: Type[LayerState], name: str):
+        def adder(estimator: Estimator):
+            self.add(layer_state_cls, name, estimator)
+            return estimator
+        return adder
+
+
+ar_layer_estimate = ARExportEstimatorRegistry()
+
+
+def estimate_layer(viewer_state: ViewerState3D,
+                   layer_state: LayerState,
+                   method: str,
+                   options: State,
+                   bounds: Union[Bounds, BoundsWithResolution],
+                   extension: str) -> Optional[LayerEstimate]:
+    """
+    Predict the output of the given export method for a single layer,
+    or return `None` if no estimator is registered for that method.
+    """
+    estimator = ar_layer_estimate.estimator(type(layer_state), method)
+    if estimator is None:
+        return None
+    return estimator(viewer_state, layer_state, options, bounds, extension.lower())
+
+
+def _points_per_mesh(options: State) -> Optional[int]:
+    log_ppm = int(options.log_points_per_mesh)
+    return None if log_ppm == 7 else 10 ** log_ppm
+
+
+def _texture_coordinate_bytes(extension: str, vertices: int, meshes: int) -> int:
+    key = _format_key(extension)
+    overhead = meshes * TEXCOORD_MESH_OVERHEAD if key == "gl" else 0
+    return overhead + TEXCOORD_VERTEX_BYTES[key] * vertices
+
+
+def _scatter_color_groups(layer_state: ScatterLayerState3D,
+                          mask: Optional[ndarray],
+                          count: int,
+                          colormap_texture: bool = False) -> ndarray:
+    """
+    The number of points that use each material, following the binning that the exporters use.
+    With a colormap texture, all of the points share a single material.
+    """
+    if layer_state.color_mode == "Fixed" or colormap_texture:
+        return array([count])
+
+    cmap_vals = ensure_numerical(layer_values(layer_state, layer_state.cmap_att, mask))
+    crange = layer_state.cmap_vmax - layer_state.cmap_vmin
+    normalized = nan_to_num(clip((cmap_vals - layer_state.cmap_vmin) / crange, 0, 1))
+    counts = bincount((normalized * 255).astype(int).ravel(), minlength=1)
+    return counts[counts > 0]
+
+
+def _scatter_counts(viewer_state: ViewerState3D,
+                    layer_state: ScatterLayerState3D,
+                    point_budget: Optional[int] = None,
+                    colormap_texture: bool = False) -> Tuple[int, ndarray]:
+    """
+    The number of points that a scatter layer exports, along with the number that use each material.
+    Decimating the points is much too slow to repeat whenever an export option changes, so a layer that's over
+    its point budget is taken to keep exactly that many points (voxel grid decimation can keep a few percent fewer),
+    spread over the materials in proportion to how many points use each of them.
+    """
+    # The scatter exporters always use the viewer bounds, rather than those passed in
+    bounds = xyz_bounds(viewer_state, with_resolution=False)
+    mask = scatter_layer_mask(viewer_state, layer_state, bounds)
+    count = int(count_nonzero(mask)) if mask is not None else layer_state.layer.size
+    if count == 0:
+        return 0, array([], dtype=int)
+
+    textured = colormap_texture and layer_state.color_mode != "Fixed"
+    groups = _scatter_color_groups(layer_state, mask, count, textured)
+    if point_budget is not None and count > point_budget:
+        groups = maximum(around(groups * point_budget / count).astype(int), 1)
+        count = int(groups.sum())
+    return count, groups
+
+
+def _estimate_scatter(viewer_state: ViewerState3D,
+                      layer_state: ScatterLayerState3D,
+                      method: str,
+                      extension: str,
+                      counts: Tuple[int, ndarray],
+                      points_count: int,
+                      triangles_count: int,
+                      points_per_mesh: Optional[int] = None,
+                      decorations: bool = True,
+                      colormap_texture: bool = False,
+                      materials: bool = True) -> LayerEstimate:
+    """
+    `counts` are the numbers of points from `_scatter_counts`, which can be shared between several estimates
+    for the same layer. With `materials=False`, the meshes are assumed to use materials (and a colormap texture)
+    that already exist, as the lower levels of detail do.
+    """
+
+    estimate = LayerEstimate(layer=export_label_for_layer(layer_state), method=method)
+    count, groups = counts
+    if count == 0:
+        return estimate
+
+    textured = colormap_texture and layer_state.color_mode != "Fixed"
+    key = _format_key(extension)
+
+    estimate.vertices = count * points_count
+    estimate.triangles = count * triangles_count
+    if key == "gl":
+        ppm = points_per_mesh or count
+        estimate.materials = len(groups) if materials else 0
+        estimate.meshes = sum(ceil(group / ppm) for group in groups)
+        # The triangle indices for a chunk are shared by all of the meshes of that color
+        chunk_sizes = minimum(groups, ppm)
+        estimate.bytes = geometry_bytes(extension, estimate.vertices, estimate.triangles,
+                                        meshes=estimate.meshes, materials=estimate.materials,
+                                        indices=int(chunk_sizes.sum()) * 3 * triangles_count,
+                                        max_index=int(chunk_sizes.max()) * points_count - 1)
+    elif key == "stl":
+        # The STL exporter adds each point as a separate mesh
+        estimate.meshes = count
+        estimate.bytes = geometry_bytes(extension, estimate.vertices, estimate.triangles)
+    else:
+        estimate.materials = len(groups)
+        estimate.meshes = len(groups)
+        estimate.bytes = geometry_bytes(extension, estimate.vertices, estimate.triangles,
+                                        meshes=estimate.meshes, materials=estimate.materials)
+
+    if textured and key != "stl":
+        estimate.bytes += _texture_coordinate_bytes(extension, estimate.vertices, estimate.meshes)
+        if materials:
+            estimate.bytes += COLORMAP_TEXTURE_OVERHEAD[key]
+
+    if decorations:
+        _add_scatter_decorations(estimate, layer_state, extension, count, len(groups), textured)
+    return estimate
+
+
+def _add_scatter_decorations(estimate: LayerEstimate,
+                             layer_state: ScatterLayerState3D,
+                             extension: str,
+                             count: int,
+                             materials: int,
+                             textured: bool = False):
+    """
+    Add the error bars and vectors that the exporters draw for a scatter layer.
+    """
+    key = _format_key(extension)
+    if key == "stl":
+        return
+
+    if key == "gl":
+        for axis in ("x", "y", "z"):
+            if getattr(layer_state, f"{axis}err_visible", False):
+                # Each error bar is a single line segment, and each material gets one mesh
+                estimate.vertices += 2 * count
+                estimate.meshes += materials
+                estimate.bytes += geometry_bytes(extension, 2 * count, 0, meshes=materials, indices=0)
+                if textured:
+                    estimate.bytes += _texture_coordinate_bytes(extension, 2 * count, materials)
+
+    if getattr(layer_state, "vector_visible", False):
+        resolution = 6 if key == "gl" else 10
+        arrowhead = layer_state.vector_arrowhead
+        vertices = cylinder_points_count(resolution)
+        triangles = len(cylinder_triangles(resolution))
+        if arrowhead:
+            vertices += cone_points_count(resolution)
+            triangles += cone_triangles_count(resolution)
+        meshes = count if key == "gl" or not arrowhead else 2 * count
+        estimate.vertices += count * vertices
+        estimate.triangles += count * triangles
+        estimate.meshes += meshes
+        # For glTF, all of the vectors share a single index buffer
+        estimate.bytes += geometry_bytes(extension, count * vertices, count * triangles, meshes=meshes,
+                                         indices=3 * triangles if key == "gl" else None,
+                                         max_index=vertices - 1)
+        if textured:
+            estimate.bytes += _texture_coordinate_bytes(extension, count * vertices, meshes)
+
+
+def _glyph_counts(glyph: str, resolution: int) -> Tuple[int, int]:
+    if glyph == "Sphere":
+        return sphere_points_count(resolution, resolution), sphere_triangles_count(resolution, resolution)
+    points_getter, triangles = glyph_geometry(glyph, resolution)
+    return len(points_getter((0, 0, 0), 1)), len(triangles)
+
+
+@ar_layer_estimate(ScatterLayerState3D, "Scatter")
+def estimate_vispy_scatter_layer(viewer_state: ViewerState3D,
+                                 layer_state: ScatterLayerState3D,
+                                 options: ARVispyScatterExportOptions,
+                                 bounds: Bounds,
+                                 extension: str) -> LayerEstimate:
+    resolutions = glyph_lod_resolutions(options.glyph, int(options.resolution), int(options.lod_levels))
+    points_count, triangles_count = _glyph_counts(options.glyph, resolutions[0])
+    # Every level exports the same points, so these are only counted once
+    counts = _scatter_counts(viewer_state, layer_state, scatter_point_budget(options), options.colormap_texture)
+    estimate = _estimate_scatter(viewer_state, layer_state, "Scatter", extension, counts,
+                                 points_count=points_count,
+                                 triangles_count=triangles_count,
+                                 points_per_mesh=_points_per_mesh(options),
+                                 colormap_texture=options.colormap_texture)
+
+    # Lower levels of detail are only exported to glTF, and repeat the spheres (but not the decorations)
+    # at a lower resolution, using the same materials
+    if _format_key(extension) == "gl":
+        for level, lod_resolution in enumerate(resolutions[1:]):
+            points_count, triangles_count = _glyph_counts(options.glyph, lod_resolution)
+            lod = _estimate_scatter(viewer_state, layer_state, "Scatter", extension, counts,
+                                    points_count=points_count,
+                                    triangles_count=triangles_count,
+                                    points_per_mesh=_points_per_mesh(options),
+                                    decorations=False,
+                                    colormap_texture=options.colormap_texture,
+                                    materials=False)
+            estimate.vertices += lod.vertices
+            estimate.triangles += lod.triangles
+            estimate.meshes += lod.meshes
+            estimate.bytes += lod.bytes
+            if level == 0:
+                # Each sphere mesh links all of its levels from its node
+                estimate.bytes += LOD_OVERHEAD * lod.meshes
+    return estimate
+
+
+@ar_layer_estimate(ScatterLayerState3D, "Points")
+def estimate_scatter_points_layer(viewer_state: ViewerState3D,
+                                  layer_state: ScatterLayerState3D,
+                                  options: ARPointCloudExportOptions,
+                                  bounds: Bounds,
+                                  extension: str) -> LayerEstimate:
+
+    estimate = LayerEstimate(layer=export_label_for_layer(layer_state), method="Points")
+    bounds = xyz_bounds(viewer_state, with_resolution=False)
+    mask = scatter_layer_mask(viewer_state, layer_state, bounds)
+    count = int(count_nonzero(mask)) if mask is not None else layer_state.layer.size
+    if count == 0:
+        return estimate
+
+    # Point clouds have no triangles, but each point has a 4-byte color when a colormap is used
+    ppm = _points_per_mesh(options) or count
+    estimate.vertices = count
+    estimate.meshes = ceil(count / ppm)
+    estimate.materials = 1
+    color_bytes = 0 if layer_state.color_mode == "Fixed" else (4 * count + POINT_COLORS_OVERHEAD * estimate.meshes)
+    estimate.bytes = geometry_bytes(extension, count, 0, meshes=estimate.meshes, materials=1, indices=0) + \
+        color_bytes
+    return estimate
+
+
+if IpyvolumeScatterLayerState is not NoneType:
+    @ar_layer_estimate(IpyvolumeScatterLayerState, "Scatter")
+    def estimate_ipyvolume_scatter_layer(viewer_state: ViewerState3D,
+                                         layer_state: IpyvolumeScatterLayerState,
+                                         options: ARIpyvolumeScatterExportOptions,
+                                         bounds: Bounds,
+                                         extension: str) -> LayerEstimate:
+        geometry = str(layer_state.geo)
+        triangles = IPYVOLUME_TRIANGLE_GETTERS.get(geometry, rectangular_prism_triangulation)()
+        points_getter = IPYVOLUME_POINTS_GETTERS.get(geometry, box_points_getter)
+        return _estimate_scatter(viewer_state, layer_state, "Scatter", extension,
+                                 _scatter_counts(viewer_state, layer_state),
+                                 points_count=len(points_getter((0, 0, 0), 1)),
+                                 triangles_count=len(triangles),
+                                 points_per_mesh=_points_per_mesh(options))
+
+
+def _normalized_volume(viewer_state: ViewerState3D,
+                       layer_state: VolumeLayerState3D,
+                       bounds: Optional[BoundsWithResolution],
+                       fill: float) -> Tuple[ndarray, float]:
+    """
+    A coarse fixed resolution buffer for the layer, scaled so that the isosurface range maps onto [0, 1],
+    along with the factor by which the viewer resolution exceeds that of the buffer.
+    """
+    bounds = bounds or xyz_bounds(viewer_state, with_resolution=True)
+    resolution = max(b[2] for b in bounds)
+    coarse_resolution = min(resolution, ESTIMATE_RESOLUTION)
+    coarse_bounds = [(b[0], b[1], coarse_resolution) for b in bounds]
+
+    data = frb_for_layer(viewer_state, layer_state, coarse_bounds)
+    isomin = isomin_for_layer(viewer_state, layer_state)
+    isomax = isomax_for_layer(viewer_state, layer_state)
+    data = (data - isomin) / (isomax - isomin)
+    data[~isfinite(data)] = fill
+    return data, resolution / coarse_resolution
+
+
+@ar_layer_estimate(VolumeLayerState3D, "Voxel")
+def estimate_voxel_layer(viewer_state: ViewerState3D,
+                         layer_state: VolumeLayerState3D,
+                         options: ARVoxelExportOptions,
+                         bounds: Optional[BoundsWithResolution],
+                         extension: str) -> LayerEstimate:
+
+    estimate = LayerEstimate(layer=export_label_for_layer(layer_state), method="Voxel")
+    data, scale = _normalized_volume(viewer_state, layer_state, bounds, fill=-1)
+    if data.size == 0:
+        return estimate
+
+    key = _format_key(extension)
+    cutoff = min(max(options.opacity_cutoff, 0), 1)
+    resolution = min(max(options.cmap_resolution, 0), 1)
+    opacity_factor = min(max(options.opacity_factor, 0), 2) / 2 if key == "gl" else 1
+
+    values = data[data > 0]
+    if key != "stl" and hasattr(layer_state, "stretch"):
+        values = layer_state.stretch_object(values, **layer_state.stretch_parameters)
+    values = clip(around(values / resolution) * resolution, 0, 1)
+    opacities = clip(around(layer_state.alpha * opacity_factor * values / resolution) * resolution, 0, 1)
+    kept = opacities >= cutoff
+
+    # Each retained (color, opacity) pair gets its own material. With a colormap, both are determined
+    # by the binned value, while for a fixed color only the opacity varies.
+    _, counts = unique(opacities[kept] if layer_state.color_mode == "Fixed" else values[kept], return_counts=True)
+    volume_scale = scale ** 3
+    voxels = int(counts.sum() * volume_scale)
+    if voxels == 0:
+        return estimate
+
+    points_count = len(rectangular_prism_points((0, 0, 0), (1, 1, 1)))
+    triangles_count = len(rectangular_prism_triangulation())
+    estimate.vertices = voxels * points_count
+    estimate.triangles = voxels * triangles_count
+    if key == "stl":
+        estimate.meshes = voxels
+        estimate.bytes = geometry_bytes(extension, estimate.vertices, estimate.triangles)
+        return estimate
+
+    estimate.materials = len(counts)
+    estimate.meshes = len(counts)
+    if key == "gl":
+        # A single index buffer, sized for the largest color, is shared by all of the meshes
+        largest = int(counts.max() * volume_scale)
+        estimate.bytes = geometry_bytes(extension, estimate.vertices, estimate.triangles,
+                                        meshes=estimate.meshes, materials=estimate.materials,
+                                        indices=3 * triangles_count * largest,
+                                        max_index=points_count * largest - 1)
+    else:
+        estimate.bytes = geometry_bytes(extension, estimate.vertices, estimate.triangles,
+                                        meshes=estimate.meshes, materials=estimate.materials)
+    return estimate
+
+
+def _level_crossings(data: ndarray, levels: ndarray) -> ndarray:
+    """
+    The number of grid edges that each level crosses. Marching cubes places one (shared) vertex
+    on each of these edges, so this is the number of vertices in each isosurface.
+    """
+    crossings = 0
+    for axis in range(data.ndim):
+        count = data.shape[axis]
+        if count < 2:
+            continue
+        first = data.take(range(count - 1), axis=axis).ravel()
+        second = data.take(range(1, count), axis=axis).ravel()
+        lows = minimum(first, second)
+        highs = maximum(first, second)
+        # The number of values below each level, for both ends of the edges.
+        # An edge is crossed by a level if its low end is below the level and its high end isn't.
+        below_low = cumsum(bincount(searchsorted(levels, lows, side="right"), minlength=len(levels) + 1))
+        below_high = cumsum(bincount(searchsorted(levels, highs, side="right"), minlength=len(levels) + 1))
+        crossings = crossings + (below_low - below_high)[:len(levels)]
+    return crossings
+
+
+@ar_layer_estimate(VolumeLayerState3D, "Isosurface")
+def estimate_isosurface_layer(viewer_state: ViewerState3D,
+                              layer_state: VolumeLayerState3D,
+                              options: ARIsosurfaceExportOptions,
+                              bounds: Optional[BoundsWithResolution],
+                              extension: str) -> LayerEstimate:
+
+    estimate = LayerEstimate(layer=export_label_for_layer(layer_state), method="Isosurface")
+    data, scale = _normalized_volume(viewer_state, layer_state, bounds, fill=-10)
+    if data.size == 0:
+        return estimate
+
+    key = _format_key(extension)
+    if key != "stl" and hasattr(layer_state, "stretch"):
+        data = layer_state.stretch_object(data, **layer_state.stretch_parameters)
+
+    isosurface_count = int(options.isosurface_count)
+    levels = linspace(0, 1, num=isosurface_count + 2)[1:-1]
+    lod_levels = int(options.lod_levels) if key == "gl" else 1
+
+    # Surface areas scale with the square of the resolution.
+    # A closed triangulated surface has (almost exactly) twice as many triangles as vertices.
+    for crossings in _level_crossings(data, levels):
+        vertices = int(crossings * scale ** 2)
+        if vertices == 0:
+            continue
+        triangles = 2 * vertices
+        materials = 0 if key == "stl" else 1
+        estimate.vertices += vertices
+        estimate.triangles += triangles
+        estimate.meshes += 1
+        estimate.materials += materials
+        estimate.bytes += geometry_bytes(extension, vertices, triangles, materials=materials)
+
+        # Each lower level of detail halves the resolution, and shares the material of the full surface
+        for lod in range(1, lod_levels):
+            lod_vertices = vertices // 4 ** lod
+            if lod_vertices == 0:
+                break
+            estimate.vertices += lod_vertices
+            estimate.triangles += 2 * lod_vertices
+            estimate.meshes += 1
+            estimate.bytes += geometry_bytes(extension, lod_vertices, 2 * lod_vertices) + LOD_OVERHEAD
+
+    return estimate
+
+
+try:
+    from glue_jupyter.ipyvolume.volume import VolumeLayerState as IPVVolumeLayerState
+    ar_layer_estimate.add(IPVVolumeLayerState, "Voxel", estimate_voxel_layer)
+    ar_layer_estimate.add(IPVVolumeLayerState, "Isosurface", estimate_isosurface_layer)
+except ImportError:
+    pass
@@ -1,16 +1,33 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import copy_context
+from functools import partial
 from math import floor
-from os.path import extsep, join, split, splitext
+import json
+from os import cpu_count, makedirs, remove
+from os.path import basename, dirname, exists, extsep, getsize, join, split, splitext
 from string import Template
-from typing import Dict, Optional, TypeVar
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TypeVar
 from glue.core.state_objects import State
 from glue.config import settings
+from glue.logger import logger
 from glue.viewers.common.state import LayerState
 from glue.viewers.common3d.viewer_state import ViewerState3D
 
 
+from glue_ar.common.cache import GeometryCache, layer_cache_key
+from glue_ar.common.estimate import ExportEstimate, estimate_layer
 from glue_ar.common.export_options import ar_layer_export
 from glue_ar.common.gltf_builder import GLTFBuilder
+from glue_ar.common.mesh_geometry import MeshGeometry, meshes_from_gltf, mesh_writer
+from glue_ar.common.mesh_optimization import ACMRReport, optimize_gl
+from glue_ar.common.progressive import preview_manifest, preview_state_dictionary
+from glue_ar.common.tiles import DEFAULT_MAX_DEPTH, DEFAULT_TILE_VERTICES, Tile, builder_buffers, \
+                                 partition_tiles, tile_builder, tileset_json
+from glue_ar.profiling import ExportProfiler, ExportReport, profile_stage, record_bytes
+from glue_ar.columns import ColumnCache
+from glue_ar.progress import ExportCancelled, ExportProgress, progress_span
 from glue_ar.registries import Builder, builder as builder_registry, compressor as compressor_registry
 from glue_ar.utils import RESOURCES_DIR, Bounds, BoundsWithResolution, export_label_for_layer, rgb_to_hex
 
@@ -25,17 +42,268 @@ def export_viewer(viewer_state: ViewerState3D,
                   allow_multiple: Optional[bool] = True,
                   compression: Optional[str] = "None",
                   model_viewer: bool = False,
-                  layer_controls: bool = True):
+                  layer_controls: bool = True,
+                  optimize_meshes: bool = False,
+                  parallel: bool = False,
+                  max_workers: Optional[int] = None,
+                  cache: Optional[GeometryCache] = None,
+                  deterministic_names: bool = False,
+                  progressive: bool = False,
+                  profiler: Optional[ExportProfiler] = None,
+                  progress: Optional[ExportProgress] = None) -> Optional[ExportReport]:
+    """
+    Export the viewer to a single file, whose type is given by the extension of `filepath`.
 
-    base, ext = splitext(filepath)
-    ext = ext[1:]
+    With `progressive`, a GLB export also gets a coarse preview of each layer (see `preview_state`) as
+    separate meshes in their own scene, whose data comes first in the file. The model-viewer page loads
+    just that part of the file first, so that something is shown straight away, and then swaps in the full
+    model once it has loaded. Other viewers show the full model as usual.
+
+    With `parallel`, each layer (or group of layers, for methods that export several at once) is exported
+    in its own thread, using up to `max_workers` threads. The glTF scatter and volume exporters do their heavy
+    lifting in NumPy, which releases the GIL, so this speeds up exports of several large layers on machines
+    with several cores. The worker threads read layer data (`data[...]`) and evaluate subset states concurrently,
+    which is assumed to be safe: glue doesn't modify data when reading it, and the columns that the layers
+    share are only fetched once (see `ColumnCache`). The data and states mustn't be changed during the export.
+    Since that hasn't been shown to hold for every data and subset type, parallel exports are opt-in
+    (the `parallel` key of a CLI job), and the viewer tools export serially.
+    """
+    written: List[str] = []
+    with profiler.activate(filepath) if profiler is not None else nullcontext(), \
+         progress.activate() if progress is not None else nullcontext(), \
+         ColumnCache().activate(), \
+         _remove_on_cancel(written):
+        ext = splitext(filepath)[1][1:]
+        gl = ext in ("gltf", "glb")
+        progressive = progressive and ext == "glb"
+        shares = _progress_shares(gl and (compression not in (None, "None") or optimize_meshes), outputs=1)
+        build = partial(_build_layers, viewer_state, layer_states, bounds,
+                        ext=ext,
+                        allow_multiple=allow_multiple,
+                        layer_controls=layer_controls,
+                        parallel=parallel,
+                        max_workers=max_workers,
+                        cache=cache,
+                        deterministic_names=deterministic_names)
+        with progress_span(shares["geometry"], stage="geometry"):
+            if progressive:
+                # The preview is much smaller than the full model, so it only gets a small share of the progress
+                with progress_span(0.1, stage="preview"):
+                    preview = build(preview_state_dictionary(state_dictionary))
+                with progress_span(0.9):
+                    builder = _with_preview(preview, build(state_dictionary))
+            else:
+                builder = build(state_dictionary)
+
+        if gl:
+            with progress_span(shares["compress"], stage="compress"):
+                builder = _prepare_gl(builder, compression=compression, optimize_meshes=optimize_meshes)
+        with progress_span(shares["write"], stage="write"):
+            _write_output(builder, viewer_state, filepath, model_viewer=model_viewer,
+                          layer_controls=layer_controls, progressive=progressive, written=written)
+
+    return profiler.report if profiler is not None else None
+
+
+def _with_preview(preview: GLTFBuilder, builder: GLTFBuilder) -> GLTFBuilder:
+    # The preview meshes go first, so that their data is at the start of the buffer
+    preview.meshes_by_layer.clear()
+    preview.lods.clear()
+    preview.add_preview(range(preview.mesh_count))
+    return preview.merge(builder)
+
+
+def export_viewer_formats(viewer_state: ViewerState3D,
+                          layer_states: List[LayerState],
+                          bounds: Union[Bounds, BoundsWithResolution],
+                          state_dictionary: Dict[str, Tuple[str, State]],
+                          filepaths: Iterable[str],
+                          allow_multiple: Optional[bool] = True,
+                          compression: Optional[str] = "None",
+                          model_viewer: bool = False,
+                          layer_controls: bool = True,
+                          optimize_meshes: bool = False,
+                          parallel: bool = False,
+                          max_workers: Optional[int] = None,
+                          cache: Optional[GeometryCache] = None,
+                          deterministic_names: bool = False,
+                          profiler: Optional[ExportProfiler] = None,
+                          progress: Optional[ExportProgress] = None) -> Optional[ExportReport]:
+    """
+    Export the viewer to several files at once (e.g. a GLB for Android and a USDZ for iOS),
+    generating the geometry for each layer only once.
+
+    The layers are exported with their glTF export methods, and any other formats are fed from the
+    resulting meshes, so USD and STL files produced this way have the same geometry and materials
+    as the glTF output. Compression, mesh optimization, and model-viewer pages only apply to glTF outputs.
+    Each layer's export method needs to be available for every one of the formats: for example,
+    the point clouds of the Points method can't be turned into USD or STL meshes.
+    """
+    filepaths = list(filepaths)
+    unknown = [filepath for filepath in filepaths if splitext(filepath)[1][1:] not in builder_registry.members]
+    if unknown:
+        raise ValueError(f"Unsupported file types: {', '.join(unknown)}")
+    extensions = {splitext(filepath)[1][1:] for filepath in filepaths}
+    for layer_state in layer_states:
+        label = export_label_for_layer(layer_state)
+        name, _ = state_dictionary[label]
+        unsupported = extensions - ar_layer_export.method_extensions(name, type(layer_state))
+        if unsupported:
+            raise ValueError(f"The {name} export method for {label} can't be used for "
+                             f"{', '.join(sorted(unsupported))} files")
+
+    written: List[str] = []
+    with profiler.activate(", ".join(filepaths)) if profiler is not None else nullcontext(), \
+         progress.activate() if progress is not None else nullcontext(), \
+         ColumnCache().activate(), \
+         _remove_on_cancel(written):
+        prepare = compression not in (None, "None") or optimize_meshes
+        shares = _progress_shares(prepare, outputs=len(filepaths))
+        with progress_span(shares["geometry"], stage="geometry"):
+            builder = _build_layers(viewer_state, layer_states, bounds, state_dictionary, "glb",
+                                    allow_multiple=allow_multiple,
+                                    layer_controls=layer_controls,
+                                    parallel=parallel,
+                                    max_workers=max_workers,
+                                    cache=cache,
+                                    deterministic_names=deterministic_names)
+
+        meshes: Optional[List[MeshGeometry]] = None
+        gl_builder: Optional[GLTFBuilder] = None
+        for filepath in filepaths:
+            ext = splitext(filepath)[1][1:]
+            if ext in ("gltf", "glb") and gl_builder is None:
+                with progress_span(shares["compress"], stage="compress"):
+                    gl_builder = _prepare_gl(builder, compression=compression, optimize_meshes=optimize_meshes)
+            with progress_span(shares["write"], stage="write"):
+                if ext in ("gltf", "glb"):
+                    output = gl_builder
+                else:
+                    # This needs to use the uncompressed glTF builder
+                    if meshes is None:
+                        with profile_stage("convert"):
+                            meshes = meshes_from_gltf(builder)
+                    builder_cls = builder_registry.members.get(ext)
+                    output = builder_cls(deterministic_names=deterministic_names)
+                    with profile_stage("convert"):
+                        mesh_writer(builder_cls)(output, meshes)
+                _write_output(output, viewer_state, filepath, model_viewer=model_viewer,
+                              layer_controls=layer_controls, written=written)
+
+    return profiler.report if profiler is not None else None
+
+
+def export_tileset(viewer_state: ViewerState3D,
+                   layer_states: List[LayerState],
+                   bounds: Union[Bounds, BoundsWithResolution],
+                   state_dictionary: Dict[str, Tuple[str, State]],
+                   filepath: str,
+                   compression: Optional[str] = "None",
+                   optimize_meshes: bool = False,
+                   tile_vertices: int = DEFAULT_TILE_VERTICES,
+                   max_depth: int = DEFAULT_MAX_DEPTH,
+                   parallel: bool = False,
+                   max_workers: Optional[int] = None,
+                   cache: Optional[GeometryCache] = None,
+                   deterministic_names: bool = False,
+                   profiler: Optional[ExportProfiler] = None,
+                   progress: Optional[ExportProgress] = None) -> Optional[ExportReport]:
+    """
+    Export the viewer as a 3D Tiles tileset, for scenes that are too large to load as a single model.
+    The layers are exported with their glTF export methods, and their meshes are partitioned spatially
+    (see `partition_tiles`) into small GLB tiles, which are written to a directory next to the tileset
+    JSON file at `filepath`. Tiles above the leaves show the levels of detail of their meshes, so a viewer
+    that streams the tileset can show a coarse version of the whole scene before the detailed tiles load.
+
+    Compression and mesh optimization are applied to each tile separately, and with `parallel`,
+    tiles are prepared and written in parallel too.
+    """
+    written: List[str] = []
+    with profiler.activate(filepath) if profiler is not None else nullcontext(), \
+         progress.activate() if progress is not None else nullcontext(), \
+         ColumnCache().activate(), \
+         _remove_on_cancel(written):
+        shares = _progress_shares(True, outputs=1)
+        with progress_span(shares["geometry"], stage="geometry"):
+            builder = _build_layers(viewer_state, layer_states, bounds, state_dictionary, "glb",
+                                    layer_controls=False,
+                                    parallel=parallel,
+                                    max_workers=max_workers,
+                                    cache=cache,
+                                    deterministic_names=deterministic_names)
+
+        with progress_span(shares["compress"] + shares["write"], stage="write"):
+            with profile_stage("partition"):
+                root = partition_tiles(builder, tile_vertices=tile_vertices, max_depth=max_depth)
+            if root is None:
+                raise ValueError("There are no meshes to export as tiles")
+            tiles = [tile for tile in root.walk() if tile.content]
+
+            # Tile URIs are relative to the tileset file
+            stem = splitext(basename(filepath))[0]
+            tiles_directory = join(dirname(filepath), f"{stem}_tiles")
+            makedirs(tiles_directory, exist_ok=True)
+            paths = []
+            for index, tile in enumerate(tiles):
+                tile.uri = f"{stem}_tiles/{index}.glb"
+                paths.append(join(tiles_directory, f"{index}.glb"))
+            written.extend(paths)
+
+            buffers_data = builder_buffers(builder)
+            write_tile = partial(_write_tile, builder, buffers_data, compression=compression,
+                                 optimize_meshes=optimize_meshes, share=1 / max(len(tiles), 1))
+            if parallel and len(tiles) > 1:
+                max_workers = min(max_workers or cpu_count() or 1, len(tiles))
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = [executor.submit(copy_context().run, write_tile, tile, path)
+                               for tile, path in zip(tiles, paths)]
+                    for future in futures:
+                        future.result()
+            else:
+                for tile, path in zip(tiles, paths):
+                    write_tile(tile, path)
+
+            written.append(filepath)
+            with profile_stage("write"), open(filepath, "w") as f:
+                json.dump(tileset_json(root), f, indent=2)
+                record_bytes(f.tell())
+
+    return profiler.report if profiler is not None else None
+
+
+def _write_tile(builder: GLTFBuilder,
+                buffers_data: List[bytes],
+                tile: Tile,
+                filepath: str,
+                compression: Optional[str] = "None",
+                optimize_meshes: bool = False,
+                share: float = 1.0):
+    with progress_span(share):
+        with profile_stage("tiles"):
+            output = tile_builder(builder, tile.content, buffers_data=buffers_data)
+        output = _prepare_gl(output, compression=compression, optimize_meshes=optimize_meshes)
+        with profile_stage("write"):
+            output.build_and_export(filepath)
+            record_bytes(getsize(filepath))
+
+
+def _build_layers(viewer_state: ViewerState3D,
+                  layer_states: List[LayerState],
+                  bounds: Union[Bounds, BoundsWithResolution],
+                  state_dictionary: Dict[str, Tuple[str, State]],
+                  ext: str,
+                  allow_multiple: Optional[bool] = True,
+                  layer_controls: bool = True,
+                  parallel: bool = False,
+                  max_workers: Optional[int] = None,
+                  cache: Optional[GeometryCache] = None,
+                  deterministic_names: bool = False) -> Builder:
     builder_cls = builder_registry.members.get(ext)
-    builder = builder_cls()
+    builder_factory = partial(builder_cls, deterministic_names=deterministic_names)
+    builder = builder_factory()
     layer_groups = defaultdict(list)
     export_groups = defaultdict(list)
 
-    exporting_gl = ext in ("gltf", "glb")
-
     # If we want to have layer controls, we can't batch multiple layers together
     allow_multiple = allow_multiple and not layer_controls
 
@@ -45,33 +313,198 @@ def export_viewer(viewer_state: ViewerState3D,
         layer_groups[key].append(layer_state)
         export_groups[key].append(export_state)
 
+    jobs: List[Tuple[Callable, Any, Any]] = []
     for key, states in layer_groups.items():
         export_states = export_groups[key]
         layer_state_cls, name = key
 
         spec = ar_layer_export.export_spec(layer_state_cls, name, ext)
         if spec.multiple and allow_multiple:
-            spec.export_method(builder, viewer_state, states, export_states, bounds)
+            jobs.append((spec.export_method, states, export_states))
         else:
             for layer_state, export_state in zip(states, export_states):
-                spec.export_method(builder, viewer_state, layer_state, export_state, bounds)
+                jobs.append((spec.export_method, layer_state, export_state))
+
+    # Each job gets an equal share of the geometry progress
+    share = 1 / max(len(jobs), 1)
+
+    # Fragments are pickled for the cache, which rules out USD stages
+    use_cache = cache is not None and ext in ("gltf", "glb")
+    if use_cache or (parallel and len(jobs) > 1):
+        fragments: List[Optional[Builder]] = [None] * len(jobs)
+        keys: List[Optional[str]] = [None] * len(jobs)
+        if use_cache:
+            digests: Dict[Any, str] = {}
+            with profile_stage("cache"):
+                for index, (export_method, layers, exports) in enumerate(jobs):
+                    keys[index] = layer_cache_key(builder_cls, export_method, viewer_state,
+                                                  layers, exports, bounds, digests=digests)
+                    fragments[index] = cache.get(keys[index])
 
-    if exporting_gl:
-        if compression not in (None, "None"):
+        missing = [index for index, fragment in enumerate(fragments) if fragment is None]
+        if parallel and len(missing) > 1:
+            max_workers = min(max_workers or cpu_count() or 1, len(missing))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Each job runs in a copy of the current context, so that the active profiler and progress carry over
+                futures = {index: executor.submit(copy_context().run, _export_fragment,
+                                                  builder_factory, viewer_state, bounds, *jobs[index], share=share)
+                           for index in missing}
+                for index, future in futures.items():
+                    fragments[index] = future.result()
+        else:
+            for index in missing:
+                fragments[index] = _export_fragment(builder_factory, viewer_state, bounds, *jobs[index],
+                                                    share=share)
+
+        if use_cache:
+            with profile_stage("cache"):
+                for index in missing:
+                    cache.put(keys[index], fragments[index])
+
+        # Merge in job order so that the output doesn't depend on scheduling, or on which fragments were cached
+        with profile_stage("merge"):
+            for fragment in fragments:
+                builder.merge(fragment)
+    else:
+        for job in jobs:
+            _run_export_job(builder, viewer_state, bounds, *job, share=share)
+
+    return builder
+
+
+def _prepare_gl(builder: GLTFBuilder,
+                compression: Optional[str] = "None",
+                optimize_meshes: bool = False) -> GLTFBuilder:
+    # Reordering needs the raw index buffers, so this must happen before compression
+    if optimize_meshes:
+        with profile_stage("optimize"):
+            builder, reports = optimize_gl(builder)
+        report = ACMRReport.combine(reports)
+        logger.info(f"Optimized {report.triangles} triangles for vertex cache: "
+                    f"ACMR {report.acmr_before:.3f} -> {report.acmr_after:.3f}")
+
+    if compression not in (None, "None"):
+        with profile_stage("compress"):
             builder = compress_gl(builder, method=compression)
 
-        if model_viewer:
-            mv_path = f"{base}{extsep}html"
+    return builder
+
+
+def _write_output(builder: Builder,
+                  viewer_state: ViewerState3D,
+                  filepath: str,
+                  model_viewer: bool = False,
+                  layer_controls: bool = True,
+                  progressive: bool = False,
+                  written: Optional[List[str]] = None):
+    # Files are recorded before they're written, so that a partial file can be cleaned up
+    written = written if written is not None else []
+    base, ext = splitext(filepath)
+    model_viewer = model_viewer and ext[1:] in ("gltf", "glb")
+    mv_path = f"{base}{extsep}html"
+    if model_viewer:
+        written.append(mv_path)
+
+    written.append(filepath)
+    with profile_stage("write"):
+        builder.build_and_export(filepath)
+        record_bytes(_output_bytes(builder, filepath))
+
+    # The page for a progressive export needs to know where the preview is in the written file
+    if model_viewer:
+        with profile_stage("modelviewer"):
             export_modelviewer(output_path=mv_path,
                                gltf_path=filepath,
                                builder=builder,
                                alt_text=viewer_state.title,
-                               layer_controls=layer_controls)
+                               layer_controls=layer_controls,
+                               preview=preview_manifest(filepath) if progressive else None)
+            record_bytes(getsize(mv_path))
+
 
-    builder.build_and_export(filepath)
+# Rough shares of the total export time taken by each stage, used to weight progress reports
+_STAGE_SHARES = {"geometry": 0.8, "compress": 0.15, "write": 0.05}
+
+
+def _progress_shares(prepare_gl: bool, outputs: int = 1) -> Dict[str, float]:
+    shares = dict(_STAGE_SHARES)
+    if not prepare_gl:
+        shares["compress"] = 0.0
+    total = sum(shares.values())
+    shares = {stage: share / total for stage, share in shares.items()}
+    shares["write"] /= outputs
+    return shares
+
+
+@contextmanager
+def _remove_on_cancel(written: List[str]) -> Iterator[None]:
+    try:
+        yield
+    except ExportCancelled:
+        for path in written:
+            if exists(path):
+                remove(path)
+        raise
+
+
+def estimate_export(viewer_state: ViewerState3D,
+                    layer_states: List[LayerState],
+                    bounds: Union[Bounds, BoundsWithResolution],
+                    state_dictionary: Dict[str, Tuple[str, State]],
+                    extension: str) -> ExportEstimate:
+    """
+    Predict the size of the output of `export_viewer` for the given layers and options,
+    without building any geometry. The byte count is for uncompressed geometry.
+    """
+    extension = extension.lower().lstrip(extsep)
+    estimate = ExportEstimate(extension=extension)
+    with ColumnCache().activate():
+        for layer_state in layer_states:
+            name, export_state = state_dictionary[export_label_for_layer(layer_state)]
+            layer_estimate = estimate_layer(viewer_state, layer_state, name, export_state, bounds, extension)
+            if layer_estimate is None:
+                estimate.unestimated.append(export_label_for_layer(layer_state))
+            else:
+                estimate.layers.append(layer_estimate)
+    return estimate
 
 
 B = TypeVar("B", bound=Builder)
+def _export_fragment(builder_factory: Callable[[], B],
+                     viewer_state: ViewerState3D,
+                     bounds: Union[Bounds, BoundsWithResolution],
+                     export_method: Callable,
+                     layer_states: Any,
+                     export_states: Any,
+                     share: float = 1.0) -> B:
+    fragment = builder_factory()
+    _run_export_job(fragment, viewer_state, bounds, export_method, layer_states, export_states, share=share)
+    return fragment
+
+
+def _run_export_job(builder: Builder,
+                    viewer_state: ViewerState3D,
+                    bounds: Union[Bounds, BoundsWithResolution],
+                    export_method: Callable,
+                    layer_states: Any,
+                    export_states: Any,
+                    share: float = 1.0):
+    if isinstance(layer_states, LayerState):
+        label = export_label_for_layer(layer_states)
+    else:
+        label = ", ".join(export_label_for_layer(layer_state) for layer_state in layer_states)
+    with profile_stage("geometry", layer=label), progress_span(share, layer=label):
+        export_method(builder, viewer_state, layer_states, export_states, bounds)
+
+
+def _output_bytes(builder: Builder, filepath: str) -> int:
+    size = getsize(filepath)
+    # A .gltf file stores its buffers in separate files
+    if filepath.endswith(".gltf"):
+        size += sum(len(resource.data) for resource in builder.file_resources if resource.data is not None)
+    return size
+
+
 def compress_gl(builder: B, method: str = "draco") -> B:
     compressor = compressor_registry.members.get(method.lower(), None)
     if compressor is None:
@@ -83,7 +516,8 @@ def export_modelviewer(output_path: str,
                        gltf_path: str,
                        builder: GLTFBuilder,
                        alt_text: str,
-                       layer_controls: bool = True):
+                       layer_controls: bool = True,
+                       preview: Optional[Dict[str, Any]] = None):
     mv_url = "https://ajax.googleapis.com/ajax/libs/model-viewer/3.3.0/model-viewer.min.js"
     with open(join(RESOURCES_DIR, "model-viewer.html")) as f:
         html_template = f.read()
@@ -110,6 +544,13 @@ def export_modelviewer(output_path: str,
     else:
         controls = ""
 
+    # The preview is embedded as JSON, which mustn't be able to close the script element that it's in
+    if preview is not None:
+        preview_json = json.dumps(preview).replace("</", "<\\/")
+        preview_script = f"<script type=\"application/json\" id=\"preview\">{preview_json}</script>"
+    else:
+        preview_script = ""
+
     _, gltf_name = split(gltf_path)
 
     substitutions = {
@@ -119,6 +560,7 @@ def export_modelviewer(output_path: str,
         "style": css,
         "button_text": "View in AR",
         "controls": controls,
+        "preview": preview_script,
         "script": javascript,
     }
     html = Template(html_template).substitute(substitutions)
@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Type
 
 from echo import delay_callback
 from glue.core.state_objects import State
@@ -6,9 +6,10 @@ from glue.viewers.common.layer_artist import LayerArtist
 from glue.viewers.common.viewer import Viewer
 from glue.viewers.common3d.layer_state import LayerState3D
 
+from glue_ar.common.export import estimate_export
 from glue_ar.common.export_options import ar_layer_export
 from glue_ar.common.export_state import ARExportDialogState
-from glue_ar.utils import export_label_for_layer
+from glue_ar.utils import export_label_for_layer, is_volume_viewer, xyz_bounds
 
 
 class ARExportDialogBase:
@@ -31,6 +32,7 @@ class ARExportDialogBase:
         self.state.add_callback('method', self._on_method_change)
         self.state.add_callback('compression', self._on_compression_change)
         self.state.add_callback('modelviewer', self._on_modelviewer_change)
+        self._update_estimate()
 
     def _initialize_dictionaries(self, layers: List[LayerArtist]):
         for layer in layers:
@@ -45,10 +47,15 @@ class ARExportDialogBase:
                     method_names = ar_layer_export.method_names(type(layer.state), self.state.filetype)
                     method = method_names[0]
                     state_cls = next(t[1] for t in states if t[0] == method)
-                state = state_cls()
+                state = self._create_export_state(state_cls)
                 self.state_dictionary[label] = (method, state)
             self._layer_export_states[label][method] = state
 
+    def _create_export_state(self, state_cls: Type[State]) -> State:
+        state = state_cls()
+        state.add_global_callback(self._on_export_option_change)
+        return state
+
     def _layer_for_label(self, label: str) -> LayerState3D:
         return next(layer for layer in self.state.layers if export_label_for_layer(layer) == label)
 
@@ -63,7 +70,7 @@ class ARExportDialogBase:
             method, state = self.state_dictionary[layer_name]
         else:
             method = method_names[0]
-            state = ar_layer_export.options_class(layer_state_cls, method)()
+            state = self._create_export_state(ar_layer_export.options_class(layer_state_cls, method))
             self.state_dictionary[layer_name] = (method, state)
         with delay_callback(self.state, 'method'):
             method_change = method != self.state.method
@@ -78,6 +85,7 @@ class ARExportDialogBase:
 
     def _on_filetype_change(self, filetype: str):
         self._update_state(self.state.layer, filetype)
+        self._request_estimate()
 
     def _on_compression_change(self, compression: str):
         pass
@@ -92,12 +100,40 @@ class ARExportDialogBase:
             layer = self._layer_for_label(self.state.layer)
             states = ar_layer_export.export_state_classes(type(layer.state))
             state_cls = next(t[1] for t in states if t[0] == method_name)
-            state = state_cls()
+            state = self._create_export_state(state_cls)
             self._layer_export_states[self.state.layer][method_name] = state
         self.state_dictionary[self.state.layer] = (method_name, state)
+        self._request_estimate()
+
+    def _on_export_option_change(self, *args):
+        self._request_estimate()
+
+    def _request_estimate(self):
+        """
+        Ask for the estimate to be updated after the options change. Estimating reads the data of every layer,
+        so the dialogs override this to wait until the options stop changing (e.g. while a slider is dragged).
+        """
+        self._update_estimate()
+
+    def _flush_estimate(self):
+        """
+        Update the estimate straight away if an update has been requested but hasn't happened yet.
+        """
+        pass
+
+    def _update_estimate(self):
+        layer_states = [layer.state for layer in self.state.layers]
+        bounds = xyz_bounds(self.viewer.state, with_resolution=is_volume_viewer(self.viewer))
+        estimate = estimate_export(self.viewer.state, layer_states, bounds,
+                                   self.state_dictionary, self.state.filetype)
+        self.state.estimate = f"Estimated output: {estimate.summary()}"
 
     @staticmethod
     def display_name(prop):
         if prop == "log_points_per_mesh":
             return "Points per mesh"
+        elif prop == "lod_levels":
+            return "Levels of detail"
+        elif prop == "log_point_budget":
+            return "Point budget"
         return prop.replace("_", " ").capitalize()
@@ -1,8 +1,10 @@
+from importlib import import_module
+
 from glue.config import DictRegistry
 from glue.core.state_objects import State
 from glue.viewers.common.state import LayerState
 
-from typing import Callable, Iterable, List, Tuple, Type
+from typing import Callable, Iterable, List, Optional, Set, Tuple, Type
 
 
 __all__ = ["ar_layer_export"]
@@ -42,21 +44,41 @@ class ARExportLayerOptionsRegistry(DictRegistry):
             key = (layer_state_cls, name, extension)
             self._members[key] = spec
 
+    def _load_lazy_members(self):
+        # Exporters register themselves when their modules are imported, so a lazy member
+        # is the path of a module to import. They're imported in the order they were added,
+        # since the first method registered for a layer type is its default
+        while self._lazy_members:
+            import_module(self._lazy_members.pop(0))
+
     def export_state_classes(self, layer_state_cls) -> List[Tuple[str, Type[State]]]:
+        self._load_lazy_members()
         return [(name, export_state_cls) for (state_cls, name), export_state_cls in
                 self.method_state_types.items() if layer_state_cls == state_cls]
 
     def options_class(self, state_cls, name) -> Type[State]:
+        self._load_lazy_members()
         return self.method_state_types[(state_cls, name)]
 
     def export_spec(self, state_cls, name, extension) -> ARExportSpecification:
+        self._load_lazy_members()
         return self._members[(state_cls, name, extension)]
 
     def method_names(self, layer_state_cls, extension) -> List[str]:
+        self._load_lazy_members()
         extension = extension.lower()
         return [name for (state_cls, name, ext) in self._members.keys()
                 if state_cls == layer_state_cls and ext == extension]
 
+    def method_extensions(self, name: str, layer_state_cls: Optional[Type[LayerState]] = None) -> Set[str]:
+        """
+        The file types that an export method is available for, for the given type of layer
+        (or for any type of layer, if none is given).
+        """
+        self._load_lazy_members()
+        return {ext for (state_cls, method, ext) in self._members.keys()
+                if method == name and (layer_state_cls is None or state_cls == layer_state_cls)}
+
     def __call__(self,
                  layer_state_cls: Type[LayerState],
                  name: str,
@@ -20,6 +20,7 @@ class ARExportDialogState(State):
     method = SelectionCallbackProperty()
     modelviewer = CallbackProperty(True)
     layer_controls = CallbackProperty(False)
+    estimate = CallbackProperty("")
 
     def __init__(self, layers: Iterable[LayerState3D]):
 
@@ -1,43 +1,76 @@
 from __future__ import annotations
 from collections import defaultdict
+from dataclasses import replace
+from hashlib import blake2b
+from os.path import splitext
 
 from gltflib import Accessor, AccessorType, AlphaMode, Animation, AnimationSampler, Asset, Attributes, Buffer, \
-                    BufferTarget, BufferView, Channel, ComponentType, GLTFModel, \
-                    Material, Mesh, Node, PBRMetallicRoughness, Primitive, PrimitiveMode, Scene, \
-                    Target
+                    BufferTarget, BufferView, Channel, ComponentType, GLTFModel, Image, \
+                    Material, Mesh, Node, PBRMetallicRoughness, Primitive, PrimitiveMode, Sampler, Scene, \
+                    Target, Texture, TextureInfo
 from gltflib.gltf import GLTF
 from gltflib.gltf_resource import FileResource
-from typing import Dict, Iterable, List, Literal, Optional, Union
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Set, Tuple, Union
 
 from glue_ar.registries import builder
 
 
+MSFT_LOD = "MSFT_lod"
+
+# Sampler filter and wrapping modes, as WebGL enums
+NEAREST = 9728
+LINEAR = 9729
+CLAMP_TO_EDGE = 33071
+
+
+def default_screen_coverage(levels: int) -> List[float]:
+    """
+    Screen coverage thresholds for a chain of the given number of levels of detail, starting with
+    the most detailed. Each level is used while its mesh covers at least that fraction of the screen;
+    the least detailed level has a threshold of zero, so that meshes are never culled entirely.
+    """
+    return [0.5 / 4 ** level for level in range(levels - 1)] + [0.0]
+
+
 @builder(("gltf", "glb"))
 class GLTFBuilder:
 
-    def __init__(self):
+    def __init__(self, deterministic_names: bool = False):
+        self.deterministic_names = deterministic_names
         self.materials: List[Material] = []
         self.meshes: List[Mesh] = []
         self.meshes_by_layer: Dict[str, List[int]] = defaultdict(list)
         self.buffers: List[Buffer] = []
         self.buffer_views: List[BufferView] = []
         self.accessors: List[Accessor] = []
+        self.images: List[Image] = []
+        self.samplers: List[Sampler] = []
+        self.textures: List[Texture] = []
         self.file_resources: List[FileResource] = []
         self.animations: List[Animation] = []
         self.extensions: Dict[str, Dict[str, bool]] = {}
+        self.lods: Dict[int, Tuple[List[int], List[float]]] = {}
+        self.preview_meshes: List[int] = []
 
     def add_material(self,
                      color: Iterable[float],
                      opacity: float = 1,
                      roughness_factor: float = 1,
                      metallic_factor: float = 0,
-                     alpha_mode: AlphaMode = AlphaMode.BLEND) -> GLTFBuilder:
+                     alpha_mode: AlphaMode = AlphaMode.BLEND,
+                     base_color_texture: Optional[int] = None) -> GLTFBuilder:
+        """
+        Add a material with the given base color. If `base_color_texture` is given, the base color
+        is sampled from that texture (using each vertex's `TEXCOORD_0`) and multiplied by `color`.
+        """
         if any(c > 1 for c in color):
             color = [c / 256 for c in color[:3]]
+        texture_info = None if base_color_texture is None else TextureInfo(index=base_color_texture)
         self.materials.append(
             Material(
                 pbrMetallicRoughness=PBRMetallicRoughness(
                     baseColorFactor=list(color[:3]) + [opacity],
+                    baseColorTexture=texture_info,
                     roughnessFactor=roughness_factor,
                     metallicFactor=metallic_factor
                 ),
@@ -52,10 +85,11 @@ class GLTFBuilder:
                  indices_accessor: Optional[int] = None,
                  material: Optional[int] = None,
                  mode: PrimitiveMode = PrimitiveMode.TRIANGLES,
-                 extensions: Optional[dict] = None) -> GLTFBuilder:
+                 extensions: Optional[dict] = None,
+                 attributes: Optional[Dict[str, int]] = None) -> GLTFBuilder:
 
         primitive_kwargs = {
-                "attributes": Attributes(POSITION=position_accessor),
+                "attributes": Attributes(POSITION=position_accessor, **(attributes or {})),
                 "mode": mode
         }
         if indices_accessor is not None:
@@ -112,12 +146,14 @@ class GLTFBuilder:
                      component_type: ComponentType,
                      count: int,
                      type: AccessorType,
-                     mins: List[Union[int, float]],
-                     maxes: List[Union[int, float]]) -> GLTFBuilder:
+                     mins: Optional[List[Union[int, float]]],
+                     maxes: Optional[List[Union[int, float]]],
+                     normalized: Optional[bool] = None) -> GLTFBuilder:
         self.accessors.append(
             Accessor(
                 bufferView=buffer_view,
                 componentType=component_type,
+                normalized=normalized,
                 count=count,
                 type=type.value,
                 min=mins,
@@ -126,13 +162,36 @@ class GLTFBuilder:
         )
         return self
 
+    def add_image(self,
+                  uri: str,
+                  mime_type: str = "image/png") -> GLTFBuilder:
+        self.images.append(Image(uri=uri, mimeType=mime_type))
+        return self
+
+    def add_sampler(self,
+                    mag_filter: int = LINEAR,
+                    min_filter: int = LINEAR,
+                    wrap_s: int = CLAMP_TO_EDGE,
+                    wrap_t: int = CLAMP_TO_EDGE) -> GLTFBuilder:
+        self.samplers.append(Sampler(magFilter=mag_filter, minFilter=min_filter, wrapS=wrap_s, wrapT=wrap_t))
+        return self
+
+    def add_texture(self,
+                    source: int,
+                    sampler: Optional[int] = None) -> GLTFBuilder:
+        self.textures.append(Texture(source=source, sampler=sampler))
+        return self
+
     def add_file_resource(self,
                           filename: str,
-                          data: bytearray) -> GLTFBuilder:
+                          data: bytearray,
+                          mime_type: Optional[str] = None) -> GLTFBuilder:
+        # Embedded images need their MIME type, which is taken from the resource
         self.file_resources.append(
             FileResource(
                 filename,
                 data=data,
+                mimetype=mime_type,
             )
         )
         return self
@@ -181,6 +240,119 @@ class GLTFBuilder:
             "used": used,
         }
 
+    def add_lods(self,
+                 mesh: int,
+                 lod_meshes: Sequence[int],
+                 screen_coverage: Optional[Sequence[float]] = None) -> GLTFBuilder:
+        """
+        Link lower levels of detail to a mesh with the `MSFT_lod` extension. The LOD meshes should go from
+        the most to the least detailed, and shouldn't belong to any layer, as they're only ever shown in place
+        of `mesh`. Viewers that don't support the extension just show `mesh`.
+
+        `screen_coverage` gives the threshold for each level, starting with `mesh` itself.
+        """
+        if len(lod_meshes) == 0:
+            return self
+        if screen_coverage is None:
+            screen_coverage = default_screen_coverage(len(lod_meshes) + 1)
+        self.lods[mesh] = (list(lod_meshes), list(screen_coverage))
+        self.add_extension(MSFT_LOD, required=False)
+        return self
+
+    def add_preview(self, meshes: Iterable[int]) -> GLTFBuilder:
+        """
+        Mark meshes as a coarse preview of the model. Preview meshes go in a separate scene named
+        `preview` rather than the default scene, so viewers that load the whole model never show them,
+        and like LOD meshes, they shouldn't belong to any layer.
+        """
+        self.preview_meshes.extend(meshes)
+        return self
+
+    @property
+    def lod_meshes(self) -> Set[int]:
+        """
+        The meshes that are only used as lower levels of detail for other meshes.
+        """
+        return {index for lod_meshes, _ in self.lods.values() for index in lod_meshes}
+
+    def merge(self, other: GLTFBuilder) -> GLTFBuilder:
+        """
+        Append the contents of another builder to this one.
+        All of the indices in the other builder's objects are re-based so that they
+        refer to the corresponding objects in this builder.
+        """
+        material_offset = self.material_count
+        mesh_offset = self.mesh_count
+        buffer_offset = self.buffer_count
+        buffer_view_offset = self.buffer_view_count
+        accessor_offset = self.accessor_count
+        image_offset = self.image_count
+        sampler_offset = self.sampler_count
+        texture_offset = self.texture_count
+
+        def rebase(index: Optional[int], offset: int) -> Optional[int]:
+            return None if index is None else index + offset
+
+        for material in other.materials:
+            pbr = material.pbrMetallicRoughness
+            if pbr is not None and pbr.baseColorTexture is not None:
+                texture_info = replace(pbr.baseColorTexture, index=pbr.baseColorTexture.index + texture_offset)
+                material = replace(material, pbrMetallicRoughness=replace(pbr, baseColorTexture=texture_info))
+            self.materials.append(material)
+
+        self.images.extend(other.images)
+        self.samplers.extend(other.samplers)
+        for texture in other.textures:
+            self.textures.append(replace(texture,
+                                         source=rebase(texture.source, image_offset),
+                                         sampler=rebase(texture.sampler, sampler_offset)))
+
+        self.buffers.extend(other.buffers)
+        self.file_resources.extend(other.file_resources)
+
+        for buffer_view in other.buffer_views:
+            self.buffer_views.append(replace(buffer_view, buffer=buffer_view.buffer + buffer_offset))
+
+        for accessor in other.accessors:
+            self.accessors.append(replace(accessor, bufferView=rebase(accessor.bufferView, buffer_view_offset)))
+
+        for mesh in other.meshes:
+            primitives = []
+            for primitive in mesh.primitives:
+                attributes = replace(primitive.attributes, **{
+                    name: index + accessor_offset
+                    for name, index in vars(primitive.attributes).items()
+                    if isinstance(index, int)
+                })
+                primitives.append(replace(primitive,
+                                          attributes=attributes,
+                                          indices=rebase(primitive.indices, accessor_offset),
+                                          material=rebase(primitive.material, material_offset)))
+            self.meshes.append(replace(mesh, primitives=primitives))
+
+        for layer_id, mesh_indices in other.meshes_by_layer.items():
+            self.meshes_by_layer[layer_id].extend(index + mesh_offset for index in mesh_indices)
+
+        for mesh_index, (lod_meshes, screen_coverage) in other.lods.items():
+            self.lods[mesh_index + mesh_offset] = ([index + mesh_offset for index in lod_meshes], screen_coverage)
+
+        self.preview_meshes.extend(index + mesh_offset for index in other.preview_meshes)
+
+        # Each mesh gets its own node, so node indices are re-based in the same way as mesh indices
+        for animation in other.animations:
+            channels = [replace(channel, target=replace(channel.target, node=rebase(channel.target.node, mesh_offset)))
+                        for channel in animation.channels or []]
+            samplers = [replace(sampler,
+                                input=sampler.input + accessor_offset,
+                                output=sampler.output + accessor_offset)
+                        for sampler in animation.samplers or []]
+            self.animations.append(replace(animation, channels=channels or None, samplers=samplers or None))
+
+        for extension, params in other.extensions.items():
+            self.extensions.setdefault(extension, params)
+
+        return self
+
     @property
     def material_count(self) -> int:
         return len(self.materials)
@@ -205,10 +377,69 @@ class GLTFBuilder:
     def animation_count(self) -> int:
         return len(self.animations)
 
+    @property
+    def image_count(self) -> int:
+        return len(self.images)
+
+    @property
+    def sampler_count(self) -> int:
+        return len(self.samplers)
+
+    @property
+    def texture_count(self) -> int:
+        return len(self.textures)
+
+    @property
+    def image_resources(self) -> List[FileResource]:
+        """
+        The file resources that hold the data of this builder's images.
+        """
+        uris = {image.uri for image in self.images}
+        return [resource for resource in self.file_resources if resource.uri in uris]
+
+    def copy_textures(self, other: GLTFBuilder) -> GLTFBuilder:
+        """
+        Copy the images, samplers, and textures of another builder (along with the image data) into this one,
+        keeping their indices, so that materials copied from the other builder can refer to them unchanged.
+        This builder shouldn't have any textures of its own.
+        """
+        self.images = list(other.images)
+        self.samplers = list(other.samplers)
+        self.textures = list(other.textures)
+        self.file_resources.extend(other.image_resources)
+        return self
+
+    def _resource_names(self) -> Dict[str, str]:
+        """
+        When using deterministic names, each file resource is renamed based on a hash of its contents,
+        so that identical builders always give identical output. The prefix of the original name
+        (e.g. `layer` in `layer_<id>.bin`) is kept to make the files easier to identify.
+        """
+        if not self.deterministic_names:
+            return {}
+        names = {}
+        for resource in self.file_resources:
+            if resource.data is None:
+                continue
+            base, ext = splitext(resource.uri)
+            prefix = base.split("_")[0]
+            digest = blake2b(bytes(resource.data), digest_size=16).hexdigest()
+            names[resource.uri] = f"{prefix}_{digest}{ext}"
+        return names
+
     def build_model(self) -> GLTFModel:
+        names = self._resource_names()
         nodes = [Node(mesh=i) for i in range(len(self.meshes))]
-        node_indices = list(range(len(nodes)))
+        # Each mesh has the node with the same index, so LOD meshes can be referred to by node.
+        # Their nodes are left out of the scene, as they're only shown in place of their primary node
+        for mesh_index, (lod_meshes, screen_coverage) in self.lods.items():
+            nodes[mesh_index].extensions = {MSFT_LOD: {"ids": lod_meshes}}
+            nodes[mesh_index].extras = {"MSFT_screencoverage": screen_coverage}
+        hidden = self.lod_meshes | set(self.preview_meshes)
+        node_indices = [index for index in range(len(nodes)) if index not in hidden]
         scenes = [Scene(nodes=node_indices)]
+        if self.preview_meshes:
+            scenes.append(Scene(name="preview", nodes=list(self.preview_meshes)))
         required_extensions = list(ext for ext, params in self.extensions.items() if params.get("required", True))
         used_extensions = list(ext for ext, params in self.extensions.items() if params.get("used", True))
         model_params = dict(
@@ -216,12 +447,17 @@ class GLTFBuilder:
             scenes=scenes,
             nodes=nodes,
             meshes=self.meshes,
-            buffers=self.buffers,
+            buffers=[replace(buffer, uri=names.get(buffer.uri, buffer.uri)) for buffer in self.buffers],
             bufferViews=self.buffer_views,
             accessors=self.accessors,
             materials=self.materials or None,
+            images=[replace(image, uri=names.get(image.uri, image.uri)) for image in self.images] or None,
+            samplers=self.samplers or None,
+            textures=self.textures or None,
             animations=self.animations or None,
         )
+        if len(scenes) > 1:
+            model_params["scene"] = 0
         if required_extensions:
             model_params["extensionsRequired"] = required_extensions
         if used_extensions:
@@ -230,7 +466,11 @@ class GLTFBuilder:
 
     def build(self) -> GLTF:
         model = self.build_model()
-        return GLTF(model=model, resources=self.file_resources)
+        names = self._resource_names()
+        resources = [FileResource(names[resource.uri], data=resource.data, mimetype=resource.mimetype)
+                     if resource.uri in names else resource
+                     for resource in self.file_resources]
+        return GLTF(model=model, resources=resources)
 
     def build_and_export(self, filepath: str):
         self.build().export(filepath)
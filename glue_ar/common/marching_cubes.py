@@ -1,5 +1,6 @@
 from mcubes import marching_cubes
 from numpy import isfinite, linspace
+from typing import List, Tuple, Union
 
 from gltflib import AccessorType, BufferTarget, ComponentType
 
@@ -11,6 +12,7 @@ from glue_ar.common.gltf_builder import GLTFBuilder
 from glue_ar.common.stl_builder import STLBuilder
 from glue_ar.common.usd_builder import USDBuilder
 from glue_ar.common.volume_export_options import ARIsosurfaceExportOptions
+from glue_ar.progress import tracked
 from glue_ar.gltf_utils import add_points_to_bytearray, add_triangles_to_bytearray, index_export_option, \
                                index_mins, index_maxes
 from glue_ar.utils import BoundsWithResolution, clip_sides, export_label_for_layer, frb_for_layer, hex_to_components, \
@@ -48,9 +50,11 @@ def add_isosurface_layer_gltf(builder: GLTFBuilder,
     sides = clip_sides(viewer_state, clip_size=1)
     sides = tuple(sides[i] for i in (2, 1, 0))
 
-    for level in levels[1:-1]:
-        barr = bytearray()
-        level_bin = f"layer_{layer_state.layer.uuid}_level_{level}.bin"
+    # Lower levels of detail come from the data downsampled by successive factors of two
+    lod_data = [(2 ** lod, data[::2 ** lod, ::2 ** lod, ::2 ** lod]) for lod in range(1, int(options.lod_levels))]
+
+    for level in tracked(levels[1:-1], every=1):
+        level_name = f"layer_{layer_state.layer.uuid}_level_{level}"
 
         points, triangles = marching_cubes(data, level)
         if len(points) == 0:
@@ -66,59 +70,88 @@ def add_isosurface_layer_gltf(builder: GLTFBuilder,
         builder.add_material(surface_color_components, opacity=opacity)
         material_index = builder.material_count - 1
 
-        points = [tuple((-1 + (index + 0.5) * side) for index, side in zip(pt, sides)) for pt in points]
-        points = [[p[1], p[0], p[2]] for p in points]
-        add_points_to_bytearray(barr, points)
-        point_len = len(barr)
-
-        pt_mins = index_mins(points)
-        pt_maxes = index_maxes(points)
-        tri_mins = [int(min(idx for tri in triangles for idx in tri))]
-        max_tri_index = int(max(idx for tri in triangles for idx in tri))
-        tri_maxes = [max_tri_index]
-
-        index_format = index_export_option(max_tri_index)
-        add_triangles_to_bytearray(barr, triangles, export_option=index_format)
-        triangle_len = len(barr) - point_len
-
-        builder.add_buffer(byte_length=len(barr), uri=level_bin)
-
-        buffer = builder.buffer_count - 1
-        builder.add_buffer_view(
-            buffer=buffer,
-            byte_length=point_len,
-            byte_offset=0,
-            target=BufferTarget.ARRAY_BUFFER,
-        )
-        builder.add_accessor(
-            buffer_view=builder.buffer_view_count-1,
-            component_type=ComponentType.FLOAT,
-            count=len(points),
-            type=AccessorType.VEC3,
-            mins=pt_mins,
-            maxes=pt_maxes,
-        )
-        builder.add_buffer_view(
-            buffer=buffer,
-            byte_length=triangle_len,
-            byte_offset=point_len,
-            target=BufferTarget.ELEMENT_ARRAY_BUFFER,
-        )
-        builder.add_accessor(
-            buffer_view=builder.buffer_view_count-1,
-            component_type=index_format.component_type,
-            count=len(triangles)*3,
-            type=AccessorType.SCALAR,
-            mins=tri_mins,
-            maxes=tri_maxes,
-        )
-        builder.add_mesh(
-            layer_id=layer_id,
-            position_accessor=builder.accessor_count-2,
-            indices_accessor=builder.accessor_count-1,
-            material=material_index,
-        )
-        builder.add_file_resource(level_bin, data=barr)
+        mesh_index = _add_isosurface_mesh_gltf(builder, points, triangles, sides, step=1,
+                                               layer_id=layer_id, material=material_index,
+                                               uri=f"{level_name}.bin")
+
+        lod_meshes = []
+        for step, lod_values in lod_data:
+            lod_points, lod_triangles = marching_cubes(lod_values, level)
+            # Once a surface is too small to survive downsampling, there are no coarser levels of it either
+            if len(lod_points) == 0 or len(lod_triangles) == 0:
+                break
+            lod_meshes.append(_add_isosurface_mesh_gltf(builder, lod_points, lod_triangles, sides, step=step,
+                                                        layer_id=[], material=material_index,
+                                                        uri=f"{level_name}_lod_{step}.bin"))
+        builder.add_lods(mesh_index, lod_meshes)
+
+
+def _add_isosurface_mesh_gltf(builder: GLTFBuilder,
+                              points,
+                              triangles,
+                              sides: Tuple[float, float, float],
+                              step: int,
+                              layer_id: Union[str, List[str]],
+                              material: int,
+                              uri: str) -> int:
+    """
+    Add a mesh for an isosurface computed on data sampled with the given step, returning the index of the new mesh.
+    """
+    barr = bytearray()
+    points = [tuple((-1 + (step * index + 0.5) * side) for index, side in zip(pt, sides)) for pt in points]
+    points = [[p[1], p[0], p[2]] for p in points]
+    add_points_to_bytearray(barr, points)
+    point_len = len(barr)
+
+    pt_mins = index_mins(points)
+    pt_maxes = index_maxes(points)
+    tri_mins = [int(min(idx for tri in triangles for idx in tri))]
+    max_tri_index = int(max(idx for tri in triangles for idx in tri))
+    tri_maxes = [max_tri_index]
+
+    index_format = index_export_option(max_tri_index)
+    add_triangles_to_bytearray(barr, triangles, export_option=index_format)
+    triangle_len = len(barr) - point_len
+
+    builder.add_buffer(byte_length=len(barr), uri=uri)
+
+    buffer = builder.buffer_count - 1
+    builder.add_buffer_view(
+        buffer=buffer,
+        byte_length=point_len,
+        byte_offset=0,
+        target=BufferTarget.ARRAY_BUFFER,
+    )
+    builder.add_accessor(
+        buffer_view=builder.buffer_view_count-1,
+        component_type=ComponentType.FLOAT,
+        count=len(points),
+        type=AccessorType.VEC3,
+        mins=pt_mins,
+        maxes=pt_maxes,
+    )
+    builder.add_buffer_view(
+        buffer=buffer,
+        byte_length=triangle_len,
+        byte_offset=point_len,
+        target=BufferTarget.ELEMENT_ARRAY_BUFFER,
+    )
+    builder.add_accessor(
+        buffer_view=builder.buffer_view_count-1,
+        component_type=index_format.component_type,
+        count=len(triangles)*3,
+        type=AccessorType.SCALAR,
+        mins=tri_mins,
+        maxes=tri_maxes,
+    )
+    builder.add_mesh(
+        layer_id=layer_id,
+        position_accessor=builder.accessor_count-2,
+        indices_accessor=builder.accessor_count-1,
+        material=material,
+    )
+    builder.add_file_resource(uri, data=barr)
+    return builder.mesh_count - 1
 
 
 @ar_layer_export(VolumeLayerState3D, "Isosurface", ARIsosurfaceExportOptions, ("usdz", "usdc", "usda"))
@@ -153,7 +186,7 @@ def add_isosurface_layer_usd(
     sides = clip_sides(viewer_state, clip_size=1)
     sides = tuple(sides[i] for i in (2, 1, 0))
 
-    for level in levels[1:-1]:
+    for level in tracked(levels[1:-1], every=1):
         alpha = layer_state.alpha * level
         points, triangles = marching_cubes(data, level)
         if len(points) == 0:
@@ -194,7 +227,7 @@ def add_isosurface_layer_stl(
     sides = clip_sides(viewer_state, clip_size=1)
     sides = tuple(sides[i] for i in (2, 1, 0))
 
-    for level in levels[1:-1]:
+    for level in tracked(levels[1:-1], every=1):
         # alpha = (3 * i + isosurface_count) / (4 * isosurface_count) * opacity
         points, triangles = marching_cubes(data, level)
         if len(points) == 0:
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from gltflib import GLTF, PrimitiveMode
+import numpy as np
+
+from glue_ar.common.gltf_builder import GLTFBuilder
+from glue_ar.common.stl_builder import STLBuilder
+from glue_ar.common.usd_builder import USDBuilder
+from glue_ar.gltf_utils import accessor_to_numpy, get_data
+from glue_ar.utils import clamp
+
+
+__all__ = ["MeshGeometry", "meshes_from_gltf", "add_meshes_usd", "add_meshes_stl", "mesh_writer"]
+
+
+@dataclass
+class MeshGeometry:
+    """
+    A format-neutral description of a single triangle mesh.
+    Points are in the (y-up) coordinates that all of the builders use, and colors are 0-255 RGB.
+    If `texture` (the data of a PNG image) is given, the mesh takes its color from that instead,
+    using `texture_coordinates`, which have two values for each point.
+    """
+    points: np.ndarray
+    triangles: np.ndarray
+    color: Tuple[int, int, int]
+    opacity: float
+    layer_id: str
+    texture: Optional[bytes] = None
+    texture_coordinates: Optional[np.ndarray] = None
+
+
+def _material_color(builder: GLTFBuilder, material_index: int) -> Tuple[Tuple[int, int, int], float]:
+    factor = builder.materials[material_index].pbrMetallicRoughness.baseColorFactor
+    # glTF materials store colors as fractions of 256, and USD expects integer components
+    color = tuple(int(clamp(round(c * 256), 0, 255)) for c in factor[:3])
+    return color, factor[3]
+
+
+def _material_texture(gltf: GLTF, material_index: int) -> Optional[bytes]:
+    texture_info = gltf.model.materials[material_index].pbrMetallicRoughness.baseColorTexture
+    if texture_info is None:
+        return None
+    image = gltf.model.images[gltf.model.textures[texture_info.index].source]
+    resource = next(r for r in gltf.resources if r.uri == image.uri)
+    return bytes(get_data(resource))
+
+
+def meshes_from_gltf(builder: GLTFBuilder) -> List[MeshGeometry]:
+    """
+    Extract the triangle meshes of a glTF builder as arrays, so that they can be used to feed other builders.
+    Meshes that share an index buffer each get their own view of it, and non-triangle primitives
+    (such as the line segments used for error bars), lower levels of detail, and preview meshes are skipped.
+    Meshes colored by a texture (such as a colormap) keep the texture image and their texture coordinates.
+    """
+    gltf = builder.build()
+    model = gltf.model
+    buffers_data = []
+    for buffer in model.buffers or []:
+        resource = next(r for r in gltf.resources if r.uri == buffer.uri)
+        buffers_data.append(get_data(resource))
+
+    layers_by_mesh = {index: layer_id for layer_id, indices in builder.meshes_by_layer.items() for index in indices}
+    skipped = builder.lod_meshes | set(builder.preview_meshes)
+
+    meshes = []
+    for index, mesh in enumerate(model.meshes or []):
+        if index in skipped:
+            continue
+        primitive = mesh.primitives[0]
+        if primitive.mode not in (None, PrimitiveMode.TRIANGLES, PrimitiveMode.TRIANGLES.value) or \
+                primitive.indices is None:
+            continue
+        points = accessor_to_numpy(model, primitive.attributes.POSITION, buffers_data)
+        triangles = accessor_to_numpy(model, primitive.indices, buffers_data).reshape((-1, 3))
+        material = primitive.material or 0
+        color, opacity = _material_color(builder, material)
+        texture = _material_texture(gltf, material)
+        texture_coordinates = None
+        if texture is not None:
+            texture_coordinates = accessor_to_numpy(model, primitive.attributes.TEXCOORD_0, buffers_data)
+        meshes.append(MeshGeometry(points=points,
+                                   triangles=triangles,
+                                   color=color,
+                                   opacity=opacity,
+                                   layer_id=layers_by_mesh.get(index, ""),
+                                   texture=texture,
+                                   texture_coordinates=texture_coordinates))
+    return meshes
+
+
+def add_meshes_usd(builder: USDBuilder, meshes: List[MeshGeometry]) -> USDBuilder:
+    for mesh in meshes:
+        # Textures are named after their contents, so an image that several meshes use is only stored once
+        texture = builder.add_texture(mesh.texture) if mesh.texture is not None else None
+        builder.add_mesh(mesh.points, mesh.triangles,
+                         color=mesh.color,
+                         opacity=mesh.opacity,
+                         identifier=mesh.layer_id or None,
+                         texture=texture,
+                         texture_coordinates=mesh.texture_coordinates)
+    return builder
+
+
+def add_meshes_stl(builder: STLBuilder, meshes: List[MeshGeometry]) -> STLBuilder:
+    for mesh in meshes:
+        builder.add_mesh(mesh.points, mesh.triangles)
+    return builder
+
+
+MESH_WRITERS: Dict[type, Callable] = {
+    USDBuilder: add_meshes_usd,
+    STLBuilder: add_meshes_stl,
+}
+
+
+def mesh_writer(builder_cls: type) -> Callable:
+    writer = MESH_WRITERS.get(builder_cls, None)
+    if writer is None:
+        raise ValueError(f"Can't write neutral mesh geometry to a {builder_cls.__name__}")
+    return writer
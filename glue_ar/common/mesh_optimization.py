@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from gltflib import AccessorType, BufferTarget, Primitive, PrimitiveMode
+import numpy as np
+
+from glue_ar.common.gltf_builder import GLTFBuilder
+from glue_ar.gltf_utils import accessor_to_numpy, get_data
+from glue_ar.utils import unique_id
+
+
+__all__ = [
+    "ACMRReport",
+    "acmr",
+    "optimize_gl",
+    "optimize_vertex_cache",
+    "optimize_vertex_fetch",
+]
+
+
+# The post-transform cache size that we optimize for.
+# Tipsify only needs an approximate value here, and 16 entries
+# is a conservative lower bound for the GPUs found in phones and headsets.
+DEFAULT_CACHE_SIZE = 16
+
+ATTRIBUTE_NAMES = ("POSITION", "NORMAL", "TANGENT", "TEXCOORD_0", "TEXCOORD_1", "COLOR_0", "JOINTS_0", "WEIGHTS_0")
+
+
+class ACMRReport(NamedTuple):
+    """
+    The average cache miss ratio (the number of vertex shader invocations per triangle)
+    for a set of triangles before and after optimization.
+    """
+    triangles: int
+    acmr_before: float
+    acmr_after: float
+
+    @classmethod
+    def combine(cls, reports: List[ACMRReport]) -> ACMRReport:
+        """
+        Combine several reports into one, weighting each by its triangle count.
+        """
+        triangles = sum(report.triangles for report in reports)
+        if triangles == 0:
+            return cls(triangles=0, acmr_before=0.0, acmr_after=0.0)
+        return cls(
+            triangles=triangles,
+            acmr_before=sum(report.acmr_before * report.triangles for report in reports) / triangles,
+            acmr_after=sum(report.acmr_after * report.triangles for report in reports) / triangles,
+        )
+
+
+def acmr(indices: np.ndarray, cache_size: int = DEFAULT_CACHE_SIZE) -> float:
+    """
+    Compute the average cache miss ratio of an index buffer, simulating
+    a FIFO post-transform cache with `cache_size` entries.
+    """
+    indices = np.asarray(indices).ravel()
+    n_triangles = len(indices) // 3
+    if n_triangles == 0:
+        return 0.0
+
+    # A vertex is in a FIFO cache if fewer than `cache_size` misses
+    # have happened since it was last loaded
+    stamps = np.full(int(indices.max()) + 1, -cache_size - 1, dtype=np.int64).tolist()
+    misses = 0
+    for index in indices.tolist():
+        if misses - stamps[index] > cache_size:
+            stamps[index] = misses
+            misses += 1
+    return misses / n_triangles
+
+
+def optimize_vertex_cache(indices: np.ndarray,
+                          vertex_count: Optional[int] = None,
+                          cache_size: int = DEFAULT_CACHE_SIZE) -> np.ndarray:
+    """
+    Reorder the triangles of an index buffer for post-transform cache locality
+    using the Tipsify algorithm of Sander, Nehab and Barczak (2007).
+    The returned index buffer references the same vertices as the input, and has the same shape.
+    """
+    indices = np.asarray(indices)
+    triangles = indices.reshape(-1, 3)
+    n_triangles = len(triangles)
+    if n_triangles == 0:
+        return indices.copy()
+
+    if vertex_count is None:
+        vertex_count = int(triangles.max()) + 1
+
+    # Vertex -> triangle adjacency, in CSR form
+    flat = triangles.ravel()
+    order = np.argsort(flat, kind="stable")
+    adjacency = (order // 3).tolist()
+    live = np.bincount(flat, minlength=vertex_count)
+    offsets = np.concatenate(([0], np.cumsum(live))).tolist()
+    live = live.tolist()
+    tris = triangles.tolist()
+
+    emitted = [False] * n_triangles
+    stamps = [0] * vertex_count
+    time = cache_size + 1
+    dead_end: List[int] = []
+    output: List[int] = []
+    cursor = 0
+    fanning = 0
+
+    while fanning >= 0:
+        candidates = []
+        for t in adjacency[offsets[fanning]:offsets[fanning + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            for v in tris[t]:
+                output.append(v)
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if time - stamps[v] > cache_size:
+                    stamps[v] = time
+                    time += 1
+
+        # Pick the candidate that will still be in the cache after its fan is emitted
+        # and has been there the longest
+        best = -1
+        best_priority = -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = 0
+                if time - stamps[v] + 2 * live[v] <= cache_size:
+                    priority = time - stamps[v]
+                if priority > best_priority:
+                    best = v
+                    best_priority = priority
+
+        if best == -1:
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    best = v
+                    break
+
+        if best == -1:
+            while cursor < vertex_count:
+                if live[cursor] > 0:
+                    best = cursor
+                    break
+                cursor += 1
+
+        fanning = best
+
+    return np.array(output, dtype=indices.dtype).reshape(indices.shape)
+
+
+def optimize_vertex_fetch(indices: np.ndarray,
+                          vertex_count: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Renumber vertices in the order that they are first referenced by an index buffer.
+
+    Returns the new index buffer, along with the permutation `remap` such that
+    `new_vertices = vertices[remap]`. Unreferenced vertices are moved to the end.
+    """
+    indices = np.asarray(indices)
+    flat = indices.ravel()
+    if vertex_count is None:
+        vertex_count = int(flat.max()) + 1 if len(flat) else 0
+
+    _, first_use = np.unique(flat, return_index=True)
+    referenced = flat[np.sort(first_use)]
+    unreferenced = np.setdiff1d(np.arange(vertex_count), referenced, assume_unique=True)
+    remap = np.concatenate((referenced, unreferenced)).astype(np.int64)
+
+    inverse = np.empty(vertex_count, dtype=np.int64)
+    inverse[remap] = np.arange(vertex_count)
+    new_indices = inverse[flat].astype(indices.dtype).reshape(indices.shape)
+    return new_indices, remap
+
+
+def _tile_size(triangles: np.ndarray, vertex_count: int) -> int:
+    """
+    Many of our index buffers (e.g. for scatter glyphs and voxels) consist of a single
+    template that is repeated with a fixed vertex offset. If that's the case, return
+    the number of triangles in the template, so that we only need to optimize it once.
+    Otherwise, return the total number of triangles.
+    """
+    n_triangles = len(triangles)
+    n_tiles = np.gcd(n_triangles, vertex_count)
+    divisors = [d for d in range(n_tiles, 1, -1) if n_tiles % d == 0]
+    for count in divisors:
+        tile_triangles = n_triangles // count
+        tile_vertices = vertex_count // count
+
+        # Cheap check on the first two tiles before we look at everything
+        first, second = triangles[:2 * tile_triangles].reshape(2, -1).astype(np.int64)
+        if not np.array_equal(first + tile_vertices, second):
+            continue
+
+        tiles = triangles.reshape(count, tile_triangles * 3).astype(np.int64)
+        tiles -= (np.arange(count, dtype=np.int64) * tile_vertices)[:, None]
+        if np.all(tiles == tiles[0]) and tiles[0].min() >= 0 and tiles[0].max() < tile_vertices:
+            return tile_triangles
+    return n_triangles
+
+
+def _optimize_indices(indices: np.ndarray,
+                      vertex_count: int,
+                      cache_size: int) -> Tuple[np.ndarray, np.ndarray, ACMRReport]:
+    triangles = np.asarray(indices).reshape(-1, 3)
+    n_triangles = len(triangles)
+    tile_triangles = _tile_size(triangles, vertex_count)
+    n_tiles = n_triangles // tile_triangles
+    tile_vertices = vertex_count // n_tiles
+
+    template = triangles[:tile_triangles]
+    optimized = optimize_vertex_cache(template, vertex_count=tile_vertices, cache_size=cache_size)
+    optimized, template_remap = optimize_vertex_fetch(optimized, vertex_count=tile_vertices)
+
+    # For repeated templates, the cache behavior of each tile is (essentially) identical,
+    # so we report the ACMR of a single tile
+    report = ACMRReport(
+        triangles=n_triangles,
+        acmr_before=acmr(template, cache_size=cache_size),
+        acmr_after=acmr(optimized, cache_size=cache_size),
+    )
+
+    tile_offsets = np.arange(n_tiles, dtype=np.int64) * tile_vertices
+    new_indices = (optimized.astype(np.int64).reshape(1, -1) + tile_offsets[:, None]).astype(triangles.dtype)
+    remap = (template_remap.reshape(1, -1) + tile_offsets[:, None]).ravel()
+    return new_indices.ravel(), remap, report
+
+
+def _append_array(barr: bytearray, array: np.ndarray) -> int:
+    # Keep every buffer view aligned to 4 bytes, as required for float data
+    barr.extend(bytes(-len(barr) % 4))
+    offset = len(barr)
+    barr.extend(np.ascontiguousarray(array).tobytes())
+    return offset
+
+
+def optimize_gl(builder: GLTFBuilder,
+                cache_size: int = DEFAULT_CACHE_SIZE) -> Tuple[GLTFBuilder, List[ACMRReport]]:
+    """
+    Create a new builder in which the triangles of each indexed mesh are reordered for
+    post-transform vertex cache locality, and the vertices are then reordered for fetch locality.
+    Meshes keep their indices, so that any references to them (e.g. for layer controls) remain valid.
+
+    Returns the new builder along with an ACMR report for each distinct index buffer.
+    """
+    gltf = builder.build()
+    model = gltf.model
+
+    buffers_data = []
+    for buffer in model.buffers or []:
+        resource = next(r for r in gltf.resources if r.uri == buffer.uri)
+        buffers_data.append(get_data(resource))
+
+    optimized_builder = GLTFBuilder(deterministic_names=builder.deterministic_names)
+    optimized_builder.materials = list(builder.materials)
+    optimized_builder.copy_textures(builder)
+    optimized_builder.extensions = dict(builder.extensions)
+    buffer_index = optimized_builder.buffer_count
+    barr = bytearray()
+
+    # Index buffers are frequently shared between meshes, so we cache by
+    # (index accessor, vertex count) and (attribute accessor, index accessor)
+    optimized_indices: Dict[Tuple[int, int], Tuple[int, np.ndarray]] = {}
+    new_accessors: Dict[Tuple[int, Optional[int]], int] = {}
+    reports: List[ACMRReport] = []
+
+    def add_accessor(accessor_index: int, data: np.ndarray, target: BufferTarget, exact_bounds: bool) -> int:
+        accessor = model.accessors[accessor_index]
+        offset = _append_array(barr, data)
+        optimized_builder.add_buffer_view(
+            buffer=buffer_index,
+            byte_length=data.nbytes,
+            byte_offset=offset,
+            target=target,
+        )
+        mins, maxes = accessor.min, accessor.max
+        if exact_bounds:
+            mins, maxes = [int(data.min())], [int(data.max())]
+        optimized_builder.add_accessor(
+            buffer_view=optimized_builder.buffer_view_count-1,
+            component_type=accessor.componentType,
+            count=accessor.count,
+            type=AccessorType(accessor.type),
+            mins=mins,
+            maxes=maxes,
+            normalized=accessor.normalized,
+        )
+        return optimized_builder.accessor_count - 1
+
+    for mesh in model.meshes or []:
+        primitive: Primitive = mesh.primitives[0]
+        attributes = {name: getattr(primitive.attributes, name) for name in ATTRIBUTE_NAMES
+                      if getattr(primitive.attributes, name, None) is not None}
+        vertex_count = model.accessors[attributes["POSITION"]].count
+        optimize = primitive.mode in (None, PrimitiveMode.TRIANGLES, PrimitiveMode.TRIANGLES.value) and \
+            primitive.indices is not None
+
+        remap = None
+        indices_accessor = None
+        if optimize:
+            key = (primitive.indices, vertex_count)
+            if key not in optimized_indices:
+                indices = accessor_to_numpy(model, primitive.indices, buffers_data)
+                new_indices, remap, report = _optimize_indices(indices, vertex_count, cache_size)
+                reports.append(report)
+                new_index = add_accessor(primitive.indices, new_indices,
+                                         BufferTarget.ELEMENT_ARRAY_BUFFER, exact_bounds=True)
+                optimized_indices[key] = (new_index, remap)
+            indices_accessor, remap = optimized_indices[key]
+        elif primitive.indices is not None:
+            key = (primitive.indices, None)
+            if key not in new_accessors:
+                indices = accessor_to_numpy(model, primitive.indices, buffers_data)
+                new_accessors[key] = add_accessor(primitive.indices, indices,
+                                                  BufferTarget.ELEMENT_ARRAY_BUFFER, exact_bounds=False)
+            indices_accessor = new_accessors[key]
+
+        new_attributes = {}
+        for name, accessor_index in attributes.items():
+            key = (accessor_index, primitive.indices if optimize else None)
+            if key not in new_accessors:
+                values = accessor_to_numpy(model, accessor_index, buffers_data)
+                if remap is not None:
+                    values = values[remap]
+                new_accessors[key] = add_accessor(accessor_index, values,
+                                                  BufferTarget.ARRAY_BUFFER, exact_bounds=False)
+            new_attributes[name] = new_accessors[key]
+
+        optimized_builder.add_mesh(
+            layer_id=[],
+            position_accessor=new_attributes.pop("POSITION"),
+            indices_accessor=indices_accessor,
+            material=primitive.material,
+            mode=primitive.mode,
+            extensions=primitive.extensions,
+        )
+        for name, accessor_index in new_attributes.items():
+            setattr(optimized_builder.meshes[-1].primitives[0].attributes, name, accessor_index)
+
+    # Mesh indices are unchanged, so the layer mapping carries over directly
+    for layer_id, mesh_indices in builder.meshes_by_layer.items():
+        optimized_builder.meshes_by_layer[layer_id] = list(mesh_indices)
+    optimized_builder.lods = dict(builder.lods)
+    optimized_builder.preview_meshes = list(builder.preview_meshes)
+
+    uri = f"optimized_{unique_id()}.bin"
+    optimized_builder.add_buffer(byte_length=len(barr), uri=uri)
+    optimized_builder.add_file_resource(uri, data=barr)
+
+    return optimized_builder, reports
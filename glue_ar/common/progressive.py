@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+from glue.core.state_objects import State
+
+
+__all__ = [
+    "PREVIEW_LOG_POINT_BUDGET",
+    "preview_manifest",
+    "preview_state",
+    "preview_state_dictionary",
+]
+
+
+# The largest number of points (as a power of ten) in a preview of a scatter layer
+PREVIEW_LOG_POINT_BUDGET = 4
+
+# Previews use glyphs with a quarter of the resolution of the full export, and a quarter of the isosurfaces
+PREVIEW_FACTOR = 4
+
+GLB_MAGIC = b"glTF"
+GLB_HEADER_BYTES = 12
+GLB_CHUNK_HEADER_BYTES = 8
+DRACO_EXTENSION = "KHR_draco_mesh_compression"
+
+
+def preview_state(state: State) -> State:
+    """
+    A copy of a set of export options that gives a coarse preview of the layer: fewer points,
+    lower resolution glyphs, fewer isosurfaces, and no levels of detail.
+    Options that a class doesn't have are left alone, so this works for any layer's options.
+    """
+    preview = type(state)()
+    preview.update_from_dict(state.as_dict())
+    if preview.is_callback_property("resolution"):
+        preview.resolution = max(preview.resolution // PREVIEW_FACTOR, 3)
+    if preview.is_callback_property("log_point_budget"):
+        preview.log_point_budget = min(preview.log_point_budget, PREVIEW_LOG_POINT_BUDGET)
+    if preview.is_callback_property("isosurface_count"):
+        preview.isosurface_count = max(preview.isosurface_count // PREVIEW_FACTOR, 1)
+    if preview.is_callback_property("lod_levels"):
+        preview.lod_levels = 1
+    return preview
+
+
+def preview_state_dictionary(state_dictionary: Dict[str, Tuple[str, State]]) -> Dict[str, Tuple[str, State]]:
+    return {label: (method, preview_state(state)) for label, (method, state) in state_dictionary.items()}
+
+
+def _read_glb(filepath: str) -> Tuple[Dict[str, Any], int]:
+    with open(filepath, "rb") as f:
+        magic, _version, _length = struct.unpack("<4sII", f.read(GLB_HEADER_BYTES))
+        if magic != GLB_MAGIC:
+            raise ValueError(f"{filepath} isn't a GLB file")
+        json_length, _chunk_type = struct.unpack("<II", f.read(GLB_CHUNK_HEADER_BYTES))
+        model = json.loads(f.read(json_length))
+    bin_start = GLB_HEADER_BYTES + GLB_CHUNK_HEADER_BYTES + json_length + GLB_CHUNK_HEADER_BYTES
+    return model, bin_start
+
+
+def preview_manifest(filepath: str) -> Optional[Dict[str, Any]]:
+    """
+    Describe the preview of a progressive GLB, so that a page can show it before the rest of the file arrives.
+    The preview meshes are at the start of the binary chunk, so the returned `start` and `end` give the
+    (inclusive) range of bytes of the file that they need, and `gltf` is the glTF JSON for just the preview,
+    with a single buffer holding those bytes. Buffer view offsets are the same as in the full file.
+
+    Returns `None` if the file doesn't have a preview scene, or if the preview uses data outside the binary chunk.
+    """
+    model, bin_start = _read_glb(filepath)
+    scene = next((scene for scene in model.get("scenes", []) if scene.get("name") == "preview"), None)
+    if scene is None or not scene.get("nodes"):
+        return None
+
+    # Collect everything that the preview meshes refer to, renumbering as we go
+    keys = ("accessors", "bufferViews", "materials", "textures", "images", "samplers")
+    maps: Dict[str, Dict[int, int]] = {key: {} for key in keys}
+    copied: Dict[str, List[Dict[str, Any]]] = {key: [] for key in maps}
+
+    def use(key: str, index: int) -> int:
+        if index not in maps[key]:
+            item = dict(model[key][index])
+            maps[key][index] = len(copied[key])
+            copied[key].append(item)
+            if key == "accessors" and "bufferView" in item:
+                item["bufferView"] = use("bufferViews", item["bufferView"])
+            elif key == "images" and "bufferView" in item:
+                item["bufferView"] = use("bufferViews", item["bufferView"])
+            elif key == "textures":
+                if "source" in item:
+                    item["source"] = use("images", item["source"])
+                if "sampler" in item:
+                    item["sampler"] = use("samplers", item["sampler"])
+            elif key == "materials":
+                pbr = item.get("pbrMetallicRoughness", {})
+                if "baseColorTexture" in pbr:
+                    texture = dict(pbr["baseColorTexture"], index=use("textures", pbr["baseColorTexture"]["index"]))
+                    item["pbrMetallicRoughness"] = dict(pbr, baseColorTexture=texture)
+        return maps[key][index]
+
+    meshes = []
+    for node_index in scene["nodes"]:
+        mesh = model["meshes"][model["nodes"][node_index]["mesh"]]
+        primitives = []
+        for primitive in mesh["primitives"]:
+            primitive = dict(primitive)
+            primitive["attributes"] = {name: use("accessors", index)
+                                       for name, index in primitive["attributes"].items()}
+            if "indices" in primitive:
+                primitive["indices"] = use("accessors", primitive["indices"])
+            if "material" in primitive:
+                primitive["material"] = use("materials", primitive["material"])
+            draco = primitive.get("extensions", {}).get(DRACO_EXTENSION, None)
+            if draco is not None:
+                draco = dict(draco, bufferView=use("bufferViews", draco["bufferView"]))
+                primitive["extensions"] = {**primitive["extensions"], DRACO_EXTENSION: draco}
+            primitives.append(primitive)
+        meshes.append(dict(mesh, primitives=primitives))
+
+    if any(view.get("buffer", 0) != 0 for view in copied["bufferViews"]):
+        return None
+    byte_length = max((view.get("byteOffset", 0) + view["byteLength"] for view in copied["bufferViews"]),
+                      default=0)
+    # Chunks are padded to four bytes
+    byte_length += -byte_length % 4
+
+    gltf = {key: value for key, value in model.items()
+            if key in ("asset", "extensionsUsed", "extensionsRequired")}
+    gltf.update(
+        scene=0,
+        scenes=[{"nodes": list(range(len(meshes)))}],
+        nodes=[{"mesh": index} for index in range(len(meshes))],
+        meshes=meshes,
+        buffers=[{"byteLength": byte_length}],
+        **{key: items for key, items in copied.items() if items},
+    )
+    return {"gltf": gltf, "start": bin_start, "end": bin_start + byte_length - 1}
@@ -1,14 +1,20 @@
 from functools import partial
-from numpy import array, clip, isfinite, isnan, ndarray, ones, sqrt
+from numpy import arange, argsort, array, asarray, bincount, cbrt, clip, cumsum, flatnonzero, float32, floor, full, \
+                  int64, isfinite, isnan, lexsort, minimum, ndarray, ones, repeat, sqrt, uint32, uint64, unique, zeros
+from numpy.random import default_rng
 from typing import Callable, Dict, List, Literal, Optional, Tuple
 
 from glue.utils import ensure_numerical
 from glue.viewers.common3d.viewer_state import ViewerState3D
 from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
 
-from glue_ar.common.shapes import rectangular_prism_points, rectangular_prism_triangulation, \
-                                  sphere_points, sphere_triangles
-from glue_ar.utils import Bounds, NoneType, get_stretches, mask_for_bounds
+from glue_ar.columns import bounds_mask, layer_values
+from glue_ar.common.shapes import MAX_ICOSPHERE_SUBDIVISIONS, icosphere_points, icosphere_points_count, \
+                                  icosphere_triangles, octahedron_points, octahedron_triangles, \
+                                  rectangular_prism_points, rectangular_prism_triangulation, sphere_points, \
+                                  sphere_points_count, sphere_triangles, star_points, star_triangles
+from glue_ar.profiling import profiled
+from glue_ar.utils import Bounds, NoneType, get_stretches, xyz_for_layer
 
 try:
     from glue_jupyter.ipyvolume.scatter import Scatter3DLayerState as IpyvolumeScatterLayerState
@@ -26,29 +32,28 @@ VECTOR_OFFSETS = {
 }
 
 
+@profiled("mask")
 def scatter_layer_mask(
         viewer_state: ViewerState3D,
         layer_state: ScatterLayerState3D,
         bounds: Bounds,
         clip_to_bounds: bool = True) -> ndarray:
 
+    # The size and color values need to be finite for the points that we export
+    finite = []
+    if layer_state.size_mode != "Fixed":
+        finite.append(ensure_numerical(layer_values(layer_state, layer_state.size_att)))
+    if layer_state.color_mode != "Fixed":
+        finite.append(ensure_numerical(layer_values(layer_state, layer_state.cmap_att)))
+
     if clip_to_bounds:
-        mask = mask_for_bounds(viewer_state, layer_state, bounds)
+        atts = (viewer_state.x_att, viewer_state.y_att, viewer_state.z_att)
+        columns = [layer_values(layer_state, att) for att in atts]
+        return bounds_mask(columns, [(min(b), max(b)) for b in bounds], finite=finite)
+    elif finite:
+        return bounds_mask([], [], finite=finite)
     else:
-        mask = None
-
-    fixed_size = layer_state.size_mode == "Fixed"
-    fixed_color = layer_state.color_mode == "Fixed"
-    if not fixed_size:
-        size_data = ensure_numerical(layer_state.layer[layer_state.size_att])
-        size_mask = isfinite(size_data)
-        mask = size_mask if mask is None else (mask & size_mask)
-    if not fixed_color:
-        color_data = ensure_numerical(layer_state.layer[layer_state.cmap_att])
-        color_mask = isfinite(color_data)
-        mask = color_mask if mask is None else (mask & color_mask)
-
-    return mask
+        return None
 
 
 def radius_for_scatter_layer(layer_state: ScatterLayerState3D) -> float:
@@ -76,7 +81,7 @@ def sizes_for_scatter_layer(layer_state: ScatterLayerState3D,
         return None
     else:
         # The specific size calculation is taken from the scatter layer artist
-        size_data = ensure_numerical(layer_state.layer[layer_state.size_att][mask].ravel())
+        size_data = ensure_numerical(layer_values(layer_state, layer_state.size_att, mask).ravel())
         size_data = clip(size_data, layer_state.size_vmin, layer_state.size_vmax)
         if layer_state.size_vmax == layer_state.size_vmin:
             sizes = sqrt(ones(size_data.shape) * 10)
@@ -94,7 +99,7 @@ def clip_vector_data(viewer_state: ViewerState3D,
                      bounds: Bounds,
                      mask: Optional[ndarray] = None) -> ndarray:
     atts = [layer_state.vx_att, layer_state.vy_att, layer_state.vz_att]
-    vector_data = [ensure_numerical(layer_state.layer[att].ravel()[mask]) for att in atts]
+    vector_data = [ensure_numerical(layer_values(layer_state, att, mask).ravel()) for att in atts]
 
     stretches = get_stretches(viewer_state)
     if viewer_state.native_aspect:
@@ -114,7 +119,7 @@ def clip_error_data(viewer_state: ViewerState3D,
                     axis: Literal["x", "y", "z"],
                     mask: Optional[ndarray] = None) -> ndarray:
     err_att = getattr(layer_state, f"{axis}err_att")
-    error_data = ensure_numerical(layer_state.layer[err_att].ravel()[mask]).astype(float)
+    error_data = ensure_numerical(layer_values(layer_state, err_att, mask).ravel()).astype(float)
     error_data[~isfinite(error_data)] = 0.0
 
     stretches = get_stretches(viewer_state)
@@ -131,6 +136,54 @@ def clip_error_data(viewer_state: ViewerState3D,
     return error_data
 
 
+# Masks and shifts that spread out the low 21 bits of an integer, leaving two zero bits between each pair
+_MORTON_STEPS = (
+    (32, 0x1f00000000ffff),
+    (16, 0x1f0000ff0000ff),
+    (8, 0x100f00f00f00f00f),
+    (4, 0x10c30c30c30c30c3),
+    (2, 0x1249249249249249),
+)
+
+
+def _spread_bits(values: ndarray) -> ndarray:
+    values = values & uint64(0x1fffff)
+    for shift, mask in _MORTON_STEPS:
+        values = (values | (values << uint64(shift))) & uint64(mask)
+    return values
+
+
+def morton_order(points: ndarray, bits: int = 21) -> ndarray:
+    """
+    Get the order that sorts an (N, 3) array of points along a Morton (Z-order) curve.
+    Consecutive runs of points in this order fill compact, octree-like cells of space,
+    so chunking sorted points gives meshes with tight bounding boxes.
+    """
+    mins = points.min(axis=0)
+    extents = points.max(axis=0) - mins
+    extents[extents == 0] = 1
+    cells = ((points - mins) * (((1 << bits) - 1) / extents)).astype(uint64)
+    codes = zeros(len(points), dtype=uint64)
+    for axis in range(3):
+        codes |= _spread_bits(cells[:, axis]) << uint64(axis)
+    return argsort(codes, kind="stable")
+
+
+def lod_resolutions(resolution: int, levels: int, min_resolution: int = 3) -> List[int]:
+    """
+    Get the sphere resolutions for a chain of levels of detail, starting with the given full resolution.
+    Each level halves the resolution of the first, down to `min_resolution`; levels that wouldn't
+    be any coarser than the previous one are left out, so there may be fewer than `levels` of them.
+    """
+    resolutions = [resolution]
+    for level in range(1, levels):
+        lower = max(resolution // 2 ** level, min_resolution)
+        if lower >= resolutions[-1]:
+            break
+        resolutions.append(lower)
+    return resolutions
+
+
 def sphere_points_getter(theta_resolution: int,
                          phi_resolution: int) -> PointsGetter:
 
@@ -154,3 +207,224 @@ IPYVOLUME_POINTS_GETTERS: Dict[str, PointsGetter] = {
     "diamond": sphere_points_getter(theta_resolution=3, phi_resolution=3),
     "circle_2d": sphere_points_getter(theta_resolution=13, phi_resolution=13),
 }
+
+# Low-poly alternatives to spheres, for dense scatter plots where the shape of each point barely matters.
+# Keyed by the glyph names used in the export options
+GLYPH_TRIANGLE_GETTERS: Dict[str, Callable] = {
+    "Octahedron": octahedron_triangles,
+    "Cross": partial(star_triangles, planes=2),
+    "Star": partial(star_triangles, planes=3),
+}
+
+GLYPH_POINTS_GETTERS: Dict[str, PointsGetter] = {
+    "Octahedron": octahedron_points,
+    "Cross": partial(star_points, planes=2),
+    "Star": partial(star_points, planes=3),
+}
+
+
+def icosphere_subdivisions(resolution: int) -> int:
+    """
+    The number of icosphere subdivisions that looks about as smooth as a UV sphere of the given resolution.
+    UV spheres crowd their vertices together near the poles, so an evenly spaced icosphere needs
+    only about half as many vertices.
+    """
+    target = sphere_points_count(resolution, resolution) / 2
+    return min(range(MAX_ICOSPHERE_SUBDIVISIONS + 1),
+               key=lambda subdivisions: abs(icosphere_points_count(subdivisions) - target))
+
+
+def glyph_geometry(glyph: str, resolution: int) -> Tuple[PointsGetter, List[Tuple[int, int, int]]]:
+    """
+    Get the points getter and triangles for a scatter glyph. Only spheres and icospheres depend on the resolution.
+    """
+    if glyph in GLYPH_POINTS_GETTERS:
+        return GLYPH_POINTS_GETTERS[glyph], GLYPH_TRIANGLE_GETTERS[glyph]()
+    if glyph == "Icosphere":
+        subdivisions = icosphere_subdivisions(resolution)
+        return partial(icosphere_points, subdivisions=subdivisions), icosphere_triangles(subdivisions)
+    return sphere_points_getter(theta_resolution=resolution, phi_resolution=resolution), \
+        sphere_triangles(theta_resolution=resolution, phi_resolution=resolution)
+
+
+def glyph_vertices(points_getter: PointsGetter, centers: ndarray, sizes: ndarray) -> ndarray:
+    """
+    The vertices of the glyphs for a set of points, as an (N, V, 3) float32 array, where V is the number
+    of vertices of a glyph. The glyph is built once, at the origin with unit size, and then scaled
+    and translated for all of the points at once. This relies on every points getter giving
+    `center + size * template`, which holds for all of the glyphs that we use.
+    """
+    template = asarray(points_getter((0, 0, 0), 1), dtype=float)
+    vertices = sizes.reshape(-1, 1, 1) * template[None, :, :]
+    vertices += asarray(centers, dtype=float)[:, None, :]
+    return vertices.astype(float32, copy=False)
+
+
+def glyph_triangle_indices(triangles: List[Tuple[int, int, int]], points_count: int, count: int) -> ndarray:
+    """
+    The triangles for `count` copies of a glyph with `points_count` vertices, whose vertices are stored
+    one glyph after another, as a (count * T, 3) array of vertex indices.
+    """
+    offsets = (arange(count, dtype=uint32) * points_count).reshape(-1, 1, 1)
+    return (asarray(triangles, dtype=uint32)[None, :, :] + offsets).reshape(-1, 3)
+
+
+def glyph_lod_resolutions(glyph: str, resolution: int, levels: int) -> List[int]:
+    """
+    Get the resolutions for a chain of levels of detail of a scatter glyph (see `lod_resolutions`).
+    Icosphere levels that would use the same number of subdivisions as the previous level are left out,
+    and glyphs that don't depend on the resolution only have the one level.
+    """
+    if glyph == "Sphere":
+        return lod_resolutions(resolution, levels)
+    if glyph == "Icosphere":
+        resolutions = []
+        for lod_resolution in lod_resolutions(resolution, levels):
+            if not resolutions or icosphere_subdivisions(lod_resolution) < icosphere_subdivisions(resolutions[-1]):
+                resolutions.append(lod_resolution)
+        return resolutions
+    return [resolution]
+
+
+# Cell indices along each axis need to fit into a third of an int64
+_MAX_GRID_CELLS = 2 ** 20
+
+
+def _grid_cells(points: ndarray, cells_per_side: int) -> ndarray:
+    """
+    The index of the cell of an even grid over the bounding box of the points that each point falls into.
+    """
+    mins = points.min(axis=0)
+    extents = points.max(axis=0) - mins
+    extents[extents == 0] = 1
+    cells = minimum(((points - mins) * (cells_per_side / extents)).astype(int64), cells_per_side - 1)
+    return (cells[:, 0] * cells_per_side + cells[:, 1]) * cells_per_side + cells[:, 2]
+
+
+def _voxel_grid_decimation(points: ndarray, budget: int) -> Tuple[ndarray, ndarray]:
+    # Find the finest grid with no more occupied cells than the budget. The number of occupied cells grows
+    # with the grid size, so we double the grid until it has too many, then bisect between the last two sizes.
+    # Points that fill their bounding box need about as many cells as the budget, so we start there
+    def occupied(cells_per_side: int) -> int:
+        return len(unique(_grid_cells(points, cells_per_side)))
+
+    low, high = 1, max(int(budget ** (1 / 3)), 2)
+    while occupied(high) <= budget:
+        if high == _MAX_GRID_CELLS:
+            low = high
+            break
+        low, high = high, min(2 * high, _MAX_GRID_CELLS)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if occupied(middle) <= budget:
+            low = middle
+        else:
+            high = middle
+
+    _, inverse, counts = unique(_grid_cells(points, low), return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+
+    # Each cell is represented by the point that's closest to the average position of its points
+    centroids = array([bincount(inverse, weights=points[:, axis]) for axis in range(3)]).T / counts[:, None]
+    distances = ((points - centroids[inverse]) ** 2).sum(axis=1)
+    order = lexsort((distances, inverse))
+    starts = cumsum(counts) - counts
+    return order[starts], counts
+
+
+def _stratified_decimation(points: ndarray, budget: int, seed: int) -> Tuple[ndarray, ndarray]:
+    # Split the bounding box into about as many cells as the budget, and give each cell
+    # its share of the budget (using largest remainders, so that the shares add up to the budget)
+    cells_per_side = max(int(round(budget ** (1 / 3))), 1)
+    cells = _grid_cells(points, cells_per_side)
+    order = lexsort((default_rng(seed).random(len(points)), cells))
+    _, starts, counts = unique(cells[order], return_index=True, return_counts=True)
+
+    shares = counts * (budget / len(points))
+    quotas = floor(shares).astype(int64)
+    remaining = budget - int(quotas.sum())
+    if remaining > 0:
+        quotas[argsort(quotas - shares, kind="stable")[:remaining]] += 1
+
+    # Points are in random order within each cell, so each cell keeps a random sample of its points
+    ranks = arange(len(points)) - repeat(starts, counts)
+    keep = ranks < repeat(quotas, counts)
+    kept_cells = quotas > 0
+    weights = repeat(counts[kept_cells] / quotas[kept_cells], quotas[kept_cells])
+
+    # Sparse cells can miss out on a share, so the points that are kept also stand in for those
+    return order[keep], weights * (len(points) / weights.sum())
+
+
+def decimate_points(points: ndarray,
+                    budget: int,
+                    method: str = "Voxel grid",
+                    seed: int = 0) -> Tuple[ndarray, ndarray]:
+    """
+    Choose at most `budget` of the given (N, 3) points, so that the ones that are left
+    are spread out in the same way as the originals. Returns the (sorted) indices of the points
+    that are kept, along with the number of the original points that each of them stands in for.
+
+    "Voxel grid" keeps the most central point of each cell of the finest even grid that has
+    no more occupied cells than the budget, which evens out the density of the points,
+    while "Stratified random" keeps a random sample from each cell of a coarse grid,
+    in proportion to the number of points in the cell, which preserves it.
+    Both are deterministic, so that repeated exports give the same points.
+    """
+    if len(points) <= budget:
+        return arange(len(points)), ones(len(points))
+
+    if method == "Stratified random":
+        indices, weights = _stratified_decimation(points, budget, seed)
+    else:
+        indices, weights = _voxel_grid_decimation(points, budget)
+
+    order = argsort(indices)
+    return indices[order], weights[order]
+
+
+@profiled("decimate")
+def decimate_scatter_layer(viewer_state: ViewerState3D,
+                           layer_state: ScatterLayerState3D,
+                           mask: Optional[ndarray],
+                           budget: Optional[int],
+                           method: str = "Voxel grid") -> Tuple[Optional[ndarray], Optional[ndarray]]:
+    """
+    Restrict the export mask of a scatter layer (as given by `scatter_layer_mask`) to at most `budget` points.
+    Returns the new mask, along with the number of original points that each remaining point stands in for,
+    which is `None` if there was no need to decimate the layer.
+    """
+    if budget is None:
+        return mask, None
+
+    points = xyz_for_layer(viewer_state, layer_state,
+                           preserve_aspect=viewer_state.native_aspect,
+                           mask=mask,
+                           scaled=True)
+    if len(points) <= budget:
+        return mask, None
+
+    indices, weights = decimate_points(points, budget, method)
+    if mask is None:
+        mask = ones(layer_values(layer_state, viewer_state.x_att).shape, dtype=bool)
+    decimated = zeros(mask.shape, dtype=bool)
+    decimated.flat[flatnonzero(mask)[indices]] = True
+    return decimated, weights
+
+
+def density_sizes(sizes: Optional[ndarray], radius: float, weights: ndarray) -> ndarray:
+    """
+    Scale the sizes of the points left after decimation (or the fixed radius, if `sizes` is `None`)
+    so that each glyph has the combined volume of the points that it stands in for.
+    """
+    if sizes is None:
+        sizes = full(len(weights), radius)
+    return sizes * cbrt(weights)
+
+
+def scatter_point_budget(options) -> Optional[int]:
+    """
+    The point budget set by scatter export options, or `None` if every point should be exported.
+    """
+    log_budget = int(options.log_point_budget)
+    return None if log_budget == 7 else 10 ** log_budget
@@ -1,18 +1,32 @@
+from echo import CallbackProperty, SelectionCallbackProperty
 from glue.core.state_objects import State
 
 from glue_ar.common.ranged_callback import RangedCallbackProperty
 
 
-__all__ = ["ARVispyScatterExportOptions"]
+__all__ = ["ARPointCloudExportOptions", "ARVispyScatterExportOptions"]
+
+
+SCATTER_GLYPHS = ["Sphere", "Icosphere", "Octahedron", "Cross", "Star"]
+
+# The ways of choosing which points to keep when a scatter layer has more points than its budget
+DECIMATION_METHODS = ["Voxel grid", "Stratified random"]
 
 
 class ARVispyScatterExportOptions(State):
+    glyph = SelectionCallbackProperty(
+            choices=SCATTER_GLYPHS,
+            docstring="The shape drawn for each point. Icospheres look as smooth as spheres with about "
+                      "half as many triangles. The octahedron, and the cross and star "
+                      "(made of two or three crossed squares), use far fewer triangles than spheres, "
+                      "which suits dense scatter plots where the shape of each point is hard to see.",
+    )
     resolution = RangedCallbackProperty(
             default=10,
             min_value=3,
             max_value=50,
             resolution=1,
-            docstring="Controls the resolution of the sphere meshes used for scatter points. "
+            docstring="Controls the resolution of the sphere (or icosphere) meshes used for scatter points. "
                       "Higher means better resolution, but a larger filesize.",
     )
     log_points_per_mesh = RangedCallbackProperty(
@@ -22,6 +36,59 @@ class ARVispyScatterExportOptions(State):
             docstring="Controls how many points are put into each mesh. "
                       "Higher means a larger filesize, but better performance."
     )
+    spatial_chunks = CallbackProperty(
+            True,
+            docstring="Whether to group nearby points into the same mesh, so that viewers can skip "
+                      "meshes that are out of view. Only used when points are split into multiple meshes."
+    )
+    lod_levels = RangedCallbackProperty(
+            default=1,
+            min_value=1,
+            max_value=3,
+            resolution=1,
+            docstring="The number of levels of detail for the sphere meshes. Each level halves the resolution "
+                      "of the spheres, and viewers that support it show coarser levels when points are far away.",
+    )
+    log_point_budget = RangedCallbackProperty(
+            default=7,
+            min_value=3,
+            max_value=7,
+            resolution=1,
+            docstring="The largest number of points to export. Layers with more points than this are "
+                      "thinned out before their meshes are built. The highest setting exports every point.",
+    )
+    decimation = SelectionCallbackProperty(
+            choices=DECIMATION_METHODS,
+            docstring="How to choose the points to keep when a layer has more points than the budget. "
+                      "A voxel grid keeps one point from each region of space, which evens out the density, "
+                      "while stratified random sampling keeps each region's share of the points.",
+    )
+    preserve_density = CallbackProperty(
+            True,
+            docstring="Whether to enlarge the points that are kept when a layer is thinned out, "
+                      "so that each stands in for the volume of the points that it replaces.",
+    )
+    colormap_texture = CallbackProperty(
+            False,
+            docstring="Whether to color colormapped points with a texture of the colormap, rather than "
+                      "a separate material for each color. This gives one material per layer, "
+                      "so the points can be drawn together, and keeps the full precision of the colormap.",
+    )
+
+
+class ARPointCloudExportOptions(State):
+    log_points_per_mesh = RangedCallbackProperty(
+            default=5,
+            min_value=3,
+            max_value=7,
+            docstring="Controls how many points are put into each mesh. "
+                      "Higher means fewer meshes, but viewers can skip fewer of them when they're out of view."
+    )
+    spatial_chunks = CallbackProperty(
+            True,
+            docstring="Whether to group nearby points into the same mesh, so that viewers can skip "
+                      "meshes that are out of view. Only used when points are split into multiple meshes."
+    )
 
 
 class ARIpyvolumeScatterExportOptions(State):
@@ -32,3 +99,8 @@ class ARIpyvolumeScatterExportOptions(State):
             docstring="Controls how many points are put into each mesh. "
                       "Higher means a larger filesize, but better performance."
     )
+    spatial_chunks = CallbackProperty(
+            True,
+            docstring="Whether to group nearby points into the same mesh, so that viewers can skip "
+                      "meshes that are out of view. Only used when points are split into multiple meshes."
+    )
@@ -1,27 +1,35 @@
 from collections import defaultdict
+from dataclasses import dataclass
+from functools import partial
 from gltflib import AccessorType, BufferTarget, ComponentType, PrimitiveMode
 from glue.utils.array import ensure_numerical
 from glue.viewers.scatter3d.viewer_state import ViewerState3D
 from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
-from numpy import ndarray
+from numpy import argsort, asarray, bincount, clip, column_stack, cumsum, float32, full, ndarray, repeat, \
+                  split, uint8, unique
 from numpy.linalg import norm
-import struct
 
-from typing import List, Literal, Optional, Tuple
+from typing import Dict, List, Literal, Optional, Tuple
 
+from glue_ar.columns import layer_values
 from glue_ar.common.export_options import ar_layer_export
-from glue_ar.common.scatter_export_options import ARIpyvolumeScatterExportOptions, ARVispyScatterExportOptions
+from glue_ar.common.scatter_export_options import ARIpyvolumeScatterExportOptions, ARPointCloudExportOptions, \
+                                                  ARVispyScatterExportOptions
 from glue_ar.common.shapes import cone_triangles, cone_points, cylinder_points, cylinder_triangles, \
-                                  normalize, rectangular_prism_triangulation, sphere_triangles
+                                  normalize, rectangular_prism_triangulation
 from glue_ar.gltf_utils import add_points_to_bytearray, add_triangles_to_bytearray, index_export_option, \
                                index_mins, index_maxes
-from glue_ar.utils import export_label_for_layer, iterable_has_nan, hex_to_components, \
-                          layer_color, offset_triangles, unique_id, xyz_bounds, xyz_for_layer, Bounds, NoneType
+from glue_ar.progress import progress_span, report_progress
+from glue_ar.utils import colormap_coordinates, colormap_png, export_label_for_layer, iterable_has_nan, \
+                          hex_to_components, layer_color, unique_id, xyz_bounds, xyz_for_layer, \
+                          Bounds, NoneType
 from glue_ar.common.gltf_builder import GLTFBuilder
 from glue_ar.common.scatter import PointsGetter, box_points_getter, IPYVOLUME_POINTS_GETTERS, \
                                    IPYVOLUME_TRIANGLE_GETTERS, VECTOR_OFFSETS, clip_error_data, clip_vector_data, \
-                                   radius_for_scatter_layer, scatter_layer_mask, sizes_for_scatter_layer, \
-                                   sphere_points_getter
+                                   decimate_scatter_layer, density_sizes, glyph_geometry, glyph_lod_resolutions, \
+                                   glyph_triangle_indices, glyph_vertices, \
+                                   radius_for_scatter_layer, scatter_layer_mask, scatter_point_budget, \
+                                   sizes_for_scatter_layer, morton_order
 
 
 try:
@@ -30,6 +38,50 @@ except ImportError:
     IpyvolumeScatterLayerState = NoneType
 
 
+def add_colormap_material(builder: GLTFBuilder, layer_state: ScatterLayerState3D) -> int:
+    """
+    Add a single material for a colormapped layer, whose base color comes from a texture of the layer's colormap.
+    Meshes that use it need a `TEXCOORD_0` attribute (see `add_texture_coordinates`).
+    Returns the index of the material.
+    """
+    uri = f"colormap_{unique_id()}.png"
+    builder.add_file_resource(uri, data=bytearray(colormap_png(layer_state.cmap)), mime_type="image/png")
+    builder.add_image(uri)
+    builder.add_sampler()
+    builder.add_texture(source=builder.image_count-1, sampler=builder.sampler_count-1)
+    builder.add_material(color=[1, 1, 1], opacity=layer_state.alpha, base_color_texture=builder.texture_count-1)
+    return builder.material_count - 1
+
+
+def add_texture_coordinates(builder: GLTFBuilder,
+                            barr: bytearray,
+                            buffer: int,
+                            coordinates: ndarray) -> int:
+    """
+    Add the colormap texture coordinates of a set of vertices to the given buffer,
+    and return the index of the accessor for them.
+    The colormap texture is a single row, so the vertical coordinate is always in the middle.
+    """
+    uvs = column_stack((coordinates, full(len(coordinates), 0.5))).astype(float32)
+    barr.extend(bytes(-len(barr) % 4))
+    builder.add_buffer_view(
+        buffer=buffer,
+        byte_length=uvs.nbytes,
+        byte_offset=len(barr),
+        target=BufferTarget.ARRAY_BUFFER,
+    )
+    barr.extend(uvs.tobytes())
+    builder.add_accessor(
+        buffer_view=builder.buffer_view_count-1,
+        component_type=ComponentType.FLOAT,
+        count=len(uvs),
+        type=AccessorType.VEC2,
+        mins=None,
+        maxes=None,
+    )
+    return builder.accessor_count - 1
+
+
 def add_vectors_gltf(builder: GLTFBuilder,
                      viewer_state: ViewerState3D,
                      layer_state: ScatterLayerState3D,
@@ -42,7 +94,8 @@ def add_vectors_gltf(builder: GLTFBuilder,
                      tip_resolution: int = 6,
                      shaft_resolution: int = 6,
                      materials: Optional[dict[int, int]] = None,
-                     mask: Optional[ndarray] = None):
+                     mask: Optional[ndarray] = None,
+                     texture_material: Optional[int] = None):
 
     vector_data = clip_vector_data(viewer_state, layer_state, bounds, mask)
     offset = VECTOR_OFFSETS[layer_state.vector_origin]
@@ -86,8 +139,10 @@ def add_vectors_gltf(builder: GLTFBuilder,
     fixed_color = layer_state.color_mode == "Fixed"
 
     if not fixed_color:
-        cmap_vals = ensure_numerical(layer_state.layer[layer_state.cmap_att][mask])
+        cmap_vals = ensure_numerical(layer_values(layer_state, layer_state.cmap_att, mask))
         crange = layer_state.cmap_vmax - layer_state.cmap_vmin
+        if texture_material is not None:
+            coordinates = colormap_coordinates(layer_state, cmap_vals)
 
     for i, (pt, v) in enumerate(zip(data, vector_data)):
         if iterable_has_nan(v):
@@ -95,6 +150,8 @@ def add_vectors_gltf(builder: GLTFBuilder,
 
         if fixed_color:
             material_index = builder.material_count - 1
+        elif texture_material is not None:
+            material_index = texture_material
         else:
             cval = cmap_vals[i]
             normalized = max(min((cval - layer_state.cmap_vmin) / crange, 1), 0)
@@ -145,12 +202,19 @@ def add_vectors_gltf(builder: GLTFBuilder,
             mins=point_mins,
             maxes=point_maxes,
         )
+        position_accessor = builder.accessor_count - 1
+
+        attributes = {}
+        if texture_material is not None and not fixed_color:
+            attributes["TEXCOORD_0"] = add_texture_coordinates(builder, barr, buffer,
+                                                               full(point_count, coordinates[i]))
 
         builder.add_mesh(
             layer_id=layer_id,
-            position_accessor=builder.accessor_count-1,
+            position_accessor=position_accessor,
             indices_accessor=triangles_accessor,
             material=material_index,
+            attributes=attributes,
         )
 
     uri = f"vectors_{unique_id()}.bin"
@@ -166,13 +230,17 @@ def add_error_bars_gltf(builder: GLTFBuilder,
                         data: ndarray,
                         bounds: Bounds,
                         materials: Optional[dict[int, int]] = None,
-                        mask: Optional[ndarray] = None):
+                        mask: Optional[ndarray] = None,
+                        texture_material: Optional[int] = None):
     err_values = clip_error_data(viewer_state, layer_state, bounds, axis, mask)
 
     fixed_color = layer_state.color_mode == "Fixed"
+    textured = texture_material is not None and not fixed_color
     if not fixed_color:
-        cmap_vals = ensure_numerical(layer_state.layer[layer_state.cmap_att][mask])
+        cmap_vals = ensure_numerical(layer_values(layer_state, layer_state.cmap_att, mask))
         crange = layer_state.cmap_vmax - layer_state.cmap_vmin
+        if textured:
+            coordinates = colormap_coordinates(layer_state, cmap_vals)
 
     # NB: This ordering is intentional to account for glTF coordinate system
     gltf_index = ['y', 'z', 'x'].index(axis)
@@ -180,10 +248,14 @@ def add_error_bars_gltf(builder: GLTFBuilder,
     barr = bytearray()
     errors_bin = f"errors_{unique_id()}.bin"
     segments_by_material = defaultdict(list)
-    material_index = builder.material_count - 1
+    coordinates_by_material = defaultdict(list)
+    material_index = texture_material if textured else builder.material_count - 1
     for i, (pt, err) in enumerate(zip(data, err_values)):
 
-        if not fixed_color:
+        if textured:
+            # Both ends of the segment get the color of the point
+            coordinates_by_material[material_index].extend((coordinates[i], coordinates[i]))
+        elif not fixed_color:
             cval = cmap_vals[i]
             normalized = max(min((cval - layer_state.cmap_vmin) / crange, 1), 0)
             cindex = int(normalized * 255)
@@ -215,53 +287,193 @@ def add_error_bars_gltf(builder: GLTFBuilder,
             mins=pt_mins,
             maxes=pt_maxes,
         )
+        position_accessor = builder.accessor_count - 1
+
+        attributes = {}
+        if textured:
+            attributes["TEXCOORD_0"] = add_texture_coordinates(builder, barr, builder.buffer_count,
+                                                               asarray(coordinates_by_material[material]))
+
         builder.add_mesh(
             layer_id=layer_id,
-            position_accessor=builder.accessor_count-1,
+            position_accessor=position_accessor,
             material=material,
             mode=PrimitiveMode.LINES,
+            attributes=attributes,
         )
 
     builder.add_buffer(byte_length=len(barr), uri=errors_bin)
     builder.add_file_resource(errors_bin, data=barr)
 
 
-def add_scatter_layer_gltf(builder: GLTFBuilder,
-                           viewer_state: ViewerState3D,
-                           layer_state: ScatterLayerState3D,
-                           points_getter: PointsGetter,
-                           triangles: List[Tuple[int, int, int]],
-                           bounds: Bounds,
-                           clip_to_bounds: bool = True,
-                           points_per_mesh: Optional[int] = None):
-    if layer_state is None:
-        return
+def _add_glyph_meshes(builder: GLTFBuilder,
+                      barr: bytearray,
+                      buffer: int,
+                      layer_id: str,
+                      points_getter: PointsGetter,
+                      triangles: List[Tuple[int, int, int]],
+                      centers: ndarray,
+                      sizes: ndarray,
+                      material: int,
+                      points_per_mesh: int,
+                      coordinates: Optional[ndarray] = None):
+    """
+    Add meshes of glyphs for a group of points that share a material, with `points_per_mesh` points to a mesh.
+    The glyphs are stored one after another, so every mesh uses (the start of) the same triangles.
+    `coordinates` are the colormap texture coordinates of the points, if they're textured.
+    """
+    n_points = len(centers)
+    pts_count = len(points_getter((0, 0, 0), 1))
+    triangles_per_point = len(triangles)
+
+    # If there are fewer points than our designated chunk size, we only want to make triangles for that many points.
+    # This is both more space-efficient and necessary to be glTF spec-compliant
+    mesh_triangles = glyph_triangle_indices(triangles, pts_count, min(points_per_mesh, n_points))
+    glyph_max_index = max(max(triangle) for triangle in triangles)
+    max_triangle_index = glyph_max_index + (len(mesh_triangles) // triangles_per_point - 1) * pts_count
+    index_format = index_export_option(max_triangle_index)
+    triangles_start = len(barr)
+    add_triangles_to_bytearray(barr, mesh_triangles, export_option=index_format)
+    triangles_len = len(barr) - triangles_start
+    builder.add_buffer_view(
+        buffer=buffer,
+        byte_length=triangles_len,
+        byte_offset=triangles_start,
+        target=BufferTarget.ELEMENT_ARRAY_BUFFER,
+    )
+    builder.add_accessor(
+        buffer_view=builder.buffer_view_count-1,
+        component_type=index_format.component_type,
+        count=mesh_triangles.size,
+        type=AccessorType.SCALAR,
+        mins=[0],
+        maxes=[max_triangle_index],
+    )
+    triangles_accessor = builder.accessor_count - 1
 
+    # We always store point values as FLOAT, which has a size of 4 bytes,
+    # so the points need to start at a multiple of 4 bytes
+    barr.extend(bytes(-len(barr) % 4))
+
+    for start in range(0, n_points, points_per_mesh):
+        report_progress(start / n_points)
+        stop = min(start + points_per_mesh, n_points)
+        mesh_points = glyph_vertices(points_getter, centers[start:stop], sizes[start:stop]).reshape(-1, 3)
+        barr_offset = len(barr)
+        add_points_to_bytearray(barr, mesh_points)
+        builder.add_buffer_view(
+            buffer=buffer,
+            byte_length=len(barr)-barr_offset,
+            byte_offset=barr_offset,
+            target=BufferTarget.ARRAY_BUFFER,
+        )
+        builder.add_accessor(
+            buffer_view=builder.buffer_view_count-1,
+            component_type=ComponentType.FLOAT,
+            count=len(mesh_points),
+            type=AccessorType.VEC3,
+            mins=mesh_points.min(axis=0).tolist(),
+            maxes=mesh_points.max(axis=0).tolist(),
+        )
+        points_accessor = builder.accessor_count - 1
+
+        # The final chunk can have fewer points than the others (if points_per_mesh isn't a divisor of the count),
+        # in which case it needs its own accessor for the start of the triangles.
+        # The first chunk always uses the buffer view that we made above
+        count = stop - start
+        chunk_triangles_accessor = triangles_accessor
+        if start != 0 and count < points_per_mesh:
+            builder.add_buffer_view(
+                buffer=buffer,
+                byte_length=count * triangles_per_point * 3 * index_format.byte_size,
+                byte_offset=triangles_start,
+                target=BufferTarget.ELEMENT_ARRAY_BUFFER,
+            )
+            builder.add_accessor(
+                buffer_view=builder.buffer_view_count-1,
+                component_type=index_format.component_type,
+                count=triangles_per_point*3*count,
+                type=AccessorType.SCALAR,
+                mins=[0],
+                maxes=[glyph_max_index + (count - 1) * pts_count],
+            )
+            chunk_triangles_accessor = builder.accessor_count - 1
+
+        attributes = {}
+        if coordinates is not None:
+            # Every vertex of a point's glyph has the same color
+            chunk_coordinates = repeat(coordinates[start:stop], pts_count)
+            attributes["TEXCOORD_0"] = add_texture_coordinates(builder, barr, buffer, chunk_coordinates)
+
+        builder.add_mesh(
+            layer_id=layer_id,
+            position_accessor=points_accessor,
+            indices_accessor=chunk_triangles_accessor,
+            material=material,
+            attributes=attributes,
+        )
+
+
+@dataclass
+class _ScatterPoints:
+    """
+    The points of a scatter layer that get a glyph, after masking, decimation and spatial sorting.
+    Each of the `groups` is a colormap index (or None, for a layer with a single material) with the indices
+    of its points in `centers`, in the order that the colors first appear. `positions` are the unsorted centers,
+    which line up with `mask` for the error bars and vectors.
+    """
+    layer_id: str
+    bounds: Bounds
+    mask: Optional[ndarray]
+    positions: ndarray
+    centers: ndarray
+    sizes: ndarray
+    radius: float
+    groups: List[Tuple[Optional[int], ndarray]]
+    coordinates: Optional[ndarray]
+    textured: bool
+    points_per_mesh: int
+
+
+def _scatter_points(viewer_state: ViewerState3D,
+                    layer_state: ScatterLayerState3D,
+                    clip_to_bounds: bool = True,
+                    points_per_mesh: Optional[int] = None,
+                    spatial_chunks: bool = False,
+                    point_budget: Optional[int] = None,
+                    decimation: str = "Voxel grid",
+                    preserve_density: bool = True,
+                    colormap_texture: bool = False) -> Optional[_ScatterPoints]:
+    """
+    Work out which points of a scatter layer get a glyph, and where, how big and what color they are.
+    This doesn't depend on the glyph, so it can be shared by several exports of a layer (like its levels of detail).
+    Returns None if there are no points to export.
+    """
     bounds = xyz_bounds(viewer_state, with_resolution=False)
 
     fixed_size = layer_state.size_mode == "Fixed"
     fixed_color = layer_state.color_mode == "Fixed"
+    # With a colormap texture, colormapped points get one material and can be chunked like fixed-color points
+    textured = colormap_texture and not fixed_color
     radius = radius_for_scatter_layer(layer_state)
     mask = scatter_layer_mask(viewer_state, layer_state, bounds, clip_to_bounds)
+    mask, weights = decimate_scatter_layer(viewer_state, layer_state, mask, point_budget, decimation)
 
     data = xyz_for_layer(viewer_state, layer_state,
                          preserve_aspect=viewer_state.native_aspect,
                          mask=mask,
-                         scaled=True)
+                         scaled=True,
+                         axis_order=(1, 2, 0))
     if len(data) == 0:
-        return
+        return None
 
-    data = data[:, [1, 2, 0]]
-
-    buffer = builder.buffer_count
-    cmap = layer_state.cmap
-    cmap_vals = ensure_numerical(layer_state.layer[layer_state.cmap_att][mask])
-    crange = layer_state.cmap_vmax - layer_state.cmap_vmin
-    uri = f"layer_{unique_id()}.bin"
+    cmap_vals = ensure_numerical(layer_values(layer_state, layer_state.cmap_att, mask))
 
     sizes = sizes_for_scatter_layer(layer_state, bounds, mask)
+    if weights is not None and preserve_density:
+        sizes = density_sizes(sizes, radius, weights)
+        fixed_size = False
 
-    barr = bytearray()
     n_points = len(data)
 
     # If points per mesh is not specified,
@@ -270,283 +482,189 @@ def add_scatter_layer_gltf(builder: GLTFBuilder,
     if points_per_mesh is None:
         points_per_mesh = n_points
 
-    layer_id = export_label_for_layer(layer_state)
-
-    if fixed_color:
-        points = []
-        tris = []
-
-        color = layer_color(layer_state)
-        color_components = hex_to_components(color)
-        builder.add_material(color=color_components, opacity=layer_state.alpha)
-
-        for i, point in enumerate(data):
-            size = radius if fixed_size else sizes[i]
-            pts = points_getter(point, size)
-            points.append(pts)
-
-        # If n_points is less than our designated chunk size, we only want
-        # to make triangles for that many points (and put everything in one mesh).
-        # This is both more space-efficient and necessary to be glTF spec-compliant
-        triangle_offset = 0
-        pts_count = len(points_getter((0, 0, 0), 1))
-        for _ in range(min(points_per_mesh, n_points)):
-            pt_triangles = offset_triangles(triangles, triangle_offset)
-            triangle_offset += pts_count
-            tris.append(pt_triangles)
-
-        mesh_triangles = [tri for sphere in tris for tri in sphere]
-        max_triangle_index = max(idx for tri in mesh_triangles for idx in tri)
-        index_format = index_export_option(max_triangle_index)
-        triangles_start = len(barr)
-        add_triangles_to_bytearray(barr, mesh_triangles, export_option=index_format)
-        triangles_end = len(barr)
-        triangles_len = triangles_end - triangles_start
-        builder.add_buffer_view(
-            buffer=buffer,
-            byte_length=triangles_len,
-            byte_offset=triangles_start,
-            target=BufferTarget.ELEMENT_ARRAY_BUFFER,
-        )
-        builder.add_accessor(
-            buffer_view=builder.buffer_view_count-1,
-            component_type=index_format.component_type,
-            count=len(mesh_triangles)*3,
-            type=AccessorType.SCALAR,
-            mins=[0],
-            maxes=[max_triangle_index],
-        )
-
-        start = 0
-        triangles_accessor = builder.accessor_count - 1
-
-        # We always store point values as FLOAT, which has a size of 4 bytes.
-        # Since the total bytearray at this point may not be divisible by 4,
-        # we add a bit of padding.
-        # Note that this will be at most 3 bytes
-        float_size = 4
-        off = float_size - (len(barr) % float_size)
-        for _ in range(off):
-            barr.extend(struct.pack("B", 0))
-
-        while start < n_points:
-            mesh_points = [pt for pts in points[start:start+points_per_mesh] for pt in pts]
-            barr_offset = len(barr)
-            add_points_to_bytearray(barr, mesh_points)
-            point_mins = index_mins(mesh_points)
-            point_maxes = index_maxes(mesh_points)
+    # Sorting the points spatially means that each chunk covers a compact region,
+    # rather than the whole scene, which lets viewers cull the chunks that are out of view.
+    # Points are grouped by color after this, so the chunks for each color are compact too.
+    # Error bars and vectors line up with the unsorted positions, so we keep those around
+    positions = data
+    if spatial_chunks and points_per_mesh < n_points:
+        order = morton_order(data)
+        data = data[order]
+        if not fixed_size:
+            sizes = sizes[order]
+        if not fixed_color:
+            cmap_vals = cmap_vals.ravel()[order]
 
-            builder.add_buffer_view(
-                buffer=buffer,
-                byte_length=len(barr)-barr_offset,
-                byte_offset=barr_offset,
-                target=BufferTarget.ARRAY_BUFFER,
-            )
-            builder.add_accessor(
-                buffer_view=builder.buffer_view_count-1,
-                component_type=ComponentType.FLOAT,
-                count=len(mesh_points),
-                type=AccessorType.VEC3,
-                mins=point_mins,
-                maxes=point_maxes,
-            )
-            points_accessor = builder.accessor_count - 1
-
-            # This should only happen on the final iteration
-            # or not at all, if points_per_mesh is a divisor of count
-            # But in this case we do need a separate accessor as the
-            # byte length is different.
-            # Note that if we're on the first chunk (start == 0)
-            # there's no need to do this - we can use the buffer view that we just created
-            count = n_points - start
-            if start != 0 and count < points_per_mesh:
-                triangles_count = len(tris)
-                byte_length = count * triangles_len // triangles_count
-                mesh_triangles = [tri for sphere in tris[:count] for tri in sphere]
-                max_triangle_index = max(idx for tri in mesh_triangles for idx in tri)
-                builder.add_buffer_view(
-                    buffer=buffer,
-                    byte_length=byte_length,
-                    byte_offset=triangles_start,
-                    target=BufferTarget.ELEMENT_ARRAY_BUFFER,
-                )
-                builder.add_accessor(
-                    buffer_view=builder.buffer_view_count-1,
-                    component_type=index_format.component_type,
-                    count=len(triangles)*3*count,
-                    type=AccessorType.SCALAR,
-                    mins=[0],
-                    maxes=[max_triangle_index],
-                )
-                triangles_accessor = builder.accessor_count - 1
-
-            builder.add_mesh(
-                layer_id=layer_id,
-                position_accessor=points_accessor,
-                indices_accessor=triangles_accessor,
-                material=builder.material_count-1,
-            )
-            start += points_per_mesh
+    # Each glyph is the same template, scaled and translated, so the vertices for a whole mesh
+    # are built with NumPy at once rather than point by point (see `glyph_vertices`)
+    point_sizes = full(n_points, radius, dtype=float) if fixed_size else asarray(sizes, dtype=float).ravel()
 
+    coordinates = None
+    if fixed_color or textured:
+        groups = [(None, None)]
+        if textured:
+            coordinates = colormap_coordinates(layer_state, cmap_vals)
     else:
-        points_by_color = defaultdict(list)
-        color_materials = defaultdict(int)
-
-        for i, point in enumerate(data):
-            cval = cmap_vals[i]
-            normalized = max(min((cval - layer_state.cmap_vmin) / crange, 1), 0)
-            cindex = int(normalized * 255)
-            color = cmap(cindex)
-
-            material_index = color_materials.get(cindex, None)
-            if material_index is None:
-                builder.add_material(color, layer_state.alpha)
-                material_index = builder.material_count - 1
-                color_materials[cindex] = material_index
-
-            size = radius if fixed_size else sizes[i]
-            pts = points_getter(point, size)
-            points_by_color[cindex].append(pts)
-
-        for cindex, points in points_by_color.items():
-
-            # If the maximum number of points in any one color is less than our designated chunk size,
-            # we only want to make triangles for that many points (and put everything in one mesh).
-            # This is both more space-efficient and necessary to be glTF spec-compliant
-            triangle_offset = 0
-            tris = []
-            pts_count = len(points_getter((0, 0, 0), 1))
-            for _ in range(min(points_per_mesh, len(points))):
-                pt_triangles = offset_triangles(triangles, triangle_offset)
-                triangle_offset += pts_count
-                tris.append(pt_triangles)
-
-            triangles_count = len(tris)
-            mesh_points = [pt for pts in points for pt in pts]
-            mesh_triangles = [tri for sphere in tris for tri in sphere]
-            max_triangle_index = max(idx for tri in mesh_triangles for idx in tri)
-            index_format = index_export_option(max_triangle_index)
-            triangles_start = len(barr)
-            add_triangles_to_bytearray(barr, mesh_triangles, export_option=index_format)
-            triangles_end = len(barr)
-            triangles_len = triangles_end - triangles_start
+        crange = layer_state.cmap_vmax - layer_state.cmap_vmin
+        normalized = clip((asarray(cmap_vals, dtype=float).ravel() - layer_state.cmap_vmin) / crange, 0, 1)
+        cindices = (normalized * 255).astype(int)
+
+        # Materials are added in the order that their colors first appear, and each color's points
+        # keep their (possibly spatially sorted) order
+        colors, first_points = unique(cindices, return_index=True)
+        order = argsort(cindices, kind="stable")
+        color_points = split(order, cumsum(bincount(cindices)[colors])[:-1])
+        groups = [(int(colors[group]), color_points[group])
+                  for group in argsort(first_points, kind="stable")]
+
+    return _ScatterPoints(
+        layer_id=export_label_for_layer(layer_state),
+        bounds=bounds,
+        mask=mask,
+        positions=positions,
+        centers=data,
+        sizes=point_sizes,
+        radius=radius,
+        groups=groups,
+        coordinates=coordinates,
+        textured=textured,
+        points_per_mesh=points_per_mesh,
+    )
 
-            builder.add_buffer_view(
-                buffer=buffer,
-                byte_length=triangles_len,
-                byte_offset=triangles_start,
-                target=BufferTarget.ELEMENT_ARRAY_BUFFER,
-            )
-            builder.add_accessor(
-                buffer_view=builder.buffer_view_count-1,
-                component_type=index_format.component_type,
-                count=len(mesh_triangles)*3,
-                type=AccessorType.SCALAR,
-                mins=[0],
-                maxes=[max_triangle_index],
-            )
 
-            start = 0
-            triangles_accessor = builder.accessor_count - 1
-            n_points = len(points)
-            while start < n_points:
-                mesh_points = [pt for pts in points[start:start+points_per_mesh] for pt in pts]
-                barr_offset = len(barr)
-                add_points_to_bytearray(barr, mesh_points)
-                point_mins = index_mins(mesh_points)
-                point_maxes = index_maxes(mesh_points)
-
-                builder.add_buffer_view(
-                    buffer=buffer,
-                    byte_length=len(barr)-barr_offset,
-                    byte_offset=barr_offset,
-                    target=BufferTarget.ARRAY_BUFFER,
-                )
-                builder.add_accessor(
-                    buffer_view=builder.buffer_view_count-1,
-                    component_type=ComponentType.FLOAT,
-                    count=len(mesh_points),
-                    type=AccessorType.VEC3,
-                    mins=point_mins,
-                    maxes=point_maxes,
-                )
-                points_accessor = builder.accessor_count - 1
-
-                # This should only happen on the final iteration
-                # or not at all, if points_per_mesh is a divisor of count
-                # But in this case we do need a separate accessor as the
-                # byte length is different.
-                # Note that if we're on the first chunk (start == 0)
-                # there's no need to do this - we can use the buffer view that we just created
-                count = n_points - start
-                if start != 0 and count < points_per_mesh:
-                    byte_length = count * triangles_len // triangles_count
-                    mesh_triangles = [tri for sphere in tris[:count] for tri in sphere]
-                    max_triangle_index = max(idx for tri in mesh_triangles for idx in tri)
-                    builder.add_buffer_view(
-                        buffer=buffer,
-                        byte_length=byte_length,
-                        byte_offset=triangles_start,
-                        target=BufferTarget.ELEMENT_ARRAY_BUFFER,
-                    )
-                    builder.add_accessor(
-                        buffer_view=builder.buffer_view_count-1,
-                        component_type=index_format.component_type,
-                        count=len(triangles)*3*count,
-                        type=AccessorType.SCALAR,
-                        mins=[0],
-                        maxes=[max_triangle_index],
-                    )
-                    triangles_accessor = builder.accessor_count - 1
-
-                material = color_materials[cindex]
-                builder.add_mesh(
-                    layer_id=layer_id,
-                    position_accessor=points_accessor,
-                    indices_accessor=triangles_accessor,
-                    material=material,
-                )
-                start += points_per_mesh
+def _add_scatter_glyphs(builder: GLTFBuilder,
+                        layer_state: ScatterLayerState3D,
+                        points: _ScatterPoints,
+                        points_getter: PointsGetter,
+                        triangles: List[Tuple[int, int, int]],
+                        materials: Dict[Optional[int], int]) -> Dict[Optional[int], int]:
+    """
+    Add the glyph meshes for the given points of a scatter layer, using `points_getter` and `triangles`
+    as the glyph template. Any materials that are missing from `materials` are added and recorded in it.
+    Returns the materials that these meshes use, by colormap index.
+    """
+    barr = bytearray()
+    buffer = builder.buffer_count
+    uri = f"layer_{unique_id()}.bin"
+    glyph_meshes = partial(_add_glyph_meshes, builder, barr, buffer, points.layer_id, points_getter, triangles,
+                           points_per_mesh=points.points_per_mesh)
+
+    n_points = len(points.centers)
+    color_materials = defaultdict(int)
+    for cindex, group in points.groups:
+        if cindex not in materials:
+            if points.textured:
+                add_colormap_material(builder, layer_state)
+            elif cindex is None:
+                color = layer_color(layer_state)
+                color_components = hex_to_components(color)
+                builder.add_material(color=color_components, opacity=layer_state.alpha)
+            else:
+                builder.add_material(layer_state.cmap(cindex), layer_state.alpha)
+            materials[cindex] = builder.material_count - 1
+        color_materials[cindex] = materials[cindex]
+        if group is None:
+            glyph_meshes(points.centers, points.sizes, materials[cindex], coordinates=points.coordinates)
+        else:
+            with progress_span(len(group) / n_points):
+                glyph_meshes(points.centers[group], points.sizes[group], materials[cindex])
 
     builder.add_buffer(byte_length=len(barr), uri=uri)
     builder.add_file_resource(uri, data=barr)
 
-    materials = color_materials if not fixed_color else None
+    return color_materials
+
+
+def _add_scatter_decorations(builder: GLTFBuilder,
+                             viewer_state: ViewerState3D,
+                             layer_state: ScatterLayerState3D,
+                             points: _ScatterPoints,
+                             color_materials: Dict[Optional[int], int]):
+    """
+    Add the error bars and vectors of a scatter layer, using the materials of its glyphs.
+    """
+    single_material = None in color_materials
+    materials = None if single_material else color_materials
+    texture_material = color_materials[None] if points.textured else None
     for axis in ("x", "y", "z"):
         if getattr(layer_state, f"{axis}err_visible", False):
             add_error_bars_gltf(
                 builder=builder,
                 viewer_state=viewer_state,
                 layer_state=layer_state,
-                layer_id=layer_id,
+                layer_id=points.layer_id,
                 axis=axis,
-                data=data,
-                bounds=bounds,
+                data=points.positions,
+                bounds=points.bounds,
                 materials=materials,
-                mask=mask,
+                mask=points.mask,
+                texture_material=texture_material,
             )
 
     if layer_state.vector_visible:
-        shaft_radius = radius / 1.5
+        shaft_radius = points.radius / 1.5
         tip_radius = shaft_radius * 4
         tip_height = 2 * tip_radius
         add_vectors_gltf(
             builder=builder,
             viewer_state=viewer_state,
             layer_state=layer_state,
-            layer_id=layer_id,
-            data=data,
-            bounds=bounds,
+            layer_id=points.layer_id,
+            data=points.positions,
+            bounds=points.bounds,
             tip_height=tip_height,
             shaft_radius=shaft_radius,
             tip_radius=tip_radius,
             shaft_resolution=6,
             tip_resolution=6,
             materials=materials,
-            mask=mask,
+            mask=points.mask,
+            texture_material=texture_material,
         )
 
 
+def add_scatter_layer_gltf(builder: GLTFBuilder,
+                           viewer_state: ViewerState3D,
+                           layer_state: ScatterLayerState3D,
+                           points_getter: PointsGetter,
+                           triangles: List[Tuple[int, int, int]],
+                           bounds: Bounds,
+                           clip_to_bounds: bool = True,
+                           points_per_mesh: Optional[int] = None,
+                           spatial_chunks: bool = False,
+                           decorations: bool = True,
+                           point_budget: Optional[int] = None,
+                           decimation: str = "Voxel grid",
+                           preserve_density: bool = True,
+                           colormap_texture: bool = False,
+                           materials: Optional[Dict[Optional[int], int]] = None):
+    """
+    `materials` maps the colormap index of each color (or None, for a layer with a single material)
+    to a material that's already in the builder. Points use these rather than new materials, and any materials
+    that are added are recorded in it, so that several exports of a layer can share them.
+    """
+    if layer_state is None:
+        return
+
+    points = _scatter_points(viewer_state, layer_state,
+                             clip_to_bounds=clip_to_bounds,
+                             points_per_mesh=points_per_mesh,
+                             spatial_chunks=spatial_chunks,
+                             point_budget=point_budget,
+                             decimation=decimation,
+                             preserve_density=preserve_density,
+                             colormap_texture=colormap_texture)
+    if points is None:
+        return
+
+    if materials is None:
+        materials = {}
+    color_materials = _add_scatter_glyphs(builder, layer_state, points, points_getter, triangles, materials)
+
+    if decorations:
+        _add_scatter_decorations(builder, viewer_state, layer_state, points, color_materials)
+
+
 @ar_layer_export(ScatterLayerState3D, "Scatter", ARVispyScatterExportOptions, ("gltf", "glb"))
 def add_vispy_scatter_layer_gltf(builder: GLTFBuilder,
                                  viewer_state: ViewerState3D,
@@ -555,28 +673,167 @@ def add_vispy_scatter_layer_gltf(builder: GLTFBuilder,
                                  bounds: Bounds,
                                  clip_to_bounds: bool = True):
 
-    resolution = int(options.resolution)
-    theta_resolution = resolution
-    phi_resolution = resolution
-    triangles = sphere_triangles(theta_resolution=theta_resolution,
-                                 phi_resolution=phi_resolution)
-
-    points_getter = sphere_points_getter(theta_resolution=theta_resolution,
-                                         phi_resolution=phi_resolution)
     log_ppm = int(options.log_points_per_mesh)
     if log_ppm == 7:
         ppm = None
     else:
         ppm = 10 ** log_ppm
 
-    add_scatter_layer_gltf(builder=builder,
-                           viewer_state=viewer_state,
-                           layer_state=layer_state,
-                           points_getter=points_getter,
-                           triangles=triangles,
-                           bounds=bounds,
-                           clip_to_bounds=clip_to_bounds,
-                           points_per_mesh=ppm)
+    # The work for each level goes as the number of triangles per sphere
+    resolutions = glyph_lod_resolutions(options.glyph, int(options.resolution), int(options.lod_levels))
+    total_work = sum(resolution ** 2 for resolution in resolutions)
+
+    # The points are the same at every level, so they're only masked, decimated and sorted once,
+    # and each level just swaps in its own glyph template
+    points = _scatter_points(viewer_state, layer_state,
+                             clip_to_bounds=clip_to_bounds,
+                             points_per_mesh=ppm,
+                             spatial_chunks=options.spatial_chunks,
+                             point_budget=scatter_point_budget(options),
+                             decimation=options.decimation,
+                             preserve_density=options.preserve_density,
+                             colormap_texture=options.colormap_texture)
+    if points is None:
+        return
+
+    first_mesh = builder.mesh_count
+    # Every level uses the materials (and colormap texture) of the full resolution level
+    materials: Dict[Optional[int], int] = {}
+    lod_meshes = []
+    for level, resolution in enumerate(resolutions):
+        points_getter, triangles = glyph_geometry(options.glyph, resolution)
+        level_start = builder.mesh_count
+        with progress_span(resolution ** 2 / total_work):
+            color_materials = _add_scatter_glyphs(builder, layer_state, points, points_getter, triangles, materials)
+
+        if level == 0:
+            _add_scatter_decorations(builder, viewer_state, layer_state, points, color_materials)
+        else:
+            # The points are chunked in the same way at every level, so the meshes of each level
+            # line up with the sphere meshes of the full resolution level, which come before its decorations.
+            # Lower levels are only ever shown in place of those, so they don't belong to the layer
+            if points.layer_id in builder.meshes_by_layer:
+                layer_meshes = builder.meshes_by_layer[points.layer_id]
+                layer_meshes[:] = [mesh for mesh in layer_meshes if mesh < level_start]
+            lod_meshes.append(range(level_start, builder.mesh_count))
+
+    for index, meshes in enumerate(zip(*lod_meshes)):
+        builder.add_lods(first_mesh + index, meshes)
+
+
+def point_colors(layer_state: ScatterLayerState3D, mask: Optional[ndarray] = None) -> Optional[ndarray]:
+    """
+    The colormapped colors of the points of a scatter layer, as an (N, 4) array of 8-bit RGBA values,
+    or None if the layer has a fixed color. Values are binned in the same way as the mesh exporters,
+    and the alpha channel is left opaque, as the layer opacity is applied by the material.
+    """
+    if layer_state.color_mode == "Fixed":
+        return None
+    cmap_vals = ensure_numerical(layer_values(layer_state, layer_state.cmap_att, mask)).ravel()
+    crange = layer_state.cmap_vmax - layer_state.cmap_vmin
+    cindices = (clip((cmap_vals - layer_state.cmap_vmin) / crange, 0, 1) * 255).astype(int)
+    colors = (asarray(layer_state.cmap(cindices)) * 255).round().astype(uint8)
+    colors[:, 3] = 255
+    return colors
+
+
+@ar_layer_export(ScatterLayerState3D, "Points", ARPointCloudExportOptions, ("gltf", "glb"))
+def add_scatter_points_layer_gltf(builder: GLTFBuilder,
+                                  viewer_state: ViewerState3D,
+                                  layer_state: ScatterLayerState3D,
+                                  options: ARPointCloudExportOptions,
+                                  bounds: Bounds,
+                                  clip_to_bounds: bool = True):
+    """
+    Export a scatter layer as a point cloud, using POINTS primitives rather than a mesh per point.
+    Each point only needs its position (and, with a colormap, a COLOR_0 value), so this scales
+    to much larger layers than the glyph-based exporters. Viewers draw the points at a fixed pixel size.
+    """
+    if layer_state is None:
+        return
+
+    bounds = xyz_bounds(viewer_state, with_resolution=False)
+    mask = scatter_layer_mask(viewer_state, layer_state, bounds, clip_to_bounds)
+    data = xyz_for_layer(viewer_state, layer_state,
+                         preserve_aspect=viewer_state.native_aspect,
+                         mask=mask,
+                         scaled=True,
+                         axis_order=(1, 2, 0))
+    n_points = len(data)
+    if n_points == 0:
+        return
+
+    colors = point_colors(layer_state, mask)
+    log_ppm = int(options.log_points_per_mesh)
+    ppm = n_points if log_ppm == 7 else 10 ** log_ppm
+    if options.spatial_chunks and ppm < n_points:
+        order = morton_order(data)
+        data = data[order]
+        if colors is not None:
+            colors = colors[order]
+
+    # Vertex colors multiply the base color, so a colormapped layer gets a white material
+    color = hex_to_components(layer_color(layer_state)) if colors is None else [1, 1, 1]
+    builder.add_material(color=color, opacity=layer_state.alpha)
+    material = builder.material_count - 1
+
+    layer_id = export_label_for_layer(layer_state)
+    buffer = builder.buffer_count
+    uri = f"points_{unique_id()}.bin"
+    barr = bytearray()
+
+    # Positions take 12 bytes and colors 4 bytes per point, so every view stays four-byte aligned
+    for start in range(0, n_points, ppm):
+        report_progress(start / n_points)
+        positions = data[start:start+ppm]
+        builder.add_buffer_view(
+            buffer=buffer,
+            byte_length=positions.nbytes,
+            byte_offset=len(barr),
+            target=BufferTarget.ARRAY_BUFFER,
+        )
+        barr.extend(positions.tobytes())
+        builder.add_accessor(
+            buffer_view=builder.buffer_view_count-1,
+            component_type=ComponentType.FLOAT,
+            count=len(positions),
+            type=AccessorType.VEC3,
+            mins=positions.min(axis=0).tolist(),
+            maxes=positions.max(axis=0).tolist(),
+        )
+        position_accessor = builder.accessor_count - 1
+
+        attributes = {}
+        if colors is not None:
+            chunk_colors = colors[start:start+ppm]
+            builder.add_buffer_view(
+                buffer=buffer,
+                byte_length=chunk_colors.nbytes,
+                byte_offset=len(barr),
+                target=BufferTarget.ARRAY_BUFFER,
+            )
+            barr.extend(chunk_colors.tobytes())
+            builder.add_accessor(
+                buffer_view=builder.buffer_view_count-1,
+                component_type=ComponentType.UNSIGNED_BYTE,
+                count=len(chunk_colors),
+                type=AccessorType.VEC4,
+                mins=None,
+                maxes=None,
+                normalized=True,
+            )
+            attributes["COLOR_0"] = builder.accessor_count - 1
+
+        builder.add_mesh(
+            layer_id=layer_id,
+            position_accessor=position_accessor,
+            material=material,
+            mode=PrimitiveMode.POINTS,
+            attributes=attributes,
+        )
+
+    builder.add_buffer(byte_length=len(barr), uri=uri)
+    builder.add_file_resource(uri, data=barr)
 
 
 if IpyvolumeScatterLayerState is not NoneType:
@@ -605,4 +862,5 @@ if IpyvolumeScatterLayerState is not NoneType:
                                triangles=triangles,
                                bounds=bounds,
                                clip_to_bounds=clip_to_bounds,
-                               points_per_mesh=ppm)
+                               points_per_mesh=ppm,
+                               spatial_chunks=options.spatial_chunks)
@@ -1,15 +1,17 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from glue.viewers.common3d.viewer_state import ViewerState3D
 from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
 
 from glue_ar.common.export_options import ar_layer_export
 from glue_ar.common.scatter import IPYVOLUME_POINTS_GETTERS, IPYVOLUME_TRIANGLE_GETTERS, PointsGetter, \
-                                   box_points_getter, radius_for_scatter_layer, scatter_layer_mask, \
-                                   sizes_for_scatter_layer, sphere_points_getter
+                                   box_points_getter, decimate_scatter_layer, density_sizes, glyph_geometry, \
+                                   radius_for_scatter_layer, scatter_layer_mask, scatter_point_budget, \
+                                   sizes_for_scatter_layer
 from glue_ar.common.scatter_export_options import ARIpyvolumeScatterExportOptions, ARVispyScatterExportOptions
-from glue_ar.common.shapes import rectangular_prism_triangulation, sphere_triangles
+from glue_ar.common.shapes import rectangular_prism_triangulation
 from glue_ar.common.stl_builder import STLBuilder
+from glue_ar.progress import tracked
 from glue_ar.utils import Bounds, NoneType, xyz_bounds, xyz_for_layer
 
 
@@ -25,7 +27,10 @@ def add_scatter_layer_stl(builder: STLBuilder,
                           points_getter: PointsGetter,
                           triangles: List[Tuple[int, int, int]],
                           bounds: Bounds,
-                          clip_to_bounds: bool = True):
+                          clip_to_bounds: bool = True,
+                          point_budget: Optional[int] = None,
+                          decimation: str = "Voxel grid",
+                          preserve_density: bool = True):
 
     if layer_state is None:
         return
@@ -35,19 +40,23 @@ def add_scatter_layer_stl(builder: STLBuilder,
     fixed_size = layer_state.size_mode == "Fixed"
     radius = radius_for_scatter_layer(layer_state)
     mask = scatter_layer_mask(viewer_state, layer_state, bounds, clip_to_bounds)
+    mask, weights = decimate_scatter_layer(viewer_state, layer_state, mask, point_budget, decimation)
 
     data = xyz_for_layer(viewer_state, layer_state,
                          preserve_aspect=viewer_state.native_aspect,
                          mask=mask,
-                         scaled=True)
+                         scaled=True,
+                         axis_order=(1, 2, 0))
 
     if len(data) == 0:
         return
 
-    data = data[:, [1, 2, 0]]
-
     sizes = sizes_for_scatter_layer(layer_state, bounds, mask)
-    for i, point in enumerate(data):
+    if weights is not None and preserve_density:
+        sizes = density_sizes(sizes, radius, weights)
+        fixed_size = False
+
+    for i, point in enumerate(tracked(data)):
 
         size = radius if fixed_size else sizes[i]
         pts = points_getter(point, size)
@@ -62,14 +71,7 @@ def add_vispy_scatter_layer_stl(builder: STLBuilder,
                                 bounds: Bounds,
                                 clip_to_bounds: bool = True):
 
-    resolution = int(options.resolution)
-    theta_resolution = resolution
-    phi_resolution = resolution
-    triangles = sphere_triangles(theta_resolution=theta_resolution,
-                                 phi_resolution=phi_resolution)
-
-    points_getter = sphere_points_getter(theta_resolution=theta_resolution,
-                                         phi_resolution=phi_resolution)
+    points_getter, triangles = glyph_geometry(options.glyph, int(options.resolution))
 
     add_scatter_layer_stl(builder=builder,
                           viewer_state=viewer_state,
@@ -77,7 +79,10 @@ def add_vispy_scatter_layer_stl(builder: STLBuilder,
                           points_getter=points_getter,
                           triangles=triangles,
                           bounds=bounds,
-                          clip_to_bounds=clip_to_bounds)
+                          clip_to_bounds=clip_to_bounds,
+                          point_budget=scatter_point_budget(options),
+                          decimation=options.decimation,
+                          preserve_density=options.preserve_density)
 
 
 if IpyvolumeScatterLayerState is not NoneType:
@@ -3,20 +3,23 @@ from typing import List, Optional, Tuple
 from glue.utils.array import ensure_numerical
 from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
 from glue.viewers.scatter3d.viewer_state import ViewerState3D
-from numpy import ndarray
+from numpy import column_stack, full, ndarray, repeat
 from numpy.linalg import norm
 
+from glue_ar.columns import layer_values
 from glue_ar.common.export_options import ar_layer_export
 from glue_ar.common.scatter import IPYVOLUME_POINTS_GETTERS, IPYVOLUME_TRIANGLE_GETTERS, VECTOR_OFFSETS, PointsGetter, \
-                                   box_points_getter, clip_vector_data, radius_for_scatter_layer, scatter_layer_mask, \
-                                   sizes_for_scatter_layer, sphere_points_getter
+                                   box_points_getter, clip_vector_data, decimate_scatter_layer, density_sizes, \
+                                   glyph_geometry, radius_for_scatter_layer, scatter_layer_mask, scatter_point_budget, \
+                                   sizes_for_scatter_layer
 from glue_ar.common.scatter_export_options import ARIpyvolumeScatterExportOptions, ARVispyScatterExportOptions
 from glue_ar.common.usd_builder import USDBuilder
+from glue_ar.progress import tracked
 from glue_ar.common.shapes import cone_triangles, cone_points, cylinder_points, cylinder_triangles, \
-                                  normalize, rectangular_prism_triangulation, sphere_triangles
+                                  normalize, rectangular_prism_triangulation
 from glue_ar.usd_utils import sanitize_path
-from glue_ar.utils import export_label_for_layer, iterable_has_nan, hex_to_components, \
-                          layer_color, offset_triangles, xyz_for_layer, Bounds, NoneType
+from glue_ar.utils import colormap_coordinates, colormap_png, export_label_for_layer, iterable_has_nan, \
+                          hex_to_components, layer_color, offset_triangles, xyz_for_layer, Bounds, NoneType
 
 
 try:
@@ -36,7 +39,9 @@ def add_vectors_usd(builder: USDBuilder,
                     tip_resolution: int = 6,
                     shaft_resolution: int = 6,
                     colors: Optional[List[Tuple[int, int, int]]] = None,
-                    mask: Optional[ndarray] = None):
+                    mask: Optional[ndarray] = None,
+                    texture: Optional[str] = None,
+                    coordinates: Optional[ndarray] = None):
 
     vector_data = clip_vector_data(viewer_state, layer_state, bounds, mask)
     offset = VECTOR_OFFSETS[layer_state.vector_origin]
@@ -64,7 +69,11 @@ def add_vectors_usd(builder: USDBuilder,
 
         fixed_color = tuple(hex_to_components(layer_color(layer_state)))
         color = colors[i] if colors is not None else fixed_color
-        builder.add_mesh(points, triangles, color=color, opacity=layer_state.alpha)
+        texture_coordinates = None
+        if texture is not None:
+            texture_coordinates = column_stack((full(len(points), coordinates[i]), full(len(points), 0.5)))
+        builder.add_mesh(points, triangles, color=color, opacity=layer_state.alpha,
+                         texture=texture, texture_coordinates=texture_coordinates)
 
         if layer_state.vector_arrowhead:
             normalized_v = normalize(adjusted_v)
@@ -76,7 +85,11 @@ def add_vectors_usd(builder: USDBuilder,
                                      central_axis=adjusted_v,
                                      theta_resolution=tip_resolution)
 
-            builder.add_mesh(tip_points, tip_triangles, color=color, opacity=layer_state.alpha)
+            if texture is not None:
+                texture_coordinates = column_stack((full(len(tip_points), coordinates[i]),
+                                                    full(len(tip_points), 0.5)))
+            builder.add_mesh(tip_points, tip_triangles, color=color, opacity=layer_state.alpha,
+                             texture=texture, texture_coordinates=texture_coordinates)
 
 
 def add_scatter_layer_usd(
@@ -87,44 +100,58 @@ def add_scatter_layer_usd(
     triangles: List[Tuple[int, int, int]],
     bounds: Bounds,
     clip_to_bounds: bool = True,
+    point_budget: Optional[int] = None,
+    decimation: str = "Voxel grid",
+    preserve_density: bool = True,
+    colormap_texture: bool = False,
 ):
 
     fixed_size = layer_state.size_mode == "Fixed"
     fixed_color = layer_state.color_mode == "Fixed"
+    textured = colormap_texture and not fixed_color
 
     identifier = sanitize_path(export_label_for_layer(layer_state))
 
     mask = scatter_layer_mask(viewer_state, layer_state, bounds, clip_to_bounds)
+    mask, weights = decimate_scatter_layer(viewer_state, layer_state, mask, point_budget, decimation)
     data = xyz_for_layer(viewer_state, layer_state,
                          preserve_aspect=viewer_state.native_aspect,
                          mask=mask,
-                         scaled=True)
+                         scaled=True,
+                         axis_order=(1, 2, 0))
 
     if len(data) == 0:
         return
 
-    data = data[:, [1, 2, 0]]
     color = layer_color(layer_state)
     color_components = tuple(hex_to_components(color))
 
     # We calculate this even if we aren't using fixed size as we might also use this for vectors
     radius = radius_for_scatter_layer(layer_state)
     sizes = sizes_for_scatter_layer(layer_state, bounds, mask)
+    if weights is not None and preserve_density:
+        sizes = density_sizes(sizes, radius, weights)
+        fixed_size = False
 
     if not fixed_color:
         cmap = layer_state.cmap
-        cmap_vals = ensure_numerical(layer_state.layer[layer_state.cmap_att][mask])
+        cmap_vals = ensure_numerical(layer_values(layer_state, layer_state.cmap_att, mask))
         crange = layer_state.cmap_vmax - layer_state.cmap_vmin
         normalized = [max(min((cval - layer_state.cmap_vmin) / crange, 1), 0) for cval in cmap_vals]
         colors = [tuple(int(256 * c) for c in cmap(norm)[:3]) for norm in normalized]
 
-    # If we're in fixed-color mode, we can use one mesh for everything
+    texture = None
+    if textured:
+        texture = builder.add_texture(colormap_png(cmap), prefix="colormap")
+        coordinates = colormap_coordinates(layer_state, cmap_vals)
+
+    # If we're in fixed-color mode (or reading colors from a texture), we can use one mesh for everything
     opacity = float(layer_state.alpha)
-    if fixed_color:
+    if fixed_color or textured:
         points = []
         tris = []
         triangle_offset = 0
-        for i, point in enumerate(data):
+        for i, point in enumerate(tracked(data, end=0.8)):
             size = radius if fixed_size else sizes[i]
             pts = points_getter(point, size)
             points.append(pts)
@@ -134,16 +161,23 @@ def add_scatter_layer_usd(
 
         mesh_points = [pt for pts in points for pt in pts]
         mesh_triangles = [tri for sphere in tris for tri in sphere]
+        texture_coordinates = None
+        if textured:
+            # Every vertex of a point's glyph has the same color
+            point_coordinates = repeat(coordinates, [len(pts) for pts in points])
+            texture_coordinates = column_stack((point_coordinates, full(len(point_coordinates), 0.5)))
         builder.add_mesh(mesh_points,
                          mesh_triangles,
                          color=color_components,
                          opacity=opacity,
-                         identifier=identifier)
+                         identifier=identifier,
+                         texture=texture,
+                         texture_coordinates=texture_coordinates)
     else:
         points_by_color = defaultdict(list)
         triangles_by_color = defaultdict(list)
         triangle_offsets = defaultdict(int)
-        for i, point in enumerate(data):
+        for i, point in enumerate(tracked(data, end=0.8)):
             color = colors[i]
             size = radius if fixed_size else sizes[i]
             pts = points_getter(point, size)
@@ -152,7 +186,7 @@ def add_scatter_layer_usd(
             points_by_color[color].append(pts)
             triangles_by_color[color].append(pt_triangles)
 
-        for color, points in points_by_color.items():
+        for color, points in tracked(points_by_color.items(), total=len(points_by_color), start=0.8, every=1):
             tris = triangles_by_color[color]
             mesh_points = [pt for pts in points for pt in pts]
             mesh_triangles = [tri for sphere in tris for tri in sphere]
@@ -184,6 +218,8 @@ def add_scatter_layer_usd(
             tip_resolution=10,
             colors=colors if not fixed_color else None,
             mask=mask,
+            texture=texture,
+            coordinates=coordinates if textured else None,
         )
 
 
@@ -195,14 +231,7 @@ def add_vispy_scatter_layer_usd(builder: USDBuilder,
                                 bounds: Bounds,
                                 clip_to_bounds: bool = True):
 
-    resolution = int(options.resolution)
-    theta_resolution = resolution
-    phi_resolution = resolution
-    triangles = sphere_triangles(theta_resolution=theta_resolution,
-                                 phi_resolution=phi_resolution)
-
-    points_getter = sphere_points_getter(theta_resolution=theta_resolution,
-                                         phi_resolution=phi_resolution)
+    points_getter, triangles = glyph_geometry(options.glyph, int(options.resolution))
 
     add_scatter_layer_usd(builder=builder,
                           viewer_state=viewer_state,
@@ -210,7 +239,11 @@ def add_vispy_scatter_layer_usd(builder: USDBuilder,
                           points_getter=points_getter,
                           triangles=triangles,
                           bounds=bounds,
-                          clip_to_bounds=clip_to_bounds)
+                          clip_to_bounds=clip_to_bounds,
+                          point_budget=scatter_point_budget(options),
+                          decimation=options.decimation,
+                          preserve_density=options.preserve_density,
+                          colormap_texture=options.colormap_texture)
 
 
 if IpyvolumeScatterLayerState is not NoneType:
@@ -1,8 +1,9 @@
+from functools import lru_cache
 from itertools import product
 import math
-from typing import Iterable, List, Tuple, Union
+from typing import Dict, Iterable, List, Tuple, Union
 
-from numpy import cross, pi
+from numpy import array, asarray, concatenate, cross, ndarray, pi, sqrt
 
 from glue_ar.utils import offset_triangles
 
@@ -12,6 +13,8 @@ __all__ = [
     "sphere_mesh_index",
     "sphere_points",
     "sphere_triangles",
+    "icosphere_points",
+    "icosphere_triangles",
     "cylinder_points",
     "cylinder_triangles",
     "cone_points",
@@ -110,6 +113,158 @@ def sphere_triangles_count(theta_resolution: int, phi_resolution: int) -> int:
     return 2 * phi_resolution * (theta_resolution - 2)
 
 
+def octahedron_points(center: Union[List[float], Tuple[float, float, float]],
+                      radius: float) -> List[Tuple[float, float, float]]:
+    return [
+        (center[0] + radius, center[1], center[2]),
+        (center[0] - radius, center[1], center[2]),
+        (center[0], center[1] + radius, center[2]),
+        (center[0], center[1] - radius, center[2]),
+        (center[0], center[1], center[2] + radius),
+        (center[0], center[1], center[2] - radius),
+    ]
+
+
+def octahedron_points_count() -> int:
+    return 6
+
+
+def octahedron_triangles(start_index: int = 0) -> List[Tuple[int, int, int]]:
+    # One face per octant. Flipping the sign of an odd number of axes reverses the orientation,
+    # so those faces have two of their vertices swapped to keep them facing outwards
+    triangles = []
+    for x, y, z in product((0, 1), (2, 3), (4, 5)):
+        if (x + y + z) % 2 == 0:
+            triangles.append((start_index + x, start_index + y, start_index + z))
+        else:
+            triangles.append((start_index + x, start_index + z, start_index + y))
+    return triangles
+
+
+def octahedron_triangles_count() -> int:
+    return 8
+
+
+# The pairs of axes spanned by each of the quads of a star glyph
+STAR_PLANES = ((0, 1), (1, 2), (0, 2))
+
+
+def star_points(center: Union[List[float], Tuple[float, float, float]],
+                radius: float,
+                planes: int = 3) -> List[Tuple[float, float, float]]:
+    """
+    The corners of a glyph made of `planes` mutually orthogonal square quads (up to three),
+    each with sides of twice the given radius, crossing at the center.
+    """
+    points = []
+    for first, second in STAR_PLANES[:planes]:
+        for a, b in ((-1, -1), (1, -1), (1, 1), (-1, 1)):
+            point = list(center)
+            point[first] += a * radius
+            point[second] += b * radius
+            points.append(tuple(point))
+    return points
+
+
+def star_points_count(planes: int = 3) -> int:
+    return 4 * planes
+
+
+def star_triangles(planes: int = 3, start_index: int = 0) -> List[Tuple[int, int, int]]:
+    # Materials are one-sided, so each quad is triangulated from both sides
+    triangles = []
+    for plane in range(planes):
+        offset = start_index + 4 * plane
+        triangles.extend([
+            (offset, offset + 1, offset + 2),
+            (offset, offset + 2, offset + 3),
+            (offset, offset + 2, offset + 1),
+            (offset, offset + 3, offset + 2),
+        ])
+    return triangles
+
+
+def star_triangles_count(planes: int = 3) -> int:
+    return 4 * planes
+
+
+# The largest number of subdivisions that icosphere templates are built for
+MAX_ICOSPHERE_SUBDIVISIONS = 4
+
+
+@lru_cache(maxsize=None)
+def _icosphere_template(subdivisions: int) -> Tuple[ndarray, ndarray]:
+    """
+    The unit-radius vertices and triangles of an icosahedron with each face subdivided
+    into `4 ** subdivisions` triangles. Each level is built from the one before,
+    and the (read-only) arrays are cached, so each level is only ever built once.
+    """
+    if subdivisions == 0:
+        t = (1 + math.sqrt(5)) / 2
+        vertices = array([
+            (-1, t, 0), (1, t, 0), (-1, -t, 0), (1, -t, 0),
+            (0, -1, t), (0, 1, t), (0, -1, -t), (0, 1, -t),
+            (t, 0, -1), (t, 0, 1), (-t, 0, -1), (-t, 0, 1),
+        ], dtype=float)
+        vertices /= sqrt((vertices ** 2).sum(axis=1, keepdims=True))
+        triangles = array([
+            (0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11),
+            (1, 5, 9), (5, 11, 4), (11, 10, 2), (10, 7, 6), (7, 1, 8),
+            (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9),
+            (4, 9, 5), (2, 4, 11), (6, 2, 10), (8, 6, 7), (9, 8, 1),
+        ], dtype=int)
+    else:
+        coarse_vertices, coarse_triangles = _icosphere_template(subdivisions - 1)
+
+        # Every edge is shared by two triangles, so each midpoint is only added once
+        midpoints: Dict[Tuple[int, int], int] = {}
+        count = len(coarse_vertices)
+
+        def midpoint(i: int, j: int) -> int:
+            nonlocal count
+            key = (i, j) if i < j else (j, i)
+            index = midpoints.get(key, None)
+            if index is None:
+                index = midpoints[key] = count
+                count += 1
+            return index
+
+        triangles = []
+        for a, b, c in coarse_triangles.tolist():
+            ab, bc, ca = midpoint(a, b), midpoint(b, c), midpoint(c, a)
+            triangles.extend([(a, ab, ca), (b, bc, ab), (c, ca, bc), (ab, bc, ca)])
+        triangles = array(triangles, dtype=int)
+
+        edges = asarray(list(midpoints.keys()), dtype=int)
+        new_vertices = coarse_vertices[edges[:, 0]] + coarse_vertices[edges[:, 1]]
+        new_vertices /= sqrt((new_vertices ** 2).sum(axis=1, keepdims=True))
+        vertices = concatenate([coarse_vertices, new_vertices])
+
+    vertices.setflags(write=False)
+    triangles.setflags(write=False)
+    return vertices, triangles
+
+
+def icosphere_points(center: Union[List[float], Tuple[float, float, float]],
+                     radius: float,
+                     subdivisions: int = 2) -> List[Tuple[float, float, float]]:
+    vertices, _ = _icosphere_template(subdivisions)
+    return list(map(tuple, (radius * vertices + asarray(center, dtype=float)).tolist()))
+
+
+def icosphere_points_count(subdivisions: int) -> int:
+    return 10 * 4 ** subdivisions + 2
+
+
+def icosphere_triangles(subdivisions: int = 2, start_index: int = 0) -> List[Tuple[int, int, int]]:
+    _, triangles = _icosphere_template(subdivisions)
+    return list(map(tuple, (triangles + start_index).tolist()))
+
+
+def icosphere_triangles_count(subdivisions: int) -> int:
+    return 20 * 4 ** subdivisions
+
+
 def normalize(vector: Iterable[float]) -> List[float]:
     magnitude = math.sqrt(sum(c * c for c in vector))
     return [c / magnitude for c in vector]
@@ -1,16 +1,23 @@
 from __future__ import annotations
 
 from numpy import array, concatenate, zeros
-from stl import Mesh
+from stl import Mesh, Mode
 from typing import Iterable, List
 
 from glue_ar.registries import builder
 
 
+# Binary STL files start with an 80-byte header
+DETERMINISTIC_HEADER = b"glue-ar".ljust(80, b" ")
+
+
 @builder("stl")
 class STLBuilder:
 
-    def __init__(self):
+    def __init__(self, deterministic_names: bool = False):
+        # STL files don't contain any resource names, but numpy-stl
+        # puts a timestamp in the header that we replace in this mode
+        self.deterministic_names = deterministic_names
         self.meshes: List[Mesh] = []
 
     def add_mesh(self,
@@ -21,16 +28,23 @@ class STLBuilder:
         verts_array = array(vertices)
         tris_array = array(triangles)
         mesh = Mesh(zeros(tris_array.shape[0], dtype=Mesh.dtype))
-        for i, f in enumerate(tris_array):
-            for j in range(3):
-                mesh.vectors[i][j] = verts_array[f[j], :]
+        if len(tris_array) > 0:
+            mesh.vectors[:] = verts_array[tris_array]
 
         self.meshes.append(mesh)
         return self
 
+    def merge(self, other: STLBuilder) -> STLBuilder:
+        self.meshes.extend(other.meshes)
+        return self
+
     def build(self) -> Mesh:
         return Mesh(concatenate([mesh.data for mesh in self.meshes]))
 
     def build_and_export(self, filepath: str):
         mesh = self.build()
-        mesh.save(filepath)
+        with open(filepath, "wb") as f:
+            mesh.save(filepath, fh=f, mode=Mode.BINARY)
+            if self.deterministic_names:
+                f.seek(0)
+                f.write(DETERMINISTIC_HEADER)
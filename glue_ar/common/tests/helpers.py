@@ -1,4 +1,12 @@
 from itertools import product
+from typing import Tuple
+
+from glue.core import Data
+from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
+from glue.viewers.scatter3d.viewer_state import ScatterViewerState3D
+from glue.viewers.volume3d.layer_state import VolumeLayerState3D
+from glue.viewers.volume3d.viewer_state import VolumeViewerState3D
+from numpy import exp, linspace, meshgrid
 
 
 def package_installed(package):
@@ -19,3 +27,28 @@ APP_VIEWER_OPTIONS = list(product(APP_TYPES, VIEWER_TYPES))
 qt_ipyvolume = ("qt", "ipyvolume")
 if qt_ipyvolume in APP_VIEWER_OPTIONS:
     APP_VIEWER_OPTIONS.remove(qt_ipyvolume)
+
+
+def scatter_scene(label: str, **components) -> Tuple[ScatterViewerState3D, ScatterLayerState3D]:
+    """
+    A 3D scatter viewer state showing a single layer, whose data has the given components.
+    """
+    data = Data(label=label, **components)
+    viewer_state = ScatterViewerState3D()
+    layer_state = ScatterLayerState3D(layer=data, viewer_state=viewer_state)
+    viewer_state.layers.append(layer_state)
+    return viewer_state, layer_state
+
+
+def volume_scene(label: str, size: int = 16, resolution: int = 32) -> Tuple[VolumeViewerState3D, VolumeLayerState3D]:
+    """
+    A 3D volume viewer state showing a Gaussian blob, sampled on a cube with `size` points along each side.
+    """
+    coordinates = linspace(-1, 1, size)
+    x, y, z = meshgrid(coordinates, coordinates, coordinates, indexing="ij", sparse=True)
+    data = Data(values=exp(-4 * (x ** 2 + y ** 2 + z ** 2)), label=label)
+    viewer_state = VolumeViewerState3D()
+    layer_state = VolumeLayerState3D(layer=data, viewer_state=viewer_state)
+    viewer_state.layers.append(layer_state)
+    viewer_state.resolution = resolution
+    return viewer_state, layer_state
@@ -110,3 +110,20 @@ class BaseExportDialogTest:
         method, layer_export_state = self.dialog.state_dictionary["Volume Data"]
         assert method == "Isosurface"
         assert layer_export_state.isosurface_count == 25
+
+    def test_estimate(self):
+        state = self.dialog.state
+        assert state.estimate.startswith("Estimated output:")
+
+        state.layer = "Scatter Data"
+        _, layer_export_state = self.dialog.state_dictionary["Scatter Data"]
+        estimate = state.estimate
+        layer_export_state.resolution += 5
+        # The dialogs can wait for the options to settle before updating the estimate
+        self.dialog._flush_estimate()
+        assert state.estimate != estimate
+
+        estimate = state.estimate
+        state.filetype = "STL"
+        self.dialog._flush_estimate()
+        assert state.estimate != estimate
@@ -0,0 +1,117 @@
+from gltflib import AccessorType, BufferTarget, ComponentType
+import pytest
+
+from glue_ar.common.gltf_builder import GLTFBuilder
+from glue_ar.common.stl_builder import STLBuilder
+
+
+POINTS = [(0, 0, 0), (1, 0, 0), (0, 1, 0)]
+TRIANGLES = [(0, 1, 2)]
+
+
+def _gltf_fragment(layer_id: str, color) -> GLTFBuilder:
+    builder = GLTFBuilder()
+    builder.add_material(color=color)
+    builder.add_buffer(byte_length=48, uri=f"{layer_id}.bin")
+    builder.add_buffer_view(buffer=0, byte_length=12, byte_offset=0, target=BufferTarget.ELEMENT_ARRAY_BUFFER)
+    builder.add_buffer_view(buffer=0, byte_length=36, byte_offset=12, target=BufferTarget.ARRAY_BUFFER)
+    builder.add_accessor(buffer_view=0, component_type=ComponentType.UNSIGNED_INT, count=3,
+                         type=AccessorType.SCALAR, mins=[0], maxes=[2])
+    builder.add_accessor(buffer_view=1, component_type=ComponentType.FLOAT, count=3,
+                         type=AccessorType.VEC3, mins=[0, 0, 0], maxes=[1, 1, 0])
+    builder.add_file_resource(f"{layer_id}.bin", data=bytearray(48))
+    builder.add_mesh(layer_id=layer_id, position_accessor=1, indices_accessor=0, material=0)
+    builder.add_mesh(layer_id=layer_id, position_accessor=1, indices_accessor=0, material=0)
+    return builder
+
+
+class TestBuilderMerge:
+
+    def test_merge_gltf(self):
+        builder = _gltf_fragment("first", [1, 0, 0])
+        builder.merge(_gltf_fragment("second", [0, 1, 0]))
+
+        assert builder.material_count == 2
+        assert builder.buffer_count == 2
+        assert builder.buffer_view_count == 4
+        assert builder.accessor_count == 4
+        assert builder.mesh_count == 4
+        assert [resource.uri for resource in builder.file_resources] == ["first.bin", "second.bin"]
+        assert dict(builder.meshes_by_layer) == {"first": [0, 1], "second": [2, 3]}
+
+        assert [view.buffer for view in builder.buffer_views] == [0, 0, 1, 1]
+        assert [accessor.bufferView for accessor in builder.accessors] == [0, 1, 2, 3]
+        for mesh in builder.meshes[2:]:
+            primitive = mesh.primitives[0]
+            assert primitive.indices == 2
+            assert primitive.attributes.POSITION == 3
+            assert primitive.material == 1
+
+        # The first builder's meshes should be untouched
+        primitive = builder.meshes[0].primitives[0]
+        assert primitive.indices == 0
+        assert primitive.attributes.POSITION == 1
+        assert primitive.material == 0
+
+    def test_merge_gltf_empty(self):
+        fragment = _gltf_fragment("layer", [1, 0, 0])
+        builder = GLTFBuilder().merge(fragment)
+
+        assert builder.build_model() == fragment.build_model()
+        assert dict(builder.meshes_by_layer) == dict(fragment.meshes_by_layer)
+
+    def test_merge_stl(self):
+        builder = STLBuilder().add_mesh(POINTS, TRIANGLES)
+        other = STLBuilder().add_mesh(POINTS, TRIANGLES).add_mesh(POINTS, TRIANGLES)
+
+        builder.merge(other)
+
+        assert len(builder.meshes) == 3
+        assert len(builder.build().vectors) == 3
+
+    def test_merge_usd(self):
+        pytest.importorskip("pxr")
+        from glue_ar.common.usd_builder import USDBuilder
+
+        builder = USDBuilder()
+        builder.add_mesh(POINTS, TRIANGLES, color=(255, 0, 0), opacity=1, identifier="layer")
+        other = USDBuilder()
+        mesh = other.add_mesh(POINTS, TRIANGLES, color=(0, 255, 0), opacity=1, identifier="layer")
+        other.add_translated_reference(mesh, (1, 2, 3), identifier="layer")
+
+        builder.merge(other)
+
+        stage = builder.stage
+        assert builder._mesh_counts["layer"] == 3
+        for index in range(3):
+            assert stage.GetPrimAtPath(f"/world/xform_layer_{index}/mesh_layer_{index}").IsValid()
+        assert stage.GetPrimAtPath("/material_255_0_0_1").IsValid()
+        assert stage.GetPrimAtPath("/material_0_255_0_1").IsValid()
+        assert len(builder._material_map) == 2
+
+        # The reference should point to the renumbered copy of the original mesh
+        reference_spec = stage.GetRootLayer().GetPrimAtPath("/world/xform_layer_2/mesh_layer_2")
+        references = list(reference_spec.referenceList.prependedItems)
+        assert [str(reference.primPath) for reference in references] == ["/world/xform_layer_1/mesh_layer_1"]
+
+    def test_merge_gltf_textures(self):
+        builder = _gltf_fragment("first", [1, 0, 0])
+        other = _gltf_fragment("second", [0, 1, 0])
+        other.add_file_resource("colormap.png", data=bytearray(8))
+        other.add_image("colormap.png")
+        other.add_sampler()
+        other.add_texture(source=0, sampler=0)
+        other.add_material(color=[1, 1, 1], base_color_texture=0)
+        builder.add_image("other.png").add_sampler().add_texture(source=0, sampler=0)
+
+        builder.merge(other)
+        assert builder.texture_count == 2
+        assert builder.textures[1].source == 1
+        assert builder.textures[1].sampler == 1
+        assert builder.materials[0].pbrMetallicRoughness.baseColorTexture is None
+        assert builder.materials[2].pbrMetallicRoughness.baseColorTexture.index == 1
+        assert [resource.uri for resource in builder.image_resources] == ["colormap.png"]
+
+        model = builder.build_model()
+        assert [image.uri for image in model.images] == ["other.png", "colormap.png"]
+        assert len(model.samplers) == 2
@@ -0,0 +1,139 @@
+from os import utime
+from os.path import join
+import time
+
+from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
+from gltflib import GLTF
+from numpy import arange
+
+from glue_ar.common.cache import GeometryCache, export_cache_key, layer_cache_key
+from glue_ar.common.export import export_viewer
+from glue_ar.common.gltf_builder import GLTFBuilder
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
+from glue_ar.common.scatter_gltf import add_vispy_scatter_layer_gltf
+from glue_ar.common.stl_builder import STLBuilder
+from glue_ar.common.tests.helpers import scatter_scene
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+class TestGeometryCache:
+
+    def setup_method(self, method):
+        self.viewer_state, self.layer_state = scatter_scene("cache_data", x=arange(10), y=arange(10) ** 2,
+                                                            z=arange(10) ** 3)
+        self.data = self.layer_state.layer
+        self.export_state = ARVispyScatterExportOptions()
+
+    def key(self):
+        bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+        return layer_cache_key(GLTFBuilder, add_vispy_scatter_layer_gltf, self.viewer_state,
+                               self.layer_state, self.export_state, bounds)
+
+    def test_key_stable(self):
+        assert self.key() == self.key()
+
+    def test_key_changes(self):
+        keys = {self.key()}
+
+        self.export_state.resolution = 20
+        keys.add(self.key())
+
+        self.layer_state.color = "#123456"
+        keys.add(self.key())
+
+        self.viewer_state.x_stretch = 2
+        keys.add(self.key())
+
+        self.data.update_components({self.data.id["x"]: arange(10) + 1})
+        keys.add(self.key())
+
+        assert len(keys) == 5
+
+    def test_key_ignores_unused_components(self):
+        self.data.add_component(arange(10) * 2, "unused")
+        key = self.key()
+        self.data.update_components({self.data.id["unused"]: arange(10)})
+        assert self.key() == key
+
+        # Changing which subset of points is shown changes the key, though
+        subset = self.data.new_subset(self.data.id["x"] > 4)
+        self.layer_state = ScatterLayerState3D(layer=subset, viewer_state=self.viewer_state)
+        key = self.key()
+        subset.subset_state = self.data.id["x"] > 5
+        assert self.key() != key
+
+    def test_export_key(self):
+        bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+
+        def key(**kwargs):
+            state_dictionary = {export_label_for_layer(self.layer_state): ("Scatter", self.export_state)}
+            return export_cache_key(self.viewer_state, [self.layer_state], state_dictionary, bounds, **kwargs)
+
+        keys = {key(), key(compression="draco")}
+        assert key() in keys
+        assert len(keys) == 2
+
+        self.export_state.resolution = 20
+        keys.add(key())
+
+        self.layer_state.size = 20
+        keys.add(key())
+
+        assert len(keys) == 4
+
+    def test_get_put(self, tmp_path):
+        cache = GeometryCache(str(tmp_path))
+        assert cache.get("missing") is None
+
+        builder = STLBuilder().add_mesh([(0, 0, 0), (1, 0, 0), (0, 1, 0)], [(0, 1, 2)])
+        cache.put("key", builder)
+
+        assert "key" in cache
+        cached = cache.get("key")
+        assert isinstance(cached, STLBuilder)
+        assert (cached.build().vectors == builder.build().vectors).all()
+
+        cache.clear()
+        assert "key" not in cache
+        assert cache.size == 0
+
+    def test_eviction(self, tmp_path):
+        builder = STLBuilder().add_mesh([(0, 0, 0), (1, 0, 0), (0, 1, 0)], [(0, 1, 2)])
+        cache = GeometryCache(str(tmp_path))
+        cache.put("first", builder)
+        entry_size = cache.size
+        cache.max_bytes = 2 * entry_size
+
+        cache.put("second", builder)
+
+        # Backdate both entries, with "first" as the least recently used,
+        # so that the test doesn't depend on the filesystem's timestamp resolution
+        now = time.time()
+        utime(join(str(tmp_path), "first.fragment"), (now - 200, now - 200))
+        utime(join(str(tmp_path), "second.fragment"), (now - 100, now - 100))
+
+        # Reading an entry should mark it as recently used
+        cache.get("first")
+        cache.put("third", builder)
+
+        assert "first" in cache
+        assert "second" not in cache
+        assert "third" in cache
+        assert cache.size <= cache.max_bytes
+
+    def test_export_with_cache(self, tmp_path):
+        cache = GeometryCache(str(tmp_path / "cache"))
+        state_dictionary = {export_label_for_layer(self.layer_state): ("Scatter", self.export_state)}
+        bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+
+        models = []
+        for index in range(2):
+            filepath = str(tmp_path / f"export_{index}.gltf")
+            export_viewer(self.viewer_state, [self.layer_state], bounds, state_dictionary, filepath, cache=cache)
+            models.append(GLTF.load(filepath).model)
+            assert self.key() in cache
+
+        first, second = models
+        assert len(second.meshes) == len(first.meshes)
+        assert second.accessors == first.accessors
+        assert second.meshes == first.meshes
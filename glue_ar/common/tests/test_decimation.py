@@ -0,0 +1,106 @@
+from gltflib import GLTF
+from numpy import array_equal, cbrt, count_nonzero, full, zeros
+from numpy.random import default_rng
+import pytest
+
+from glue_ar.common.export import export_viewer
+from glue_ar.common.scatter import decimate_points, decimate_scatter_layer, density_sizes, scatter_layer_mask, \
+                                   scatter_point_budget
+from glue_ar.common.scatter_export_options import DECIMATION_METHODS, ARVispyScatterExportOptions
+from glue_ar.common.shapes import octahedron_points_count
+from glue_ar.common.tests.helpers import scatter_scene
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+class TestDecimation:
+
+    def setup_method(self, method):
+        rng = default_rng(11)
+        # A dense cluster alongside a sparse background
+        self.points = rng.random((5000, 3))
+        self.points[:4000] *= 0.1
+
+    @pytest.mark.parametrize("method", DECIMATION_METHODS)
+    def test_decimate_points(self, method):
+        indices, weights = decimate_points(self.points, 500, method)
+        assert 0 < len(indices) <= 500
+        assert len(weights) == len(indices)
+        assert (weights >= 1).all()
+        assert (indices[1:] > indices[:-1]).all()
+
+        # Repeated exports need to give the same points
+        again, _ = decimate_points(self.points, 500, method)
+        assert array_equal(indices, again)
+
+        indices, weights = decimate_points(self.points, 5000, method)
+        assert array_equal(indices, range(5000))
+        assert (weights == 1).all()
+
+    def test_voxel_grid(self):
+        indices, weights = decimate_points(self.points, 500, "Voxel grid")
+        # Every point is represented by exactly one of the points that are kept,
+        # and the cluster is thinned out much more than the background
+        assert weights.sum() == len(self.points)
+        cluster = count_nonzero(indices < 4000)
+        assert cluster < len(indices) - cluster
+
+        # Points on a line need a much finer grid than points that fill a box
+        line = zeros((2000, 3))
+        line[:, 0] = default_rng(3).random(2000)
+        indices, weights = decimate_points(line, 100, "Voxel grid")
+        assert 50 < len(indices) <= 100
+
+    def test_stratified(self):
+        indices, weights = decimate_points(self.points, 500, "Stratified random")
+        # Each region keeps its share of the points
+        assert len(indices) == 500
+        assert count_nonzero(indices < 4000) == pytest.approx(400, abs=20)
+        assert weights.sum() == pytest.approx(len(self.points))
+
+    def test_density_sizes(self):
+        weights = full(4, 8.0)
+        assert array_equal(density_sizes(None, 0.5, weights), full(4, 1.0))
+        sizes = full(4, 0.25)
+        assert density_sizes(sizes, 0.5, weights) == pytest.approx(sizes * cbrt(8))
+
+    def test_point_budget(self):
+        assert scatter_point_budget(ARVispyScatterExportOptions()) is None
+        assert scatter_point_budget(ARVispyScatterExportOptions(log_point_budget=4)) == 10_000
+
+
+class TestScatterLayerDecimation:
+
+    def setup_method(self, method):
+        rng = default_rng(5)
+        self.viewer_state, self.layer_state = scatter_scene("decimation_data", x=rng.random(3000),
+                                                            y=rng.random(3000), z=rng.random(3000))
+        self.data = self.layer_state.layer
+        self.viewer_state.x_min, self.viewer_state.x_max = 0, 0.5
+        self.bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+
+    def test_decimate_scatter_layer(self):
+        mask = scatter_layer_mask(self.viewer_state, self.layer_state, self.bounds)
+        decimated, weights = decimate_scatter_layer(self.viewer_state, self.layer_state, mask, 1000)
+        assert decimated.shape == mask.shape
+        assert count_nonzero(decimated) == len(weights) <= 1000
+        # Only points that were going to be exported can be kept
+        assert not (decimated & ~mask).any()
+
+        assert decimate_scatter_layer(self.viewer_state, self.layer_state, mask, None) == (mask, None)
+        unchanged, weights = decimate_scatter_layer(self.viewer_state, self.layer_state, mask, 3000)
+        assert unchanged is mask
+        assert weights is None
+
+        decimated, _ = decimate_scatter_layer(self.viewer_state, self.layer_state, None, 1000)
+        assert decimated.shape == self.data.shape
+
+    def test_export(self, tmp_path):
+        options = ARVispyScatterExportOptions(glyph="Octahedron", log_point_budget=3,
+                                              decimation="Stratified random")
+        filepath = str(tmp_path / "decimated.glb")
+        export_viewer(self.viewer_state, [self.layer_state], self.bounds,
+                      {export_label_for_layer(self.layer_state): ("Scatter", options)}, filepath)
+
+        model = GLTF.load(filepath).model
+        vertices = sum(model.accessors[mesh.primitives[0].attributes.POSITION].count for mesh in model.meshes)
+        assert vertices == 1000 * octahedron_points_count()
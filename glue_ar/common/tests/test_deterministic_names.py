@@ -0,0 +1,79 @@
+from filecmp import cmp
+
+from numpy import arange
+import pytest
+
+from glue_ar.common.export import export_viewer
+from glue_ar.common.gltf_builder import GLTFBuilder
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
+from glue_ar.common.stl_builder import DETERMINISTIC_HEADER, STLBuilder
+from glue_ar.common.tests.helpers import scatter_scene
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+def _gltf_builder(deterministic_names: bool, uri: str, data: bytes) -> GLTFBuilder:
+    builder = GLTFBuilder(deterministic_names=deterministic_names)
+    builder.add_buffer(byte_length=len(data), uri=uri)
+    builder.add_file_resource(uri, data=bytearray(data))
+    return builder
+
+
+class TestDeterministicNames:
+
+    def test_gltf_names(self):
+        data = bytes(range(16))
+        first = _gltf_builder(True, "layer_abc.bin", data).build()
+        second = _gltf_builder(True, "layer_def.bin", data).build()
+
+        uri = first.model.buffers[0].uri
+        assert uri.startswith("layer_")
+        assert uri.endswith(".bin")
+        assert uri != "layer_abc.bin"
+        assert second.model.buffers[0].uri == uri
+        assert [resource.uri for resource in first.resources] == [uri]
+
+        different = _gltf_builder(True, "layer_abc.bin", bytes(16)).build()
+        assert different.model.buffers[0].uri != uri
+
+    def test_gltf_names_default(self):
+        gltf = _gltf_builder(False, "layer_abc.bin", bytes(16)).build()
+        assert gltf.model.buffers[0].uri == "layer_abc.bin"
+        assert gltf.resources[0].uri == "layer_abc.bin"
+
+    def test_usd_identifiers(self):
+        pytest.importorskip("pxr")
+        from glue_ar.common.usd_builder import USDBuilder
+
+        builder = USDBuilder(deterministic_names=True)
+        for _ in range(2):
+            builder.add_mesh([(0, 0, 0), (1, 0, 0), (0, 1, 0)], [(0, 1, 2)], color=(255, 0, 0), opacity=1)
+
+        assert dict(builder._mesh_counts) == {"mesh": 2}
+        assert builder.stage.GetPrimAtPath("/world/xform_mesh_1/mesh_mesh_1").IsValid()
+
+    def test_stl_header(self, tmp_path):
+        filepath = str(tmp_path / "mesh.stl")
+        STLBuilder(deterministic_names=True) \
+            .add_mesh([(0, 0, 0), (1, 0, 0), (0, 1, 0)], [(0, 1, 2)]) \
+            .build_and_export(filepath)
+
+        with open(filepath, "rb") as f:
+            assert f.read(80) == DETERMINISTIC_HEADER
+
+    @pytest.mark.parametrize("extension", ("gltf", "glb", "stl"))
+    def test_export_reproducible(self, tmp_path, extension):
+        viewer_state, layer_state = scatter_scene("deterministic_data", x=arange(10), y=arange(10) ** 2,
+                                                  z=arange(10) ** 3)
+        state_dictionary = {export_label_for_layer(layer_state): ("Scatter", ARVispyScatterExportOptions())}
+        bounds = xyz_bounds(viewer_state, with_resolution=False)
+
+        paths = []
+        for index in range(2):
+            directory = tmp_path / str(index)
+            directory.mkdir()
+            filepath = str(directory / f"export.{extension}")
+            export_viewer(viewer_state, [layer_state], bounds, state_dictionary, filepath,
+                          deterministic_names=True)
+            paths.append(filepath)
+
+        assert cmp(*paths, shallow=False)
@@ -0,0 +1,153 @@
+from os.path import getsize
+
+from gltflib import GLTF
+from numpy.random import default_rng
+import pytest
+
+from glue_ar.common.estimate import ExportEstimate, LayerEstimate, format_bytes
+from glue_ar.common.export import estimate_export, export_viewer
+from glue_ar.common.scatter_export_options import ARPointCloudExportOptions, ARVispyScatterExportOptions
+from glue_ar.common.tests.helpers import scatter_scene, volume_scene
+from glue_ar.common.volume_export_options import ARIsosurfaceExportOptions, ARVoxelExportOptions
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+def _gltf_counts(filepath):
+    model = GLTF.load(filepath).model
+    vertices = triangles = 0
+    for mesh in model.meshes:
+        primitive = mesh.primitives[0]
+        vertices += model.accessors[primitive.attributes.POSITION].count
+        triangles += model.accessors[primitive.indices].count // 3
+    return vertices, triangles, len(model.meshes), len(model.materials)
+
+
+class TestEstimate:
+
+    def scatter_setup(self, color_mode="Fixed", count=200):
+        rng = default_rng(7)
+        self.viewer_state, self.layer_state = scatter_scene("estimate_scatter", x=rng.random(count),
+                                                            y=rng.random(count), z=rng.random(count),
+                                                            c=rng.random(count))
+        self.layer_state.color_mode = color_mode
+        self.layer_state.cmap_att = self.layer_state.layer.id["c"]
+        self.bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+
+    def volume_setup(self):
+        self.viewer_state, self.layer_state = volume_scene("estimate_volume")
+        self.bounds = xyz_bounds(self.viewer_state, with_resolution=True)
+
+    def estimate_and_export(self, tmp_path, method, options, extension):
+        state_dictionary = {export_label_for_layer(self.layer_state): (method, options)}
+        estimate = estimate_export(self.viewer_state, [self.layer_state], self.bounds, state_dictionary, extension)
+        filepath = str(tmp_path / f"export.{extension}")
+        export_viewer(self.viewer_state, [self.layer_state], self.bounds, state_dictionary, filepath)
+        return estimate, filepath
+
+    @pytest.mark.parametrize("color_mode,log_points_per_mesh,lod_levels,colormap_texture",
+                             (("Fixed", 7, 1, False), ("Fixed", 1, 1, False), ("Linear", 7, 1, False),
+                              ("Linear", 1, 3, False), ("Linear", 7, 1, True), ("Linear", 1, 3, True)))
+    def test_scatter_gltf(self, tmp_path, color_mode, log_points_per_mesh, lod_levels, colormap_texture):
+        self.scatter_setup(color_mode)
+        options = ARVispyScatterExportOptions(resolution=8, log_points_per_mesh=log_points_per_mesh,
+                                              lod_levels=lod_levels, colormap_texture=colormap_texture)
+        estimate, filepath = self.estimate_and_export(tmp_path, "Scatter", options, "glb")
+
+        assert (estimate.vertices, estimate.triangles, estimate.meshes, estimate.materials) == \
+               _gltf_counts(filepath)
+        # The lower levels of detail are small enough that the per-mesh and per-material metadata dominates
+        assert estimate.bytes == pytest.approx(getsize(filepath), rel=0.05 if lod_levels == 1 else 0.1)
+
+    @pytest.mark.parametrize("color_mode", ("Fixed", "Linear"))
+    def test_points_gltf(self, tmp_path, color_mode):
+        # Point clouds are small, so we need enough points for the per-file metadata not to dominate
+        self.scatter_setup(color_mode, count=5000)
+        options = ARPointCloudExportOptions(log_points_per_mesh=3)
+        estimate, filepath = self.estimate_and_export(tmp_path, "Points", options, "glb")
+
+        model = GLTF.load(filepath).model
+        vertices = sum(model.accessors[mesh.primitives[0].attributes.POSITION].count for mesh in model.meshes)
+        assert (estimate.vertices, estimate.triangles, estimate.meshes, estimate.materials) == \
+               (vertices, 0, len(model.meshes), len(model.materials))
+        assert estimate.bytes == pytest.approx(getsize(filepath), rel=0.05)
+
+    @pytest.mark.parametrize("glyph,log_point_budget", (("Sphere", 7), ("Star", 7), ("Star", 3)))
+    def test_scatter_stl(self, tmp_path, glyph, log_point_budget):
+        self.scatter_setup(count=200 if log_point_budget == 7 else 3000)
+        options = ARVispyScatterExportOptions(glyph=glyph, log_point_budget=log_point_budget)
+        estimate, filepath = self.estimate_and_export(tmp_path, "Scatter", options, "stl")
+        if log_point_budget == 7:
+            assert estimate.bytes == getsize(filepath)
+        else:
+            # The estimate assumes that decimation keeps the whole budget, which voxel grids can fall a little short of
+            assert estimate.bytes == pytest.approx(getsize(filepath), rel=0.1)
+
+    @pytest.mark.parametrize("glyph,resolution,log_point_budget",
+                             (("Octahedron", 10, 7), ("Icosphere", 10, 7), ("Icosphere", 40, 7),
+                              ("Octahedron", 10, 3)))
+    def test_glyph_gltf(self, tmp_path, glyph, resolution, log_point_budget):
+        # Glyphs are small enough that a material per point would dominate the size
+        self.scatter_setup("Fixed", count=200 if log_point_budget == 7 else 3000)
+        options = ARVispyScatterExportOptions(glyph=glyph, resolution=resolution, log_points_per_mesh=3,
+                                              lod_levels=3, log_point_budget=log_point_budget)
+        estimate, filepath = self.estimate_and_export(tmp_path, "Scatter", options, "glb")
+        counts = (estimate.vertices, estimate.triangles, estimate.meshes, estimate.materials)
+        if log_point_budget == 7:
+            assert counts == _gltf_counts(filepath)
+            assert estimate.bytes == pytest.approx(getsize(filepath), rel=0.05)
+        else:
+            assert counts == pytest.approx(_gltf_counts(filepath), rel=0.1)
+            assert estimate.bytes == pytest.approx(getsize(filepath), rel=0.1)
+
+    def test_voxels_gltf(self, tmp_path):
+        self.volume_setup()
+        options = ARVoxelExportOptions(opacity_cutoff=0.2)
+        estimate, filepath = self.estimate_and_export(tmp_path, "Voxel", options, "glb")
+
+        assert (estimate.vertices, estimate.triangles, estimate.meshes, estimate.materials) == \
+               _gltf_counts(filepath)
+        assert estimate.bytes == pytest.approx(getsize(filepath), rel=0.05)
+
+    def test_isosurface_gltf(self, tmp_path):
+        self.volume_setup()
+        options = ARIsosurfaceExportOptions(isosurface_count=5)
+        estimate, filepath = self.estimate_and_export(tmp_path, "Isosurface", options, "glb")
+
+        vertices, triangles, meshes, materials = _gltf_counts(filepath)
+        assert estimate.vertices == vertices
+        assert estimate.triangles == pytest.approx(triangles, rel=0.05)
+        assert (estimate.meshes, estimate.materials) == (meshes, materials)
+
+        # Lower levels of detail are scaled down from the full surfaces, rather than counted
+        options.lod_levels = 2
+        estimate, filepath = self.estimate_and_export(tmp_path, "Isosurface", options, "glb")
+        vertices, triangles, meshes, materials = _gltf_counts(filepath)
+        assert estimate.vertices == pytest.approx(vertices, rel=0.1)
+        assert estimate.triangles == pytest.approx(triangles, rel=0.05)
+        assert (estimate.meshes, estimate.materials) == (meshes, materials)
+
+    def test_options_change_estimate(self):
+        self.scatter_setup()
+        options = ARVispyScatterExportOptions(resolution=5)
+        state_dictionary = {export_label_for_layer(self.layer_state): ("Scatter", options)}
+        small = estimate_export(self.viewer_state, [self.layer_state], self.bounds, state_dictionary, "glb")
+        options.resolution = 20
+        large = estimate_export(self.viewer_state, [self.layer_state], self.bounds, state_dictionary, "glb")
+        assert large.vertices > small.vertices
+        assert large.bytes > small.bytes
+
+    def test_unestimated_layers(self):
+        self.scatter_setup()
+        state_dictionary = {export_label_for_layer(self.layer_state): ("Unknown", ARVispyScatterExportOptions())}
+        estimate = estimate_export(self.viewer_state, [self.layer_state], self.bounds, state_dictionary, "glb")
+        assert estimate.layers == []
+        assert estimate.unestimated == ["estimate_scatter"]
+        assert "not including estimate_scatter" in estimate.summary()
+
+    def test_summary(self):
+        estimate = ExportEstimate(extension="glb",
+                                  layers=[LayerEstimate(layer="layer", method="Scatter", vertices=1200,
+                                                        triangles=2000, meshes=3, materials=2, bytes=2_500_000)])
+        assert estimate.summary() == "~1,200 vertices, 2,000 triangles in 3 meshes (2 materials), about 2.5 MB"
+        assert format_bytes(512) == "512 B"
+        assert format_bytes(3_400_000_000) == "3.4 GB"
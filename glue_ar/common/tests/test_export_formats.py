@@ -0,0 +1,114 @@
+from filecmp import cmp
+
+from gltflib import GLTF
+from numpy import arange
+from pxr import Usd, UsdGeom, UsdShade
+from stl import Mesh
+import pytest
+
+from glue_ar.common.export import export_viewer, export_viewer_formats
+from glue_ar.common.gltf_builder import GLTFBuilder
+from glue_ar.common.mesh_geometry import add_meshes_stl, add_meshes_usd, meshes_from_gltf
+from glue_ar.common.scatter_export_options import ARPointCloudExportOptions, ARVispyScatterExportOptions
+from glue_ar.common.scatter_gltf import add_vispy_scatter_layer_gltf
+from glue_ar.common.stl_builder import STLBuilder
+from glue_ar.common.tests.helpers import scatter_scene
+from glue_ar.common.usd_builder import USDBuilder
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+class TestExportFormats:
+
+    def setup_method(self, method):
+        self.viewer_state, self.layer_state = scatter_scene("formats_data", x=arange(10), y=arange(10) ** 2,
+                                                            z=arange(10) ** 3, c=arange(10))
+        self.layer_state.color_mode = "Linear"
+        self.layer_state.cmap_att = self.layer_state.layer.id["c"]
+        self.options = ARVispyScatterExportOptions(resolution=6)
+        self.state_dictionary = {export_label_for_layer(self.layer_state): ("Scatter", self.options)}
+        self.bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+
+    def gltf_builder(self) -> GLTFBuilder:
+        builder = GLTFBuilder()
+        add_vispy_scatter_layer_gltf(builder, self.viewer_state, self.layer_state, self.options, self.bounds)
+        return builder
+
+    def test_meshes_from_gltf(self):
+        self.layer_state.xerr_visible = True
+        self.layer_state.xerr_att = self.layer_state.layer.id["x"]
+        builder = self.gltf_builder()
+        meshes = meshes_from_gltf(builder)
+
+        # The error bars are line segments, so they should be skipped
+        assert len(builder.meshes) == 20
+        assert len(meshes) == 10
+        assert all(mesh.layer_id == "formats_data" for mesh in meshes)
+        assert all(mesh.triangles.shape[1] == 3 for mesh in meshes)
+        assert all(mesh.triangles.max() < len(mesh.points) for mesh in meshes)
+
+        material = builder.materials[builder.meshes[0].primitives[0].material]
+        color = material.pbrMetallicRoughness.baseColorFactor
+        assert meshes[0].color == tuple(round(c * 256) for c in color[:3])
+        assert meshes[0].opacity == color[3]
+
+    def test_add_meshes(self):
+        meshes = meshes_from_gltf(self.gltf_builder())
+        triangles = sum(len(mesh.triangles) for mesh in meshes)
+
+        stl = add_meshes_stl(STLBuilder(), meshes).build()
+        assert len(stl.vectors) == triangles
+        assert (stl.vectors[:len(meshes[0].triangles)] == meshes[0].points[meshes[0].triangles]).all()
+
+        stage = add_meshes_usd(USDBuilder(), meshes).stage
+        usd_meshes = [UsdGeom.Mesh(prim) for prim in stage.Traverse() if prim.IsA(UsdGeom.Mesh)]
+        assert len(usd_meshes) == len(meshes)
+        assert sum(len(mesh.GetFaceVertexCountsAttr().Get()) for mesh in usd_meshes) == triangles
+
+    def test_export_formats(self, tmp_path):
+        filepaths = [str(tmp_path / f"export.{extension}") for extension in ("glb", "usda", "stl")]
+        export_viewer_formats(self.viewer_state, [self.layer_state], self.bounds, self.state_dictionary,
+                              filepaths, deterministic_names=True)
+
+        single = str(tmp_path / "single.glb")
+        export_viewer(self.viewer_state, [self.layer_state], self.bounds, self.state_dictionary, single,
+                      deterministic_names=True)
+        assert cmp(filepaths[0], single, shallow=False)
+
+        model = GLTF.load(filepaths[0]).model
+        stage = Usd.Stage.Open(filepaths[1])
+        usd_meshes = [prim for prim in stage.Traverse() if prim.IsA(UsdGeom.Mesh)]
+        assert len(usd_meshes) == len(model.meshes)
+
+        triangles = sum(model.accessors[mesh.primitives[0].indices].count // 3 for mesh in model.meshes)
+        assert len(Mesh.from_file(filepaths[2]).vectors) == triangles
+
+    def test_colormap_texture(self, tmp_path):
+        self.options.colormap_texture = True
+        filepaths = [str(tmp_path / f"export.{extension}") for extension in ("glb", "usda")]
+        export_viewer_formats(self.viewer_state, [self.layer_state], self.bounds, self.state_dictionary,
+                              filepaths, deterministic_names=True)
+
+        # The USD meshes take their colors from the colormap texture, as with a direct USD export
+        stage = Usd.Stage.Open(filepaths[1])
+        usd_meshes = [prim for prim in stage.Traverse() if prim.IsA(UsdGeom.Mesh)]
+        assert usd_meshes
+        for prim in usd_meshes:
+            assert UsdGeom.PrimvarsAPI(prim).GetPrimvar("st").HasValue()
+        textures = [prim.GetAttribute("inputs:file").Get() for prim in stage.Traverse()
+                    if prim.IsA(UsdShade.Shader) and prim.GetAttribute("info:id").Get() == "UsdUVTexture"]
+        assert len(textures) == 1
+        assert (tmp_path / textures[0].path).exists()
+
+    @pytest.mark.parametrize("extension", ("usda", "stl"))
+    def test_points_method(self, tmp_path, extension):
+        # Point clouds have no triangles to write to the other formats
+        state_dictionary = {export_label_for_layer(self.layer_state): ("Points", ARPointCloudExportOptions())}
+        filepaths = [str(tmp_path / "export.glb"), str(tmp_path / f"export.{extension}")]
+        with pytest.raises(ValueError, match=f"Points export method for formats_data can't be used for {extension}"):
+            export_viewer_formats(self.viewer_state, [self.layer_state], self.bounds, state_dictionary, filepaths)
+        assert not any((tmp_path / name).exists() for name in ("export.glb", f"export.{extension}"))
+
+    def test_invalid_format(self, tmp_path):
+        with pytest.raises(ValueError):
+            export_viewer_formats(self.viewer_state, [self.layer_state], self.bounds, self.state_dictionary,
+                                  [str(tmp_path / "export.gltf"), str(tmp_path / "export.gltf.glb.bin")])
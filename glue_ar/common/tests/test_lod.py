@@ -0,0 +1,181 @@
+from gltflib import GLTF, AccessorType, BufferTarget, ComponentType
+from numpy.random import default_rng
+import pytest
+import struct
+
+from glue_ar.common.export import export_viewer
+from glue_ar.common.gltf_builder import MSFT_LOD, GLTFBuilder, default_screen_coverage
+from glue_ar.common.marching_cubes import add_isosurface_layer_gltf
+from glue_ar.common.mesh_geometry import meshes_from_gltf
+from glue_ar.common import scatter_gltf
+from glue_ar.common.scatter import decimate_scatter_layer, glyph_geometry, glyph_lod_resolutions, \
+                                   icosphere_subdivisions, lod_resolutions
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
+from glue_ar.common.tests.helpers import package_installed, scatter_scene, volume_scene
+from glue_ar.common.volume_export_options import ARIsosurfaceExportOptions
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+def _lod_builder() -> GLTFBuilder:
+    builder = GLTFBuilder()
+    builder.add_material(color=[255, 0, 0])
+    builder.add_buffer(byte_length=48, uri="lod.bin")
+    builder.add_buffer_view(buffer=0, byte_length=12, byte_offset=0, target=BufferTarget.ELEMENT_ARRAY_BUFFER)
+    builder.add_buffer_view(buffer=0, byte_length=36, byte_offset=12, target=BufferTarget.ARRAY_BUFFER)
+    builder.add_accessor(buffer_view=0, component_type=ComponentType.UNSIGNED_INT, count=3,
+                         type=AccessorType.SCALAR, mins=[0], maxes=[2])
+    builder.add_accessor(buffer_view=1, component_type=ComponentType.FLOAT, count=3,
+                         type=AccessorType.VEC3, mins=[0, 0, 0], maxes=[1, 1, 0])
+    data = struct.pack("<3I", 0, 1, 2) + struct.pack("<9f", 0, 0, 0, 1, 0, 0, 0, 1, 0)
+    builder.add_file_resource("lod.bin", data=bytearray(data))
+    for layer_id in ("layer", "layer", [], []):
+        builder.add_mesh(layer_id=layer_id, position_accessor=1, indices_accessor=0, material=0)
+    builder.add_lods(1, [2, 3])
+    return builder
+
+
+def _lod_nodes(model):
+    return {index: node.extensions[MSFT_LOD]["ids"] for index, node in enumerate(model.nodes)
+            if node.extensions and MSFT_LOD in node.extensions}
+
+
+class TestLODs:
+
+    def test_builder(self):
+        builder = _lod_builder()
+        assert builder.lod_meshes == {2, 3}
+        assert builder.add_lods(0, []).lods.keys() == {1}
+
+        model = builder.build_model()
+        assert model.scenes[0].nodes == [0, 1]
+        assert _lod_nodes(model) == {1: [2, 3]}
+        assert model.nodes[1].extras == {"MSFT_screencoverage": default_screen_coverage(3)}
+        assert MSFT_LOD in model.extensionsUsed
+        assert MSFT_LOD not in (model.extensionsRequired or [])
+
+    def test_merge(self):
+        builder = _lod_builder().merge(_lod_builder())
+        assert builder.lods == {1: ([2, 3], default_screen_coverage(3)), 5: ([6, 7], default_screen_coverage(3))}
+        assert builder.build_model().scenes[0].nodes == [0, 1, 4, 5]
+
+    def test_screen_coverage(self):
+        assert default_screen_coverage(1) == [0.0]
+        coverage = default_screen_coverage(3)
+        assert coverage == sorted(coverage, reverse=True)
+        assert coverage[-1] == 0
+
+    def test_lod_resolutions(self):
+        assert lod_resolutions(16, 3) == [16, 8, 4]
+        assert lod_resolutions(10, 1) == [10]
+        assert lod_resolutions(5, 3) == [5, 3]
+        assert lod_resolutions(3, 3) == [3]
+
+    def test_glyph_lod_resolutions(self):
+        assert glyph_lod_resolutions("Sphere", 16, 3) == [16, 8, 4]
+        assert glyph_lod_resolutions("Star", 16, 3) == [16]
+        # Each icosphere level has fewer subdivisions than the last
+        resolutions = glyph_lod_resolutions("Icosphere", 40, 3)
+        subdivisions = [icosphere_subdivisions(resolution) for resolution in resolutions]
+        assert subdivisions == [3, 2, 1]
+        assert glyph_lod_resolutions("Icosphere", 8, 3) == [8]
+
+    @pytest.mark.parametrize("color_mode", ("Fixed", "Linear", "Textured"))
+    def test_scatter(self, tmp_path, color_mode):
+        rng = default_rng(3)
+        viewer_state, layer_state = scatter_scene("lod_scatter", x=rng.random(50), y=rng.random(50),
+                                                  z=rng.random(50), c=rng.integers(0, 2, 50))
+        layer_state.color_mode = "Fixed" if color_mode == "Fixed" else "Linear"
+        layer_state.cmap_att = layer_state.layer.id["c"]
+        layer_state.cmap_vmin, layer_state.cmap_vmax = 0, 1
+        bounds = xyz_bounds(viewer_state, with_resolution=False)
+
+        options = ARVispyScatterExportOptions(resolution=16, log_points_per_mesh=1, lod_levels=3,
+                                              colormap_texture=color_mode == "Textured")
+        filepath = str(tmp_path / "scatter.gltf")
+        export_viewer(viewer_state, [layer_state], bounds, {export_label_for_layer(layer_state): ("Scatter", options)},
+                      filepath)
+
+        model = GLTF.load(filepath).model
+        lods = _lod_nodes(model)
+        # Each chunk has a chain of two lower levels
+        assert len(lods) == len(model.scenes[0].nodes) == len(model.meshes) // 3
+        for index, ids in lods.items():
+            counts = [model.accessors[model.meshes[i].primitives[0].attributes.POSITION].count for i in [index] + ids]
+            assert counts == sorted(counts, reverse=True)
+            assert len(set(counts)) == 3
+            # The lower levels use the same materials as the full resolution level
+            materials = [model.meshes[i].primitives[0].material for i in [index] + ids]
+            assert materials[0] is not None
+            assert set(materials) == {materials[0]}
+
+        # Rather than a copy of each material (and colormap texture) for every level
+        assert len(model.materials) == (2 if color_mode == "Linear" else 1)
+        assert len(model.images or []) == (1 if color_mode == "Textured" else 0)
+
+    def test_scatter_points_once(self, tmp_path, monkeypatch):
+        calls = []
+
+        def decimate(*args, **kwargs):
+            calls.append(args)
+            return decimate_scatter_layer(*args, **kwargs)
+
+        monkeypatch.setattr(scatter_gltf, "decimate_scatter_layer", decimate)
+
+        rng = default_rng(4)
+        viewer_state, layer_state = scatter_scene("lod_budget", x=rng.random(5000), y=rng.random(5000),
+                                                  z=rng.random(5000))
+        bounds = xyz_bounds(viewer_state, with_resolution=False)
+
+        options = ARVispyScatterExportOptions(resolution=16, lod_levels=3, log_point_budget=3)
+        filepath = str(tmp_path / "scatter.gltf")
+        export_viewer(viewer_state, [layer_state], bounds, {export_label_for_layer(layer_state): ("Scatter", options)},
+                      filepath)
+
+        # The points are masked and decimated once, and every level has a glyph for each of them
+        assert len(calls) == 1
+        model = GLTF.load(filepath).model
+        (index, ids), = _lod_nodes(model).items()
+        counts = [model.accessors[model.meshes[i].primitives[0].attributes.POSITION].count for i in [index] + ids]
+        glyph_sizes = [len(glyph_geometry("Sphere", resolution)[0]((0, 0, 0), 1)) for resolution in (16, 8, 4)]
+        points = {count // size for count, size in zip(counts, glyph_sizes)}
+        assert len(points) == 1
+        assert points.pop() <= 1000
+
+    def test_isosurface(self, tmp_path):
+        viewer_state, layer_state = volume_scene("lod_volume")
+        bounds = xyz_bounds(viewer_state, with_resolution=True)
+
+        options = ARIsosurfaceExportOptions(isosurface_count=3, lod_levels=2)
+        export_viewer(viewer_state, [layer_state], bounds,
+                      {export_label_for_layer(layer_state): ("Isosurface", options)},
+                      str(tmp_path / "volume.gltf"))
+        model = GLTF.load(str(tmp_path / "volume.gltf")).model
+        lods = _lod_nodes(model)
+        assert len(lods) == 3
+        for index, (lod,) in lods.items():
+            primary = model.meshes[index].primitives[0]
+            lower = model.meshes[lod].primitives[0]
+            # Levels of detail share the material of the full surface, and cover about the same region
+            assert lower.material == primary.material
+            assert model.accessors[lower.attributes.POSITION].count < model.accessors[primary.attributes.POSITION].count
+            primary_accessor = model.accessors[primary.attributes.POSITION]
+            lower_accessor = model.accessors[lower.attributes.POSITION]
+            assert lower_accessor.min == pytest.approx(primary_accessor.min, abs=0.25)
+            assert lower_accessor.max == pytest.approx(primary_accessor.max, abs=0.25)
+
+        # Only the full resolution surfaces are used for other formats
+        builder = GLTFBuilder()
+        add_isosurface_layer_gltf(builder, viewer_state, layer_state, options, bounds)
+        assert len(meshes_from_gltf(builder)) == 3
+
+    @pytest.mark.skipif(not package_installed("DracoPy"), reason="Requires DracoPy")
+    def test_draco(self):
+        from glue_ar.compression_draco import create_draco_model
+
+        builder = _lod_builder()
+        builder.add_mesh(layer_id="layer", position_accessor=1, indices_accessor=0, material=0)
+        draco_builder = create_draco_model(builder)
+        # The layer meshes come first, followed by the levels of detail
+        assert draco_builder.mesh_count == 5
+        assert draco_builder.lods == {1: ([3, 4], default_screen_coverage(3))}
+        assert draco_builder.build_model().scenes[0].nodes == [0, 1, 2]
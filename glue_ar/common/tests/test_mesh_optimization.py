@@ -0,0 +1,122 @@
+from gltflib import AccessorType, BufferTarget, ComponentType
+import numpy as np
+
+from glue_ar.common.gltf_builder import GLTFBuilder
+from glue_ar.common.mesh_optimization import ACMRReport, acmr, optimize_gl, \
+                                             optimize_vertex_cache, optimize_vertex_fetch
+from glue_ar.common.shapes import sphere_points, sphere_points_count, sphere_triangles
+from glue_ar.gltf_utils import accessor_to_numpy, get_data
+
+
+def _triangle_set(indices, vertices):
+    triangles = vertices[indices.reshape(-1, 3)]
+    return {tuple(sorted(map(tuple, triangle))) for triangle in triangles}
+
+
+def _sphere_grid(count):
+    triangles = np.array(sphere_triangles(theta_resolution=8, phi_resolution=8), dtype=np.uint32)
+    points_per_sphere = sphere_points_count(theta_resolution=8, phi_resolution=8)
+    points = np.concatenate([
+        np.array(sphere_points(center=(i, 0, 0), radius=0.25, theta_resolution=8, phi_resolution=8))
+        for i in range(count)
+    ]).astype(np.float32)
+    indices = np.concatenate([triangles + i * points_per_sphere for i in range(count)]).astype(np.uint32).ravel()
+    return points, indices
+
+
+def _sphere_builder(points, indices):
+    builder = GLTFBuilder()
+    builder.add_material(color=[255, 0, 0])
+    barr = bytearray(points.tobytes())
+    barr.extend(indices.tobytes())
+    builder.add_buffer(byte_length=len(barr), uri="sphere.bin")
+    builder.add_buffer_view(buffer=0, byte_length=points.nbytes, byte_offset=0,
+                            target=BufferTarget.ARRAY_BUFFER)
+    builder.add_buffer_view(buffer=0, byte_length=indices.nbytes, byte_offset=points.nbytes,
+                            target=BufferTarget.ELEMENT_ARRAY_BUFFER)
+    builder.add_accessor(buffer_view=0, component_type=ComponentType.FLOAT, count=len(points),
+                         type=AccessorType.VEC3, mins=points.min(axis=0).tolist(),
+                         maxes=points.max(axis=0).tolist())
+    builder.add_accessor(buffer_view=1, component_type=ComponentType.UNSIGNED_INT, count=len(indices),
+                         type=AccessorType.SCALAR, mins=[int(indices.min())], maxes=[int(indices.max())])
+    builder.add_file_resource("sphere.bin", data=barr)
+    builder.add_mesh(layer_id="layer", position_accessor=0, indices_accessor=1, material=0)
+    return builder
+
+
+class TestMeshOptimization:
+
+    def test_acmr(self):
+        # Every vertex of a lone triangle is a miss
+        assert acmr(np.array([0, 1, 2])) == 3
+        # A fan reuses two vertices per triangle
+        assert acmr(np.array([0, 1, 2, 0, 2, 3, 0, 3, 4])) == 5 / 3
+        # A cache of size 3 can't hold onto the shared vertex
+        assert acmr(np.array([0, 1, 2, 3, 4, 5, 0, 1, 2]), cache_size=3) == 3
+        assert acmr(np.array([], dtype=np.uint32)) == 0
+
+    def test_optimize_vertex_cache(self):
+        points, indices = _sphere_grid(1)
+        shuffled = np.random.default_rng(12).permutation(indices.reshape(-1, 3)).ravel()
+
+        optimized = optimize_vertex_cache(shuffled)
+
+        assert optimized.shape == shuffled.shape
+        assert _triangle_set(optimized, points) == _triangle_set(shuffled, points)
+        assert acmr(optimized) < acmr(shuffled)
+
+    def test_optimize_vertex_fetch(self):
+        points, indices = _sphere_grid(2)
+        indices = indices[::-1].copy()
+
+        new_indices, remap = optimize_vertex_fetch(indices, len(points))
+        new_points = points[remap]
+
+        assert np.array_equal(new_points[new_indices], points[indices])
+        # Vertices should be laid out in order of first use
+        _, first_use = np.unique(new_indices, return_index=True)
+        assert np.all(np.diff(first_use) > 0)
+
+    def test_optimize_gl(self):
+        points, indices = _sphere_grid(4)
+        builder = _sphere_builder(points, indices)
+
+        optimized, reports = optimize_gl(builder)
+
+        assert len(reports) == 1
+        report = reports[0]
+        assert report.triangles == len(indices) // 3
+        assert report.acmr_after <= report.acmr_before
+        assert optimized.meshes_by_layer == {"layer": [0]}
+        assert optimized.mesh_count == 1
+
+        gltf = optimized.build()
+        model = gltf.model
+        buffers_data = [get_data(resource) for resource in gltf.resources]
+        primitive = model.meshes[0].primitives[0]
+        new_points = accessor_to_numpy(model, primitive.attributes.POSITION, buffers_data)
+        new_indices = accessor_to_numpy(model, primitive.indices, buffers_data)
+        assert _triangle_set(new_indices, new_points) == _triangle_set(indices, points)
+
+    def test_optimize_gl_textures(self):
+        builder = _sphere_builder(*_sphere_grid(2))
+        builder.add_file_resource("colormap.png", data=bytearray(8), mime_type="image/png")
+        builder.add_image("colormap.png").add_sampler().add_texture(source=0, sampler=0)
+        builder.add_material(color=[1, 1, 1], base_color_texture=0)
+
+        optimized, _ = optimize_gl(builder)
+        assert optimized.textures == builder.textures
+        assert optimized.materials[1].pbrMetallicRoughness.baseColorTexture.index == 0
+        assert [resource.uri for resource in optimized.image_resources] == ["colormap.png"]
+        assert optimized.build_model().images[0].uri == "colormap.png"
+
+    def test_combine_reports(self):
+        reports = [ACMRReport(triangles=10, acmr_before=1.0, acmr_after=0.5),
+                   ACMRReport(triangles=30, acmr_before=2.0, acmr_after=1.0)]
+
+        combined = ACMRReport.combine(reports)
+
+        assert combined.triangles == 40
+        assert combined.acmr_before == 1.75
+        assert combined.acmr_after == 0.875
+        assert ACMRReport.combine([]) == ACMRReport(triangles=0, acmr_before=0.0, acmr_after=0.0)
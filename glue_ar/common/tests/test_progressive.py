@@ -0,0 +1,105 @@
+import json
+import re
+import struct
+
+from gltflib import GLTF
+from numpy.random import default_rng
+import pytest
+
+from glue_ar.common.export import export_viewer
+from glue_ar.common.progressive import PREVIEW_LOG_POINT_BUDGET, preview_manifest, preview_state
+from glue_ar.common.scatter_export_options import ARPointCloudExportOptions, ARVispyScatterExportOptions
+from glue_ar.common.tests.helpers import package_installed, scatter_scene
+from glue_ar.common.volume_export_options import ARIsosurfaceExportOptions
+from glue_ar.gltf_utils import accessor_to_numpy
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+def _preview_glb(filepath, manifest) -> bytes:
+    # The same as the model-viewer page does in the browser
+    with open(filepath, "rb") as f:
+        f.seek(manifest["start"])
+        binary = f.read(manifest["end"] - manifest["start"] + 1)
+    content = json.dumps(manifest["gltf"]).encode()
+    content += b" " * (-len(content) % 4)
+    return struct.pack("<4sII", b"glTF", 2, 28 + len(content) + len(binary)) + \
+        struct.pack("<II", len(content), 0x4E4F534A) + content + \
+        struct.pack("<II", len(binary), 0x004E4942) + binary
+
+
+def _vertex_count(model, mesh):
+    return model.accessors[mesh.primitives[0].attributes.POSITION].count
+
+
+class TestProgressive:
+
+    def setup_method(self, method):
+        rng = default_rng(4)
+        self.viewer_state, self.layer_state = scatter_scene("progressive_data", x=rng.random(1000),
+                                                            y=rng.random(1000), z=rng.random(1000))
+        self.data = self.layer_state.layer
+        self.bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+        self.options = ARVispyScatterExportOptions(resolution=12, log_points_per_mesh=3, lod_levels=2)
+
+    def export(self, filepath, **kwargs):
+        export_viewer(self.viewer_state, [self.layer_state], self.bounds,
+                      {export_label_for_layer(self.layer_state): ("Scatter", self.options)},
+                      str(filepath), **kwargs)
+
+    def test_preview_state(self):
+        preview = preview_state(self.options)
+        assert (preview.resolution, preview.log_point_budget, preview.lod_levels) == (3, PREVIEW_LOG_POINT_BUDGET, 1)
+        assert preview.log_points_per_mesh == self.options.log_points_per_mesh
+        assert self.options.resolution == 12
+
+        assert preview_state(ARIsosurfaceExportOptions(isosurface_count=20)).isosurface_count == 5
+        assert preview_state(ARIsosurfaceExportOptions(isosurface_count=2)).isosurface_count == 1
+        assert preview_state(ARPointCloudExportOptions(log_points_per_mesh=4)).log_points_per_mesh == 4
+
+    @pytest.mark.parametrize("optimize_meshes", (False, True))
+    def test_export(self, tmp_path, optimize_meshes):
+        filepath = tmp_path / "progressive.glb"
+        self.export(filepath, progressive=True, model_viewer=True, optimize_meshes=optimize_meshes)
+
+        model = GLTF.load(str(filepath)).model
+        assert model.scene == 0
+        full, preview = model.scenes
+        assert preview.name == "preview"
+        assert not set(full.nodes) & set(preview.nodes)
+        preview_vertices = sum(_vertex_count(model, model.meshes[node]) for node in preview.nodes)
+        full_vertices = sum(_vertex_count(model, model.meshes[node]) for node in full.nodes)
+        assert preview_vertices < full_vertices / 5
+
+        # The preview can be shown from the start of the file alone
+        manifest = preview_manifest(str(filepath))
+        assert manifest["end"] < filepath.stat().st_size / 5
+        (tmp_path / "preview.glb").write_bytes(_preview_glb(filepath, manifest))
+        preview_gltf = GLTF.load(str(tmp_path / "preview.glb"))
+        preview_model = preview_gltf.model
+        assert len(preview_model.meshes) == len(preview.nodes)
+        positions = accessor_to_numpy(preview_model, preview_model.meshes[0].primitives[0].attributes.POSITION,
+                                      [preview_gltf.resources[0].data])
+        assert positions.min() >= -1.1 and positions.max() <= 1.1
+
+        html = (tmp_path / "progressive.html").read_text()
+        embedded = re.search(r'<script type="application/json" id="preview">(.*?)</script>', html).group(1)
+        assert json.loads(embedded) == manifest
+
+    def test_not_progressive(self, tmp_path):
+        self.export(tmp_path / "model.glb", model_viewer=True)
+        assert len(GLTF.load(str(tmp_path / "model.glb")).model.scenes) == 1
+        assert preview_manifest(str(tmp_path / "model.glb")) is None
+        assert 'id="preview"' not in (tmp_path / "model.html").read_text()
+
+        # Only GLB files are progressive
+        self.export(tmp_path / "model.gltf", progressive=True)
+        assert len(GLTF.load(str(tmp_path / "model.gltf")).model.scenes) == 1
+
+    @pytest.mark.skipif(not package_installed("DracoPy"), reason="Requires DracoPy")
+    def test_draco(self, tmp_path):
+        filepath = tmp_path / "draco.glb"
+        self.export(filepath, progressive=True, compression="draco")
+        manifest = preview_manifest(str(filepath))
+        assert manifest["end"] < filepath.stat().st_size / 5
+        (tmp_path / "preview.glb").write_bytes(_preview_glb(filepath, manifest))
+        assert len(GLTF.load(str(tmp_path / "preview.glb")).model.meshes) > 0
@@ -196,10 +196,11 @@ class BaseScatterTest:
         if viewer_type == "vispy":
             def state_maker():
                 return ARVispyScatterExportOptions(resolution=15,
-                                                   log_points_per_mesh=0)
+                                                   log_points_per_mesh=0,
+                                                   spatial_chunks=False)
         elif viewer_type == "ipyvolume":
             def state_maker():
-                return ARIpyvolumeScatterExportOptions(log_points_per_mesh=0)
+                return ARIpyvolumeScatterExportOptions(log_points_per_mesh=0, spatial_chunks=False)
         else:
             raise ValueError("Viewer type should be either vispy or ipyvolume")
 
@@ -1,18 +1,26 @@
+from os import remove
 from sys import platform
 from tempfile import NamedTemporaryFile
 
-from gltflib import AccessorType, AlphaMode, BufferTarget, ComponentType, GLTFModel
+from gltflib import AccessorType, AlphaMode, BufferTarget, ComponentType, GLTFModel, PrimitiveMode
 from gltflib.gltf import GLTF
+from numpy import arange, array_equal, asarray, meshgrid, prod, stack
+from numpy.random import default_rng
 import pytest
 
 from glue_ar.common.export import export_viewer
-from glue_ar.common.shapes import sphere_points_count, sphere_triangles, sphere_triangles_count
+from glue_ar.common.scatter import box_points_getter, glyph_geometry, glyph_triangle_indices, glyph_vertices, \
+                                   morton_order
+from glue_ar.common.scatter_export_options import SCATTER_GLYPHS, ARPointCloudExportOptions, \
+                                                  ARVispyScatterExportOptions
+from glue_ar.common.shapes import octahedron_points_count, octahedron_triangles_count, sphere_points_count, \
+                                  sphere_triangles, sphere_triangles_count, star_points_count, star_triangles_count
 from glue_ar.common.tests.gltf_helpers import count_indices, count_vertices, unpack_vertices
-from glue_ar.common.tests.helpers import APP_VIEWER_OPTIONS
+from glue_ar.common.tests.helpers import APP_VIEWER_OPTIONS, package_installed, scatter_scene
 from glue_ar.common.tests.test_scatter import BaseScatterTest
-from glue_ar.gltf_utils import index_export_option
-from glue_ar.utils import export_label_for_layer, hex_to_components, layers_to_export, mask_for_bounds, \
-                          xyz_bounds, xyz_for_layer
+from glue_ar.gltf_utils import accessor_to_numpy, get_data, index_export_option
+from glue_ar.utils import colormap_coordinates, export_label_for_layer, hex_to_components, layers_to_export, \
+                          mask_for_bounds, xyz_bounds, xyz_for_layer
 
 
 class TestScatterGLTF(BaseScatterTest):
@@ -99,8 +107,8 @@ class TestScatterGLTF(BaseScatterTest):
         data = xyz_for_layer(self.viewer.state, layer.state,
                              preserve_aspect=self.viewer.state.native_aspect,
                              mask=mask,
-                             scaled=True)
-        data = data[:, [1, 2, 0]]
+                             scaled=True,
+                             axis_order=(1, 2, 0))
 
         # Check that the center of each sphere mesh matches the
         # corresponding data point
@@ -112,3 +120,228 @@ class TestScatterGLTF(BaseScatterTest):
             center = tuple(sum(p[i] for p in points) / n_points for i in range(3))
             data_point = data[index]
             assert all(abs(center[i] - data_point[i]) < tolerance for i in range(len(center)))
+
+    @pytest.mark.parametrize("app_type,viewer_type", APP_VIEWER_OPTIONS)
+    def test_parallel_export(self, app_type: str, viewer_type: str):
+        if app_type == "jupyter" and viewer_type == "vispy" and platform == "win32":
+            return
+        self.basic_setup(app_type, viewer_type)
+        bounds = xyz_bounds(self.viewer.state, with_resolution=False)
+        layer_states = [layer.state for layer in layers_to_export(self.viewer)]
+
+        models = []
+        for parallel in (False, True):
+            tmpfile = NamedTemporaryFile(suffix=".gltf", delete=False)
+            tmpfile.close()
+            export_viewer(self.viewer.state,
+                          layer_states=layer_states,
+                          bounds=bounds,
+                          state_dictionary=self.state_dictionary,
+                          filepath=tmpfile.name,
+                          compression=None,
+                          parallel=parallel)
+            models.append(GLTF.load(tmpfile.name).model)
+            remove(tmpfile.name)
+
+        serial, parallel = models
+        assert len(parallel.meshes) == len(serial.meshes)
+        assert len(parallel.accessors) == len(serial.accessors)
+        assert len(parallel.materials) == len(serial.materials)
+        assert [mesh.primitives[0].indices for mesh in parallel.meshes] == \
+               [mesh.primitives[0].indices for mesh in serial.meshes]
+
+
+def test_morton_order():
+    rng = default_rng(11)
+    grid = stack(meshgrid(arange(8), arange(8), arange(8)), axis=-1).reshape(-1, 3)
+    points = rng.permutation(grid).astype(float)
+    order = morton_order(points)
+    assert sorted(order) == list(range(len(points)))
+
+    # Each run of 64 points in Morton order should fill exactly one octant of the grid
+    chunks = points[order].reshape(8, 64, 3)
+    extents = chunks.max(axis=1) - chunks.min(axis=1)
+    assert (extents == 3).all()
+    assert len({tuple(chunk.min(axis=0)) for chunk in chunks}) == 8
+
+
+@pytest.mark.parametrize("color_mode", ("Fixed", "Linear"))
+def test_spatial_chunks(tmp_path, color_mode):
+    rng = default_rng(5)
+    # Only two colors, so that there are several chunks of each color
+    viewer_state, layer_state = scatter_scene("chunk_data", x=rng.random(400), y=rng.random(400),
+                                              z=rng.random(400), c=rng.integers(0, 2, 400))
+    layer_state.color_mode = color_mode
+    layer_state.cmap_att = layer_state.layer.id["c"]
+    layer_state.cmap_vmin, layer_state.cmap_vmax = 0, 1
+    bounds = xyz_bounds(viewer_state, with_resolution=False)
+
+    volumes = {}
+    for spatial_chunks in (False, True):
+        options = ARVispyScatterExportOptions(resolution=4, log_points_per_mesh=1, spatial_chunks=spatial_chunks)
+        filepath = str(tmp_path / f"chunks_{spatial_chunks}.gltf")
+        export_viewer(viewer_state, [layer_state], bounds, {export_label_for_layer(layer_state): ("Scatter", options)},
+                      filepath)
+        model = GLTF.load(filepath).model
+        extents = []
+        for mesh in model.meshes:
+            accessor = model.accessors[mesh.primitives[0].attributes.POSITION]
+            extents.append(prod([hi - lo for lo, hi in zip(accessor.min, accessor.max)]))
+        volumes[spatial_chunks] = (len(model.meshes), sum(extents))
+
+    # The same number of meshes, but covering much less space
+    assert volumes[True][0] == volumes[False][0]
+    assert volumes[True][1] < 0.5 * volumes[False][1]
+
+
+@pytest.mark.parametrize("glyph,points_count,triangles_count",
+                         (("Octahedron", octahedron_points_count(), octahedron_triangles_count()),
+                          ("Cross", star_points_count(2), star_triangles_count(2)),
+                          ("Star", star_points_count(3), star_triangles_count(3))))
+def test_glyph_export(tmp_path, glyph, points_count, triangles_count):
+    rng = default_rng(7)
+    viewer_state, layer_state = scatter_scene("glyph_data", x=rng.random(100), y=rng.random(100),
+                                              z=rng.random(100))
+    bounds = xyz_bounds(viewer_state, with_resolution=False)
+
+    options = ARVispyScatterExportOptions(glyph=glyph, resolution=30, log_points_per_mesh=7, lod_levels=3)
+    filepath = str(tmp_path / "glyphs.gltf")
+    export_viewer(viewer_state, [layer_state], bounds, {export_label_for_layer(layer_state): ("Scatter", options)},
+                  filepath)
+
+    # The glyphs don't depend on the resolution, and don't have levels of detail
+    model = GLTF.load(filepath).model
+    assert len(model.meshes) == 1
+    assert model.extensionsUsed is None or "MSFT_lod" not in model.extensionsUsed
+    primitive = model.meshes[0].primitives[0]
+    assert model.accessors[primitive.attributes.POSITION].count == 100 * points_count
+    assert model.accessors[primitive.indices].count == 300 * triangles_count
+
+
+@pytest.mark.parametrize("color_mode", ("Fixed", "Linear"))
+def test_points_export(tmp_path, color_mode):
+    rng = default_rng(9)
+    viewer_state, layer_state = scatter_scene("points_data", x=rng.random(1500), y=rng.random(1500),
+                                              z=rng.random(1500), c=rng.random(1500))
+    layer_state.color_mode = color_mode
+    layer_state.cmap_att = layer_state.layer.id["c"]
+    bounds = xyz_bounds(viewer_state, with_resolution=False)
+
+    options = ARPointCloudExportOptions(log_points_per_mesh=3)
+    filepath = str(tmp_path / "points.glb")
+    export_viewer(viewer_state, [layer_state], bounds, {export_label_for_layer(layer_state): ("Points", options)},
+                  filepath)
+
+    model = GLTF.load(filepath).model
+    assert len(model.meshes) == 2
+    assert len(model.materials) == 1
+    count = 0
+    for mesh in model.meshes:
+        primitive = mesh.primitives[0]
+        assert primitive.mode == PrimitiveMode.POINTS.value
+        assert primitive.indices is None
+        count += model.accessors[primitive.attributes.POSITION].count
+        if color_mode == "Fixed":
+            assert primitive.attributes.COLOR_0 is None
+        else:
+            colors = model.accessors[primitive.attributes.COLOR_0]
+            assert colors.componentType == ComponentType.UNSIGNED_BYTE.value
+            assert colors.type == AccessorType.VEC4.value
+            assert colors.normalized
+    assert count == 1500
+
+    # Positions and colors are the only per-point data
+    bytes_per_point = 16 if color_mode == "Linear" else 12
+    assert sum(buffer.byteLength for buffer in model.buffers) == bytes_per_point * 1500
+
+    if package_installed("DracoPy"):
+        # Point clouds can't be Draco-compressed, so they're kept as they are
+        export_viewer(viewer_state, [layer_state], bounds,
+                      {export_label_for_layer(layer_state): ("Points", options)},
+                      filepath, compression="draco")
+        compressed = GLTF.load(filepath).model
+        assert [mesh.primitives[0].mode for mesh in compressed.meshes] == [PrimitiveMode.POINTS.value] * 2
+        assert [mesh.primitives[0].attributes for mesh in compressed.meshes] == \
+               [mesh.primitives[0].attributes for mesh in model.meshes]
+        assert compressed.accessors == model.accessors
+
+
+@pytest.mark.parametrize("log_points_per_mesh", (1, 7))
+def test_colormap_texture(tmp_path, log_points_per_mesh):
+    rng = default_rng(4)
+    viewer_state, layer_state = scatter_scene("texture_data", x=rng.random(60), y=rng.random(60), z=rng.random(60),
+                                              c=rng.random(60))
+    layer_state.color_mode = "Linear"
+    layer_state.cmap_att = layer_state.layer.id["c"]
+    layer_state.cmap_vmin, layer_state.cmap_vmax = 0, 1
+    layer_state.xerr_visible = True
+    layer_state.xerr_att = layer_state.layer.id["c"]
+    bounds = xyz_bounds(viewer_state, with_resolution=False)
+
+    options = ARVispyScatterExportOptions(resolution=4, log_points_per_mesh=log_points_per_mesh,
+                                          spatial_chunks=False, colormap_texture=True)
+    state_dictionary = {export_label_for_layer(layer_state): ("Scatter", options)}
+    filepath = str(tmp_path / "texture.gltf")
+    export_viewer(viewer_state, [layer_state], bounds, state_dictionary, filepath)
+
+    gltf = GLTF.load(filepath, load_file_resources=True)
+    model = gltf.model
+    # A single material for the whole layer, with its color read from the colormap
+    assert len(model.materials) == 1
+    pbr = model.materials[0].pbrMetallicRoughness
+    assert pbr.baseColorFactor[:3] == [1, 1, 1]
+    assert model.textures[pbr.baseColorTexture.index].source == 0
+    assert len(model.images) == 1
+    assert (tmp_path / model.images[0].uri).exists()
+
+    buffers_data = [get_data(gltf.get_resource(buffer.uri)) for buffer in model.buffers]
+    sphere_count = 1 if log_points_per_mesh == 7 else 6
+    assert len(model.meshes) == sphere_count + 1
+    coordinates = []
+    for mesh in model.meshes[:sphere_count]:
+        primitive = mesh.primitives[0]
+        assert primitive.material == 0
+        assert model.accessors[primitive.attributes.TEXCOORD_0].count == \
+               model.accessors[primitive.attributes.POSITION].count
+        coordinates.append(accessor_to_numpy(model, primitive.attributes.TEXCOORD_0, buffers_data))
+
+    # Each vertex of a sphere has the coordinate of its point
+    expected = colormap_coordinates(layer_state, layer_state.layer["c"])
+    points_count = sphere_points_count(4, 4)
+    uvs = stack([uv for chunk in coordinates for uv in chunk])
+    assert array_equal(uvs[::points_count, 0], expected)
+    assert (uvs[:, 1] == 0.5).all()
+
+    # The error bars share the material
+    errors = model.meshes[-1].primitives[0]
+    assert errors.mode == PrimitiveMode.LINES.value
+    assert errors.material == 0
+    assert errors.attributes.TEXCOORD_0 is not None
+
+    # Embedded images need to keep their type
+    filepath = str(tmp_path / "texture.glb")
+    export_viewer(viewer_state, [layer_state], bounds, state_dictionary, filepath)
+    image = GLTF.load(filepath).model.images[0]
+    assert image.bufferView is not None
+    assert image.mimeType == "image/png"
+
+
+@pytest.mark.parametrize("glyph", SCATTER_GLYPHS + ["Box"])
+def test_glyph_vertices(glyph):
+    if glyph == "Box":
+        points_getter, triangles = box_points_getter, [(0, 1, 2)]
+    else:
+        points_getter, triangles = glyph_geometry(glyph, 8)
+    rng = default_rng(4)
+    centers = rng.random((20, 3)).astype("float32")
+    sizes = rng.random(20)
+
+    # The vectorized glyphs match building each point's glyph on its own
+    vertices = glyph_vertices(points_getter, centers, sizes)
+    expected = [points_getter(center, size) for center, size in zip(centers.tolist(), sizes.tolist())]
+    assert vertices == pytest.approx(asarray(expected), abs=1e-6)
+
+    points_count = len(expected[0])
+    indices = glyph_triangle_indices(triangles, points_count, 3)
+    assert indices.tolist() == [[index + offset for index in triangle]
+                                for offset in (0, points_count, 2 * points_count) for triangle in triangles]
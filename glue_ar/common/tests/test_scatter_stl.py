@@ -37,9 +37,8 @@ class TestScatterSTL(BaseScatterTest):
         data = xyz_for_layer(self.viewer.state, layer.state,
                              preserve_aspect=self.viewer.state.native_aspect,
                              mask=mask,
-                             scaled=True)
-
-        data = data[:, [1, 2, 0]]
+                             scaled=True,
+                             axis_order=(1, 2, 0))
 
         # Check that the center of each sphere mesh matches the
         # corresponding data point
@@ -1,12 +1,15 @@
 from sys import platform
 from tempfile import NamedTemporaryFile
+from zipfile import ZipFile
 
-from pxr import Usd
+from numpy.random import default_rng
+from pxr import Usd, UsdGeom, UsdShade
 import pytest
 
 from glue_ar.common.export import export_viewer
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
 from glue_ar.common.shapes import sphere_points_count, sphere_triangles_count
-from glue_ar.common.tests.helpers import APP_VIEWER_OPTIONS
+from glue_ar.common.tests.helpers import APP_VIEWER_OPTIONS, scatter_scene
 from glue_ar.common.tests.test_scatter import BaseScatterTest
 from glue_ar.usd_utils import material_for_mesh
 from glue_ar.utils import export_label_for_layer, hex_to_components, iterator_count, layers_to_export, xyz_bounds
@@ -81,3 +84,53 @@ class TestVispyScatterUSD(BaseScatterTest):
                round(layer.state.alpha, color_precision)
         assert [round(c, color_precision) for c in pbr_shader.GetAttribute("inputs:diffuseColor").Get()] == \
                color_components
+
+
+@pytest.mark.parametrize("size_mode", ("Fixed", "Linear"))
+def test_export_from_viewer_state(tmp_path, size_mode):
+    # Positions come out of the viewer state as float32, which USD needs as an array rather than a list
+    rng = default_rng(2)
+    viewer_state, layer_state = scatter_scene("usd_data", x=rng.random(20), y=rng.random(20), z=rng.random(20))
+    layer_state.size_mode = size_mode
+    layer_state.size_att = layer_state.layer.id["x"]
+    bounds = xyz_bounds(viewer_state, with_resolution=False)
+
+    filepath = str(tmp_path / "scatter.usdc")
+    options = ARVispyScatterExportOptions(resolution=6)
+    export_viewer(viewer_state, [layer_state], bounds,
+                  {export_label_for_layer(layer_state): ("Scatter", options)}, filepath)
+
+    stage = Usd.Stage.Open(filepath)
+    meshes = [UsdGeom.Mesh(prim) for prim in stage.Traverse() if prim.IsA(UsdGeom.Mesh)]
+    assert sum(len(mesh.GetPointsAttr().Get()) for mesh in meshes) == 20 * sphere_points_count(6, 6)
+
+
+def test_colormap_texture(tmp_path):
+    rng = default_rng(6)
+    viewer_state, layer_state = scatter_scene("usd_texture", x=rng.random(30), y=rng.random(30), z=rng.random(30),
+                                              c=rng.random(30))
+    layer_state.color_mode = "Linear"
+    layer_state.cmap_att = layer_state.layer.id["c"]
+    bounds = xyz_bounds(viewer_state, with_resolution=False)
+
+    filepath = str(tmp_path / "texture.usdz")
+    options = ARVispyScatterExportOptions(resolution=6, colormap_texture=True)
+    export_viewer(viewer_state, [layer_state], bounds,
+                  {export_label_for_layer(layer_state): ("Scatter", options)}, filepath)
+
+    # The texture goes into the package, rather than being left next to it
+    names = ZipFile(filepath).namelist()
+    textures = [name for name in names if name.endswith(".png")]
+    assert len(textures) == 1
+    assert list(tmp_path.iterdir()) == [tmp_path / "texture.usdz"]
+
+    stage = Usd.Stage.Open(filepath)
+    meshes = [UsdGeom.Mesh(prim) for prim in stage.Traverse() if prim.IsA(UsdGeom.Mesh)]
+    assert len(meshes) == 1
+    st = UsdGeom.PrimvarsAPI(meshes[0]).GetPrimvar("st")
+    assert len(st.Get()) == len(meshes[0].GetPointsAttr().Get())
+
+    material = material_for_mesh(meshes[0])
+    texture = UsdShade.Shader(stage.GetPrimAtPath(f"{material.GetPath()}/texture"))
+    assert texture.GetIdAttr().Get() == "UsdUVTexture"
+    assert texture.GetInput("file").Get().path == f"./{textures[0]}"
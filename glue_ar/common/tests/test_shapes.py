@@ -3,9 +3,12 @@ from math import sqrt
 import pytest
 from glue_ar.common.shapes import cone_points, cone_points_count, cone_triangles, cone_triangles_count, \
                                   cylinder_points, cylinder_points_count, cylinder_triangles, \
-                                  cylinder_triangles_count, rectangular_prism_points, \
+                                  cylinder_triangles_count, icosphere_points, icosphere_points_count, \
+                                  icosphere_triangles, icosphere_triangles_count, octahedron_points, octahedron_points_count, \
+                                  octahedron_triangles, octahedron_triangles_count, rectangular_prism_points, \
                                   rectangular_prism_triangulation, sphere_points, sphere_points_count, \
-                                  sphere_triangles, sphere_triangles_count
+                                  sphere_triangles, sphere_triangles_count, star_points, star_points_count, \
+                                  star_triangles, star_triangles_count
 
 
 class TestShapes:
@@ -213,3 +216,62 @@ class TestShapes:
         triangles = cone_triangles(theta_resolution=theta_resolution,
                                    start_index=start_index)
         assert len(triangles) == cone_triangles_count(theta_resolution=theta_resolution)
+
+    def test_octahedron(self):
+        center = (1, 2, 3)
+        points = octahedron_points(center, radius=2)
+        assert len(points) == octahedron_points_count()
+        assert {(3, 2, 3), (-1, 2, 3), (1, 4, 3), (1, 0, 3), (1, 2, 5), (1, 2, 1)} == set(points)
+
+        triangles = octahedron_triangles()
+        assert len(triangles) == octahedron_triangles_count()
+        for triangle in triangles:
+            # Each face's normal should point away from the center
+            a, b, c = (points[index] for index in triangle)
+            u = [b[i] - a[i] for i in range(3)]
+            v = [c[i] - a[i] for i in range(3)]
+            normal = (u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0])
+            assert sum(normal[i] * (a[i] - center[i]) for i in range(3)) > 0
+
+        assert min(min(t) for t in octahedron_triangles(start_index=6)) == 6
+
+    @pytest.mark.parametrize("planes,start_index", product((1, 2, 3), (0, 4)))
+    def test_star(self, planes, start_index):
+        points = star_points((0, 0, 0), radius=1, planes=planes)
+        assert len(points) == star_points_count(planes)
+        assert all(sqrt(sum(c * c for c in point)) == pytest.approx(sqrt(2)) for point in points)
+
+        triangles = star_triangles(planes=planes, start_index=start_index)
+        assert len(triangles) == star_triangles_count(planes)
+        assert {index for triangle in triangles for index in triangle} == \
+               set(range(start_index, start_index + len(points)))
+        # Each quad is visible from both sides
+        faces = {tuple(sorted(triangle)) for triangle in triangles}
+        assert len(faces) == len(triangles) // 2
+
+    @pytest.mark.parametrize("subdivisions", range(5))
+    def test_icosphere(self, subdivisions):
+        center = (1, -1, 2)
+        points = icosphere_points(center, radius=3, subdivisions=subdivisions)
+        assert len(points) == icosphere_points_count(subdivisions)
+        assert all(sqrt(sum((p - c) ** 2 for p, c in zip(point, center))) == pytest.approx(3) for point in points)
+
+        triangles = icosphere_triangles(subdivisions)
+        assert len(triangles) == icosphere_triangles_count(subdivisions)
+        assert {index for triangle in triangles for index in triangle} == set(range(len(points)))
+
+        # A closed surface: every edge is shared by exactly two triangles, traversed in opposite directions
+        edges = [(t[i], t[(i + 1) % 3]) for t in triangles for i in range(3)]
+        edge_set = set(edges)
+        assert len(edge_set) == len(edges)
+        assert all((b, a) in edge_set for a, b in edges)
+
+        for triangle in triangles:
+            a, b, c = (points[index] for index in triangle)
+            u = [b[i] - a[i] for i in range(3)]
+            v = [c[i] - a[i] for i in range(3)]
+            normal = (u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0])
+            assert sum(normal[i] * (a[i] - center[i]) for i in range(3)) > 0
+
+        shifted = icosphere_triangles(subdivisions, start_index=5)
+        assert shifted[0] == tuple(index + 5 for index in triangles[0])
@@ -0,0 +1,124 @@
+import json
+
+from gltflib import GLTF
+from numpy import concatenate, full
+from numpy.random import default_rng
+import pytest
+
+from glue_ar.common.export import export_tileset
+from glue_ar.common.gltf_builder import MSFT_LOD, GLTFBuilder
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
+from glue_ar.common.scatter_gltf import add_vispy_scatter_layer_gltf
+from glue_ar.common.tests.helpers import scatter_scene
+from glue_ar.common.tiles import partition_tiles, tile_builder, tileset_json
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+def _tile_boxes(tile_json):
+    yield tile_json
+    for child in tile_json.get("children", []):
+        yield from _tile_boxes(child)
+
+
+def _contains(outer, inner):
+    # Both boxes are axis-aligned, so we only need their centers and half-axis lengths
+    outer_center, inner_center = outer[:3], inner[:3]
+    outer_half, inner_half = (outer[3], outer[7], outer[11]), (inner[3], inner[7], inner[11])
+    return all(o - oh <= i - ih + 1e-6 and i + ih <= o + oh + 1e-6
+               for o, i, oh, ih in zip(outer_center, inner_center, outer_half, inner_half))
+
+
+class TestTiles:
+
+    def setup_method(self, method):
+        rng = default_rng(8)
+        # Four separate clusters
+        centers = [(0, 0, 0), (1, 0, 0), (0, 1, 1), (1, 1, 0)]
+        x, y, z = (concatenate([full(100, center[axis]) + 0.1 * rng.random(100) for center in centers])
+                   for axis in range(3))
+        self.viewer_state, self.layer_state = scatter_scene("tiles_data", x=x, y=y, z=z)
+        self.data = self.layer_state.layer
+        self.bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+        self.options = ARVispyScatterExportOptions(resolution=8, log_points_per_mesh=2, lod_levels=3,
+                                                   spatial_chunks=True)
+
+    def builder(self) -> GLTFBuilder:
+        builder = GLTFBuilder()
+        add_vispy_scatter_layer_gltf(builder, self.viewer_state, self.layer_state, self.options, self.bounds)
+        return builder
+
+    def test_partition(self):
+        builder = self.builder()
+        vertices = builder.accessors[builder.meshes[0].primitives[0].attributes.POSITION].count
+        root = partition_tiles(builder, tile_vertices=2 * vertices)
+        tiles = list(root.walk())
+
+        # Every mesh ends up in exactly one leaf
+        leaves = [tile for tile in tiles if not tile.children]
+        assert sorted(mesh for leaf in leaves for mesh in leaf.content) == sorted(root.meshes)
+        assert all(len(leaf.content) <= 2 and leaf.geometric_error == 0 for leaf in leaves)
+        assert len(root.children) == 4
+
+        for tile in tiles:
+            for child in tile.children:
+                assert child.geometric_error <= tile.geometric_error
+                assert (tile.mins <= child.mins).all() and (child.maxes <= tile.maxes).all()
+            if tile.children:
+                # Tiles above the leaves show the levels of detail of the meshes below them
+                assert tile.content == [builder.lods[mesh][0][tile.height - 1] for mesh in tile.meshes]
+                assert tile.geometric_error > 0
+
+        # A single tile holds everything if the budget allows it
+        root = partition_tiles(builder, tile_vertices=len(root.meshes) * vertices)
+        assert root.children == [] and root.content == root.meshes
+        assert partition_tiles(GLTFBuilder()) is None
+
+    def test_tile_builder(self):
+        builder = self.builder()
+        root = partition_tiles(builder, tile_vertices=1)
+        leaf = next(tile for tile in root.walk() if not tile.children)
+        tile = tile_builder(builder, leaf.content)
+        assert tile.mesh_count == len(leaf.content)
+        assert tile.lods == {}
+        assert MSFT_LOD not in tile.extensions
+
+        model = tile.build_model()
+        for index, mesh in zip(leaf.content, model.meshes):
+            original = builder.accessors[builder.meshes[index].primitives[0].attributes.POSITION]
+            copied = model.accessors[mesh.primitives[0].attributes.POSITION]
+            assert (copied.count, copied.min, copied.max) == (original.count, original.min, original.max)
+
+    def test_tileset_json(self):
+        root = partition_tiles(self.builder(), tile_vertices=1)
+        for index, tile in enumerate(tile for tile in root.walk() if tile.content):
+            tile.uri = f"tiles/{index}.glb"
+        tileset = tileset_json(root)
+        assert tileset["asset"]["version"] == "1.1"
+        assert tileset["root"]["refine"] == "REPLACE"
+        assert tileset["geometricError"] >= tileset["root"]["geometricError"]
+
+        for tile_json in _tile_boxes(tileset["root"]):
+            for child in tile_json.get("children", []):
+                assert _contains(tile_json["boundingVolume"]["box"], child["boundingVolume"]["box"])
+
+        # Boxes are z-up, while the glTF content is y-up
+        box = tileset["root"]["boundingVolume"]["box"]
+        assert box[1] == pytest.approx(-(root.mins[2] + root.maxes[2]) / 2)
+        assert box[2] == pytest.approx((root.mins[1] + root.maxes[1]) / 2)
+
+    @pytest.mark.parametrize("parallel", (False, True))
+    def test_export(self, tmp_path, parallel):
+        filepath = tmp_path / "scene.json"
+        export_tileset(self.viewer_state, [self.layer_state], self.bounds,
+                       {export_label_for_layer(self.layer_state): ("Scatter", self.options)},
+                       str(filepath), tile_vertices=1000, parallel=parallel, optimize_meshes=True)
+
+        tileset = json.loads(filepath.read_text())
+        uris = [tile["content"]["uri"] for tile in _tile_boxes(tileset["root"]) if "content" in tile]
+        assert len(uris) > 1
+        assert all(uri.startswith("scene_tiles/") for uri in uris)
+        for uri in uris:
+            model = GLTF.load(str(tmp_path / uri)).model
+            assert len(model.meshes) > 0
+            assert MSFT_LOD not in (model.extensionsUsed or [])
+        assert len(list((tmp_path / "scene_tiles").iterdir())) == len(uris)
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from gltflib import AccessorType, BufferTarget
+import numpy as np
+
+from glue_ar.common.gltf_builder import MSFT_LOD, GLTFBuilder
+from glue_ar.common.mesh_optimization import ATTRIBUTE_NAMES
+from glue_ar.gltf_utils import accessor_to_numpy, get_data
+from glue_ar.utils import unique_id
+
+
+__all__ = [
+    "DEFAULT_MAX_DEPTH",
+    "DEFAULT_TILE_VERTICES",
+    "Tile",
+    "builder_buffers",
+    "partition_tiles",
+    "tile_builder",
+    "tileset_json",
+]
+
+
+# The default number of vertices that a tile can hold before it's split up
+DEFAULT_TILE_VERTICES = 100_000
+
+# The default maximum depth of the tile tree
+DEFAULT_MAX_DEPTH = 8
+
+
+@dataclass
+class Tile:
+    """
+    A node of a tileset. `meshes` are the primary meshes (of the builder the tileset was partitioned from)
+    that lie in this tile's region, and `content` are the meshes that the tile shows - the full meshes
+    for leaf tiles, and lower levels of detail of the meshes in the region for the tiles above them.
+    Tiles with children are replaced by them once the error of showing the tile's content is too large.
+    """
+    mins: np.ndarray
+    maxes: np.ndarray
+    meshes: List[int]
+    children: List[Tile] = field(default_factory=list)
+    content: List[int] = field(default_factory=list)
+    geometric_error: float = 0.0
+    uri: Optional[str] = None
+
+    @property
+    def height(self) -> int:
+        return 0 if not self.children else 1 + max(child.height for child in self.children)
+
+    @property
+    def diagonal(self) -> float:
+        return float(np.linalg.norm(self.maxes - self.mins))
+
+    def walk(self) -> Iterator[Tile]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+def _mesh_bounds(builder: GLTFBuilder, mesh: int) -> Tuple[np.ndarray, np.ndarray]:
+    accessor = builder.accessors[builder.meshes[mesh].primitives[0].attributes.POSITION]
+    return np.asarray(accessor.min, dtype=float), np.asarray(accessor.max, dtype=float)
+
+
+def _partition(meshes: List[int],
+               bounds: Dict[int, Tuple[np.ndarray, np.ndarray]],
+               counts: Dict[int, int],
+               tile_vertices: int,
+               max_depth: int,
+               depth: int) -> Tile:
+    mins = np.min([bounds[mesh][0] for mesh in meshes], axis=0)
+    maxes = np.max([bounds[mesh][1] for mesh in meshes], axis=0)
+    tile = Tile(mins=mins, maxes=maxes, meshes=meshes)
+    if depth >= max_depth or len(meshes) == 1 or sum(counts[mesh] for mesh in meshes) <= tile_vertices:
+        return tile
+
+    # Meshes go to the octant of the region that their center is in
+    center = (mins + maxes) / 2
+    octants: Dict[Tuple[bool, ...], List[int]] = {}
+    for mesh in meshes:
+        mesh_center = (bounds[mesh][0] + bounds[mesh][1]) / 2
+        octants.setdefault(tuple(mesh_center > center), []).append(mesh)
+    if len(octants) == 1:
+        return tile
+
+    tile.children = [_partition(octants[key], bounds, counts, tile_vertices, max_depth, depth + 1)
+                     for key in sorted(octants)]
+    return tile
+
+
+def partition_tiles(builder: GLTFBuilder,
+                    tile_vertices: int = DEFAULT_TILE_VERTICES,
+                    max_depth: int = DEFAULT_MAX_DEPTH) -> Optional[Tile]:
+    """
+    Partition the meshes of a builder into an octree of tiles, splitting each region until its meshes
+    have at most `tile_vertices` vertices between them. Meshes are the smallest unit that gets partitioned,
+    so a scatter layer needs to be split into several meshes (ideally with spatial chunking, so that each
+    mesh covers a small region) for its tiles to be any smaller than the layer.
+
+    Tiles above the leaves show the `MSFT_lod` levels of detail of their meshes: a tile that's `n` levels
+    above the leaves shows the `n`-th level of each mesh, if all of its meshes have that many levels,
+    and has no content of its own otherwise. Leaf tiles have no geometric error, tiles showing levels
+    of detail have an error of a quarter of their diagonal, and tiles without content one of their whole
+    diagonal, so that they're refined straight away. Returns `None` if the builder has no meshes.
+    """
+    skipped = builder.lod_meshes | set(builder.preview_meshes)
+    meshes = [index for index in range(builder.mesh_count) if index not in skipped]
+    if not meshes:
+        return None
+    bounds = {mesh: _mesh_bounds(builder, mesh) for mesh in meshes}
+    counts = {mesh: builder.accessors[builder.meshes[mesh].primitives[0].attributes.POSITION].count
+              for mesh in meshes}
+    root = _partition(meshes, bounds, counts, tile_vertices, max_depth, depth=0)
+
+    for tile in root.walk():
+        height = tile.height
+        if height == 0:
+            tile.content = list(tile.meshes)
+            continue
+        chains = [builder.lods.get(mesh, ([], []))[0] for mesh in tile.meshes]
+        if all(len(chain) >= height for chain in chains):
+            tile.content = [chain[height - 1] for chain in chains]
+            tile.geometric_error = tile.diagonal / 4
+        else:
+            tile.geometric_error = tile.diagonal
+
+    # A tile's error can't be smaller than that of its children
+    def enforce_monotonic(tile: Tile) -> float:
+        for child in tile.children:
+            tile.geometric_error = max(tile.geometric_error, enforce_monotonic(child))
+        return tile.geometric_error
+
+    enforce_monotonic(root)
+    return root
+
+
+def tile_builder(builder: GLTFBuilder,
+                 meshes: Sequence[int],
+                 buffers_data: Optional[List[bytes]] = None) -> GLTFBuilder:
+    """
+    Create a new builder holding copies of the given meshes of `builder`, along with the data that they use.
+    Materials and textures are copied as they are, so that material indices don't change.
+    Levels of detail and animations aren't carried over, since each tile shows a single level of detail.
+
+    `buffers_data` can be given to avoid reading the buffers of `builder` for each tile.
+    """
+    if buffers_data is None:
+        buffers_data = builder_buffers(builder)
+    model = builder.build_model()
+
+    tile = GLTFBuilder(deterministic_names=builder.deterministic_names)
+    tile.materials = list(builder.materials)
+    tile.copy_textures(builder)
+    tile.extensions = {extension: params for extension, params in builder.extensions.items()
+                       if extension != MSFT_LOD}
+    buffer_index = tile.buffer_count
+    barr = bytearray()
+    new_accessors: Dict[int, int] = {}
+
+    def copy_accessor(accessor_index: int, target: BufferTarget) -> int:
+        if accessor_index not in new_accessors:
+            accessor = model.accessors[accessor_index]
+            data = accessor_to_numpy(model, accessor_index, buffers_data)
+            barr.extend(bytes(-len(barr) % 4))
+            offset = len(barr)
+            barr.extend(np.ascontiguousarray(data).tobytes())
+            tile.add_buffer_view(buffer=buffer_index, byte_length=data.nbytes, byte_offset=offset, target=target)
+            tile.add_accessor(buffer_view=tile.buffer_view_count - 1,
+                              component_type=accessor.componentType,
+                              count=accessor.count,
+                              type=AccessorType(accessor.type),
+                              mins=accessor.min,
+                              maxes=accessor.max,
+                              normalized=accessor.normalized)
+            new_accessors[accessor_index] = tile.accessor_count - 1
+        return new_accessors[accessor_index]
+
+    layers: Dict[int, List[str]] = {}
+    for layer_id, mesh_indices in builder.meshes_by_layer.items():
+        for index in mesh_indices:
+            layers.setdefault(index, []).append(layer_id)
+
+    for mesh in meshes:
+        primitive = model.meshes[mesh].primitives[0]
+        attributes = {name: copy_accessor(getattr(primitive.attributes, name), BufferTarget.ARRAY_BUFFER)
+                      for name in ATTRIBUTE_NAMES
+                      if getattr(primitive.attributes, name, None) is not None}
+        indices = None
+        if primitive.indices is not None:
+            indices = copy_accessor(primitive.indices, BufferTarget.ELEMENT_ARRAY_BUFFER)
+        tile.add_mesh(layer_id=layers.get(mesh, []),
+                      position_accessor=attributes.pop("POSITION"),
+                      indices_accessor=indices,
+                      material=primitive.material,
+                      mode=primitive.mode,
+                      extensions=primitive.extensions,
+                      attributes=attributes)
+
+    uri = f"tile_{unique_id()}.bin"
+    tile.add_buffer(byte_length=len(barr), uri=uri)
+    tile.add_file_resource(uri, data=barr)
+    return tile
+
+
+def builder_buffers(builder: GLTFBuilder) -> List[bytes]:
+    """
+    The data of each of the buffers of a builder, in order.
+    """
+    resources = {resource.uri: resource for resource in builder.file_resources}
+    return [get_data(resources[buffer.uri]) for buffer in builder.buffers]
+
+
+def _bounding_box(tile: Tile) -> List[float]:
+    # glTF content is y-up, while tilesets are z-up, so (x, y, z) in the model is (x, -z, y) in the tileset.
+    # Runtimes can struggle with boxes that are flat, so each half-axis has a small minimum length
+    center = (tile.mins + tile.maxes) / 2
+    half = np.maximum((tile.maxes - tile.mins) / 2, 1e-6 * max(tile.diagonal, 1))
+    return [float(center[0]), float(-center[2]), float(center[1]),
+            float(half[0]), 0.0, 0.0,
+            0.0, float(half[2]), 0.0,
+            0.0, 0.0, float(half[1])]
+
+
+def _tile_json(tile: Tile) -> Dict[str, Any]:
+    json: Dict[str, Any] = {
+        "boundingVolume": {"box": _bounding_box(tile)},
+        "geometricError": tile.geometric_error,
+    }
+    if tile.uri is not None:
+        json["content"] = {"uri": tile.uri}
+    if tile.children:
+        json["children"] = [_tile_json(child) for child in tile.children]
+    return json
+
+
+def tileset_json(root: Tile) -> Dict[str, Any]:
+    """
+    The 3D Tiles tileset for a tree of tiles. Each tile with content should have had the URI
+    (relative to the tileset) of its content set.
+    """
+    root_json = _tile_json(root)
+    root_json["refine"] = "REPLACE"
+    return {
+        "asset": {"version": "1.1", "generator": "glue-ar"},
+        "geometricError": max(root.geometric_error, root.diagonal),
+        "root": root_json,
+    }
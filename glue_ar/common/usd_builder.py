@@ -1,24 +1,33 @@
+from __future__ import annotations
+
 from collections import defaultdict
-from os import extsep, remove
-from os.path import exists, splitext
+from hashlib import blake2b
+from os import extsep, remove, utime
+from os.path import dirname, exists, join, splitext
 
-from pxr import Usd, UsdGeom, UsdLux, UsdShade, UsdUtils
-from typing import Dict, Iterable, Optional, Tuple
+from numpy import asarray, float32, int32, ndarray
+from pxr import Sdf, Usd, UsdGeom, UsdLux, UsdShade, UsdUtils, Vt
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from glue_ar.registries import builder
-from glue_ar.usd_utils import material_for_color, material_for_mesh, sanitize_path
+from glue_ar.usd_utils import material_for_color, material_for_mesh, material_for_texture, sanitize_path
 from glue_ar.utils import unique_id
 
 
-MaterialInfo = Tuple[int, int, int, float, float, float]
+MaterialInfo = Union[Tuple[int, int, int, float, float, float], Tuple[str, float, float, float]]
+
+# 1980-01-02, which is safely inside the range of timestamps that zip archives can represent
+USDZ_TIMESTAMP = 315619200
 
 
 @builder(("usda", "usdc", "usdz"))
 class USDBuilder:
 
-    def __init__(self):
+    def __init__(self, deterministic_names: bool = False):
+        self.deterministic_names = deterministic_names
         self._create_stage()
         self._material_map: Dict[MaterialInfo, UsdShade.Shader] = {}
+        self._textures: Dict[str, bytes] = {}
 
     def _create_stage(self):
         self.stage = Usd.Stage.CreateInMemory()
@@ -35,6 +44,11 @@ class USDBuilder:
         light = UsdLux.RectLight.Define(self.stage, "/light")
         light.CreateHeightAttr(-1)
 
+    def _default_identifier(self) -> str:
+        # With deterministic names, meshes without an identifier are distinguished
+        # only by their counts, which depend on the order in which they're added
+        return "mesh" if self.deterministic_names else unique_id()
+
     def _material_for_color(self,
                             color: Tuple[int, int, int],
                             opacity: float,
@@ -54,20 +68,57 @@ class USDBuilder:
         self._material_map[color_key] = material
         return material
 
+    def _material_for_texture(self,
+                              texture: str,
+                              opacity: float,
+                              metallic: float,
+                              roughness: float) -> UsdShade.Material:
+
+        texture_key = (texture, opacity, metallic, roughness)
+        material = self._material_map.get(texture_key, None)
+        if material is not None:
+            return material
+
+        identifier = f"{splitext(texture)[0]}_{opacity}".replace(".", "_")
+        material = material_for_texture(self.stage,
+                                        texture_path=f"./{texture}",
+                                        opacity=opacity,
+                                        metallic=metallic,
+                                        roughness=roughness,
+                                        identifier=identifier)
+        self._material_map[texture_key] = material
+        return material
+
+    def add_texture(self, data: bytes, prefix: str = "texture") -> str:
+        """
+        Add a PNG image for meshes to use as a texture, and return its name. The image is written alongside
+        the exported file (or into the package, for USDZ). Images are named after a hash of their contents,
+        so adding the same image more than once only stores it once.
+        """
+        digest = blake2b(data, digest_size=16).hexdigest()
+        name = f"{prefix}_{digest}.png"
+        self._textures[name] = data
+        return name
+
     def add_mesh(self,
-                 points: Iterable[Iterable[float]],
-                 triangles: Iterable[Iterable[int]],
+                 points: Union[Iterable[Iterable[float]], ndarray],
+                 triangles: Union[Iterable[Iterable[int]], ndarray],
                  color: Tuple[int, int, int],
                  opacity: float,
                  metallic: float = 0.0,
                  roughness: float = 1.0,
-                 identifier: Optional[str] = None) -> UsdGeom.Mesh:
+                 identifier: Optional[str] = None,
+                 texture: Optional[str] = None,
+                 texture_coordinates: Optional[ndarray] = None) -> UsdGeom.Mesh:
         """
         This returns the generated mesh rather than the builder instance.
         This breaks the builder pattern but we'll potentially want this reference to it
         for other meshes that we create.
+
+        If `texture` (the name of an image from `add_texture`) is given, the color of the mesh is read from it
+        instead, using the given texture coordinates, which should have two values for each point.
         """
-        identifier = sanitize_path(identifier or unique_id())
+        identifier = sanitize_path(identifier or self._default_identifier())
         count = self._mesh_counts[identifier]
         xform_key = f"{self.default_prim_key}/xform_{identifier}_{count}"
         UsdGeom.Xform.Define(self.stage, xform_key)
@@ -75,11 +126,23 @@ class USDBuilder:
         self._mesh_counts[identifier] += 1
         mesh = UsdGeom.Mesh.Define(self.stage, mesh_key)
         mesh.CreateSubdivisionSchemeAttr().Set(UsdGeom.Tokens.none)
+        # Positions built from float32 arrays have NumPy scalar components, which USD won't convert from a list
+        points = Vt.Vec3fArray.FromNumpy(asarray(points, dtype=float32).reshape(-1, 3))
         mesh.CreatePointsAttr(points)
-        mesh.CreateFaceVertexCountsAttr([3] * len(triangles))
-        mesh.CreateFaceVertexIndicesAttr([int(idx) for tri in triangles for idx in tri])
+        mesh.CreateFaceVertexCountsAttr(Vt.IntArray(len(triangles), 3))
+        if isinstance(triangles, ndarray):
+            indices = Vt.IntArray.FromNumpy(triangles.astype(int32).ravel())
+        else:
+            indices = [int(idx) for tri in triangles for idx in tri]
+        mesh.CreateFaceVertexIndicesAttr(indices)
 
-        material = self._material_for_color(color, opacity, metallic=metallic, roughness=roughness)
+        if texture is not None:
+            st = UsdGeom.PrimvarsAPI(mesh).CreatePrimvar("st", Sdf.ValueTypeNames.TexCoord2fArray,
+                                                         UsdGeom.Tokens.vertex)
+            st.Set(Vt.Vec2fArray.FromNumpy(asarray(texture_coordinates, dtype=float32).reshape(-1, 2)))
+            material = self._material_for_texture(texture, opacity, metallic=metallic, roughness=roughness)
+        else:
+            material = self._material_for_color(color, opacity, metallic=metallic, roughness=roughness)
         mesh.GetPrim().ApplyAPI(UsdShade.MaterialBindingAPI)
         UsdShade.MaterialBindingAPI(mesh).Bind(material)
 
@@ -91,7 +154,7 @@ class USDBuilder:
                                  material: Optional[UsdShade.Material] = None,
                                  identifier: Optional[str] = None) -> UsdGeom.Mesh:
         prim = mesh.GetPrim()
-        identifier = sanitize_path(identifier or unique_id())
+        identifier = sanitize_path(identifier or self._default_identifier())
         count = self._mesh_counts[identifier]
         xform_key = f"{self.default_prim_key}/xform_{identifier}_{count}"
         UsdGeom.Xform.Define(self.stage, xform_key)
@@ -113,8 +176,67 @@ class USDBuilder:
 
         return mesh
 
+    def merge(self, other: USDBuilder) -> USDBuilder:
+        """
+        Copy the meshes and materials from another builder's stage into this one.
+        Meshes are renumbered so that they follow on from any existing meshes with the same identifier,
+        and any internal references between the copied meshes are updated to match.
+        """
+        source_layer = other.stage.GetRootLayer()
+        target_layer = self.stage.GetRootLayer()
+
+        for color_key, material in other._material_map.items():
+            if color_key in self._material_map:
+                continue
+            path = material.GetPath()
+            Sdf.CopySpec(source_layer, path, target_layer, path)
+            self._material_map[color_key] = UsdShade.Material(self.stage.GetPrimAtPath(path))
+        self._textures.update(other._textures)
+
+        path_map: Dict[Sdf.Path, Sdf.Path] = {}
+        for identifier, count in other._mesh_counts.items():
+            offset = self._mesh_counts[identifier]
+            for index in range(count):
+                source_key = f"{other.default_prim_key}/xform_{identifier}_{index}/mesh_{identifier}_{index}"
+                xform_key = f"{self.default_prim_key}/xform_{identifier}_{index + offset}"
+                UsdGeom.Xform.Define(self.stage, xform_key)
+                mesh_key = f"{xform_key}/mesh_{identifier}_{index + offset}"
+                Sdf.CopySpec(source_layer, source_key, target_layer, mesh_key)
+                path_map[Sdf.Path(source_key)] = Sdf.Path(mesh_key)
+            self._mesh_counts[identifier] += count
+
+        for mesh_path in path_map.values():
+            references = target_layer.GetPrimAtPath(mesh_path).referenceList
+            items = list(references.prependedItems)
+            if items:
+                references.prependedItems = [
+                    Sdf.Reference(reference.assetPath, path_map.get(reference.primPath, reference.primPath))
+                    for reference in items
+                ]
+
+        return self
+
+    def _write_textures(self, directory: str) -> List[str]:
+        """
+        Write the texture images into the given directory, and return the paths of the files that were created.
+        Existing files are left alone, as they're named after their contents.
+        """
+        written = []
+        for name, data in self._textures.items():
+            path = join(directory, name)
+            if exists(path):
+                continue
+            with open(path, "wb") as f:
+                f.write(data)
+            if self.deterministic_names:
+                utime(path, (USDZ_TIMESTAMP, USDZ_TIMESTAMP))
+            written.append(path)
+        return written
+
     def export(self, filepath: str):
         base, ext = splitext(filepath)
+        # Textures are referred to relative to the layer, so they go in the same directory
+        textures = self._write_textures(dirname(filepath) or ".")
         if ext == ".usdz":
             usdc_path = f"{base}{extsep}usdc"
             usdc_exists = exists(usdc_path)
@@ -124,8 +246,15 @@ class USDBuilder:
                 usdc_path = f"{base}-{count}{extsep}usdc"
                 usdc_exists = exists(usdc_path)
             self.stage.GetRootLayer().Export(usdc_path)
+            if self.deterministic_names:
+                # The package records the modification time of the layer file,
+                # so we fix it to keep the archive byte-for-byte reproducible
+                utime(usdc_path, (USDZ_TIMESTAMP, USDZ_TIMESTAMP))
             UsdUtils.CreateNewUsdzPackage(usdc_path, filepath)
             remove(usdc_path)
+            # The package holds its own copies of the textures
+            for path in textures:
+                remove(path)
         else:
             self.stage.GetRootLayer().Export(filepath)
 
@@ -14,6 +14,15 @@ class ARIsosurfaceExportOptions(State):
         resolution=1,
         docstring="The number of isosurfaces used in the export.",
     )
+    lod_levels = RangedCallbackProperty(
+        default=1,
+        min_value=1,
+        max_value=3,
+        resolution=1,
+        docstring="The number of levels of detail for each isosurface. Each level is computed from the data "
+                  "downsampled by a further factor of two, and viewers that support it show coarser levels "
+                  "when the isosurfaces are far away.",
+    )
 
 
 class ARVoxelExportOptions(State):
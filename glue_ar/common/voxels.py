@@ -10,7 +10,8 @@ from glue_ar.common.gltf_builder import GLTFBuilder
 from glue_ar.common.stl_builder import STLBuilder
 from glue_ar.common.usd_builder import USDBuilder
 from glue_ar.common.volume_export_options import ARVoxelExportOptions
-from glue_ar.usd_utils import material_for_color, sanitize_path
+from glue_ar.progress import tracked
+from glue_ar.usd_utils import material_for_color
 from glue_ar.utils import BoundsWithResolution, alpha_composite, binned_opacity, clamp, clamp_with_resolution, \
                           clip_sides, export_label_for_layer, frb_for_layer, hex_to_components, isomin_for_layer, \
                           isomax_for_layer, layer_color, offset_triangles, unique_id, xyz_bounds
@@ -51,7 +52,7 @@ def add_voxel_layers_gltf(builder: GLTFBuilder,
 
     occupied_voxels = {}
 
-    for layer_state, option in zip(layer_states, options):
+    for layer_index, (layer_state, option) in enumerate(zip(layer_states, options)):
         opacity_cutoff = clamp(option.opacity_cutoff, 0, 1)
         cmap_resolution = clamp(option.cmap_resolution, 0, 1)
         opacity_factor = clamp(option.opacity_factor, 0, 2) / 2
@@ -77,7 +78,9 @@ def add_voxel_layers_gltf(builder: GLTFBuilder,
             voxel_colors = layer_state.cmap([i * cmap_resolution for i in range(ceil(1 / cmap_resolution) + 1)])
             voxel_colors = [[int(256 * float(c)) for c in vc[:3]] for vc in voxel_colors]
 
-        for indices in nonempty_indices:
+        # The first half of the progress is finding the occupied voxels of each layer
+        layer_start = 0.5 * layer_index / len(layer_states)
+        for indices in tracked(nonempty_indices, start=layer_start, end=layer_start + 0.5 / len(layer_states)):
             value = data[tuple(indices)]
             t_voxel = (value - isomin) / isorange
             if t_voxel > 0 and hasattr(layer_state, 'stretch'):
@@ -169,7 +172,7 @@ def add_voxel_layers_gltf(builder: GLTFBuilder,
 
     points_barr = bytearray()
     default_triangles_accessor = builder.accessor_count - 1
-    for rgba, voxels in voxels_by_color.items():
+    for rgba, voxels in tracked(voxels_by_color.items(), total=len(voxels_by_color), start=0.5, every=1):
 
         triangles_accessor = default_triangles_accessor
         start = 0
@@ -247,23 +250,29 @@ def add_voxel_layers_gltf(builder: GLTFBuilder,
 @ar_layer_export(VolumeLayerState3D, "Voxel", ARVoxelExportOptions, ("usda", "usdc", "usdz"), multiple=True)
 def add_voxel_layers_usd(builder: USDBuilder,
                          viewer_state: VolumeViewerState3D,
-                         layer_states: Iterable[VolumeLayerState3D],
-                         options: Iterable[ARVoxelExportOptions],
+                         layer_states: Union[Iterable[VolumeLayerState3D], VolumeLayerState3D],
+                         options: Union[Iterable[ARVoxelExportOptions], ARVoxelExportOptions],
                          bounds: Optional[BoundsWithResolution] = None):
 
+    if isinstance(layer_states, VolumeLayerState3D):
+        layer_states = [layer_states]
+
+    if isinstance(options, ARVoxelExportOptions):
+        options = [options]
+
     bounds = bounds or xyz_bounds(viewer_state, with_resolution=True)
     sides = clip_sides(viewer_state, clip_size=1)
     sides = tuple(sides[i] for i in (1, 2, 0))
 
     triangles = rectangular_prism_triangulation()
 
-    identifier = sanitize_path(f"voxels_{unique_id()}")
+    identifier = "voxels"
 
     opacity_factor = 1
     occupied_voxels = {}
     colors_map = defaultdict(set)
 
-    for layer_state, option in zip(layer_states, options):
+    for layer_index, (layer_state, option) in enumerate(zip(layer_states, options)):
         opacity_cutoff = clamp(option.opacity_cutoff, 0, 1)
         cmap_resolution = clamp(option.cmap_resolution, 0, 1)
         data = frb_for_layer(viewer_state, layer_state, bounds)
@@ -288,7 +297,9 @@ def add_voxel_layers_usd(builder: USDBuilder,
             voxel_colors = layer_state.cmap([i * cmap_resolution for i in range(ceil(1 / cmap_resolution) + 1)])
             voxel_colors = [[int(256 * float(c)) for c in vc[:3]] for vc in voxel_colors]
 
-        for indices in nonempty_indices:
+        # The first half of the progress is finding the occupied voxels of each layer
+        layer_start = 0.5 * layer_index / len(layer_states)
+        for indices in tracked(nonempty_indices, start=layer_start, end=layer_start + 0.5 / len(layer_states)):
 
             value = data[tuple(indices)]
             t_voxel = (value - isomin) / isorange
@@ -318,7 +329,7 @@ def add_voxel_layers_usd(builder: USDBuilder,
 
     materials_map = {}
 
-    for rgba, indices_set in colors_map.items():
+    for rgba, indices_set in tracked(colors_map.items(), total=len(colors_map), start=0.5, every=1):
         if rgba[-1] < opacity_cutoff:
             continue
 
@@ -352,10 +363,16 @@ def add_voxel_layers_usd(builder: USDBuilder,
 @ar_layer_export(VolumeLayerState3D, "Voxel", ARVoxelExportOptions, ("stl",), multiple=True)
 def add_voxel_layers_stl(builder: STLBuilder,
                          viewer_state: VolumeViewerState3D,
-                         layer_states: Iterable[VolumeLayerState3D],
-                         options: Iterable[ARVoxelExportOptions],
+                         layer_states: Union[Iterable[VolumeLayerState3D], VolumeLayerState3D],
+                         options: Union[Iterable[ARVoxelExportOptions], ARVoxelExportOptions],
                          bounds: Optional[BoundsWithResolution] = None):
 
+    if isinstance(layer_states, VolumeLayerState3D):
+        layer_states = [layer_states]
+
+    if isinstance(options, ARVoxelExportOptions):
+        options = [options]
+
     bounds = bounds or xyz_bounds(viewer_state, with_resolution=True)
     sides = clip_sides(viewer_state, clip_size=1)
     sides = tuple(sides[i] for i in (1, 2, 0))
@@ -365,9 +382,9 @@ def add_voxel_layers_stl(builder: STLBuilder,
     opacity_factor = 1
     occupied_voxels = {}
 
-    for layer_state, option in zip(layer_states, options):
+    for layer_index, (layer_state, option) in enumerate(zip(layer_states, options)):
         opacity_cutoff = clamp(option.opacity_cutoff, 0, 1)
-        opacity_resolution = clamp(option.opacity_resolution, 0, 1)
+        opacity_resolution = clamp(option.cmap_resolution, 0, 1)
         data = frb_for_layer(viewer_state, layer_state, bounds)
 
         if len(data) == 0:
@@ -386,7 +403,9 @@ def add_voxel_layers_stl(builder: STLBuilder,
         color = layer_color(layer_state)
         color_components = hex_to_components(color)
 
-        for indices in nonempty_indices:
+        # The first half of the progress is finding the occupied voxels of each layer
+        layer_start = 0.5 * layer_index / len(layer_states)
+        for indices in tracked(nonempty_indices, start=layer_start, end=layer_start + 0.5 / len(layer_states)):
             value = data[tuple(indices)]
             adjusted_opacity = binned_opacity(layer_state.alpha * opacity_factor * (value - isomin) / isorange,
                                               opacity_resolution)
@@ -399,7 +418,7 @@ def add_voxel_layers_stl(builder: STLBuilder,
             elif adjusted_opacity >= opacity_cutoff:
                 occupied_voxels[indices_tpl] = color_components[:3] + [adjusted_opacity]
 
-    for indices, rgba in occupied_voxels.items():
+    for indices, rgba in tracked(occupied_voxels.items(), total=len(occupied_voxels), start=0.5):
         if rgba[-1] < opacity_cutoff:
             continue
 
@@ -1,88 +1,19 @@
+from typing import Dict
+
 import numpy as np
 
 from glue_ar.common.gltf_builder import GLTFBuilder
+from glue_ar.common.mesh_optimization import ATTRIBUTE_NAMES
+from glue_ar.gltf_utils import accessor_to_numpy, get_data
+from glue_ar.progress import report_progress
 from glue_ar.registries import compressor
 
-from gltflib import AccessorType, AlphaMode, ComponentType, GLTFModel
-from gltflib.gltf_resource import GLTFResource
+from gltflib import AccessorType, AlphaMode, BufferTarget, PrimitiveMode
 import DracoPy
 
 DRACO_EXTENSION = "KHR_draco_mesh_compression"
 
-
-def component_dtype(component_type: ComponentType | int) -> type:
-    match component_type:
-        case ComponentType.UNSIGNED_BYTE:
-            return np.uint8
-        case ComponentType.UNSIGNED_SHORT:
-            return np.uint16
-        case ComponentType.UNSIGNED_INT:
-            return np.uint32
-        case ComponentType.FLOAT:
-            return np.float32
-        case ComponentType.SHORT:
-            return np.int16
-        case ComponentType.BYTE:
-            return np.int8
-        case _:
-            raise ValueError("Invalid component type")
-
-
-def components_per_element(accessor_type: AccessorType | str) -> int:
-    match accessor_type:
-        case AccessorType.SCALAR.value:
-            return 1
-        case AccessorType.VEC2.value:
-            return 2
-        case AccessorType.VEC3.value:
-            return 3
-        case AccessorType.VEC4.value | AccessorType.MAT2.value:
-            return 4
-        case AccessorType.MAT3.value:
-            return 9
-        case AccessorType.MAT4.value:
-            return 16
-        case _:
-            raise ValueError("Invalid accessor type")
-
-
-def accessor_to_numpy(model: GLTFModel, accessor_index: int, buffers_data) -> np.ndarray:
-    accessor = model.accessors[accessor_index]
-    bv = model.bufferViews[accessor.bufferView]
-    buf_index = bv.buffer
-    bin_data = buffers_data[buf_index]
-
-    base = (bv.byteOffset or 0) + (accessor.byteOffset or 0)
-
-    component_type = accessor.componentType
-    dtype = component_dtype(component_type)
-
-    n_components = components_per_element(accessor.type)
-
-    count = accessor.count
-    item_bytes = np.dtype(dtype).itemsize * n_components
-    byte_length = count * item_bytes
-
-    raw = memoryview(bin_data)[base : base + byte_length]
-    arr = np.frombuffer(raw, dtype=dtype)
-
-    if n_components == 1:
-        return arr
-    else:
-        return arr.reshape((count, n_components))
-
-
-def get_data(resource: GLTFResource) -> bytes:
-    if resource.data:
-        return resource.data
-
-    if resource.uri:
-        with open(resource.uri, 'rb') as f:
-            data = f.read()
-
-        return data
-
-    raise ValueError("Resource has no data!")
+TRIANGLE_MODES = (None, PrimitiveMode.TRIANGLES, PrimitiveMode.TRIANGLES.value)
 
 
 def create_draco_model(
@@ -106,9 +37,11 @@ def create_draco_model(
 
     draco_bin_data = bytearray()
 
-    draco_builder = GLTFBuilder()
+    draco_builder = GLTFBuilder(deterministic_names=builder.deterministic_names)
     buffer_index = draco_builder.buffer_count
 
+    # Textures keep their indices, so textured materials can refer to them unchanged
+    draco_builder.copy_textures(builder)
     for material in model.materials or []:
         pbr = material.pbrMetallicRoughness
         draco_builder.add_material(
@@ -117,92 +50,158 @@ def create_draco_model(
             metallic_factor=pbr.metallicFactor or 0,
             roughness_factor = pbr.roughnessFactor or 1,
             alpha_mode=AlphaMode(material.alphaMode),
+            base_color_texture=pbr.baseColorTexture.index if pbr.baseColorTexture is not None else None,
         )
 
+    def copy_accessor(accessor_index: int, target: BufferTarget) -> int:
+        values = np.ascontiguousarray(accessor_to_numpy(model, accessor_index, buffers_data))
+        # Accessor data needs to be aligned to four bytes
+        draco_bin_data.extend(bytes(-len(draco_bin_data) % 4))
+        draco_builder.add_buffer_view(
+            buffer=buffer_index,
+            byte_offset=len(draco_bin_data),
+            byte_length=values.nbytes,
+            target=target,
+        )
+        draco_bin_data.extend(values.tobytes())
+        accessor = model.accessors[accessor_index]
+        draco_builder.add_accessor(
+            buffer_view=draco_builder.buffer_view_count-1,
+            component_type=accessor.componentType,
+            type=AccessorType(accessor.type),
+            count=accessor.count,
+            mins=accessor.min,
+            maxes=accessor.max,
+            normalized=accessor.normalized,
+        )
+        return draco_builder.accessor_count - 1
+
     meshes_handled: set[int] = set()
+    mesh_count = max(len(model.meshes or []), 1)
 
-    for layer_id, mesh_indices in builder.meshes_by_layer.items():
-        for mesh_index in mesh_indices:
+    # LOD meshes don't belong to a layer, but still need to be encoded, so they go after all of the layer meshes.
+    # Preview meshes don't belong to a layer either, and go first, so that their data stays at the start of
+    # the buffer. The encoded meshes are renumbered, so we track where each one ends up in order to relink them
+    ordered_meshes = [([], mesh_index) for mesh_index in builder.preview_meshes]
+    ordered_meshes.extend((layer_id, mesh_index)
+                          for layer_id, mesh_indices in builder.meshes_by_layer.items()
+                          for mesh_index in mesh_indices)
+    ordered_meshes.extend(([], mesh_index) for mesh_index in sorted(builder.lod_meshes))
+    mesh_map: Dict[int, int] = {}
 
-            if mesh_index in meshes_handled:
-                continue
+    for layer_id, mesh_index in ordered_meshes:
 
-            mesh = model.meshes[mesh_index]
+        if mesh_index in meshes_handled:
+            continue
 
-            if mesh.primitives is None:
-                continue
+        report_progress(len(meshes_handled) / mesh_count)
+        mesh = model.meshes[mesh_index]
 
-            for primitive in mesh.primitives:
+        if mesh.primitives is None:
+            continue
 
-                # No POSITION - we can't Draco-encode this primitive
-                if primitive.attributes is None or primitive.attributes.POSITION is None:
-                    continue
+        for primitive in mesh.primitives:
 
-                position_accessor_idx = primitive.attributes.POSITION
-                positions = accessor_to_numpy(model, position_accessor_idx, buffers_data)
-                # positions = positions.astype(np.float32, copy=False)
+            # No POSITION - we can't Draco-encode this primitive
+            if primitive.attributes is None or primitive.attributes.POSITION is None:
+                continue
 
+            # The Draco extension only applies to triangle meshes, so other primitives
+            # (such as point clouds and error bars) are copied over uncompressed.
+            # We only encode positions, and Draco reorders vertices, so the same goes for
+            # triangle meshes with other attributes (such as colormap texture coordinates)
+            attribute_names = [name for name in ATTRIBUTE_NAMES
+                               if getattr(primitive.attributes, name, None) is not None]
+            if primitive.mode not in TRIANGLE_MODES or attribute_names != ["POSITION"]:
+                attributes = {name: copy_accessor(getattr(primitive.attributes, name), BufferTarget.ARRAY_BUFFER)
+                              for name in attribute_names}
+                indices_accessor = None
                 if primitive.indices is not None:
-                    index_arr = accessor_to_numpy(model, primitive.indices, buffers_data)
-                    # index_arr = index_arr.astype(np.uint32, copy=False)
-                    index_arr = index_arr.ravel()
-                else:
-                    count = positions.shape[0]
-                    index_arr = np.arange(count, dtype=np.uint32)
-
-                faces = index_arr.reshape(-1, 3)
-
-                draco_bytes = DracoPy.encode(positions, faces, quantization_bits=quantization_bits, compression_level=compression_level)
-
-                byte_offset = len(draco_bin_data)
-                draco_bin_data.extend(draco_bytes)
-
-                buffer_view_index = draco_builder.buffer_view_count
-                draco_builder.add_buffer_view(
-                    buffer=buffer_index,
-                    byte_offset=byte_offset,
-                    byte_length=len(draco_bytes),
-                    target=None,  # NB: We want this here for Draco; this isn't a standard ARRAY_BUFFER / ELEMENT_ARRAY_BUFFER
-                )
-
-                position_accessor = model.accessors[position_accessor_idx]
-                min_vals = (
-                    position_accessor.min
-                    if position_accessor.min is not None
-                    else positions.min(axis=0).tolist()
-                )
-                max_vals = (
-                    position_accessor.max
-                    if position_accessor.max is not None
-                    else positions.max(axis=0).tolist()
-                )
-                draco_builder.add_accessor(
-                    component_type=position_accessor.componentType,
-                    type=AccessorType(position_accessor.type),
-                    count=position_accessor.count,
-                    mins=min_vals,
-                    maxes=max_vals,
-                    buffer_view=None,
-                )
-
-                extensions_data = {
-                    DRACO_EXTENSION: {
-                        "bufferView": buffer_view_index,
-                        "attributes": {
-                            "POSITION": 0,
-                        }
-                    }
-                }
-
+                    indices_accessor = copy_accessor(primitive.indices, BufferTarget.ELEMENT_ARRAY_BUFFER)
                 draco_builder.add_mesh(
                     layer_id=layer_id,
-                    position_accessor=draco_builder.accessor_count-1,
+                    position_accessor=attributes.pop("POSITION"),
+                    indices_accessor=indices_accessor,
                     material=primitive.material,
                     mode=primitive.mode,
-                    extensions=extensions_data,
+                    attributes=attributes,
                 )
+                mesh_map[mesh_index] = draco_builder.mesh_count - 1
+                continue
 
-            meshes_handled.add(mesh_index)
+            position_accessor_idx = primitive.attributes.POSITION
+            positions = accessor_to_numpy(model, position_accessor_idx, buffers_data)
+            # positions = positions.astype(np.float32, copy=False)
+
+            if primitive.indices is not None:
+                index_arr = accessor_to_numpy(model, primitive.indices, buffers_data)
+                # index_arr = index_arr.astype(np.uint32, copy=False)
+                index_arr = index_arr.ravel()
+            else:
+                count = positions.shape[0]
+                index_arr = np.arange(count, dtype=np.uint32)
+
+            faces = index_arr.reshape(-1, 3)
+
+            draco_bytes = DracoPy.encode(positions, faces, quantization_bits=quantization_bits, compression_level=compression_level)
+
+            byte_offset = len(draco_bin_data)
+            draco_bin_data.extend(draco_bytes)
+
+            buffer_view_index = draco_builder.buffer_view_count
+            draco_builder.add_buffer_view(
+                buffer=buffer_index,
+                byte_offset=byte_offset,
+                byte_length=len(draco_bytes),
+                target=None,  # NB: We want this here for Draco; this isn't a standard ARRAY_BUFFER / ELEMENT_ARRAY_BUFFER
+            )
+
+            position_accessor = model.accessors[position_accessor_idx]
+            min_vals = (
+                position_accessor.min
+                if position_accessor.min is not None
+                else positions.min(axis=0).tolist()
+            )
+            max_vals = (
+                position_accessor.max
+                if position_accessor.max is not None
+                else positions.max(axis=0).tolist()
+            )
+            draco_builder.add_accessor(
+                component_type=position_accessor.componentType,
+                type=AccessorType(position_accessor.type),
+                count=position_accessor.count,
+                mins=min_vals,
+                maxes=max_vals,
+                buffer_view=None,
+            )
+
+            extensions_data = {
+                DRACO_EXTENSION: {
+                    "bufferView": buffer_view_index,
+                    "attributes": {
+                        "POSITION": 0,
+                    }
+                }
+            }
+
+            draco_builder.add_mesh(
+                layer_id=layer_id,
+                position_accessor=draco_builder.accessor_count-1,
+                material=primitive.material,
+                mode=primitive.mode,
+                extensions=extensions_data,
+            )
+            mesh_map[mesh_index] = draco_builder.mesh_count - 1
+
+        meshes_handled.add(mesh_index)
+
+    for mesh_index, (lod_meshes, screen_coverage) in builder.lods.items():
+        if mesh_index in mesh_map and all(index in mesh_map for index in lod_meshes):
+            draco_builder.add_lods(mesh_map[mesh_index],
+                                   [mesh_map[index] for index in lod_meshes],
+                                   screen_coverage)
+    draco_builder.add_preview(mesh_map[index] for index in builder.preview_meshes if index in mesh_map)
 
 
     bin_uri = "draco.bin"
@@ -3,9 +3,13 @@ import operator
 import struct
 from typing import Callable, Iterable, List, Literal, Optional, Tuple, Type, TypeVar, Union
 
-from gltflib import AccessorType, ComponentType, Material, PBRMetallicRoughness
+from gltflib import AccessorType, ComponentType, GLTFModel, Material, PBRMetallicRoughness
 from gltflib.gltf import GLTF
-from gltflib.gltf_resource import FileResource
+from gltflib.gltf_resource import FileResource, GLTFResource
+import numpy as np
+
+from glue_ar.profiling import profile_stage, record_bytes
+
 
 __all__ = [
     "GLTFIndexExportOption",
@@ -69,27 +73,36 @@ def create_material_for_color(
     )
 
 
+# glTF binary data is always little-endian
+_FORMAT_DTYPES = {"e": "<f2", "f": "<f4", "B": "<u1", "H": "<u2", "I": "<u4"}
+
+
+def _pack(arr: bytearray, values, format: str):
+    # Packing through NumPy runs in C (and releases the GIL for arrays), rather than a struct call per value
+    start = len(arr)
+    with profile_stage("packing"):
+        if not isinstance(values, np.ndarray):
+            values = list(values)
+        arr.extend(np.asarray(values, dtype=_FORMAT_DTYPES[format]).tobytes())
+        record_bytes(len(arr) - start)
+
+
 def add_points_to_bytearray(arr: bytearray,
                             points: Iterable[Iterable[Union[int, float]]],
                             format: Literal["e", "f"] = "f"):
-    for point in points:
-        for coordinate in point:
-            arr.extend(struct.pack(format, coordinate))
+    _pack(arr, points, format)
 
 
 def add_triangles_to_bytearray(arr: bytearray,
                                triangles: Iterable[Iterable[int]],
                                export_option: GLTFIndexExportOption = GLTFIndexExportOption.Int):
-    for triangle in triangles:
-        for index in triangle:
-            arr.extend(struct.pack(export_option.format, index))
+    _pack(arr, triangles, export_option.format)
 
 
 def add_values_to_bytearray(arr: bytearray,
                             values: Iterable[Union[int, float]],
                             format: Literal["e", "f"] = "f"):
-    for value in values:
-        arr.extend(struct.pack(format, value))
+    _pack(arr, values, format)
 
 
 T = TypeVar("T", bound=Union[int, float])
@@ -204,3 +217,78 @@ def get_vertex_positions(gltf: GLTF, mesh_index: int, primitive_index: int = 0):
         vertex = struct.unpack(unpack_format, vertex_bytes)
         vertex_data.append(vertex)
     return vertex_data
+
+
+def component_dtype(component_type: ComponentType | int) -> type:
+    match component_type:
+        case ComponentType.UNSIGNED_BYTE:
+            return np.uint8
+        case ComponentType.UNSIGNED_SHORT:
+            return np.uint16
+        case ComponentType.UNSIGNED_INT:
+            return np.uint32
+        case ComponentType.FLOAT:
+            return np.float32
+        case ComponentType.SHORT:
+            return np.int16
+        case ComponentType.BYTE:
+            return np.int8
+        case _:
+            raise ValueError("Invalid component type")
+
+
+def components_per_element(accessor_type: AccessorType | str) -> int:
+    match accessor_type:
+        case AccessorType.SCALAR.value:
+            return 1
+        case AccessorType.VEC2.value:
+            return 2
+        case AccessorType.VEC3.value:
+            return 3
+        case AccessorType.VEC4.value | AccessorType.MAT2.value:
+            return 4
+        case AccessorType.MAT3.value:
+            return 9
+        case AccessorType.MAT4.value:
+            return 16
+        case _:
+            raise ValueError("Invalid accessor type")
+
+
+def accessor_to_numpy(model: GLTFModel, accessor_index: int, buffers_data) -> np.ndarray:
+    accessor = model.accessors[accessor_index]
+    bv = model.bufferViews[accessor.bufferView]
+    buf_index = bv.buffer
+    bin_data = buffers_data[buf_index]
+
+    base = (bv.byteOffset or 0) + (accessor.byteOffset or 0)
+
+    component_type = accessor.componentType
+    dtype = component_dtype(component_type)
+
+    n_components = components_per_element(accessor.type)
+
+    count = accessor.count
+    item_bytes = np.dtype(dtype).itemsize * n_components
+    byte_length = count * item_bytes
+
+    raw = memoryview(bin_data)[base : base + byte_length]
+    arr = np.frombuffer(raw, dtype=dtype)
+
+    if n_components == 1:
+        return arr
+    else:
+        return arr.reshape((count, n_components))
+
+
+def get_data(resource: GLTFResource) -> bytes:
+    if resource.data:
+        return resource.data
+
+    if resource.uri:
+        with open(resource.uri, 'rb') as f:
+            data = f.read()
+
+        return data
+
+    raise ValueError("Resource has no data!")
@@ -1,3 +1,4 @@
+from asyncio import TimerHandle, get_running_loop
 import ipyvuetify as v  # noqa
 from ipyvuetify.VuetifyTemplate import VuetifyTemplate
 from ipywidgets import widget_serialization
@@ -13,6 +14,10 @@ from glue_ar.common.export_dialog_base import ARExportDialogBase
 from glue_ar.jupyter.widgets import widgets_for_callback_property
 
 
+# How long (in seconds) the options need to stay the same before the estimate is updated
+ESTIMATE_DELAY = 0.3
+
+
 class JupyterARExportDialog(ARExportDialogBase, VuetifyTemplate):
 
     template_file = (__file__, "export_dialog.vue")
@@ -39,12 +44,15 @@ class JupyterARExportDialog(ARExportDialogBase, VuetifyTemplate):
 
     layer_controls = traitlets.Bool(False).tag(sync=True)
 
+    estimate = traitlets.Unicode().tag(sync=True)
+
     def __init__(self,
                  viewer: Viewer,
                  display: Optional[bool] = False,
                  on_cancel: Optional[Callable] = None,
                  on_export: Optional[Callable] = None):
 
+        self._estimate_handle: Optional[TimerHandle] = None
         ARExportDialogBase.__init__(self, viewer=viewer)
         self.layer_layout = v.Col()
         VuetifyTemplate.__init__(self)
@@ -58,6 +66,7 @@ class JupyterARExportDialog(ARExportDialogBase, VuetifyTemplate):
         link_glue_choices(self, self.state, 'method')
         link((self, 'modelviewer'), (self.state, 'modelviewer'))
         link((self, 'layer_controls'), (self.state, 'layer_controls'))
+        link((self, 'estimate'), (self.state, 'estimate'))
 
         self.dialog_open = display
         self.on_cancel = on_cancel
@@ -65,6 +74,24 @@ class JupyterARExportDialog(ARExportDialogBase, VuetifyTemplate):
 
         self.input_widgets = []
 
+    def _request_estimate(self):
+        # Changes from the front end are handled on the kernel's event loop, so the update can wait there.
+        # Without a running loop (e.g. when the options are changed from a script) it happens straight away
+        try:
+            loop = get_running_loop()
+        except RuntimeError:
+            self._update_estimate()
+            return
+        if self._estimate_handle is not None:
+            self._estimate_handle.cancel()
+        self._estimate_handle = loop.call_later(ESTIMATE_DELAY, self._flush_estimate)
+
+    def _flush_estimate(self):
+        if self._estimate_handle is not None:
+            self._estimate_handle.cancel()
+            self._estimate_handle = None
+            self._update_estimate()
+
     def _update_layer_ui(self, state: State):
         if self.layer_layout is not None:
             for widget in self.layer_layout.children:
@@ -75,11 +102,13 @@ class JupyterARExportDialog(ARExportDialogBase, VuetifyTemplate):
         self.layer_layout = v.Col()
         for property, _ in state.iter_callback_properties():
             is_log_pm = (property in ("log_points_per_mesh", "log_voxels_per_mesh"))
+            gl_only = is_log_pm or property in ("spatial_chunks", "lod_levels")
+            is_log = is_log_pm or property == "log_point_budget"
             # TODO: Think of a cleaner way to handle this
-            if is_log_pm and self.state.filetype.lower() not in ("gltf", "glb"):
+            if gl_only and self.state.filetype.lower() not in ("gltf", "glb"):
                 continue
             name = self.display_name(property)
-            widgets = widgets_for_callback_property(state, property, name, label_for_value=not is_log_pm)
+            widgets = widgets_for_callback_property(state, property, name, label_for_value=not is_log)
             input_widgets.extend(w for w in widgets if isinstance(w, v.Slider))
             rows.append(v.Row(children=widgets, align="center"))
 
@@ -0,0 +1,149 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from os.path import basename
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+from glue.logger import logger
+from ipyvuetify.VuetifyTemplate import VuetifyTemplate
+from ipywidgets import VBox
+import traitlets
+
+from glue_ar.progress import ExportCancelled, ExportProgress, ProgressSnapshot
+
+
+__all__ = ["ExportJob", "ExportJobWidget", "ExportJobList", "ExportQueue", "export_queue"]
+
+
+class ExportJobWidget(VuetifyTemplate):
+
+    template_file = (__file__, "export_job.vue")
+
+    filename = traitlets.Unicode().tag(sync=True)
+    status = traitlets.Unicode("queued").tag(sync=True)
+    value = traitlets.Float(0).tag(sync=True)
+    message = traitlets.Unicode("Waiting for earlier exports to finish").tag(sync=True)
+    cancelling = traitlets.Bool(False).tag(sync=True)
+
+    def __init__(self, filename: str, on_cancel: Optional[Callable] = None, on_dismiss: Optional[Callable] = None):
+        super().__init__()
+        self.filename = filename
+        self.on_cancel = on_cancel
+        self.on_dismiss = on_dismiss
+
+    def vue_cancel(self, *args):
+        if self.on_cancel:
+            self.on_cancel()
+
+    def vue_dismiss(self, *args):
+        if self.on_dismiss:
+            self.on_dismiss()
+        self.close()
+
+
+class ExportJobList(VBox):
+    """
+    The progress widgets of the exports started from one viewer. These stay in place until they're dismissed,
+    so this is kept apart from anything (like the export dialogs) that gets cleared away.
+    """
+
+    def add(self, job: "ExportJob"):
+        widget = job.widget
+        widget.on_dismiss = lambda: self.remove(widget)
+        self.children = (*self.children, widget)
+
+    def remove(self, widget: ExportJobWidget):
+        self.children = tuple(child for child in self.children if child is not widget)
+
+
+class ExportJob:
+    """
+    An export waiting for, or running on, an `ExportQueue`, along with the widget that shows its progress.
+    The exporter is called with the given keyword arguments, plus the `progress` that tracks it.
+    """
+
+    def __init__(self, exporter: Callable, filepath: str, kwargs: Dict[str, Any]):
+        self.exporter = exporter
+        self.filepath = filepath
+        self.kwargs = kwargs
+        self.progress = ExportProgress(callback=self._on_progress, interval=0.25)
+        self.widget = ExportJobWidget(basename(filepath), on_cancel=self.cancel)
+        self.future: Optional[Future] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def status(self) -> str:
+        return self.widget.status
+
+    def cancel(self):
+        self.progress.cancel()
+        self.widget.cancelling = True
+        # A job that hasn't started yet can be taken off the queue directly
+        if self.future is not None and self.future.cancel():
+            self._finish("cancelled", "Cancelled before starting")
+
+    def _on_progress(self, snapshot: ProgressSnapshot):
+        self.widget.value = 100 * snapshot.fraction
+        if not self.progress.cancelled:
+            self.widget.message = snapshot.description
+
+    def _finish(self, status: str, message: str):
+        # The widget outlives the job on the queue, so let go of the states and data that the export needed
+        self.kwargs = {}
+        self.widget.status = status
+        self.widget.message = message
+        self.widget.cancelling = False
+
+    def run(self):
+        self.widget.status = "running"
+        self.widget.message = "Starting export"
+        try:
+            self.exporter(filepath=self.filepath, progress=self.progress, **self.kwargs)
+        except ExportCancelled:
+            self._finish("cancelled", "Export cancelled")
+        except Exception as e:
+            logger.exception(f"Export to {self.filepath} failed")
+            self.error = e
+            self._finish("failed", f"Export failed: {e}")
+        else:
+            self.widget.value = 100
+            self._finish("done", f"Exported to {self.filepath}")
+
+
+class ExportQueue:
+    """
+    Runs exports one after another on a background thread, so that the kernel stays responsive while they run.
+    `jobs` holds the exports that are waiting or running; a job is removed once it finishes, fails or is cancelled.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="glue-ar-export")
+        self._lock = Lock()
+        self.jobs: List[ExportJob] = []
+
+    def submit(self, exporter: Callable, filepath: str, **kwargs) -> ExportJob:
+        job = ExportJob(exporter, filepath, kwargs)
+        with self._lock:
+            self.jobs.append(job)
+        job.future = self._executor.submit(job.run)
+        job.future.add_done_callback(lambda future: self._remove(job))
+        return job
+
+    def _remove(self, job: ExportJob):
+        with self._lock:
+            if job in self.jobs:
+                self.jobs.remove(job)
+
+    @property
+    def pending(self) -> List[ExportJob]:
+        with self._lock:
+            return [job for job in self.jobs if job.future is not None and not job.future.done()]
+
+    def shutdown(self, cancel: bool = False):
+        if cancel:
+            for job in self.pending:
+                job.cancel()
+        self._executor.shutdown(wait=True)
+
+
+# Exports from all viewers share one queue, so that they take turns rather than competing for the CPU
+export_queue = ExportQueue()
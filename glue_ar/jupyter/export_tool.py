@@ -4,9 +4,8 @@ from os.path import exists
 from glue.config import viewer_tool
 from glue.viewers.common.tool import Tool
 
-from glue_ar.common.export import export_viewer
-from glue_ar.jupyter.export_dialog import JupyterARExportDialog
-from glue_ar.utils import AR_ICON, is_volume_viewer, xyz_bounds
+from glue_ar.jupyter.export_queue import ExportJob, ExportJobList, export_queue
+from glue_ar.utils import AR_ICON, copy_state, is_volume_viewer, snapshot_viewer_state, xyz_bounds
 
 import ipyvuetify as v  # noqa
 from ipywidgets import HBox, Layout # noqa
@@ -24,7 +23,20 @@ class JupyterARExportTool(Tool):
     action_text = "Export 3D file"
     tool_tip = "Export the current view to a 3D file"
 
+    def __init__(self, viewer=None):
+        super().__init__(viewer=viewer)
+        self.job_list = ExportJobList()
+
+    def _clear_output(self):
+        # Clearing the viewer output removes the dialogs, but the progress of earlier exports should stay visible
+        self.viewer.output_widget.clear_output()
+        if self.job_list.children:
+            with self.viewer.output_widget:
+                display(self.job_list)
+
     def activate(self):
+        # This imports all of the exporters, so it's only imported once it's needed
+        from glue_ar.jupyter.export_dialog import JupyterARExportDialog
 
         done = False
 
@@ -63,7 +75,7 @@ class JupyterARExportTool(Tool):
             self.maybe_save_figure(file_chooser.selected)
 
         def on_close_click(button, event, data):
-            self.viewer.output_widget.clear_output()
+            self._clear_output()
             dialog.close()
 
         def on_selected_change(chooser):
@@ -99,7 +111,6 @@ class JupyterARExportTool(Tool):
 
             def on_yes_click(button, event, data):
                 self.save_figure(filepath)
-                self.viewer.output_widget.clear_output()
 
             def on_no_click(button, event, data):
                 check_dialog.v_model = False
@@ -111,18 +122,32 @@ class JupyterARExportTool(Tool):
                 display(check_dialog)
         else:
             self.save_figure(filepath)
-            self.viewer.output_widget.clear_output()
 
-    def save_figure(self, filepath):
+    def save_figure(self, filepath) -> ExportJob:
+        """
+        Queue the export to run in the background, and show its progress below the viewer.
+        The export uses copies of the viewer, layer and export options states as they are now,
+        so changing the viewer (or starting another export) while this one waits or runs doesn't affect it.
+        """
+        from glue_ar.common.cache import default_geometry_cache
+        from glue_ar.common.export import export_viewer
+
         bounds = xyz_bounds(self.viewer.state, with_resolution=is_volume_viewer(self.viewer))
         layer_states = [layer.state for layer in self.viewer.layers if layer.enabled and layer.state.visible]
-        state_dict = self.export_dialog.state_dictionary
-        export_viewer(viewer_state=self.viewer.state,
-                      layer_states=layer_states,
-                      bounds=bounds,
-                      state_dictionary=state_dict,
-                      filepath=filepath,
-                      compression=self.export_dialog.state.compression,
-                      model_viewer=self.export_dialog.state.modelviewer,
-                      layer_controls=self.export_dialog.state.modelviewer and \
-                                     self.export_dialog.state.layer_controls)
+        viewer_state, layer_states = snapshot_viewer_state(self.viewer.state, layer_states)
+        state_dict = {label: (method, copy_state(state))
+                      for label, (method, state) in self.export_dialog.state_dictionary.items()}
+        dialog_state = self.export_dialog.state
+        job = export_queue.submit(export_viewer,
+                                  viewer_state=viewer_state,
+                                  layer_states=layer_states,
+                                  bounds=bounds,
+                                  state_dictionary=state_dict,
+                                  filepath=filepath,
+                                  compression=dialog_state.compression,
+                                  model_viewer=dialog_state.modelviewer,
+                                  cache=default_geometry_cache(),
+                                  layer_controls=dialog_state.modelviewer and dialog_state.layer_controls)
+        self.job_list.add(job)
+        self._clear_output()
+        return job
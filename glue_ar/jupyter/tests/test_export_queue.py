@@ -0,0 +1,86 @@
+from threading import Event
+
+from pytest import importorskip, raises
+
+importorskip("glue_jupyter")
+
+from glue_ar.jupyter.export_queue import ExportJobList, ExportQueue
+from glue_ar.progress import progress_span, report_progress
+
+
+def _export(filepath, progress, steps=10, started=None, release=None):
+    with progress.activate():
+        if started is not None:
+            started.set()
+        if release is not None:
+            release.wait(5)
+        with progress_span(1, stage="geometry", layer="Layer"):
+            for step in range(steps):
+                report_progress(step / steps)
+    with open(filepath, "w") as f:
+        f.write("exported")
+
+
+def _failing_export(filepath, progress):
+    raise ValueError("Bad options")
+
+
+class TestExportQueue:
+
+    def setup_method(self, method):
+        self.queue = ExportQueue()
+
+    def teardown_method(self, method):
+        self.queue.shutdown(cancel=True)
+
+    def test_export(self, tmp_path):
+        filepaths = [str(tmp_path / f"export_{index}.glb") for index in range(3)]
+        jobs = [self.queue.submit(_export, filepath) for filepath in filepaths]
+        for job in jobs:
+            job.future.result(timeout=10)
+            assert job.status == "done"
+            assert job.widget.value == 100
+            assert job.widget.filename == job.filepath.split("/")[-1]
+            with open(job.filepath) as f:
+                assert f.read() == "exported"
+        assert self.queue.pending == []
+        # Finished jobs don't stay on the queue, or keep hold of what they exported
+        assert self.queue.jobs == []
+        assert all(job.kwargs == {} for job in jobs)
+
+    def test_cancel(self, tmp_path):
+        started, release = Event(), Event()
+        running = self.queue.submit(_export, str(tmp_path / "running.glb"), started=started, release=release)
+        queued = self.queue.submit(_export, str(tmp_path / "queued.glb"))
+        assert started.wait(5)
+        assert queued.status == "queued"
+
+        # The queued job never starts, and the running one stops at its next progress check
+        queued.widget.vue_cancel()
+        assert queued.status == "cancelled"
+        running.widget.vue_cancel()
+        assert running.widget.cancelling
+        release.set()
+        running.future.result(timeout=10)
+        assert running.status == "cancelled"
+        assert not (tmp_path / "running.glb").exists()
+        assert not (tmp_path / "queued.glb").exists()
+
+    def test_failure(self, tmp_path):
+        job = self.queue.submit(_failing_export, str(tmp_path / "export.glb"))
+        job.future.result(timeout=10)
+        assert job.status == "failed"
+        assert "Bad options" in job.widget.message
+        with raises(ValueError):
+            raise job.error
+
+    def test_job_list(self, tmp_path):
+        job_list = ExportJobList()
+        jobs = [self.queue.submit(_export, str(tmp_path / f"export_{index}.glb")) for index in range(2)]
+        for job in jobs:
+            job_list.add(job)
+            job.future.result(timeout=10)
+        assert job_list.children == tuple(job.widget for job in jobs)
+
+        jobs[0].widget.vue_dismiss()
+        assert job_list.children == (jobs[1].widget,)
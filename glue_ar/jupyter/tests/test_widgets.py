@@ -3,8 +3,9 @@ from pytest import importorskip
 importorskip("glue_jupyter")
 
 from echo import CallbackProperty
-from ipyvuetify import Checkbox, Img, Slider, Tooltip
+from ipyvuetify import Checkbox, Img, Select, Slider, Tooltip
 
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
 from glue_ar.common.tests.test_base_dialog import DummyState
 from glue_ar.jupyter.widgets import boolean_callback_widgets, info_icon, \
                                     info_tooltip, number_callback_widgets, \
@@ -98,3 +99,18 @@ def test_widgets_for_property():
     assert checkbox.label == "Bool CB"
     assert not checkbox.value
     assert isinstance(icon, Tooltip)
+
+
+def test_selection_callback_widgets():
+    state = ARVispyScatterExportOptions()
+    widgets = widgets_for_callback_property(state, "glyph", "Glyph")
+    assert len(widgets) == 2
+    select, icon = widgets
+    assert isinstance(select, Select)
+    assert select.label == "Glyph"
+    assert select.items == ["Sphere", "Icosphere", "Octahedron", "Cross", "Star"]
+    assert select.v_model == "Sphere"
+    assert isinstance(icon, Tooltip)
+
+    select.v_model = "Cross"
+    assert state.glyph == "Cross"
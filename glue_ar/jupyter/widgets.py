@@ -1,7 +1,7 @@
 from os.path import join
 from typing import List, Tuple
 
-from echo import CallbackProperty, HasCallbackProperties
+from echo import CallbackProperty, HasCallbackProperties, SelectionCallbackProperty
 from glue_jupyter.common.toolbar_vuetify import read_icon
 from glue_jupyter.link import link
 import ipyvuetify as v
@@ -90,6 +90,29 @@ def number_callback_widgets(instance: HasCallbackProperties,
         return (slider,)
 
 
+def selection_callback_widgets(instance: HasCallbackProperties,
+                               property: str,
+                               display_name: str,
+                               **kwargs) -> Tuple[DOMWidget]:
+
+    instance_type = type(instance)
+    cb_property = getattr(instance_type, property)
+
+    select = v.Select(
+            items=list(cb_property.get_choices(instance)),
+            label=display_name,
+            hide_details=True,
+    )
+    link((instance, property),
+         (select, 'v_model'))
+
+    if cb_property.__doc__:
+        icon = info_icon(cb_property)
+        return (select, icon)
+    else:
+        return (select,)
+
+
 def widgets_for_callback_property(
         instance: HasCallbackProperties,
         property: str,
@@ -97,6 +120,9 @@ def widgets_for_callback_property(
         **kwargs,
 ) -> Tuple[DOMWidget]:
 
+    if isinstance(getattr(type(instance), property), SelectionCallbackProperty):
+        return selection_callback_widgets(instance, property, display_name, **kwargs)
+
     t = type(getattr(instance, property))
     if t is bool:
         return boolean_callback_widgets(instance, property, display_name, **kwargs)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+import json
+from threading import Lock
+from time import perf_counter
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from glue.logger import logger
+
+
+__all__ = ["ExportProfiler", "ExportReport", "StageRecord", "profile_stage", "profiled", "record_bytes"]
+
+
+@dataclass
+class StageRecord:
+    """
+    The accumulated statistics for one stage of an export, for a single layer (if applicable).
+    Times are inclusive of any stages nested inside of this one.
+    `peak_memory` is the largest increase in traced memory over the start of any call,
+    and is `None` if memory wasn't traced.
+    """
+    stage: str
+    layer: Optional[str] = None
+    calls: int = 0
+    wall_time: float = 0.0
+    peak_memory: Optional[int] = None
+    output_bytes: int = 0
+
+
+@dataclass
+class ExportReport:
+    filepath: Optional[str] = None
+    total_time: float = 0.0
+    peak_memory: Optional[int] = None
+    stages: List[StageRecord] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+class _OpenStage:
+
+    def __init__(self, record: StageRecord, start_memory: int):
+        self.record = record
+        self.start_memory = start_memory
+        self.peak_memory = 0
+
+
+_active_profiler: ContextVar[Optional[ExportProfiler]] = ContextVar("glue_ar_profiler", default=None)
+_open_stages: ContextVar[Tuple[_OpenStage, ...]] = ContextVar("glue_ar_profiler_stages", default=())
+
+
+class ExportProfiler:
+    """
+    Collects timing, memory, and output size statistics for the stages of an export.
+
+    Pass an instance to `export_viewer` (or use `activate` directly), then inspect `report`.
+    Memory tracing uses `tracemalloc`, which slows down allocation-heavy code noticeably,
+    so it can be turned off with `trace_memory=False`. Note that `tracemalloc` is process-wide,
+    so memory measurements for stages running concurrently on different threads will overlap.
+    """
+
+    def __init__(self, trace_memory: bool = True, log_json: bool = False):
+        self.trace_memory = trace_memory
+        self.log_json = log_json
+        self.report = ExportReport()
+        self._records: Dict[Tuple[str, Optional[str]], StageRecord] = {}
+        self._lock = Lock()
+
+    def _record(self, stage: str, layer: Optional[str]) -> StageRecord:
+        key = (stage, layer)
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                record = StageRecord(stage=stage, layer=layer,
+                                     peak_memory=0 if self.trace_memory else None)
+                self._records[key] = record
+                self.report.stages.append(record)
+        return record
+
+    def _update_peaks(self, open_stages: Tuple[_OpenStage, ...]) -> int:
+        # Each stage resets the traced peak when it starts, so we need to make sure that
+        # the peak so far has been attributed to all of the enclosing stages first
+        current, peak = tracemalloc.get_traced_memory()
+        for open_stage in open_stages:
+            open_stage.peak_memory = max(open_stage.peak_memory, peak - open_stage.start_memory)
+        tracemalloc.reset_peak()
+        return current
+
+    @contextmanager
+    def stage(self, name: str, layer: Optional[str] = None) -> Iterator[StageRecord]:
+        open_stages = _open_stages.get()
+        if layer is None and open_stages:
+            layer = open_stages[-1].record.layer
+        record = self._record(name, layer)
+
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        start_memory = self._update_peaks(open_stages) if tracing else 0
+        open_stage = _OpenStage(record, start_memory)
+        token = _open_stages.set(open_stages + (open_stage,))
+        start = perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = perf_counter() - start
+            _open_stages.reset(token)
+            if tracing:
+                self._update_peaks(open_stages + (open_stage,))
+            with self._lock:
+                record.calls += 1
+                record.wall_time += elapsed
+                if tracing:
+                    record.peak_memory = max(record.peak_memory or 0, open_stage.peak_memory)
+
+    @contextmanager
+    def activate(self, filepath: Optional[str] = None) -> Iterator[ExportProfiler]:
+        """
+        Make this the active profiler for the duration of the context, so that
+        any stages entered via `profile_stage` are recorded by it.
+        """
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        self.report.filepath = filepath
+        token = _active_profiler.set(self)
+        total = self._record("total", None)
+        try:
+            with self.stage("total"):
+                yield self
+        finally:
+            _active_profiler.reset(token)
+            if started_tracing:
+                tracemalloc.stop()
+            self.report.total_time = total.wall_time
+            self.report.peak_memory = total.peak_memory
+            if self.log_json:
+                logger.info(self.report.to_json())
+
+
+@contextmanager
+def profile_stage(name: str, layer: Optional[str] = None) -> Iterator[Optional[StageRecord]]:
+    """
+    Record the enclosed code as a stage of the active export profiler, if there is one.
+    If no layer is given, the layer of the enclosing stage is used.
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield None
+        return
+    with profiler.stage(name, layer) as record:
+        yield record
+
+
+T = TypeVar("T")
+
+
+def profiled(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    A decorator that records each call of the decorated function as the given stage.
+    """
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> T:
+            with profile_stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_bytes(count: int):
+    """
+    Attribute the given number of output bytes to the innermost active stage.
+    """
+    open_stages = _open_stages.get()
+    if not open_stages:
+        return
+    profiler = _active_profiler.get()
+    if profiler is None:
+        return
+    with profiler._lock:
+        open_stages[-1].record.output_bytes += count
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from threading import Event, RLock
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+
+__all__ = ["CancellationToken", "ExportCancelled", "ExportProgress", "ProgressSnapshot",
+           "check_cancelled", "format_duration", "progress_span", "report_progress", "tracked"]
+
+
+_STAGE_DESCRIPTIONS = {
+    "geometry": "Building geometry",
+    "compress": "Compressing",
+    "write": "Writing file",
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class CancellationToken:
+    """
+    A thread-safe flag that asks an export to stop at its next progress check.
+    """
+
+    def __init__(self):
+        self._event = Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ExportCancelled()
+
+
+def format_duration(seconds: float) -> str:
+    seconds = round(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+
+@dataclass(frozen=True)
+class ProgressSnapshot:
+    """
+    The state of an export at some point in time. `fraction` runs from 0 to 1,
+    and `eta` (in seconds) is `None` until there's been enough progress to extrapolate from.
+    """
+    fraction: float
+    stage: Optional[str]
+    layer: Optional[str]
+    elapsed: float
+    eta: Optional[float]
+
+    @property
+    def description(self) -> str:
+        """
+        A short description of the current stage, for display in a UI,
+        e.g. "Building geometry for Layer 1 (about 2m 05s left)".
+        """
+        description = _STAGE_DESCRIPTIONS.get(self.stage, "Preparing")
+        if self.stage == "geometry" and self.layer:
+            description += f" for {self.layer}"
+        if self.eta is not None:
+            description += f" (about {format_duration(self.eta)} left)"
+        return description
+
+
+class _Span:
+
+    def __init__(self, width: float, stage: Optional[str], layer: Optional[str], parents: Tuple[_Span, ...]):
+        self.width = width
+        self.stage = stage
+        self.layer = layer
+        self.parents = parents
+        self.done = 0.0
+
+
+_active_progress: ContextVar[Optional[ExportProgress]] = ContextVar("glue_ar_progress", default=None)
+_open_spans: ContextVar[Tuple[_Span, ...]] = ContextVar("glue_ar_progress_spans", default=())
+
+
+class ExportProgress:
+    """
+    Tracks the progress of an export, and carries the token used to cancel it.
+
+    Pass an instance to `export_viewer`, then poll `snapshot` from another thread
+    (or give a `callback`, which is called with a snapshot at most every `interval` seconds,
+    on whichever thread made the progress). Calling `cancel` makes the export raise `ExportCancelled`
+    at its next progress check.
+
+    The export is divided into nested spans (stages, then layers, then chunks within a layer),
+    each of which takes up a fixed share of its parent. Progress is additive,
+    so spans running concurrently on different threads are counted correctly.
+    """
+
+    def __init__(self,
+                 callback: Optional[Callable[[ProgressSnapshot], None]] = None,
+                 token: Optional[CancellationToken] = None,
+                 interval: float = 0.1):
+        self.callback = callback
+        self.token = token or CancellationToken()
+        self.interval = interval
+        self._fraction = 0.0
+        self._stage: Optional[str] = None
+        self._layer: Optional[str] = None
+        self._start: Optional[float] = None
+        self._last_callback = 0.0
+        self._lock = RLock()
+
+    def cancel(self):
+        self.token.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.cancelled
+
+    @property
+    def snapshot(self) -> ProgressSnapshot:
+        with self._lock:
+            fraction = min(self._fraction, 1.0)
+            stage, layer = self._stage, self._layer
+        elapsed = perf_counter() - self._start if self._start is not None else 0.0
+        eta = elapsed * (1 - fraction) / fraction if fraction > 0.01 else None
+        return ProgressSnapshot(fraction=fraction, stage=stage, layer=layer, elapsed=elapsed, eta=eta)
+
+    def _advance(self, span: _Span, fraction: float):
+        with self._lock:
+            delta = min(max(fraction, 0.0), 1.0) * span.width - span.done
+            if delta > 0:
+                for s in span.parents + (span,):
+                    s.done += delta
+                self._fraction += delta
+            if span.stage is not None:
+                self._stage = span.stage
+            self._layer = span.layer
+            self._notify()
+
+    def _notify(self, force: bool = False):
+        if self.callback is None:
+            return
+        # The callback is run under the lock so that snapshots from different threads arrive in order
+        with self._lock:
+            now = perf_counter()
+            if force or now - self._last_callback >= self.interval:
+                self._last_callback = now
+                self.callback(self.snapshot)
+
+    @contextmanager
+    def activate(self) -> Iterator[ExportProgress]:
+        """
+        Make this the active progress tracker for the duration of the context,
+        so that progress reported via `progress_span` and `report_progress` is counted by it.
+        """
+        self._start = perf_counter()
+        root = _Span(1.0, None, None, ())
+        progress_token = _active_progress.set(self)
+        spans_token = _open_spans.set((root,))
+        try:
+            self.token.raise_if_cancelled()
+            yield self
+            self._advance(root, 1.0)
+            self._notify(force=True)
+        finally:
+            _open_spans.reset(spans_token)
+            _active_progress.reset(progress_token)
+
+
+@contextmanager
+def progress_span(share: float, stage: Optional[str] = None, layer: Optional[str] = None) -> Iterator[None]:
+    """
+    Count the enclosed code as taking up the given share of the innermost open span.
+    The span is complete when the context exits.
+    If no stage or layer is given, those of the enclosing span are used.
+    """
+    progress = _active_progress.get()
+    if progress is None:
+        yield
+        return
+    spans = _open_spans.get()
+    parent = spans[-1]
+    width = parent.width * share
+    span = _Span(width, stage or parent.stage, layer or parent.layer, spans)
+    token = _open_spans.set(spans + (span,))
+    try:
+        progress.token.raise_if_cancelled()
+        progress._advance(span, 0.0)
+        yield
+        progress._advance(span, 1.0)
+    finally:
+        _open_spans.reset(token)
+
+
+def report_progress(fraction: float):
+    """
+    Report that the given fraction of the innermost open span is complete,
+    and raise `ExportCancelled` if the export has been cancelled.
+    """
+    progress = _active_progress.get()
+    if progress is None:
+        return
+    progress.token.raise_if_cancelled()
+    progress._advance(_open_spans.get()[-1], fraction)
+
+
+def check_cancelled():
+    """
+    Raise `ExportCancelled` if the active export has been cancelled.
+    """
+    progress = _active_progress.get()
+    if progress is not None:
+        progress.token.raise_if_cancelled()
+
+
+T = TypeVar("T")
+
+
+def tracked(items: Iterable[T],
+            total: Optional[int] = None,
+            start: float = 0.0,
+            end: float = 1.0,
+            every: int = 1000) -> Iterable[T]:
+    """
+    Iterate over the given items, reporting progress through the innermost open span
+    (scaled to run from `start` to `end`) and checking for cancellation after every `every` items.
+    When no export progress is being tracked, the items are returned as they are.
+    """
+    if _active_progress.get() is None:
+        return items
+    if total is None:
+        total = len(items)
+    return _tracked(items, total, start, end, every)
+
+
+def _tracked(items: Iterable[T], total: int, start: float, end: float, every: int) -> Iterator[T]:
+    scale = (end - start) / max(total, 1)
+    for index, item in enumerate(items):
+        if index % every == 0:
+            report_progress(start + index * scale)
+        yield item
+    report_progress(end)
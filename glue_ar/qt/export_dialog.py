@@ -5,6 +5,7 @@ from glue.core.state_objects import State
 from glue_qt.utils import load_ui
 from glue_ar.common.export_dialog_base import ARExportDialogBase
 
+from qtpy.QtCore import QTimer
 from qtpy.QtWidgets import QDialog, QFormLayout, QHBoxLayout, QLayoutItem, QVBoxLayout, QLayout, QWidget
 
 from glue_ar.qt.widgets import widgets_for_callback_property
@@ -13,13 +14,23 @@ from glue_ar.qt.widgets import widgets_for_callback_property
 __all__ = ['QtARExportDialog']
 
 
+# How long the options need to stay the same before the estimate is updated
+ESTIMATE_DELAY_MS = 300
+
+
 class QtARExportDialog(ARExportDialogBase, QDialog):
 
     def __init__(self, parent=None, viewer=None):
 
+        self._estimate_timer = None
         ARExportDialogBase.__init__(self, viewer=viewer)
         QDialog.__init__(self, parent=parent)
 
+        self._estimate_timer = QTimer(self)
+        self._estimate_timer.setSingleShot(True)
+        self._estimate_timer.setInterval(ESTIMATE_DELAY_MS)
+        self._estimate_timer.timeout.connect(self._update_estimate)
+
         self.ui = load_ui('export_dialog.ui', self, directory=os.path.dirname(__file__))
 
         self._connections = autoconnect_callbacks_to_qt(self.state, self.ui)
@@ -33,6 +44,18 @@ class QtARExportDialog(ARExportDialogBase, QDialog):
         self.ui.button_cancel.clicked.connect(self.reject)
         self.ui.button_ok.clicked.connect(self.accept)
 
+    def _request_estimate(self):
+        # The timer doesn't exist until the dialog has been set up, and until then there's nothing to wait for
+        if self._estimate_timer is None:
+            self._update_estimate()
+        else:
+            self._estimate_timer.start()
+
+    def _flush_estimate(self):
+        if self._estimate_timer is not None and self._estimate_timer.isActive():
+            self._estimate_timer.stop()
+            self._update_estimate()
+
     def _clear_layout(self, layout: QLayout):
         if layout is not None:
             while layout.count():
@@ -69,13 +92,15 @@ class QtARExportDialog(ARExportDialogBase, QDialog):
         self._clear_layer_layout()
         for property in state.callback_properties():
             is_log_pm = (property in ("log_points_per_mesh", "log_voxels_per_mesh"))
+            gl_only = is_log_pm or property in ("spatial_chunks", "lod_levels")
+            is_log = is_log_pm or property == "log_point_budget"
             # TODO: Think of a cleaner way to handle this
-            if is_log_pm and self.state.filetype.lower() not in ("gltf", "glb"):
+            if gl_only and self.state.filetype.lower() not in ("gltf", "glb"):
                 continue
             row = QVBoxLayout()
             name = self.display_name(property)
             widget_tuples, connection = widgets_for_callback_property(state, property, name,
-                                                                      label_for_value=not is_log_pm)
+                                                                      label_for_value=not is_log)
             self._layer_connections.append(connection)
             for widgets in widget_tuples:
                 subrow = QHBoxLayout()
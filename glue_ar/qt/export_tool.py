@@ -8,8 +8,7 @@ from glue.viewers.common.tool import SimpleToolMenu, Tool
 from glue_qt.utils.threading import Worker
 
 from glue_ar.utils import AR_ICON, is_volume_viewer, xyz_bounds
-from glue_ar.common.export import export_viewer
-from glue_ar.qt.export_dialog import QtARExportDialog
+from glue_ar.progress import ExportProgress
 from glue_ar.qt.exporting_dialog import ExportingDialog
 
 
@@ -42,6 +41,10 @@ class QtARExportTool(Tool):
     _default_filename = "glue_export"
 
     def activate(self):
+        # These import all of the exporters, so they're only imported once they're needed
+        from glue_ar.common.cache import default_geometry_cache
+        from glue_ar.common.export import export_viewer
+        from glue_ar.qt.export_dialog import QtARExportDialog
 
         dialog = QtARExportDialog(parent=self.viewer, viewer=self.viewer)
         result = dialog.exec_()
@@ -75,6 +78,7 @@ class QtARExportTool(Tool):
                            filepath=export_path,
                            compression=dialog.state.compression,
                            model_viewer=dialog.state.modelviewer,
+                           cache=default_geometry_cache(),
                            layer_controls=dialog.state.modelviewer and \
                                           dialog.state.layer_controls)
 
@@ -82,8 +86,9 @@ class QtARExportTool(Tool):
         _, ext = splitext(kwargs["filepath"])
         ext = ext[1:]
         filetype = _FILETYPE_NAMES.get(ext, None)
-        worker = Worker(exporter, **kwargs)
-        exporting_dialog = ExportingDialog(parent=self.viewer, filetype=filetype)
+        progress = ExportProgress()
+        worker = Worker(exporter, progress=progress, **kwargs)
+        exporting_dialog = ExportingDialog(parent=self.viewer, filetype=filetype, progress=progress)
         worker.result.connect(exporting_dialog.close)
         worker.error.connect(exporting_dialog.close)
         worker.start()
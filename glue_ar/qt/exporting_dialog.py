@@ -1,22 +1,40 @@
-from qtpy.QtWidgets import QDialog, QLabel, QVBoxLayout
+from typing import Optional
+
+from qtpy.QtWidgets import QDialog, QLabel, QProgressBar, QPushButton, QVBoxLayout
 from qtpy.QtCore import Qt, QTimer
 
+from glue_ar.progress import ExportProgress
+
 __all__ = ['ExportingDialog']
 
 
 class ExportingDialog(QDialog):
 
     _max_dots = 3
+    _progress_steps = 1000
 
-    def __init__(self, parent=None, filetype=None):
+    def __init__(self, parent=None, filetype=None, progress: Optional[ExportProgress] = None):
         super(ExportingDialog, self).__init__(parent=parent, flags=Qt.FramelessWindowHint)
 
+        self.progress = progress
+
         target = filetype if filetype else "3D file"
         self.message = f"Exporting to {target}"
         self.label = QLabel()
         self.label.setText(self.message)
         self.layout = QVBoxLayout()
         self.layout.addWidget(self.label)
+
+        if progress is not None:
+            self.progress_bar = QProgressBar()
+            self.progress_bar.setRange(0, self._progress_steps)
+            self.status_label = QLabel()
+            self.cancel_button = QPushButton("Cancel")
+            self.cancel_button.clicked.connect(self.cancel)
+            self.layout.addWidget(self.progress_bar)
+            self.layout.addWidget(self.status_label)
+            self.layout.addWidget(self.cancel_button)
+
         self.setLayout(self.layout)
 
         ending_spaces = " " * self._max_dots
@@ -27,11 +45,43 @@ class ExportingDialog(QDialog):
         self.timer.timeout.connect(self._on_timer_update)
         self.timer.start(750)
 
+        # The export runs on a worker thread, so we poll its progress rather than listening for updates
+        self.progress_timer = QTimer()
+        if progress is not None:
+            self.progress_timer.timeout.connect(self._update_progress)
+            self.progress_timer.start(200)
+
     def _on_timer_update(self):
         self.n_dots = (self.n_dots + 1) % (self._max_dots + 1)
         text = self.message + "." * self.n_dots
         self.label.setText(text)
 
+    def _update_progress(self):
+        snapshot = self.progress.snapshot
+        self.progress_bar.setValue(round(snapshot.fraction * self._progress_steps))
+        if not self.progress.cancelled:
+            self.status_label.setText(snapshot.description)
+
+    def cancel(self):
+        """
+        Ask the export to stop. The export stops (and removes any files that it has written)
+        at its next progress check, at which point the worker closes this dialog.
+        """
+        if self.progress is None:
+            return
+        self.progress.cancel()
+        self.cancel_button.setEnabled(False)
+        self.message = "Cancelling export"
+        self.status_label.setText("Waiting for the current step to finish")
+
+    def reject(self):
+        # Escape shouldn't leave the export running in the background without a dialog
+        if self.progress is not None:
+            self.cancel()
+        else:
+            super(ExportingDialog, self).reject()
+
     def close(self):
         super(ExportingDialog, self).close()
         self.timer.stop()
+        self.progress_timer.stop()
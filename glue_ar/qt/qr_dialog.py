@@ -1,23 +1,76 @@
 from os.path import dirname
+from typing import Optional
 
 from PIL.ImageQt import ImageQt
 from glue_qt.utils import load_ui
+from qtpy.QtCore import Qt, QTimer
 from qtpy.QtWidgets import QDialog
 from qtpy.QtGui import QPixmap
 
 from glue_ar.common.qr import create_qr
+from glue_ar.progress import ExportProgress
 
 
 class QRDialog(QDialog):
+    """
+    A dialog showing a QR code for a URL. If the content at the URL isn't available yet,
+    the dialog can be opened with `preparing=True`, in which case it shows the progress
+    of the export until `show_qr` is called. If the URL isn't known until then either,
+    it can be passed to `show_qr` instead.
+    """
 
-    def __init__(self, parent, url=None, img=None):
+    def __init__(self, parent, url=None, img=None, preparing=False, progress: Optional[ExportProgress] = None):
 
         super(QRDialog, self).__init__(parent=parent)
-        img = create_qr(url)
+        self.url = url
+        self.progress = progress
+        self.preparing = preparing
+        self.ui = load_ui("qr_dialog.ui", self, directory=dirname(__file__))
+        self.ui.label_image.setAlignment(Qt.AlignCenter)
+        self.ui.label_image.setWordWrap(True)
+
+        # The export runs on a worker thread, so we poll its progress rather than listening for updates
+        self.progress_timer = QTimer()
+        self.progress_timer.timeout.connect(self._update_progress)
+
+        if preparing:
+            self.ui.label_url.setText("Preparing 3D view...")
+            self.ui.label_image.setText("Starting export")
+            if progress is not None:
+                self.progress_timer.start(200)
+        else:
+            self.show_qr()
+
+    def _update_progress(self):
+        if not self.preparing:
+            return
+        snapshot = self.progress.snapshot
+        self.ui.label_image.setText(f"{round(100 * snapshot.fraction)}%\n{snapshot.description}")
+
+    def show_qr(self, url: Optional[str] = None):
+        if url is not None:
+            self.url = url
+        self.preparing = False
+        self.progress_timer.stop()
+        img = create_qr(self.url)
         self.img = ImageQt(img)
         self.pix = QPixmap.fromImage(self.img)
-        self.ui = load_ui("qr_dialog.ui", self, directory=dirname(__file__))
-        self.ui.label_url.setText(f"<a href=\"{url}\">Open 3D view</a>")
+        self.ui.label_url.setText(f"<a href=\"{self.url}\">Open 3D view</a>")
         self.ui.label_image.setPixmap(self.pix)
         width, height = img.size
+        self.ui.label_image.resize(width, height)
         self.setFixedSize(width, height + 60)
+
+    def show_error(self, exc_info):
+        self.preparing = False
+        self.progress_timer.stop()
+        _, error, _ = exc_info
+        self.ui.label_url.setText("Unable to prepare 3D view")
+        self.ui.label_image.setText(str(error))
+
+    def reject(self):
+        # Closing the dialog before the export is finished means that it isn't needed anymore
+        if self.preparing and self.progress is not None:
+            self.progress.cancel()
+        self.progress_timer.stop()
+        super(QRDialog, self).reject()
@@ -1,9 +1,9 @@
 import ngrok
 import os
-from os.path import split
-from tempfile import NamedTemporaryFile
+from os.path import exists, join, splitext
+from tempfile import TemporaryDirectory
 from threading import Thread
-from typing import Tuple
+from typing import Optional, Set, Tuple
 
 from glue.config import viewer_tool
 from glue.core.state_objects import State
@@ -11,14 +11,17 @@ from glue.viewers.common.state import LayerState
 from glue.viewers.common.tool import Tool
 from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
 from glue.viewers.volume3d.viewer_state import VolumeViewerState3D
+from glue_qt.utils.threading import Worker
 
 from glue_ar.utils import AR_ICON, export_label_for_layer, xyz_bounds
-from glue_ar.common.export import export_modelviewer, export_viewer
+from glue_ar.common.cache import default_geometry_cache, export_cache_key
 from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
 from glue_ar.common.volume_export_options import ARIsosurfaceExportOptions
 from glue_ar.common.qr import get_local_ip
+from glue_ar.progress import ExportProgress
 from glue_ar.qt.qr_dialog import QRDialog
-from glue_ar.qt.server import run_ar_server
+from glue_ar.qt.server import run_ar_server, write_precompressed
+from glue_ar.registries import compressor as compressor_registry
 
 
 __all__ = ["ARLocalQRTool"]
@@ -31,12 +34,63 @@ class ARLocalQRTool(Tool):
     action_text = "3D view via QR"
     tool_tip = "Get a QR code for the current view in 3D"
 
+    port = 4000
+
+    # Exports are shared between all of the QR tools, so that showing the same view
+    # again (from any viewer) doesn't need a new export
+    _export_directory: Optional[TemporaryDirectory] = None
+    _exported: Set[str] = set()
+
+    def __init__(self, viewer):
+        super(ARLocalQRTool, self).__init__(viewer)
+        self._worker = None
+
     def _export_items_for_layer(self, layer: LayerState) -> Tuple[str, State]:
         if isinstance(layer, ScatterLayerState3D):
             return ("Scatter", ARVispyScatterExportOptions())
         else:
             return ("Isosurface", ARIsosurfaceExportOptions(isosurface_count=8))
 
+    @staticmethod
+    def _default_compression() -> str:
+        # A single compressed GLB keeps the download to a phone as small as possible
+        return "draco" if "draco" in compressor_registry.members else "None"
+
+    @classmethod
+    def _cache_directory(cls) -> str:
+        if cls._export_directory is None:
+            cls._export_directory = TemporaryDirectory(prefix="glue-ar-qr-")
+        return cls._export_directory.name
+
+    @classmethod
+    def _is_cached(cls, key: str) -> bool:
+        directory = cls._cache_directory()
+        return key in cls._exported and \
+            all(exists(join(directory, f"{key}.{ext}")) for ext in ("glb", "html"))
+
+    @classmethod
+    def _export(cls, key: str, **kwargs):
+        # This imports all of the exporters, so it's only imported once it's needed
+        from glue_ar.common.export import export_viewer
+
+        export_viewer(**kwargs)
+        filepath = kwargs["filepath"]
+        write_precompressed([filepath, f"{splitext(filepath)[0]}.html"])
+        # Only record the export once it's complete, so that a failed or cancelled export is never reused
+        cls._exported.add(key)
+
+    @classmethod
+    def _prepare(cls, base_url: str, **kwargs) -> str:
+        """
+        Export the view, unless an identical export is already available, and return the URL to show it.
+        This runs on a worker thread, since computing the key reads the data of every layer.
+        """
+        key = export_cache_key(kwargs["viewer_state"], kwargs["layer_states"], kwargs["state_dictionary"],
+                               kwargs["bounds"], compression=kwargs["compression"])
+        if not cls._is_cached(key):
+            cls._export(key, filepath=join(cls._cache_directory(), f"{key}.glb"), **kwargs)
+        return f"{base_url}/{key}.html"
+
     def activate(self):
         layer_states = [layer.state for layer in self.viewer.layers
                         if layer.enabled and layer.state.visible]
@@ -45,36 +99,46 @@ class ARLocalQRTool(Tool):
             export_label_for_layer(state): self._export_items_for_layer(state)
             for state in layer_states
         }
-        with NamedTemporaryFile(suffix=".gltf") as gltf_tmp, \
-             NamedTemporaryFile(suffix=".html") as html_tmp:
-
-            _, gltf_base = split(gltf_tmp.name)
-            export_viewer(self.viewer.state, layer_states, bounds, state_dictionary, gltf_tmp.name)
-            export_modelviewer(html_tmp.name, gltf_base, self.viewer.state.title)
-
-            port = 4000
-            directory, filename = split(html_tmp.name)
-            server = run_ar_server(port, directory)
-            use_ngrok = os.getenv("NGROK_AUTHTOKEN", None) is not None
-
-            try:
-                thread = Thread(target=server.serve_forever)
-                thread.start()
-
-                if use_ngrok:
-                    listener = ngrok.forward(port, authtoken_from_env=True)
-                    url = f"{listener.url()}/{filename}"
-                else:
-                    ip = get_local_ip()
-                    url = f"http://{ip}:{port}/{filename}"
-                dialog = QRDialog(parent=self.viewer, url=url)
-                dialog.exec_()
-
-            finally:
-                if use_ngrok:
-                    try:
-                        ngrok.disconnect(listener.url())
-                    except RuntimeError:
-                        pass
-                server.shutdown()
-                server.server_close()
+
+        server = run_ar_server(self.port, self._cache_directory())
+        use_ngrok = os.getenv("NGROK_AUTHTOKEN", None) is not None
+
+        try:
+            thread = Thread(target=server.serve_forever)
+            thread.start()
+
+            if use_ngrok:
+                listener = ngrok.forward(self.port, authtoken_from_env=True)
+                base_url = listener.url()
+            else:
+                ip = get_local_ip()
+                base_url = f"http://{ip}:{self.port}"
+
+            # The dialog opens straight away. Whether there's an export to reuse is only known once the worker
+            # has computed its key, so the dialog shows the progress (if any) until the worker returns the URL
+            progress = ExportProgress()
+            dialog = QRDialog(parent=self.viewer, preparing=True, progress=progress)
+            self._worker = Worker(self._prepare,
+                                  base_url=base_url,
+                                  viewer_state=self.viewer.state,
+                                  layer_states=layer_states,
+                                  bounds=bounds,
+                                  state_dictionary=state_dictionary,
+                                  compression=self._default_compression(),
+                                  model_viewer=True,
+                                  progressive=True,
+                                  cache=default_geometry_cache(),
+                                  progress=progress)
+            self._worker.result.connect(dialog.show_qr)
+            self._worker.error.connect(dialog.show_error)
+            self._worker.start()
+            dialog.exec_()
+
+        finally:
+            if use_ngrok:
+                try:
+                    ngrok.disconnect(listener.url())
+                except RuntimeError:
+                    pass
+            server.shutdown()
+            server.server_close()
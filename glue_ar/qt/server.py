@@ -1,18 +1,283 @@
-from http.server import SimpleHTTPRequestHandler
-from socketserver import TCPServer
+from contextlib import suppress
+from dataclasses import dataclass
+import gzip
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from mmap import ACCESS_READ, mmap
+import os
+from os.path import exists, isfile, splitext
+import re
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-def create_handler(directory):
+
+__all__ = ["ARServer", "create_handler", "run_ar_server", "write_precompressed"]
+
+
+# Files at least this large are memory-mapped rather than read into memory
+MMAP_THRESHOLD = 1024 * 1024
+
+# The file types that are worth storing precompressed variants of
+PRECOMPRESS_EXTENSIONS = (".gltf", ".bin", ".glb", ".html", ".json")
+
+# Content encodings with precompressed variants, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Pages and tilesets are always revalidated, since re-exporting a view overwrites them,
+# while the models they load can be reused for a while
+CACHE_CONTROL = {
+    ".html": "no-cache",
+    ".json": "no-cache",
+}
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def write_precompressed(paths: Iterable[str], min_saving: float = 0.1) -> List[str]:
+    """
+    Write gzip (and, if the `brotli` package is installed, brotli) compressed copies
+    of each of the given files that the server can send to clients that accept them.
+    Variants that don't save at least `min_saving` of the original size aren't kept.
+    Returns the paths of the variants that were written.
+    """
+    written = []
+    for path in paths:
+        if splitext(path)[1] not in PRECOMPRESS_EXTENSIONS:
+            continue
+        with open(path, "rb") as f:
+            content = f.read()
+        variants = [(".gz", gzip.compress(content, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(content)))
+        for suffix, compressed in variants:
+            variant_path = f"{path}{suffix}"
+            if len(compressed) <= (1 - min_saving) * len(content):
+                with open(variant_path, "wb") as f:
+                    f.write(compressed)
+                written.append(variant_path)
+            elif exists(variant_path):
+                os.remove(variant_path)
+    return written
+
+
+@dataclass
+class _CachedFile:
+    content: Union[bytes, mmap]
+    size: int
+    mtime_ns: int
+
+    @property
+    def etag(self) -> str:
+        return f"\"{self.size:x}-{self.mtime_ns:x}\""
+
+
+class _FileCache:
+    """
+    Holds the contents of served files in memory (or memory-mapped, for large files),
+    so that repeated and concurrent requests don't need to go back to disk.
+    Entries are reloaded whenever the file on disk changes.
+    """
+
+    def __init__(self, mmap_threshold: int = MMAP_THRESHOLD):
+        self.mmap_threshold = mmap_threshold
+        self._files: Dict[str, _CachedFile] = {}
+        self._lock = Lock()
+
+    def get(self, path: str) -> Optional[_CachedFile]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._files.get(path, None)
+        if cached is not None and self._is_current(cached, stat):
+            return cached
+
+        # Reading (or mapping) the file happens outside of the lock, so that requests for other files don't wait on it
+        with open(path, "rb") as f:
+            if stat.st_size and stat.st_size >= self.mmap_threshold:
+                content = mmap(f.fileno(), 0, access=ACCESS_READ)
+            else:
+                content = f.read()
+        loaded = _CachedFile(content=content, size=len(content), mtime_ns=stat.st_mtime_ns)
+
+        with self._lock:
+            current = self._files.get(path, None)
+            if current is not None and current is not cached and self._is_current(current, stat):
+                # Another request loaded the same version of the file in the meantime
+                stale, loaded = loaded, current
+            else:
+                stale = current
+                self._files[path] = loaded
+        if stale is not None:
+            self._release(stale)
+        return loaded
+
+    @staticmethod
+    def _is_current(cached: _CachedFile, stat: os.stat_result) -> bool:
+        return cached.size == stat.st_size and cached.mtime_ns == stat.st_mtime_ns
+
+    @staticmethod
+    def _release(cached: _CachedFile):
+        if isinstance(cached.content, mmap):
+            # A response that's still being sent keeps its mapping alive until it's done
+            with suppress(BufferError):
+                cached.content.close()
+
+    def close(self):
+        # Mapped files can't be removed on some platforms, so we need to release them when we're done
+        with self._lock:
+            for cached in self._files.values():
+                self._release(cached)
+            self._files.clear()
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single byte range from a Range header, returning the (inclusive) start and end.
+    Raises ValueError for ranges that can't be satisfied, and returns None for ranges
+    that we don't handle (such as multiple ranges), in which case the whole file is sent.
+    """
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def create_handler(directory, file_cache: Optional[_FileCache] = None):
 
     class ARHttpRequestHandler(SimpleHTTPRequestHandler):
 
+        files = file_cache if file_cache is not None else _FileCache()
+
         def __init__(self, *args, **kwargs):
             super().__init__(*args, directory=directory, **kwargs)
 
+        def _accepted_encodings(self) -> List[str]:
+            header = self.headers.get("Accept-Encoding", "")
+            return [part.split(";")[0].strip() for part in header.split(",")]
+
+        def _choose_variant(self, path: str) -> Tuple[str, Optional[str]]:
+            # Ranges of an encoded response are ranges of the encoded bytes, which isn't what
+            # a client resuming a download expects, so those requests get the original file
+            if self.headers.get("Range") is None:
+                accepted = self._accepted_encodings()
+                for encoding, suffix in ENCODINGS:
+                    if encoding in accepted and isfile(f"{path}{suffix}"):
+                        return f"{path}{suffix}", encoding
+            return path, None
+
+        def send_head(self):
+            path = self.translate_path(self.path)
+            if not isfile(path):
+                # Directory listings, redirects and errors are handled as usual
+                return super().send_head()
+
+            variant_path, encoding = self._choose_variant(path)
+            cached = self.files.get(variant_path)
+            if cached is None:
+                self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+                return None
+
+            cache_control = CACHE_CONTROL.get(splitext(path)[1], DEFAULT_CACHE_CONTROL)
+            etag = cached.etag
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", cache_control)
+                self.end_headers()
+                return None
+
+            start, end = 0, cached.size - 1
+            status = HTTPStatus.OK
+            range_header = self.headers.get("Range")
+            if range_header is not None and cached.size > 0:
+                try:
+                    byte_range = _parse_range(range_header, cached.size)
+                except ValueError:
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header("Content-Range", f"bytes */{cached.size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return None
+                if byte_range is not None:
+                    start, end = byte_range
+                    status = HTTPStatus.PARTIAL_CONTENT
+
+            self.send_response(status)
+            self.send_header("Content-Type", self.guess_type(path))
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("Vary", "Accept-Encoding")
+            if encoding is not None:
+                self.send_header("Content-Encoding", encoding)
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{cached.size}")
+            self.end_headers()
+            return memoryview(cached.content)[start:end + 1]
+
+        def do_GET(self):
+            body = self.send_head()
+            if body is None:
+                return
+            if isinstance(body, memoryview):
+                try:
+                    self.wfile.write(body)
+                finally:
+                    body.release()
+            else:
+                try:
+                    self.copyfile(body, self.wfile)
+                finally:
+                    body.close()
+
+        def do_HEAD(self):
+            body = self.send_head()
+            if body is None:
+                return
+            if isinstance(body, memoryview):
+                body.release()
+            else:
+                body.close()
+
     return ARHttpRequestHandler
 
 
+class ARServer(ThreadingHTTPServer):
+    """
+    Serves each request on its own thread, so that a phone can fetch a page and the
+    files that it loads in parallel.
+    """
+
+    def server_close(self):
+        super().server_close()
+        files = getattr(self.RequestHandlerClass, "files", None)
+        if files is not None:
+            files.close()
+
+
 def run_ar_server(port, directory):
     handler_cls = create_handler(directory)
-    server = TCPServer(("", port), handler_cls)
+    server = ARServer(("", port), handler_cls)
     return server
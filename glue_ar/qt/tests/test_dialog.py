@@ -87,9 +87,14 @@ class TestQtExportDialog(BaseExportDialogTest):
         self.dialog._update_layer_ui(state)
         assert self.dialog.ui.layer_layout.count() == 3
 
+        # Every option is shown for glB, which is the default file type
         state = ARVispyScatterExportOptions()
         self.dialog._update_layer_ui(state)
-        assert self.dialog.ui.layer_layout.count() == 2
+        assert self.dialog.ui.layer_layout.count() == len(state.callback_properties())
+
+        self.dialog.state.filetype = "STL"
+        self.dialog._update_layer_ui(state)
+        assert self.dialog.ui.layer_layout.count() == len(state.callback_properties()) - 3
 
     def test_clear_layout(self):
         self.dialog._clear_layer_layout()
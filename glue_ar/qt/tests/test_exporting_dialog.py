@@ -0,0 +1,38 @@
+from pytest import importorskip
+
+importorskip("glue_qt")
+
+from glue_qt.utils import get_qapp
+
+from glue_ar.progress import ExportProgress, progress_span, report_progress
+from glue_ar.qt.exporting_dialog import ExportingDialog
+
+
+class TestExportingDialog:
+
+    def setup_method(self, method):
+        self.app = get_qapp()
+        self.progress = ExportProgress()
+        self.dialog = ExportingDialog(filetype="glB", progress=self.progress)
+
+    def teardown_method(self, method):
+        self.dialog.close()
+
+    def test_progress(self):
+        with self.progress.activate():
+            with progress_span(0.5, stage="geometry", layer="Layer 1"):
+                report_progress(0.5)
+                self.dialog._update_progress()
+                assert self.dialog.progress_bar.value() == 250
+                status = self.dialog.status_label.text()
+                assert status.startswith("Building geometry for Layer 1")
+                assert "left" in status
+
+    def test_cancel(self):
+        self.dialog.cancel_button.click()
+        assert self.progress.cancelled
+        assert not self.dialog.cancel_button.isEnabled()
+
+    def test_reject_cancels(self):
+        self.dialog.reject()
+        assert self.progress.cancelled
@@ -0,0 +1,52 @@
+from pytest import importorskip
+
+importorskip("glue_qt")
+
+from glue_qt.utils import get_qapp
+
+from glue_ar.progress import ExportProgress, progress_span, report_progress
+from glue_ar.qt.qr_dialog import QRDialog
+
+
+class TestQRDialog:
+
+    def setup_method(self, method):
+        self.app = get_qapp()
+        self.url = "http://127.0.0.1:4000/export.html"
+        self.progress = ExportProgress()
+        self.dialog = QRDialog(parent=None, url=self.url, preparing=True, progress=self.progress)
+
+    def teardown_method(self, method):
+        self.dialog.close()
+
+    def test_preparing(self):
+        assert self.dialog.ui.label_image.pixmap() is None or self.dialog.ui.label_image.pixmap().isNull()
+        with self.progress.activate():
+            with progress_span(1, stage="geometry", layer="Layer 1"):
+                report_progress(0.5)
+                self.dialog._update_progress()
+        assert self.dialog.ui.label_image.text().startswith("50%")
+
+        self.dialog.show_qr()
+        assert not self.dialog.preparing
+        assert not self.dialog.ui.label_image.pixmap().isNull()
+        assert self.url in self.dialog.ui.label_url.text()
+
+    def test_url_on_completion(self):
+        dialog = QRDialog(parent=None, preparing=True, progress=ExportProgress())
+        url = "http://127.0.0.1:4000/key.html"
+        dialog.show_qr(url)
+        assert dialog.url == url
+        assert url in dialog.ui.label_url.text()
+        dialog.close()
+
+    def test_error(self):
+        try:
+            raise ValueError("Bad options")
+        except ValueError as e:
+            self.dialog.show_error((type(e), e, e.__traceback__))
+        assert self.dialog.ui.label_image.text() == "Bad options"
+
+    def test_reject_cancels(self):
+        self.dialog.reject()
+        assert self.progress.cancelled
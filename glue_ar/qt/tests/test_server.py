@@ -0,0 +1,141 @@
+from http.client import HTTPConnection
+from mmap import mmap
+from threading import Thread
+
+from glue_ar.qt.server import ARServer, _FileCache, create_handler, write_precompressed
+
+
+class TestARServer:
+
+    def setup_method(self, method):
+        self.content = b"".join(f"vertex {index}\n".encode() for index in range(2000))
+
+    def start(self, directory, **kwargs):
+        self.server = ARServer(("127.0.0.1", 0), create_handler(str(directory), **kwargs))
+        self.thread = Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def teardown_method(self, method):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def request(self, path, headers=None, method="GET"):
+        connection = HTTPConnection("127.0.0.1", self.server.server_address[1])
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def test_get(self, tmp_path):
+        (tmp_path / "model.bin").write_bytes(self.content)
+        (tmp_path / "index.html").write_text("<html></html>")
+        self.start(tmp_path)
+
+        response, body = self.request("/model.bin")
+        assert response.status == 200
+        assert body == self.content
+        assert response.getheader("Accept-Ranges") == "bytes"
+        assert response.getheader("ETag")
+        assert response.getheader("Content-Encoding") is None
+
+        response, _ = self.request("/index.html")
+        assert response.getheader("Cache-Control") == "no-cache"
+
+        response, body = self.request("/missing.bin")
+        assert response.status == 404
+
+    def test_etag(self, tmp_path):
+        (tmp_path / "model.bin").write_bytes(self.content)
+        self.start(tmp_path)
+
+        response, _ = self.request("/model.bin")
+        etag = response.getheader("ETag")
+        response, body = self.request("/model.bin", headers={"If-None-Match": etag})
+        assert response.status == 304
+        assert body == b""
+
+        # Changing the file gives a new tag
+        (tmp_path / "model.bin").write_bytes(self.content[:100])
+        response, body = self.request("/model.bin", headers={"If-None-Match": etag})
+        assert response.status == 200
+        assert body == self.content[:100]
+        assert response.getheader("ETag") != etag
+
+    def test_range(self, tmp_path):
+        (tmp_path / "model.bin").write_bytes(self.content)
+        self.start(tmp_path)
+        size = len(self.content)
+
+        response, body = self.request("/model.bin", headers={"Range": "bytes=10-19"})
+        assert response.status == 206
+        assert body == self.content[10:20]
+        assert response.getheader("Content-Range") == f"bytes 10-19/{size}"
+
+        response, body = self.request("/model.bin", headers={"Range": "bytes=-5"})
+        assert body == self.content[-5:]
+
+        response, body = self.request("/model.bin", headers={"Range": "bytes=100-"})
+        assert body == self.content[100:]
+
+        response, _ = self.request("/model.bin", headers={"Range": f"bytes={size}-"})
+        assert response.status == 416
+
+        response, body = self.request("/model.bin", headers={"Range": "bytes=0-1,5-6"})
+        assert response.status == 200
+        assert body == self.content
+
+    def test_mmap(self, tmp_path):
+        (tmp_path / "model.bin").write_bytes(self.content)
+        files = _FileCache(mmap_threshold=1)
+        self.start(tmp_path, file_cache=files)
+        response, body = self.request("/model.bin", headers={"Range": "bytes=5-9"})
+        assert body == self.content[5:10]
+        assert isinstance(files.get(str(tmp_path / "model.bin")).content, mmap)
+        response, body = self.request("/model.bin", method="HEAD")
+        assert response.getheader("Content-Length") == str(len(self.content))
+
+    def test_reload(self, tmp_path):
+        path = tmp_path / "model.bin"
+        path.write_bytes(self.content)
+        files = _FileCache(mmap_threshold=1)
+        self.start(tmp_path, file_cache=files)
+        first = files.get(str(path))
+        view = memoryview(first.content)
+
+        # The old mapping is closed when the file changes, unless a response is still using it
+        path.write_bytes(self.content * 2)
+        second = files.get(str(path))
+        assert second is not first
+        assert second.content[:] == self.content * 2
+        assert not first.content.closed
+        assert view[:5] == self.content[:5]
+        view.release()
+
+        path.write_bytes(self.content)
+        third = files.get(str(path))
+        assert second.content.closed
+        response, body = self.request("/model.bin")
+        assert body == self.content
+        assert files.get(str(path)) is third
+
+    def test_precompressed(self, tmp_path):
+        path = tmp_path / "model.gltf"
+        path.write_bytes(self.content)
+        written = write_precompressed([str(path), str(tmp_path / "image.png")])
+        assert str(path) + ".gz" in written
+        self.start(tmp_path)
+
+        response, body = self.request("/model.gltf", headers={"Accept-Encoding": "gzip, deflate"})
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert response.getheader("Content-Type") != "application/gzip"
+        assert len(body) < len(self.content)
+
+        # Ranges always refer to the original file
+        response, body = self.request("/model.gltf", headers={"Accept-Encoding": "gzip", "Range": "bytes=0-9"})
+        assert response.getheader("Content-Encoding") is None
+        assert body == self.content[:10]
+
+        response, body = self.request("/model.gltf")
+        assert body == self.content
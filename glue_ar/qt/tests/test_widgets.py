@@ -3,9 +3,10 @@ from pytest import importorskip
 importorskip("glue_qt")
 
 from echo import CallbackProperty
-from echo.qt import connect_checkable_button, connect_value
-from qtpy.QtWidgets import QPushButton, QSpacerItem, QCheckBox, QLabel, QSlider
+from echo.qt import connect_checkable_button, connect_combo_selection, connect_value
+from qtpy.QtWidgets import QComboBox, QPushButton, QSpacerItem, QCheckBox, QLabel, QSlider
 
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
 from glue_ar.common.tests.test_base_dialog import DummyState
 from glue_ar.qt.widgets import boolean_callback_widgets, horizontal_spacer, \
                                info_button, info_tooltip, widgets_for_callback_property
@@ -130,3 +131,22 @@ def test_widgets_for_callback_property(qtbot):
     assert not box.isChecked()
     assert isinstance(spacer, QSpacerItem)
     assert isinstance(info_button, QPushButton)
+
+
+def test_selection_callback_widgets(qtbot):
+    state = ARVispyScatterExportOptions()
+    widget_rows, connection = widgets_for_callback_property(state, "glyph", "Glyph")
+    assert isinstance(connection, connect_combo_selection)
+    assert len(widget_rows) == 2
+
+    label, spacer, info_button = widget_rows[0]
+    assert isinstance(label, QLabel)
+    assert label.text() == "Glyph:"
+    assert isinstance(info_button, QPushButton)
+
+    combo, = widget_rows[1]
+    assert isinstance(combo, QComboBox)
+    assert [combo.itemText(index) for index in range(combo.count())] == ["Sphere", "Icosphere", "Octahedron", "Cross", "Star"]
+    assert combo.currentText() == "Sphere"
+    state.glyph = "Star"
+    assert combo.currentText() == "Star"
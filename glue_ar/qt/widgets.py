@@ -2,11 +2,11 @@ from math import floor, log
 from os.path import join
 from typing import Tuple
 
-from echo import CallbackProperty, HasCallbackProperties, add_callback, remove_callback
-from echo.qt import BaseConnection, connect_checkable_button, connect_value
+from echo import CallbackProperty, HasCallbackProperties, SelectionCallbackProperty, add_callback, remove_callback
+from echo.qt import BaseConnection, connect_checkable_button, connect_combo_selection, connect_value
 from qtpy.QtGui import QCursor, QEnterEvent, QIcon
 from qtpy.QtCore import Qt, QEvent
-from qtpy.QtWidgets import QCheckBox, QPushButton, QSpacerItem, QToolTip, QLabel, QSizePolicy, QSlider, QWidget
+from qtpy.QtWidgets import QCheckBox, QComboBox, QPushButton, QSpacerItem, QToolTip, QLabel, QSizePolicy, QSlider, QWidget
 
 from glue_ar.utils import RESOURCES_DIR
 
@@ -131,11 +131,37 @@ def number_callback_widgets(instance: HasCallbackProperties,
         return ((label,), value_widgets), connection
 
 
+def selection_callback_widgets(instance: HasCallbackProperties,
+                               property: str,
+                               display_name: str,
+                               **kwargs) -> Tuple[Tuple[Tuple[QWidget]], connect_combo_selection]:
+
+    instance_type = type(instance)
+    cb_property: SelectionCallbackProperty = getattr(instance_type, property)
+
+    label = QLabel()
+    label.setText(f"{display_name}:")
+
+    # The connection fills in the combo box items from the property's choices
+    combo = QComboBox()
+    connection = connect_combo_selection(instance, property, combo)
+
+    if cb_property.__doc__:
+        button = info_button(cb_property)
+        spacer = horizontal_spacer(width=40, height=20)
+        return ((label, spacer, button), (combo,)), connection
+    else:
+        return ((label,), (combo,)), connection
+
+
 def widgets_for_callback_property(instance: HasCallbackProperties,
                                   property: str,
                                   display_name: str,
                                   **kwargs) -> Tuple[Tuple[Tuple[QWidget]], BaseConnection]:
 
+    if isinstance(getattr(type(instance), property), SelectionCallbackProperty):
+        return selection_callback_widgets(instance, property, display_name, **kwargs)
+
     t = type(getattr(instance, property))
     if t is bool:
         return boolean_callback_widgets(instance, property, display_name, **kwargs)
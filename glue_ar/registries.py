@@ -1,10 +1,12 @@
-from collections.abc import Callable
-from typing import Iterable, Protocol, Type, TypeVar, Union
+from collections.abc import Callable, Mapping
+from importlib import import_module
+from importlib.util import find_spec
+from typing import Any, Iterable, Iterator, Protocol, Type, TypeVar, Union
 
 from glue.config import DictRegistry
 
 
-__all__ = ["Builder", "builder", "compressor"]
+__all__ = ["Builder", "EntryPoint", "builder", "compressor"]
 
 
 T = TypeVar("T", covariant=True)
@@ -15,9 +17,95 @@ class Builder(Protocol[T]):
     def build_and_export(self, filepath: str):
         ...
 
+    def merge(self, other: "Builder[T]") -> "Builder[T]":
+        ...
+
+
+
+class EntryPoint:
+    """
+    A reference to an object that hasn't been imported yet, given as `"module.path:attribute"`.
+    `requires` are the top-level packages that the module needs, which are checked
+    for without importing them, so that an entry point whose dependencies are missing can be skipped.
+    """
+
+    def __init__(self, reference: str, requires: Iterable[str] = ()):
+        self.module, _, self.attribute = reference.partition(":")
+        if not self.module or not self.attribute:
+            raise ValueError(f"Entry points must have the form 'module.path:attribute', not {reference!r}")
+        self.requires = tuple(requires)
+
+    @property
+    def available(self) -> bool:
+        return all(find_spec(package) is not None for package in self.requires)
+
+    def load(self) -> Any:
+        return getattr(import_module(self.module), self.attribute)
+
+    def __repr__(self) -> str:
+        return f"EntryPoint('{self.module}:{self.attribute}')"
+
+
+class LazyMembers(Mapping):
+    """
+    The members of a `LazyDictRegistry`. Looking up the keys doesn't import anything,
+    while getting a value imports it (if it's an entry point) and records the result in the registry.
+    """
+
+    def __init__(self, registry: "LazyDictRegistry"):
+        self._registry = registry
+
+    def __getitem__(self, key: str) -> Any:
+        return self._registry._resolve(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._registry._members))
+
+    def __len__(self) -> int:
+        return len(self._registry._members)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._registry._members
+
+    def __repr__(self) -> str:
+        return repr(self._registry._members)
+
+
+class LazyDictRegistry(DictRegistry):
+    """
+    A dictionary registry whose members can be registered as entry points, so that
+    the modules defining them are only imported once they're used.
+    Entry points whose required packages aren't installed are left out.
+    """
+
+    def add_lazy(self, keys: Union[str, Iterable[str]], reference: str, requires: Iterable[str] = ()):
+        entry_point = EntryPoint(reference, requires)
+        if not entry_point.available:
+            return
+        for key in ([keys] if isinstance(keys, str) else keys):
+            # An object that has already been imported shouldn't be replaced with a reference to it
+            if key not in self._members:
+                self._members[key] = entry_point
+
+    def _resolve(self, key: str) -> Any:
+        member = self._members[key]
+        if isinstance(member, EntryPoint):
+            loaded = member.load()
+            # Importing the module normally registers the object with this registry,
+            # but the entry point may refer to an object that isn't decorated
+            if self._members.get(key) is member:
+                self._members[key] = loaded
+            member = self._members[key]
+        return member
+
+    @property
+    def members(self) -> LazyMembers:
+        # These registries have no default members, so glue's lazy members are all that need loading
+        self._load_lazy_members()
+        return LazyMembers(self)
 
 
-class BuilderRegistry(DictRegistry):
+class BuilderRegistry(LazyDictRegistry):
 
     def add(self, extensions: Union[str, Iterable[str]], builder: Type):
         if isinstance(extensions, str):
@@ -37,7 +125,7 @@ builder = BuilderRegistry()
 
 
 B = TypeVar('B', bound=Builder)
-class CompressorRegistry(DictRegistry):
+class CompressorRegistry(LazyDictRegistry):
 
     def add(self, name: str, compressor: Callable[[B], B]):
         self._members[name] = compressor
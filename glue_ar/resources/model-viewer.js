@@ -28,9 +28,68 @@ function forceUpdate(modelViewer) {
   );
 }
 
+// Build a GLB holding just the preview of a progressive export from the start of the full file,
+// using the JSON for the preview that the page was exported with
+async function previewURL(src, manifest) {
+  const response = await fetch(src, { headers: { Range: `bytes=${manifest.start}-${manifest.end}` } });
+  if (response.status !== 206) {
+    // Without range requests we'd be downloading the whole file anyway, so we just show the full model
+    throw new Error("Range requests aren't supported");
+  }
+  const binary = await response.arrayBuffer();
+
+  const encoder = new TextEncoder();
+  const json = encoder.encode(JSON.stringify(manifest.gltf));
+  const jsonLength = Math.ceil(json.length / 4) * 4;
+  const length = 12 + 8 + jsonLength + 8 + binary.byteLength;
+  const glb = new Uint8Array(length);
+  const view = new DataView(glb.buffer);
+  view.setUint32(0, 0x46546C67, true);  // "glTF"
+  view.setUint32(4, 2, true);
+  view.setUint32(8, length, true);
+  view.setUint32(12, jsonLength, true);
+  view.setUint32(16, 0x4E4F534A, true);  // "JSON"
+  glb.fill(0x20, 20, 20 + jsonLength);
+  glb.set(json, 20);
+  view.setUint32(20 + jsonLength, binary.byteLength, true);
+  view.setUint32(24 + jsonLength, 0x004E4942, true);  // "BIN"
+  glb.set(new Uint8Array(binary), 28 + jsonLength);
+  return URL.createObjectURL(new Blob([glb], { type: "model/gltf-binary" }));
+}
+
 const modelViewer = document.querySelector("model-viewer");
 modelViewer.shadowIntensity = 0;
+
+// For progressive exports, show the preview at the start of the file first, and swap in the full model
+// once it has loaded. Our script runs before model-viewer starts up, so it hasn't started loading yet
+const previewManifest = document.querySelector("#preview");
+let previewing = false;
+if (previewManifest !== null) {
+  const src = modelViewer.getAttribute("src");
+  modelViewer.removeAttribute("src");
+  previewing = true;
+  previewURL(src, JSON.parse(previewManifest.textContent))
+    .then((url) => {
+      modelViewer.addEventListener("load", () => {
+        previewing = false;
+        modelViewer.src = src;
+        URL.revokeObjectURL(url);
+      }, { once: true });
+      modelViewer.src = url;
+    })
+    .catch(() => {
+      previewing = false;
+      modelViewer.src = src;
+    });
+}
+
+let controlsReady = false;
 modelViewer.addEventListener("load", (_event) => {
+  // Layer controls refer to the meshes of the full model
+  if (previewing || controlsReady) {
+    return;
+  }
+  controlsReady = true;
   const layerControls = document.querySelector("#layer-controls");
   const buttons = [...layerControls.querySelectorAll("button")];
   buttons.forEach((button) => updateButtonStyle(button, true, button.dataset.color));
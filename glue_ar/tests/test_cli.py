@@ -0,0 +1,217 @@
+from filecmp import cmp
+import json
+from os import utime
+from os.path import exists, getmtime
+
+from glue.core import Data, DataCollection
+from glue.core.session import Session
+from glue.core.state import GlueSerializer
+from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
+from glue.viewers.scatter3d.viewer_state import ScatterViewerState3D
+from glue.viewers.volume3d.layer_state import VolumeLayerState3D
+from glue.viewers.volume3d.viewer_state import VolumeViewerState3D
+from numpy import arange, exp, linspace, meshgrid
+import pytest
+
+from glue_ar.cli import ExportTask, expand_tasks, load_session_viewers, main, run_tasks
+from glue_ar.common.cache import GeometryCache
+from glue_ar.common.export import export_viewer
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+class _Viewer:
+    """
+    Stands in for a glue viewer when writing a session, producing the same record as `Viewer.__gluestate__`.
+    """
+
+    def __init__(self, type_name, session, state):
+        self.type_name = type_name
+        self.session = session
+        self.state = state
+
+    def __gluestate__(self, context):
+        return dict(state=self.state.__gluestate__(context),
+                    session=context.id(self.session),
+                    layers=[dict(_type="glue.viewers.common.layer_artist.LayerArtist", state=context.id(layer))
+                            for layer in self.state.layers],
+                    _protocol=1)
+
+
+class _Application:
+
+    def __init__(self, session, viewers):
+        self.session = session
+        self.viewers = viewers
+
+    def __gluestate__(self, context):
+        return dict(session=context.id(self.session),
+                    data=context.id(self.session.data_collection),
+                    viewers=[[context.id(viewer) for viewer in self.viewers]],
+                    tab_names=["Tab 1"])
+
+
+def write_session(path):
+    scatter_data = Data(x=arange(10), y=arange(10) ** 2, z=arange(10) ** 3, label="cli_scatter")
+    coordinates = linspace(-1, 1, 8)
+    x, y, z = meshgrid(coordinates, coordinates, coordinates, indexing="ij", sparse=True)
+    volume_data = Data(values=exp(-4 * (x ** 2 + y ** 2 + z ** 2)), label="cli_volume")
+    session = Session(data_collection=DataCollection([scatter_data, volume_data]))
+
+    scatter_state = ScatterViewerState3D()
+    scatter_state.layers.append(ScatterLayerState3D(layer=scatter_data, viewer_state=scatter_state))
+    volume_state = VolumeViewerState3D()
+    volume_state.layers.append(VolumeLayerState3D(layer=volume_data, viewer_state=volume_state))
+    volume_state.resolution = 16
+
+    viewers = [_Viewer("glue_vispy_viewers.scatter.qt.scatter_viewer.VispyScatterViewer", session, scatter_state),
+               _Viewer("glue_qt.viewers.histogram.data_viewer.HistogramViewer", session, ScatterViewerState3D()),
+               _Viewer("glue_vispy_viewers.volume.qt.volume_viewer.VispyVolumeViewer", session, volume_state)]
+    serializer = GlueSerializer(_Application(session, viewers))
+    records = json.loads(serializer.dumps())
+    for viewer in viewers:
+        records[serializer.id(viewer)]["_type"] = viewer.type_name
+    with open(path, "w") as f:
+        json.dump(records, f)
+
+
+class TestCLI:
+
+    def setup_method(self, method):
+        self.spec = {"jobs": [{"session": "session.glu", "output": "out/{session}-{viewer}.glb",
+                               "deterministic_names": True}]}
+
+    def write_spec(self, tmp_path, name="spec.json"):
+        write_session(tmp_path / "session.glu")
+        path = tmp_path / name
+        path.write_text(json.dumps(self.spec))
+        return str(path)
+
+    def test_load_session_viewers(self, tmp_path):
+        write_session(tmp_path / "session.glu")
+        viewers = load_session_viewers(str(tmp_path / "session.glu"))
+
+        # The histogram viewer isn't a 3D viewer, so it should be skipped
+        assert [viewer.index for viewer in viewers] == [0, 2]
+        assert isinstance(viewers[0].viewer_state, ScatterViewerState3D)
+        assert isinstance(viewers[1].viewer_state, VolumeViewerState3D)
+        assert viewers[1].viewer_state.resolution == 16
+        for viewer in viewers:
+            layer_state, = viewer.layer_states
+            assert layer_state.viewer_state is viewer.viewer_state
+            assert list(viewer.viewer_state.layers) == [layer_state]
+        assert viewers[0].layer_states[0].layer.label == "cli_scatter"
+
+        with pytest.raises(ValueError):
+            load_session_viewers(str(tmp_path / "session.glu"), indices=[1])
+
+    def test_export_and_resume(self, tmp_path):
+        spec = self.write_spec(tmp_path)
+        summary = tmp_path / "summary.json"
+        assert main([spec, "--summary", str(summary), "--quiet"]) == 0
+
+        outputs = [tmp_path / "out" / "session-0.glb", tmp_path / "out" / "session-2.glb"]
+        assert all(exists(output) for output in outputs)
+        results = json.loads(summary.read_text())
+        assert [result["status"] for result in results] == ["exported", "exported"]
+        assert all(result["bytes"] > 0 and "geometry" in result["stages"] for result in results)
+
+        mtime = getmtime(outputs[0])
+        assert main([spec, "--summary", str(summary), "--quiet"]) == 0
+        assert [result["status"] for result in json.loads(summary.read_text())] == ["skipped", "skipped"]
+        assert getmtime(outputs[0]) == mtime
+
+        # Touching the session makes its outputs stale
+        utime(tmp_path / "session.glu", (mtime + 10, mtime + 10))
+        assert main([spec, "--summary", str(summary), "--quiet"]) == 0
+        assert [result["status"] for result in json.loads(summary.read_text())] == ["exported", "exported"]
+
+        assert main([spec, "--summary", str(summary), "--quiet", "--force"]) == 0
+        assert [result["status"] for result in json.loads(summary.read_text())] == ["exported", "exported"]
+
+    def test_options(self, tmp_path):
+        self.spec["defaults"] = {"options": {"Scatter": {"resolution": 4, "log_points_per_mesh": 1}}}
+        self.spec["jobs"][0].update(viewers=[0], options={"Scatter": {"resolution": 5}}, parallel=True)
+        spec = self.write_spec(tmp_path)
+        task, = expand_tasks(json.loads((tmp_path / "spec.json").read_text()), spec_path=spec)
+        assert task.options == {"Scatter": {"resolution": 5, "log_points_per_mesh": 1}}
+        assert task.parallel
+        result, = run_tasks([task])
+        assert result.status == "exported"
+
+        viewer, = load_session_viewers(task.session, indices=[0])
+        layer_state, = viewer.layer_states
+        options = ARVispyScatterExportOptions(resolution=5, log_points_per_mesh=1)
+        expected = str(tmp_path / "expected.glb")
+        export_viewer(viewer.viewer_state, [layer_state], xyz_bounds(viewer.viewer_state, with_resolution=False),
+                      {export_label_for_layer(layer_state): ("Scatter", options)}, expected,
+                      deterministic_names=True)
+        assert cmp(task.outputs[0], expected, shallow=False)
+
+    def test_failed_export(self, tmp_path):
+        self.spec["jobs"][0].update(viewers=[0], options={"Scatter": {"not_an_option": 1}})
+        spec = self.write_spec(tmp_path)
+        summary = tmp_path / "summary.csv"
+        assert main([spec, "--summary", str(summary), "--quiet"]) == 1
+        assert not exists(tmp_path / "out" / "session-0.glb")
+        assert "not_an_option" in summary.read_text()
+
+    def test_invalid_spec(self, tmp_path):
+        self.spec["jobs"][0]["output"] = "out/export.glb"
+        with pytest.raises(ValueError, match="Several exports"):
+            expand_tasks(json.loads(open(self.write_spec(tmp_path)).read()), spec_path=str(tmp_path / "spec.json"))
+
+        self.spec["jobs"][0]["colour"] = "red"
+        with pytest.raises(ValueError, match="colour"):
+            expand_tasks(self.spec, spec_path=self.write_spec(tmp_path))
+
+    def test_unsupported_method(self, tmp_path):
+        self.spec["jobs"][0]["methods"] = {"cli_scatter": "Points"}
+        self.spec["jobs"][0]["output"] = ["out/{session}-{viewer}.glb", "out/{session}-{viewer}.usda"]
+        with pytest.raises(ValueError, match="Points export method can't be used for usda"):
+            expand_tasks(self.spec, spec_path=self.write_spec(tmp_path))
+
+        self.spec["jobs"][0]["output"] = "out/{session}-{viewer}.glb"
+        assert expand_tasks(self.spec, spec_path=self.write_spec(tmp_path))
+
+    def test_parallel_yaml(self, tmp_path):
+        yaml = pytest.importorskip("yaml")
+        self.spec["jobs"][0]["output"] = ["out/{session}-{viewer}.glb", "out/{session}-{viewer}.stl"]
+        write_session(tmp_path / "session.glu")
+        spec = tmp_path / "spec.yaml"
+        spec.write_text(yaml.safe_dump(self.spec))
+        assert main([str(spec), "--jobs", "2", "--quiet"]) == 0
+        for viewer in (0, 2):
+            assert all(exists(tmp_path / "out" / f"session-{viewer}.{ext}") for ext in ("glb", "stl"))
+
+    def test_up_to_date(self, tmp_path):
+        session = tmp_path / "session.glu"
+        session.write_text("{}")
+        output = tmp_path / "export.glb"
+        task = ExportTask(session=str(session), viewer=0, outputs=[str(output)], model_viewer=True)
+        assert not task.up_to_date()
+        output.write_text("")
+        # The model-viewer page is also an output
+        assert task.output_files == [str(output), str(tmp_path / "export.html")]
+        assert not task.up_to_date()
+        (tmp_path / "export.html").write_text("")
+        assert task.up_to_date()
+
+    def test_cache(self, tmp_path):
+        self.spec["jobs"][0].update(viewers=[0], cache="cache")
+        spec = self.write_spec(tmp_path)
+        task, = expand_tasks(json.loads((tmp_path / "spec.json").read_text()), spec_path=spec)
+        assert task.cache == str(tmp_path / "cache")
+        assert main([spec, "--quiet"]) == 0
+        assert len(GeometryCache(task.cache)._entries()) == 1
+
+    def test_tileset(self, tmp_path):
+        self.spec["jobs"][0].update(output="out/{session}-{viewer}.json", viewers=[0])
+        assert main([self.write_spec(tmp_path), "--quiet"]) == 0
+        tileset = json.loads((tmp_path / "out" / "session-0.json").read_text())
+        assert tileset["root"]["content"]["uri"] == "session-0_tiles/0.glb"
+        assert exists(tmp_path / "out" / "session-0_tiles" / "0.glb")
+
+        self.spec["jobs"][0]["output"] = ["out/{session}-{viewer}.json", "out/{session}-{viewer}.glb"]
+        with pytest.raises(ValueError, match="Tilesets"):
+            expand_tasks(self.spec, spec_path=self.write_spec(tmp_path))
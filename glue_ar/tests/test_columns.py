@@ -0,0 +1,70 @@
+from numpy import arange, array_equal, inf, nan
+
+from glue_ar.columns import ColumnCache, bounds_mask, layer_values
+from glue_ar.common.scatter import scatter_layer_mask, sizes_for_scatter_layer
+from glue_ar.common.tests.helpers import scatter_scene
+from glue_ar.utils import mask_for_bounds, xyz_bounds, xyz_for_layer
+
+
+class TestColumnCache:
+
+    def setup_method(self, method):
+        x = arange(10, dtype=float)
+        x[3] = nan
+        self.viewer_state, self.layer_state = scatter_scene("columns_data", x=x, y=arange(10) * 2, z=-arange(10),
+                                                            s=arange(10) % 3)
+        self.data = self.layer_state.layer
+        self.viewer_state.x_att = self.data.id["x"]
+        self.viewer_state.y_att = self.data.id["y"]
+        self.viewer_state.z_att = self.data.id["z"]
+        self.viewer_state.x_min, self.viewer_state.x_max = 1, 8
+        self.viewer_state.y_min, self.viewer_state.y_max = 0, 18
+        self.viewer_state.z_min, self.viewer_state.z_max = -9, 0
+
+    def test_layer_values(self):
+        x = self.data.id["x"]
+        mask = self.data["y"] > 5
+        assert array_equal(layer_values(self.layer_state, x), self.data["x"], equal_nan=True)
+        assert array_equal(layer_values(self.data, x, mask), self.data["x"][mask], equal_nan=True)
+
+        cache = ColumnCache()
+        with cache.activate():
+            first = layer_values(self.layer_state, x)
+            assert layer_values(self.data, x) is first
+            masked = layer_values(self.layer_state, x, mask)
+            assert layer_values(self.layer_state, x, mask) is masked
+            assert array_equal(masked, self.data["x"][mask], equal_nan=True)
+        assert cache.misses == 1
+        assert cache.hits == 3
+
+    def test_export_fetches_once(self):
+        self.layer_state.size_mode = "Linear"
+        self.layer_state.size_att = self.data.id["s"]
+        bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+
+        cache = ColumnCache()
+        with cache.activate():
+            mask = scatter_layer_mask(self.viewer_state, self.layer_state, bounds)
+            xyz_for_layer(self.viewer_state, self.layer_state, mask=mask, scaled=True)
+            sizes_for_scatter_layer(self.layer_state, bounds, mask)
+            xyz_for_layer(self.viewer_state, self.layer_state, mask=mask, scaled=True)
+
+        # x, y, z, and the size attribute
+        assert cache.misses == 4
+        assert cache.hits > 0
+
+    def test_bounds_mask(self):
+        bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+        mask = mask_for_bounds(self.viewer_state, self.layer_state, bounds)
+        expected = (self.data["x"] >= 1) & (self.data["x"] <= 8)
+        assert array_equal(mask, expected)
+        assert not mask[3]
+
+        columns = [self.data["x"], self.data["y"]]
+        sizes = arange(10, dtype=float)
+        sizes[5] = inf
+        mask = bounds_mask(columns, [(0, 9), (0, 10)], finite=[sizes])
+        assert array_equal(mask.nonzero()[0], [0, 1, 2, 4])
+
+        mask = bounds_mask([], [], finite=[sizes])
+        assert mask.sum() == 9
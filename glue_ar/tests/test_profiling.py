@@ -0,0 +1,87 @@
+import json
+
+from numpy import arange, ones
+
+from glue_ar.common.export import export_viewer
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
+from glue_ar.common.tests.helpers import scatter_scene
+from glue_ar.profiling import ExportProfiler, profile_stage, profiled, record_bytes
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+@profiled("decorated")
+def _decorated():
+    return 1
+
+
+def test_stages():
+    profiler = ExportProfiler()
+    with profiler.activate("test.glb"):
+        with profile_stage("outer", layer="layer"):
+            with profile_stage("inner"):
+                record_bytes(10)
+                data = ones(100_000)
+            assert _decorated() == 1
+            assert _decorated() == 1
+            record_bytes(5)
+        del data
+
+    report = profiler.report
+    assert report.filepath == "test.glb"
+    records = {(record.stage, record.layer): record for record in report.stages}
+    assert set(records) == {("total", None), ("outer", "layer"), ("inner", "layer"), ("decorated", "layer")}
+
+    outer = records[("outer", "layer")]
+    inner = records[("inner", "layer")]
+    assert outer.calls == 1
+    assert inner.calls == 1
+    assert records[("decorated", "layer")].calls == 2
+    assert inner.output_bytes == 10
+    assert outer.output_bytes == 5
+    assert outer.wall_time >= inner.wall_time
+    assert report.total_time >= outer.wall_time
+
+    # The inner stage allocated an 800kB array, which should count towards both stages
+    assert inner.peak_memory >= 800_000
+    assert outer.peak_memory >= inner.peak_memory
+    assert report.peak_memory >= outer.peak_memory
+
+    as_json = json.loads(report.to_json())
+    assert len(as_json["stages"]) == 4
+
+
+def test_no_memory_tracing():
+    profiler = ExportProfiler(trace_memory=False)
+    with profiler.activate():
+        with profile_stage("stage"):
+            pass
+
+    assert all(record.peak_memory is None for record in profiler.report.stages)
+    assert profiler.report.peak_memory is None
+
+
+def test_inactive():
+    with profile_stage("stage") as record:
+        record_bytes(10)
+    assert record is None
+    assert _decorated() == 1
+
+
+def test_export_viewer_report(tmp_path):
+    viewer_state, layer_state = scatter_scene("profiling_data", x=arange(10), y=arange(10) ** 2, z=arange(10) ** 3)
+    label = export_label_for_layer(layer_state)
+    state_dictionary = {label: ("Scatter", ARVispyScatterExportOptions())}
+    bounds = xyz_bounds(viewer_state, with_resolution=False)
+    filepath = str(tmp_path / "profiled.glb")
+
+    report = export_viewer(viewer_state, [layer_state], bounds, state_dictionary, filepath,
+                           profiler=ExportProfiler(), model_viewer=True)
+
+    records = {(record.stage, record.layer): record for record in report.stages}
+    assert ("geometry", label) in records
+    assert ("mask", label) in records
+    assert records[("packing", label)].output_bytes > 0
+    assert records[("modelviewer", None)].output_bytes > 0
+    assert records[("write", None)].output_bytes == (tmp_path / "profiled.glb").stat().st_size
+
+    assert export_viewer(viewer_state, [layer_state], bounds, state_dictionary, filepath) is None
@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from os.path import exists
+
+from glue.core import Data
+from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
+from glue.viewers.scatter3d.viewer_state import ScatterViewerState3D
+from numpy import arange
+import pytest
+
+from glue_ar.common.export import export_viewer, export_viewer_formats
+from glue_ar.common.scatter_export_options import ARVispyScatterExportOptions
+from glue_ar.progress import CancellationToken, ExportCancelled, ExportProgress, ProgressSnapshot, \
+                             check_cancelled, format_duration, progress_span, report_progress, tracked
+from glue_ar.utils import export_label_for_layer, xyz_bounds
+
+
+def test_spans():
+    progress = ExportProgress()
+    with progress.activate():
+        with progress_span(0.5, stage="first"):
+            report_progress(0.5)
+            assert progress.snapshot.fraction == pytest.approx(0.25)
+            assert progress.snapshot.stage == "first"
+            # Spans within a span add to its progress
+            with progress_span(0.5, layer="layer"):
+                report_progress(0.5)
+                assert progress.snapshot.fraction == pytest.approx(0.375)
+                assert progress.snapshot.stage == "first"
+                assert progress.snapshot.layer == "layer"
+            assert progress.snapshot.fraction == pytest.approx(0.5)
+        assert progress.snapshot.fraction == pytest.approx(0.5)
+
+        # Progress never goes backwards
+        with progress_span(0.5, stage="second"):
+            report_progress(0.5)
+            report_progress(0.2)
+            assert progress.snapshot.fraction == pytest.approx(0.75)
+            assert progress.snapshot.eta is not None
+    assert progress.snapshot.fraction == 1
+
+
+def test_description():
+    snapshot = ProgressSnapshot(fraction=0.5, stage="geometry", layer="Layer 1", elapsed=125, eta=125)
+    assert snapshot.description == "Building geometry for Layer 1 (about 2m 05s left)"
+    snapshot = ProgressSnapshot(fraction=0, stage=None, layer=None, elapsed=0, eta=None)
+    assert snapshot.description == "Preparing"
+    assert format_duration(5.2) == "5s"
+    assert format_duration(3 * 3600 + 120) == "3h 02m"
+
+
+def test_concurrent_spans():
+    progress = ExportProgress()
+
+    def job():
+        with progress_span(0.25):
+            for _ in tracked(range(100), every=10):
+                pass
+
+    with progress.activate():
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(copy_context().run, job) for _ in range(4)]
+            for future in futures:
+                future.result()
+        assert progress.snapshot.fraction == pytest.approx(1)
+
+
+def test_inactive():
+    items = [1, 2, 3]
+    assert tracked(items) is items
+    with progress_span(0.5):
+        report_progress(0.5)
+        check_cancelled()
+
+
+def test_cancel():
+    token = CancellationToken()
+    progress = ExportProgress(token=token)
+    with pytest.raises(ExportCancelled):
+        with progress.activate():
+            with progress_span(0.5):
+                report_progress(0.5)
+                token.cancel()
+                report_progress(0.6)
+    assert progress.cancelled
+    assert progress.snapshot.fraction == pytest.approx(0.25)
+
+
+class TestExportProgress:
+
+    def setup_method(self, method):
+        data = Data(x=arange(50), y=arange(50) ** 2, z=arange(50) ** 3, c=arange(50), label="progress_data")
+        self.viewer_state = ScatterViewerState3D()
+        self.layer_states = []
+        for index in range(3):
+            subset = data.new_subset(data.id["x"] > index * 10, label=f"progress_subset_{index}")
+            layer_state = ScatterLayerState3D(layer=subset, viewer_state=self.viewer_state)
+            self.viewer_state.layers.append(layer_state)
+            self.layer_states.append(layer_state)
+        self.layer_states[0].color_mode = "Linear"
+        self.layer_states[0].cmap_att = data.id["c"]
+        self.state_dictionary = {export_label_for_layer(layer_state): ("Scatter", ARVispyScatterExportOptions())
+                                 for layer_state in self.layer_states}
+        self.bounds = xyz_bounds(self.viewer_state, with_resolution=False)
+        self.snapshots = []
+
+    def export(self, filepath, progress, **kwargs):
+        export_viewer(self.viewer_state, self.layer_states, self.bounds, self.state_dictionary, filepath,
+                      progress=progress, **kwargs)
+
+    @pytest.mark.parametrize("parallel", (False, True))
+    def test_progress(self, tmp_path, parallel):
+        progress = ExportProgress(callback=self.snapshots.append, interval=0)
+        self.export(str(tmp_path / "export.glb"), progress, parallel=parallel)
+
+        fractions = [snapshot.fraction for snapshot in self.snapshots]
+        assert fractions == sorted(fractions)
+        assert fractions[-1] == 1
+        assert len(set(fractions)) > 10
+        assert {snapshot.stage for snapshot in self.snapshots} >= {"geometry", "write"}
+        layers = {snapshot.layer for snapshot in self.snapshots}
+        assert {export_label_for_layer(layer_state) for layer_state in self.layer_states} <= layers
+
+    def test_cancel_during_geometry(self, tmp_path):
+        def callback(snapshot):
+            if snapshot.fraction > 0.3:
+                progress.cancel()
+
+        progress = ExportProgress(callback=callback, interval=0)
+        filepath = tmp_path / "export.glb"
+        with pytest.raises(ExportCancelled):
+            self.export(str(filepath), progress, model_viewer=True)
+        assert not exists(filepath)
+        assert not exists(tmp_path / "export.html")
+
+    def test_cancel_cleans_up_outputs(self, tmp_path):
+        filepaths = [str(tmp_path / "export.glb"), str(tmp_path / "export.stl")]
+
+        # Cancel once the first file has been written
+        def callback(snapshot):
+            if exists(filepaths[0]):
+                progress.cancel()
+
+        progress = ExportProgress(callback=callback, interval=0)
+        with pytest.raises(ExportCancelled):
+            export_viewer_formats(self.viewer_state, self.layer_states, self.bounds, self.state_dictionary,
+                                  filepaths, model_viewer=True, progress=progress)
+        assert not any(exists(filepath) for filepath in filepaths)
+        assert not exists(tmp_path / "export.html")
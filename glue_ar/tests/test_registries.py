@@ -1,3 +1,9 @@
+from collections import OrderedDict
+import subprocess
+import sys
+
+import pytest
+
 from ..registries import BuilderRegistry, CompressorRegistry
 
 
@@ -27,3 +33,47 @@ def test_compressor_registry():
         pass
 
     assert compressor_registry.members == {"dummy": dummy_compressor}
+
+
+def test_lazy_builder_registry():
+
+    builder_registry = BuilderRegistry()
+    builder_registry.add_lazy(("ext1", "ext2"), "collections:OrderedDict")
+    builder_registry.add_lazy("missing", "glue_ar.not_a_module:Builder", requires=("not_a_package",))
+
+    assert "ext1" in builder_registry.members
+    assert "missing" not in builder_registry.members
+    assert sorted(builder_registry.members) == ["ext1", "ext2"]
+    assert builder_registry.members.get("ext1") is OrderedDict
+    assert builder_registry.members == {"ext1": OrderedDict, "ext2": OrderedDict}
+
+    # A builder that has been imported isn't replaced by an entry point
+    @builder_registry("ext3")
+    class ExtBuilder:
+        pass
+
+    builder_registry.add_lazy("ext3", "collections:OrderedDict")
+    assert builder_registry.members["ext3"] is ExtBuilder
+
+    with pytest.raises(ValueError):
+        builder_registry.add_lazy("ext4", "collections.OrderedDict")
+
+
+def test_lazy_compressor_registry():
+
+    compressor_registry = CompressorRegistry()
+    compressor_registry.add_lazy("dummy", "glue_ar.tests.test_registries:dummy_compressor")
+    assert compressor_registry.members == {"dummy": dummy_compressor}
+
+
+def dummy_compressor(_filepath: str):
+    pass
+
+
+def test_setup_is_lazy():
+    # The export dependencies shouldn't be imported when glue starts up
+    code = "import sys; import glue_ar; glue_ar.setup(); " \
+           "print(','.join(m for m in ('pxr', 'stl', 'DracoPy', 'mcubes', 'glue_ar.common.export') " \
+           "if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
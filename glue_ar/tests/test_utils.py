@@ -1,16 +1,25 @@
+from io import BytesIO
 from itertools import product
-from numpy import arange, array, array_equal, nan, ones
+from matplotlib import colormaps
+from numpy import allclose, arange, array, array_equal, float32, float64, nan, ones, unique
+from numpy.random import default_rng
+from PIL import Image
 import pytest
 
 from glue.core import Data
 from glue.viewers.common.viewer import LayerArtist
+from glue.viewers.scatter3d.layer_state import ScatterLayerState3D
+from glue.viewers.scatter3d.viewer_state import ScatterViewerState3D
 from glue_vispy_viewers.volume.volume_viewer import Vispy3DVolumeViewerState
 
+from glue_ar.common.tests.helpers import scatter_scene
 from glue_ar.utils import alpha_composite, binned_opacity, clamp, clamp_with_resolution, clamped_opacity, \
-                          clip_linear_transformations, clip_sides, color_component_to_hex, data_count, data_for_layer, \
+                          clip_linear_transformations, clip_sides, colormap_coordinates, colormap_png, \
+                          color_component_to_hex, data_count, data_for_layer, \
                           export_label_for_layer, get_resolution, hex_to_components, is_volume_viewer, \
                           iterable_has_nan, iterator_count, layer_color, mask_for_bounds, ndarray_has_nan, \
-                          offset_triangles, rgb_to_hex, slope_intercept_between, unique_id, xyz_bounds
+                          offset_triangles, rgb_to_hex, slope_intercept_between, unique_id, xyz_bounds, \
+                          bring_into_clip, xyz_for_layer, snapshot_viewer_state
 
 from .helpers import GLUE_QT_INSTALLED, GLUE_JUPYTER_INSTALLED
 
@@ -188,6 +197,51 @@ def test_mask_for_bounds():
     assert array_equal(mask_for_bounds(viewer.state, layer_state, bounds), mask)
 
 
+def test_bring_into_clip():
+    bounds = [(0, 10), (-5, 5), (0, 2)]
+    data = [[0, 5, 10], [-5, 0, 5], [0, 1, 2]]
+    scaled = bring_into_clip(data, bounds, preserve_aspect=False)
+    assert allclose(scaled, [[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]])
+
+    scaled = bring_into_clip(data, bounds, preserve_aspect=True)
+    assert allclose(scaled, [[-1, 0, 1], [-1, 0, 1], [-0.2, 0, 0.2]])
+
+
+def test_xyz_for_layer():
+    viewer_state, layer_state = scatter_scene("xyz_data", x=arange(10), y=arange(10) * 2.0, z=-arange(10))
+    data = layer_state.layer
+    viewer_state.x_min, viewer_state.x_max = 0, 9
+    viewer_state.y_min, viewer_state.y_max = 0, 18
+    viewer_state.z_min, viewer_state.z_max = -9, 0
+
+    xyz = xyz_for_layer(viewer_state, layer_state, dtype=float64)
+    assert array_equal(xyz, array([data["x"], data["y"], data["z"]]).T)
+
+    mask = data["x"] % 2 == 0
+    xyz = xyz_for_layer(viewer_state, layer_state, mask=mask, scaled=True,
+                        preserve_aspect=False, axis_order=(1, 2, 0))
+    assert xyz.dtype == float32
+    assert xyz.shape == (5, 3)
+    assert xyz.flags.c_contiguous
+    expected = bring_into_clip([data["x"][mask], data["y"][mask], data["z"][mask]],
+                               xyz_bounds(viewer_state, with_resolution=False),
+                               preserve_aspect=False)
+    assert allclose(xyz, expected[[1, 2, 0]].T)
+
+
+def test_xyz_for_layer_large_offset():
+    # Scaling in single precision would collapse these onto a handful of values
+    x = 2460000 + default_rng(0).random(1000)
+    viewer_state, layer_state = scatter_scene("offset_data", x=x, y=x - 2460000, z=x - 2460000)
+    viewer_state.x_min, viewer_state.x_max = 2460000, 2460001
+    viewer_state.y_min, viewer_state.y_max = 0, 1
+    viewer_state.z_min, viewer_state.z_max = 0, 1
+
+    xyz = xyz_for_layer(viewer_state, layer_state, scaled=True, preserve_aspect=False)
+    assert len(unique(xyz[:, 0])) == 1000
+    assert allclose(xyz[:, 0], xyz[:, 1], atol=1e-6)
+
+
 def test_hex_to_components():
     assert hex_to_components("#7f11e0") == [127, 17, 224]
     assert hex_to_components("#abcdef47") == [171, 205, 239, 71]
@@ -362,3 +416,54 @@ def test_rgb_to_hex():
     assert rgb_to_hex(0.0, 0.0, 0.0) == "#000000"
     assert rgb_to_hex(1.0, 1.0, 1.0) == "#ffffff"
     assert rgb_to_hex(0.1, 0.25, 0.33) == "#1a4054"
+
+
+def test_colormap_png():
+    cmap = colormaps["viridis"]
+    image = Image.open(BytesIO(colormap_png(cmap)))
+    assert image.size == (256, 1)
+    assert image.getpixel((0, 0)) == tuple(round(255 * c) for c in cmap(0.0)[:3])
+    assert image.getpixel((255, 0)) == tuple(round(255 * c) for c in cmap(1.0)[:3])
+
+
+def test_colormap_coordinates():
+    data = Data(c=[0, 5, 10, 20, nan], label="colormap_data")
+    viewer_state = ScatterViewerState3D()
+    layer_state = ScatterLayerState3D(layer=data, viewer_state=viewer_state)
+    layer_state.cmap_vmin, layer_state.cmap_vmax = 0, 10
+    coordinates = colormap_coordinates(layer_state, data["c"])
+    assert coordinates.dtype == float32
+    # The ends of the colormap are the centers of the end texels, and values outside of the range are clipped
+    assert allclose(coordinates, [0.5 / 256, 0.5, 255.5 / 256, 255.5 / 256, 0.5 / 256])
+
+
+def test_snapshot_viewer_state():
+    data = Data(x=[1, 2, 3], y=[4, 5, 6], z=[7, 8, 9], label="snapshot_data")
+    viewer_state = ScatterViewerState3D()
+    for _ in range(2):
+        viewer_state.layers.append(ScatterLayerState3D(layer=data, viewer_state=viewer_state))
+    viewer_state.x_att = data.id["y"]
+    viewer_state.x_min = -5
+    layer_state = viewer_state.layers[1]
+    layer_state.color_mode = "Linear"
+    layer_state.cmap_att = data.id["z"]
+
+    snapshot, layer_states = snapshot_viewer_state(viewer_state, [layer_state])
+    assert len(snapshot.layers) == 2
+    assert layer_states == [snapshot.layers[1]]
+    assert snapshot.x_att is data.id["y"]
+    assert snapshot.x_min == -5
+    assert layer_states[0].layer is data
+    assert layer_states[0].color_mode == "Linear"
+    assert layer_states[0].cmap_att is data.id["z"]
+
+    # Changes on either side, including to the data's style, don't carry over to the other
+    color = layer_states[0].color
+    viewer_state.x_min = 0
+    layer_state.cmap_att = data.id["x"]
+    data.style.color = "#00ff00"
+    assert snapshot.x_min == -5
+    assert layer_states[0].cmap_att is data.id["z"]
+    assert layer_states[0].color == color
+    layer_states[0].color = "#0000ff"
+    assert data.style.color == "#00ff00"
@@ -30,6 +30,46 @@ def material_for_color(stage: Usd.Stage,
     return material
 
 
+def material_for_texture(stage: Usd.Stage,
+                         texture_path: str,
+                         opacity: float,
+                         metallic: float = 0.0,
+                         roughness: float = 1.0,
+                         identifier: Optional[str] = None) -> UsdShade.Material:
+    """
+    Create a material whose diffuse color is read from an image, using the `st` texture coordinates
+    of the mesh that it's bound to.
+    """
+    identifier = identifier or sub(r"\W", "_", texture_path)
+    material_key = f"/material_{identifier}"
+    material = UsdShade.Material.Define(stage, material_key)
+    pbr_shader = UsdShade.Shader.Define(stage, f"{material_key}/PBRShader")
+    pbr_shader.CreateIdAttr("UsdPreviewSurface")
+    pbr_shader.CreateInput("metallic", Sdf.ValueTypeNames.Float).Set(metallic)
+    pbr_shader.CreateInput("roughness", Sdf.ValueTypeNames.Float).Set(roughness)
+    pbr_shader.CreateInput("opacity", Sdf.ValueTypeNames.Float).Set(opacity)
+
+    st_name = material.CreateInput("frame:stPrimvarName", Sdf.ValueTypeNames.Token)
+    st_name.Set("st")
+    st_reader = UsdShade.Shader.Define(stage, f"{material_key}/stReader")
+    st_reader.CreateIdAttr("UsdPrimvarReader_float2")
+    st_reader.CreateInput("varname", Sdf.ValueTypeNames.Token).ConnectToSource(st_name)
+
+    texture = UsdShade.Shader.Define(stage, f"{material_key}/texture")
+    texture.CreateIdAttr("UsdUVTexture")
+    texture.CreateInput("file", Sdf.ValueTypeNames.Asset).Set(texture_path)
+    texture.CreateInput("st", Sdf.ValueTypeNames.Float2).ConnectToSource(st_reader.ConnectableAPI(), "result")
+    texture.CreateInput("wrapS", Sdf.ValueTypeNames.Token).Set("clamp")
+    texture.CreateInput("wrapT", Sdf.ValueTypeNames.Token).Set("clamp")
+    texture.CreateInput("sourceColorSpace", Sdf.ValueTypeNames.Token).Set("sRGB")
+    texture.CreateOutput("rgb", Sdf.ValueTypeNames.Float3)
+
+    pbr_shader.CreateInput("diffuseColor", Sdf.ValueTypeNames.Color3f).ConnectToSource(texture.ConnectableAPI(), "rgb")
+    material.CreateSurfaceOutput().ConnectToSource(pbr_shader.ConnectableAPI(), "surface")
+
+    return material
+
+
 def material_for_mesh(mesh: UsdGeom.Mesh) -> UsdShade.Material:
     prim = mesh.GetPrim()
     relationship = prim.GetRelationship("material:binding")
@@ -1,9 +1,11 @@
+from io import BytesIO
 from numbers import Number
 from os.path import abspath, dirname, join
 from uuid import uuid4
-from typing import Iterator, Literal, overload, Iterable, List, Optional, Tuple, Union
+from typing import Dict, Iterator, Literal, overload, Iterable, List, Optional, Sequence, Tuple, TypeVar, Union
 
 from glue.core import BaseData
+from glue.core.state_objects import State
 from glue.core.subset_group import GroupedSubset
 from glue.viewers.common.state import LayerState, ViewerState
 from glue.viewers.common.viewer import LayerArtist, Viewer
@@ -12,7 +14,13 @@ from glue.viewers.common3d.viewer_state import ViewerState3D
 from glue.viewers.volume3d.layer_state import VolumeLayerState3D
 from glue.viewers.volume3d.viewer_state import VolumeViewerState3D
 
-from numpy import array, inf, isnan, ndarray
+from numpy import asarray, clip, empty, float32, float64, inf, isnan, linspace, nan_to_num, ndarray, \
+                  newaxis, uint8
+from numpy.typing import DTypeLike
+from PIL import Image
+
+from glue_ar.columns import bounds_mask, layer_values
+from glue_ar.profiling import profiled
 
 # Backwards compatibility for Python < 3.10
 try:
@@ -30,7 +38,8 @@ __all__ = [
     "unique_id", "alpha_composite", "data_for_layer", "frb_for_layer",
     "ndarray_has_nan", "iterable_has_nan", "iterator_count",
     "is_volume_viewer", "get_resolution", "clamp", "clamped_opacity",
-    "binned_opacity", "offset_triangles",
+    "binned_opacity", "offset_triangles", "colormap_png", "colormap_coordinates",
+    "copy_state", "snapshot_viewer_state",
 ]
 
 
@@ -38,9 +47,14 @@ PACKAGE_DIR = dirname(abspath(__file__))
 AR_ICON = abspath(join(dirname(__file__), "ar.png"))
 RESOURCES_DIR = join(PACKAGE_DIR, "resources")
 
+# The number of texels in a colormap texture. Matplotlib colormaps have 256 entries by default
+COLORMAP_TEXTURE_WIDTH = 256
+
 Bounds = List[Tuple[float, float]]
 BoundsWithResolution = List[Tuple[float, float, int]]
 
+StateType = TypeVar("StateType", bound=State)
+
 
 def data_count(layers: Iterable[Union[LayerArtist, LayerState]]) -> int:
     """
@@ -184,33 +198,34 @@ def clip_sides(viewer_state: ViewerState3D,
         return tuple(2 * clip_size * stretch / (max_stretch * resolution) for stretch in stretches)
 
 
-def bring_into_clip(data,
-                    bounds: Union[Bounds, BoundsWithResolution],
-                    clip_size: float = 1.0,
-                    preserve_aspect: bool = True,
-                    stretches: Tuple[float, float, float] = (1.0, 1.0, 1.0)):
+def _clip_transformations(bounds: Union[Bounds, BoundsWithResolution],
+                          clip_size: float = 1.0,
+                          preserve_aspect: bool = True,
+                          stretches: Tuple[float, float, float] = (1.0, 1.0, 1.0)) -> List[Tuple[float, float]]:
     if preserve_aspect:
-        line_data = clip_linear_transformations(bounds=bounds, clip_size=clip_size, stretches=stretches)
+        return clip_linear_transformations(bounds=bounds, clip_size=clip_size, stretches=stretches)
     else:
-        line_data = [slope_intercept_between([bds[0], -stretch], [bds[1], stretch])
-                     for bds, stretch in zip(bounds, stretches)]
+        return [slope_intercept_between([bds[0], -stretch], [bds[1], stretch])
+                for bds, stretch in zip(bounds, stretches)]
 
-    scaled = [[m * d + b for d in data[idx]] for idx, (m, b) in enumerate(line_data)]
 
-    return scaled
+def bring_into_clip(data,
+                    bounds: Union[Bounds, BoundsWithResolution],
+                    clip_size: float = 1.0,
+                    preserve_aspect: bool = True,
+                    stretches: Tuple[float, float, float] = (1.0, 1.0, 1.0)) -> ndarray:
+    line_data = _clip_transformations(bounds, clip_size=clip_size,
+                                      preserve_aspect=preserve_aspect, stretches=stretches)
+    slopes, intercepts = (asarray(values)[:, newaxis] for values in zip(*line_data))
+    return slopes * asarray(data, dtype=float64) + intercepts
 
 
 def mask_for_bounds(viewer_state: ViewerState3D,
                     layer_state: LayerState,
                     bounds: Union[Bounds, BoundsWithResolution]):
-    data = layer_state.layer
-    bounds = [(min(b), max(b)) for b in bounds]
-    return (data[viewer_state.x_att] >= bounds[0][0]) & \
-           (data[viewer_state.x_att] <= bounds[0][1]) & \
-           (data[viewer_state.y_att] >= bounds[1][0]) & \
-           (data[viewer_state.y_att] <= bounds[1][1]) & \
-           (data[viewer_state.z_att] >= bounds[2][0]) & \
-           (data[viewer_state.z_att] <= bounds[2][1])
+    atts = (viewer_state.x_att, viewer_state.y_att, viewer_state.z_att)
+    columns = [layer_values(layer_state, att) for att in atts]
+    return bounds_mask(columns, [(min(b), max(b)) for b in bounds])
 
 
 def get_stretches(viewer_state: ViewerState3D) -> Tuple[float, float, float]:
@@ -220,24 +235,38 @@ def get_stretches(viewer_state: ViewerState3D) -> Tuple[float, float, float]:
     )
 
 
-# TODO: Worry about efficiency later
-# and just generally make this better
 def xyz_for_layer(viewer_state: ViewerState3D,
                   layer_state: LayerState,
                   scaled: bool = False,
                   preserve_aspect: bool = True,
-                  mask: Optional[ndarray] = None) -> ndarray:
-    xs = layer_state.layer[viewer_state.x_att][mask]
-    ys = layer_state.layer[viewer_state.y_att][mask]
-    zs = layer_state.layer[viewer_state.z_att][mask]
-    vals = [xs, ys, zs]
+                  mask: Optional[ndarray] = None,
+                  axis_order: Sequence[int] = (0, 1, 2),
+                  dtype: DTypeLike = float32) -> ndarray:
+    """
+    Get the (N, 3) array of positions for a layer, optionally brought into clip space.
+    The columns of the result are the viewer's x, y, and z attributes, reordered by
+    `axis_order` - for example, the exporters use `(1, 2, 0)` to get the y-up axes
+    that the 3D file formats use. The transform is done in double precision, one column at a time,
+    and only the result is stored as `dtype`, so data far from the origin keeps its resolution.
+    """
+    atts = (viewer_state.x_att, viewer_state.y_att, viewer_state.z_att)
+    columns = [layer_values(layer_state, att, mask).ravel() for att in atts]
 
     if scaled:
         stretches = get_stretches(viewer_state)
         bounds = xyz_bounds(viewer_state, with_resolution=False)
-        vals = bring_into_clip(vals, bounds, preserve_aspect=preserve_aspect, stretches=stretches)
+        line_data = _clip_transformations(bounds, preserve_aspect=preserve_aspect, stretches=stretches)
+
+    xyz = empty((len(columns[0]), 3), dtype=dtype)
+    for index, axis in enumerate(axis_order):
+        column = xyz[:, index]
+        if scaled:
+            slope, intercept = line_data[axis]
+            column[:] = asarray(columns[axis], dtype=float64) * slope + intercept
+        else:
+            column[:] = columns[axis]
 
-    return array(list(zip(*vals)))
+    return xyz
 
 
 def hex_to_components(color: str) -> List[int]:
@@ -252,6 +281,30 @@ def rgb_to_hex(r: float, g: float, b: float) -> str:
     return "#" + "".join(color_component_to_hex(c) for c in (r, g, b))
 
 
+def colormap_png(cmap, width: int = COLORMAP_TEXTURE_WIDTH) -> bytes:
+    """
+    Render a colormap as a PNG image that is `width` pixels wide and one pixel high,
+    running from the lowest value of the colormap on the left to the highest on the right.
+    """
+    colors = (asarray(cmap(linspace(0, 1, width)))[:, :3] * 255).round().astype(uint8)
+    out = BytesIO()
+    Image.fromarray(colors.reshape(1, width, 3)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def colormap_coordinates(layer_state: LayerState,
+                         values: ndarray,
+                         width: int = COLORMAP_TEXTURE_WIDTH) -> ndarray:
+    """
+    The horizontal texture coordinates that pick out the colors of the given colormap attribute values
+    from a `colormap_png` image. The ends of the colormap map to the centers of the outermost texels,
+    so that linear filtering interpolates between neighboring colors without blending in the edges.
+    """
+    crange = layer_state.cmap_vmax - layer_state.cmap_vmin
+    normalized = nan_to_num(clip((asarray(values, dtype=float64).ravel() - layer_state.cmap_vmin) / crange, 0, 1))
+    return ((normalized * (width - 1) + 0.5) / width).astype(float32)
+
+
 def unique_id() -> str:
     return uuid4().hex
 
@@ -277,6 +330,7 @@ def data_for_layer(layer_or_state: Union[LayerArtist, LayerState]) -> BaseData:
         return layer_or_state.layer.data
 
 
+@profiled("frb")
 def frb_for_layer(viewer_state: ViewerState,
                   layer_or_state: Union[LayerArtist, LayerState],
                   bounds: BoundsWithResolution) -> ndarray:
@@ -358,3 +412,37 @@ def binned_opacity(raw_opacity: float, resolution: float) -> float:
 
 def offset_triangles(triangle_indices, offset):
     return [tuple(idx + offset for idx in triangle) for triangle in triangle_indices]
+
+
+def copy_state(state: StateType, **kwargs) -> StateType:
+    """
+    Make an independent copy of a state, so that later changes to the original don't affect it.
+    Any keyword arguments are passed to the constructor of the copy, and take precedence over the original's values.
+    """
+    copy = type(state)(**kwargs)
+    if isinstance(copy, LayerState3D):
+        # Layer states keep their color and alpha in sync with the style of their data.
+        # A copy shouldn't follow (or change) the style, and shouldn't tell the viewer about its own updates
+        for sync in (copy._sync_color, copy._sync_alpha):
+            if sync is not None:
+                sync.disable_syncing()
+        copy.remove_global_callback(copy._notify_layer_update)
+    properties: Dict = {name: value for name, value in state.as_dict().items()
+                        if name not in kwargs and name != "layers"}
+    copy.update_from_dict(properties)
+    return copy
+
+
+def snapshot_viewer_state(viewer_state: ViewerState3D,
+                          layer_states: Iterable[LayerState]) -> Tuple[ViewerState3D, List[LayerState]]:
+    """
+    Copy a viewer state, along with all of its layer states, so that an export can run from the copy
+    while the viewer keeps changing. Returns the copied viewer state and the copies of the given layer states.
+    """
+    copy = type(viewer_state)()
+    copies = {id(layer_state): copy_state(layer_state, layer=layer_state.layer)
+              for layer_state in viewer_state.layers}
+    copy.layers = list(copies.values())
+    # The attribute choices depend on the layers, so the remaining properties are copied once those are in place
+    copy.update_from_dict({name: value for name, value in viewer_state.as_dict().items() if name != "layers"})
+    return copy, [copies[id(layer_state)] for layer_state in layer_states]